@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:31
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+import django.db.models.deletion
+
+
+def collapse_characters(apps, schema_editor):
+    """ ユーザーごとに最後に作成したキャラクターだけを残し、キャラクターのないユーザーには初期設定のキャラクターを作成します。 """
+    Character = apps.get_model('character', 'Character')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    latest_pks = Character.objects.values('user').annotate(latest_pk=Max('pk')).values('latest_pk')
+    Character.objects.exclude(pk__in=latest_pks).delete()
+    Character.objects.bulk_create([
+        Character(user_id=user_pk, name='ボディビルダー', number='1')
+        for user_pk in User.objects.filter(character__isnull=True).values_list('pk', flat=True).iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('character', '0003_auto_20201112_1833'),
+    ]
+
+    operations = [
+        migrations.RunPython(collapse_characters, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='character',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
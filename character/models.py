@@ -1,10 +1,48 @@
 from django.db import models
 from django.conf import settings
 
+from tr_calendar.cache import bump_generation
+
 # Create your models here.
 
+# キャラクターを選択していないユーザーに設定するキャラクター
+DEFAULT_NAME = 'ボディビルダー'
+DEFAULT_NUMBER = '1'
+
+
+class CharacterManager(models.Manager):
+    def provision(self, user):
+        """ ユーザーのキャラクターを返します。まだなければ初期設定のキャラクターを作成します。
+
+        通常は本登録（UserCreateComplete）の際に作成済みのため、作成するのは管理画面などで作成したユーザーのみです。
+        """
+        try:
+            return user.character
+        except Character.DoesNotExist:
+            character, _ = self.get_or_create(user=user, defaults={'name': DEFAULT_NAME, 'number': DEFAULT_NUMBER})
+            user.character = character
+            return character
+
+    def select(self, user, name, number):
+        """ ユーザーのキャラクターを変更します。
+
+        既にキャラクターがあれば一回のUPDATEで変更し、なければ作成します。
+        """
+        if self.filter(user=user).update(name=name, number=number):
+            # updateではシグナルが送られないため、ここでホーム画面のキャッシュを無効にします
+            bump_generation(user.pk)
+        else:
+            self.create(user=user, name=name, number=number)
+
 
 class Character(models.Model):
     name = models.CharField(max_length=50, null=True, blank=True)
     number = models.CharField(max_length=50, null=True, blank=True)
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # ユーザーごとに一つだけ作成します。ログイン中のユーザーと一緒に取得します（register.backends.UserBackend）
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+
+    objects = CharacterManager()
+
+    def get_serif_template(self):
+        """ キャラクターのセリフのテンプレート名を返します。 """
+        return f'character_serif/character{self.number}.html'
@@ -0,0 +1,35 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+from register.testing import factory_user
+
+
+class TestCollapseCharactersMigration(TransactionTestCase):
+    """ ユーザーごとのキャラクターが一つにまとめられること """
+    migrate_from = [('character', '0003_auto_20201112_1833')]
+    migrate_to = [('character', '0004_character_one_per_user')]
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self._migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_migrate(self):
+        apps = self._migrate(self.migrate_from)
+        Character = apps.get_model('character', 'Character')
+        user = factory_user()
+        no_character_user = factory_user(email='other@example.com')
+        Character.objects.create(user_id=user.pk, name='ボディビルダー', number='1')
+        Character.objects.create(user_id=user.pk, name='フィジーカー', number='2')
+
+        apps = self._migrate(self.migrate_to)
+        Character = apps.get_model('character', 'Character')
+        self.assertEqual(
+            list(Character.objects.order_by('user').values_list('user', 'name', 'number')),
+            [(user.pk, 'フィジーカー', '2'), (no_character_user.pk, 'ボディビルダー', '1')],
+        )
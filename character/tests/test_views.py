@@ -0,0 +1,55 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from register.testing import factory_user
+from ..models import Character, DEFAULT_NAME
+
+
+class TestCharacterSelection(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _getTarget(self):
+        return reverse('character:character_selection')
+
+    def test_get(self):
+        res = self.client.get(self._getTarget())
+        self.assertTemplateUsed(res, 'character_selection.html')
+
+    def test_post(self):
+        Character.objects.provision(self.user)
+        # セッション、ユーザー、キャラクターの変更
+        with self.assertNumQueries(3):
+            res = self.client.post(self._getTarget(), {'name': 'フィジーカー', 'character': '2'})
+
+        self.assertRedirects(res, reverse('home:home'), fetch_redirect_response=False)
+        self.assertEqual(list(Character.objects.values_list('user', 'name', 'number')),
+                         [(self.user.pk, 'フィジーカー', '2')])
+
+    def test_post_create(self):
+        """ キャラクターがまだなければ作成すること """
+        self.client.post(self._getTarget(), {'name': 'フィジーカー', 'character': '2'})
+        self.assertEqual(list(Character.objects.values_list('user', 'name', 'number')),
+                         [(self.user.pk, 'フィジーカー', '2')])
+
+
+class TestProvision(TestCase):
+    def test_provision(self):
+        user = factory_user()
+        character = Character.objects.provision(user)
+        self.assertEqual((character.name, character.number), (DEFAULT_NAME, '1'))
+        # 作成済みであれば作成しないこと
+        with self.assertNumQueries(0):
+            self.assertEqual(Character.objects.provision(user), character)
+
+    def test_user_create_complete(self):
+        """ 本登録の際にキャラクターを作成すること """
+        from django.core.signing import dumps
+
+        user = factory_user(is_active=False)
+        self.client.get(reverse('register:user_create_complete', kwargs={'token': dumps(user.pk)}))
+        self.assertEqual(Character.objects.get(user=user).name, DEFAULT_NAME)
@@ -13,27 +13,16 @@ def character_selection(request):
     GETで送られてきたら「CharacterForm」をコンテキストに入れてキャラクター選択
     のテンプレートを表示します。
 
-    POSTで送られてきたらformの内容をバリデートして、これまで設定していたキャラクターオブジェクトが
-    あればそれを削除して、新しいキャラクターオブジェクトを作成します。そして、ホームにリダイレクトします。
+    POSTで送られてきたらformの内容をバリデートして、ユーザーのキャラクターオブジェクトを変更します。
+    （まだなければ作成します）そして、ホームにリダイレクトします。
     """
     user = request.user
     if request.method == 'POST':
         form = CharacterForm(request.POST)
         if form.is_valid():
-            # バリデーション成功後、削除するための現在設定中のキャラクターオブジェクトを取得
-            del_objects = Character.objects.filter(user=user)
-            if del_objects:
-                # 現在設定中のキャラクターオブジェクトがあればそれを削除
-                for del_object in del_objects:
-                    del_object.delete()
-            character = form.save(commit=False)
-            character.user = user
-            name = request.POST.get('name')
-            character.name = name
+            name = form.cleaned_data['name']
             number = request.POST.get('character')  # キャラクターを表す番号
-            character.number = number
-
-            character.save()
+            Character.objects.select(user, name, number)
             return redirect('home:home')
     else:
         # GETの場合
@@ -1,6 +1,25 @@
 from django.contrib import admin
-from .models import Discipline
+from tr_calendar.cache import bump_generation
+from .models import Discipline, DisciplineSet
 
 # Register your models here.
 
-admin.site.register(Discipline)
+
+class DisciplineSetInline(admin.TabularInline):
+    model = DisciplineSet
+
+
+@admin.register(Discipline)
+class DisciplineAdmin(admin.ModelAdmin):
+    inlines = [DisciplineSetInline]
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        # 種目の削除ではシグナルを送らないため、ここでキャッシュを無効にします
+        bump_generation(obj.body_part.user_id)
+
+    def delete_queryset(self, request, queryset):
+        user_pks = set(queryset.values_list('body_part__user', flat=True))
+        super().delete_queryset(request, queryset)
+        for user_pk in user_pks:
+            bump_generation(user_pk)
@@ -0,0 +1,177 @@
+import numpy as np
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Coalesce
+
+from .models import DisciplineSet
+
+# numpyの日付（1970-01-01からの日数）は木曜日が0になるため、月曜日始まりの週番号を求めるときにずらす日数
+MONDAY_OFFSET = 3
+
+
+class TrainingHistory:
+    def __init__(self, rows):
+        """ ユーザーの全てのセットを列ごとのnumpy配列に格納し、集計します。
+
+        rows は (日付, 部位, 種目名, 重量, 回数) のリストです。日付は'2020-11-02'の形の文字列でも構いません。
+        集計はセッション（同じ種目名、同じ日付のセットをまとめたもの）ごとに行います。
+
+        self.days : 1970-01-01からの日数
+        self.part_codes, self.exercise_codes : self.part_names、self.exercise_names のインデックス
+        self.weights, self.reps : 重量、回数（入力されていない場合はnan）
+        """
+        if rows:
+            dates, parts, exercises, weights, reps = zip(*rows)
+        else:
+            dates, parts, exercises, weights, reps = [], [], [], [], []
+        # 同じ日付のセットが多いため、日付の変換は重複を除いてから行います
+        unique_dates, date_codes = np.unique(np.array(dates, dtype=str), return_inverse=True)
+        self.days = unique_dates.astype('datetime64[D]').astype(np.int64)[date_codes]
+        self.part_names, self.part_codes = np.unique(np.array(parts, dtype=str), return_inverse=True)
+        self.exercise_names, self.exercise_codes = np.unique(np.array(exercises, dtype=str), return_inverse=True)
+        self.weights = np.array(weights, dtype=float)
+        self.reps = np.array(reps, dtype=float)
+
+    @classmethod
+    def from_user(cls, user):
+        """ ユーザーの全てのセットを一回のクエリで取得してインスタンス化します。
+
+        行数が多いため、日付はdateオブジェクトに変換せず文字列のまま取得します。
+        """
+        rows = DisciplineSet.objects.filter(
+            discipline__body_part__user=user, discipline__date__isnull=False,
+        ).values_list(
+            Cast('discipline__date', CharField()),
+            'discipline__body_part__part',
+            Coalesce('discipline__discipline', Value('')),
+            'weight',
+            'reps',
+        )
+        return cls(list(rows))
+
+    @property
+    def volumes(self):
+        """ セットごとの挙上量（重量×回数）です。重量か回数が入力されていないセットは0になります。 """
+        return np.nan_to_num(self.weights * self.reps)
+
+    @property
+    def estimated_1rms(self):
+        """ セットごとの推定1RM（Epley式 重量×(1＋回数÷30)）です。重量か回数が入力されていないセットはnanになります。 """
+        return self.weights * (1 + self.reps / 30)
+
+    def weekly_volume(self):
+        """ 週ごと、部位ごとの総挙上量を返します。
+
+        例： {'weeks': ['2020-11-02', '2020-11-09'], 'parts': ['背中', '胸'], 'volume': [[0.0, 1600.0], [1200.0, 0.0]]}
+        """
+        if not len(self.days):
+            return {'weeks': [], 'parts': [], 'volume': []}
+        weeks = (self.days + MONDAY_OFFSET) // 7
+        first_week = weeks.min()
+        week_count = weeks.max() - first_week + 1
+        part_count = len(self.part_names)
+        keys = (weeks - first_week) * part_count + self.part_codes
+        volume = np.bincount(keys, weights=self.volumes, minlength=week_count * part_count)
+        mondays = (np.arange(first_week, first_week + week_count) * 7 - MONDAY_OFFSET).astype('datetime64[D]')
+        return {
+            'weeks': [str(monday) for monday in mondays],
+            'parts': self.part_names.tolist(),
+            'volume': volume.reshape(week_count, part_count).tolist(),
+        }
+
+    def get_sessions(self):
+        """ 種目ごと、日付順のセッションの集計値を配列で返します。
+
+        セットを種目、日付、重量、回数の順に並べ、各セッションの最後のセットを最も重いセット（トップセット）とします。
+        """
+        weights = np.where(np.isnan(self.weights), -np.inf, self.weights)
+        reps = np.nan_to_num(self.reps, nan=-1)
+        order = np.lexsort((reps, weights, self.days, self.exercise_codes))
+        exercise_codes = self.exercise_codes[order]
+        days = self.days[order]
+        is_start = np.ones(len(order), dtype=bool)
+        is_start[1:] = (exercise_codes[1:] != exercise_codes[:-1]) | (days[1:] != days[:-1])
+        starts = np.flatnonzero(is_start)
+        tops = np.append(starts[1:], len(order)) - 1
+        return {
+            'exercise_codes': exercise_codes[starts],
+            'days': days[starts],
+            'top_weights': self.weights[order][tops],
+            'top_reps': self.reps[order][tops],
+            'estimated_1rms': np.fmax.reduceat(self.estimated_1rms[order], starts) if len(order) else np.array([]),
+            'volumes': np.add.reduceat(self.volumes[order], starts) if len(order) else np.array([]),
+        }
+
+    def get_streaks(self, sessions):
+        """ セッションごとに、同じ種目の前回のセッションから推定1RMが伸び続けている回数を返します。 """
+        estimated_1rms = sessions['estimated_1rms']
+        exercise_codes = sessions['exercise_codes']
+        increased = np.zeros(len(estimated_1rms), dtype=bool)
+        increased[1:] = (estimated_1rms[1:] > estimated_1rms[:-1]) & (exercise_codes[1:] == exercise_codes[:-1])
+        index = np.arange(len(increased))
+        # 最後に伸びなかったセッションからの回数が連続して伸びた回数になります
+        last_reset = np.maximum.accumulate(np.where(increased, 0, index))
+        return index - last_reset
+
+    def exercise_stats(self):
+        """ 種目ごとのトップセットと推定1RMの推移、連続して推定1RMが伸びている回数を返します。
+
+        例： [{'exercise': 'ベンチプレス', 'part': '胸',
+               'trend': [{'date': '2020-11-02', 'top_weight': 60.0, 'top_reps': 10, 'estimated_1rm': 80.0, 'volume': 1200.0}, ...],
+               'best_1rm': 80.0, 'current_streak': 1, 'longest_streak': 3}, ...]
+        """
+        if not len(self.days):
+            return []
+        sessions = self.get_sessions()
+        streaks = self.get_streaks(sessions)
+        exercise_codes = sessions['exercise_codes']
+        starts = np.flatnonzero(np.diff(exercise_codes, prepend=-1))
+        ends = np.append(starts[1:], len(exercise_codes))
+        longest_streaks = np.maximum.reduceat(streaks, starts)
+        best_1rms = np.fmax.reduceat(sessions['estimated_1rms'], starts)
+        # 種目の部位は、その種目で最も多く記録された部位とします
+        part_counts = np.zeros((len(self.exercise_names), len(self.part_names)), dtype=np.int64)
+        np.add.at(part_counts, (self.exercise_codes, self.part_codes), 1)
+        parts = self.part_names[part_counts.argmax(axis=1)].tolist()
+        exercise_names = self.exercise_names.tolist()
+
+        dates = sessions['days'].astype('datetime64[D]').astype(str).tolist()
+        top_weights = to_list(sessions['top_weights'])
+        top_reps = to_list(sessions['top_reps'], int)
+        estimated_1rms = to_list(sessions['estimated_1rms'])
+        volumes = sessions['volumes'].tolist()
+
+        stats = []
+        for start, end, longest_streak, best_1rm in zip(starts, ends, longest_streaks, to_list(best_1rms)):
+            code = exercise_codes[start]
+            stats.append({
+                'exercise': exercise_names[code],
+                'part': parts[code],
+                'trend': [{
+                    'date': dates[i],
+                    'top_weight': top_weights[i],
+                    'top_reps': top_reps[i],
+                    'estimated_1rm': estimated_1rms[i],
+                    'volume': volumes[i],
+                } for i in range(start, end)],
+                'best_1rm': best_1rm,
+                'current_streak': int(streaks[end - 1]),
+                'longest_streak': int(longest_streak),
+            })
+        return stats
+
+
+def to_list(values, cast=float):
+    """ numpy配列をリストにします。nanはNoneにします。 """
+    is_finite = np.isfinite(values)
+    ret = np.where(is_finite, values, 0).astype(cast).astype(object)
+    ret[~is_finite] = None
+    return ret.tolist()
+
+
+def get_training_stats(user):
+    """ ユーザーの週ごと、部位ごとの総挙上量と種目ごとの集計値を返します。 """
+    history = TrainingHistory.from_user(user)
+    return {
+        'weekly_volume': history.weekly_volume(),
+        'exercises': history.exercise_stats(),
+    }
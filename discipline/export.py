@@ -0,0 +1,202 @@
+import csv
+import datetime
+import json
+
+from django.db.models import Q
+from django.utils import timezone
+
+from tr_calendar.models import DaySchedule
+from .models import Discipline, DisciplineSet
+
+# 一回のクエリで取得する行数
+CHUNK_SIZE = 2000
+# StreamingHttpResponseに一度に渡す文字数の目安
+BUFFER_SIZE = 64 * 1024
+
+FIELDS = ['type', 'date', 'part', 'detail_part', 'discipline', 'sets', 'remarks']
+
+
+def iter_day_schedules(user, chunk_size=CHUNK_SIZE):
+    """ ユーザーの日付ごとのスケジュールを日付、部位番号の順に返します。
+
+    一回の大きなクエリではなく、前のチャンクの最後の(日付, 部位番号)より後をchunk_size行ずつ取得します。
+    （MySQLではiterator()でも結果全体がクライアントに読み込まれるため、短いクエリに分けます）
+    """
+    queryset = DaySchedule.objects.filter(user=user).order_by('date', 'slot')
+    last = None
+    while True:
+        chunk = queryset
+        if last is not None:
+            chunk = chunk.filter(Q(date__gt=last.date) | Q(date=last.date, slot__gt=last.slot))
+        count = 0
+        for day_schedule in chunk[:chunk_size].iterator():
+            yield day_schedule
+            last = day_schedule
+            count += 1
+        if count < chunk_size:
+            return
+
+
+def iter_disciplines(user, chunk_size=CHUNK_SIZE):
+    """ ユーザーの種目を登録順に (種目, [(重量, 回数), ...]) で返します。
+
+    種目はpkの範囲でchunk_size行ずつ取得し、セットはチャンクごとに一回のクエリでまとめて取得します。
+    """
+    queryset = Discipline.objects.filter(body_part__user=user).select_related('body_part').order_by('pk')
+    last_pk = 0
+    while True:
+        disciplines = list(queryset.filter(pk__gt=last_pk)[:chunk_size].iterator())
+        if not disciplines:
+            return
+        sets = {discipline.pk: [] for discipline in disciplines}
+        for discipline_id, weight, reps in DisciplineSet.objects.filter(
+            discipline__in=sets.keys()
+        ).order_by('discipline', 'index').values_list('discipline', 'weight', 'reps').iterator():
+            sets[discipline_id].append((weight, reps))
+        for discipline in disciplines:
+            yield discipline, sets[discipline.pk]
+        if len(disciplines) < chunk_size:
+            return
+        last_pk = disciplines[-1].pk
+
+
+def iter_records(user, chunk_size=CHUNK_SIZE):
+    """ ユーザーの履歴を、スケジュール、種目の順に FIELDS をキーにした辞書で返します。 """
+    for day_schedule in iter_day_schedules(user, chunk_size):
+        yield {
+            'type': 'schedule',
+            'date': day_schedule.date,
+            'part': day_schedule.part,
+            'detail_part': day_schedule.detail_part,
+            'discipline': None,
+            'sets': [],
+            'remarks': None,
+            'uid': f'schedule-{day_schedule.pk}',
+        }
+    for discipline, sets in iter_disciplines(user, chunk_size):
+        yield {
+            'type': 'discipline',
+            'date': discipline.date,
+            'part': discipline.body_part.part,
+            'detail_part': discipline.body_part.detail_part,
+            'discipline': discipline.discipline,
+            'sets': sets,
+            'remarks': discipline.remarks,
+            'uid': f'discipline-{discipline.pk}',
+        }
+
+
+def format_sets(sets):
+    """ セットを '60x10;70x8' の形の文字列にします。入力されていない値は空にします。 """
+    return ';'.join(
+        f"{'' if weight is None else f'{weight:g}'}x{'' if reps is None else reps}" for weight, reps in sets
+    )
+
+
+class Echo:
+    """ csv.writerの書き込み先として、書き込んだ値をそのまま返します。 """
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(records):
+    writer = csv.writer(Echo())
+    # Excelで文字化けしないようにBOMを付けます
+    yield '\ufeff' + writer.writerow(FIELDS)
+    for record in records:
+        yield writer.writerow([
+            record['type'], record['date'] or '', record['part'], record['detail_part'] or '',
+            record['discipline'] or '', format_sets(record['sets']), record['remarks'] or '',
+        ])
+
+
+def iter_jsonl(records):
+    for record in records:
+        yield json.dumps({
+            **{field: record[field] for field in FIELDS},
+            'date': record['date'] and record['date'].isoformat(),
+        }, ensure_ascii=False) + '\n'
+
+
+def escape_ics(value):
+    """ iCalendarのテキストの値をエスケープします。 """
+    return (
+        value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def fold_ics(line):
+    """ iCalendarの行を75オクテットごとに折り返します。（マルチバイト文字の途中では折り返しません） """
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    lines = []
+    start = 0
+    limit = 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # UTF-8の継続バイト（0b10xxxxxx）の前では折り返しません
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        lines.append(encoded[start:end].decode())
+        start = end
+        # 2行目以降は先頭の空白の分だけ短くします
+        limit = 74
+    return '\r\n '.join(lines) + '\r\n'
+
+
+def iter_ics(records):
+    """ 日付のある履歴を終日の予定として返します。 """
+    dtstamp = timezone.now().strftime('%Y%m%dT%H%M%SZ')
+    yield 'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//workout_plan//training history//JA\r\n'
+    for record in records:
+        if record['date'] is None:
+            continue
+        summary = record['part'] + (f"（{record['detail_part']}）" if record['detail_part'] else '')
+        if record['discipline']:
+            summary += f" {record['discipline']}"
+        lines = [
+            'BEGIN:VEVENT',
+            f"UID:{record['uid']}@workout_plan",
+            f'DTSTAMP:{dtstamp}',
+            f"DTSTART;VALUE=DATE:{record['date']:%Y%m%d}",
+            f"DTEND;VALUE=DATE:{record['date'] + datetime.timedelta(days=1):%Y%m%d}",
+            f'SUMMARY:{escape_ics(summary)}',
+        ]
+        description = '\n'.join(filter(None, [format_sets(record['sets']), record['remarks']]))
+        if description:
+            lines.append(f'DESCRIPTION:{escape_ics(description)}')
+        lines.append('END:VEVENT')
+        yield ''.join(fold_ics(line) for line in lines)
+    yield 'END:VCALENDAR\r\n'
+
+
+# 形式ごとの (書き出す関数, Content-Type, 拡張子)
+FORMATS = {
+    'csv': (iter_csv, 'text/csv; charset=utf-8', 'csv'),
+    'jsonl': (iter_jsonl, 'application/jsonl; charset=utf-8', 'jsonl'),
+    'ics': (iter_ics, 'text/calendar; charset=utf-8', 'ics'),
+}
+
+
+def buffered(chunks, size=BUFFER_SIZE):
+    """ 小さな文字列をsize文字程度にまとめて返します。 """
+    buffer = []
+    length = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def export_history(user, fmt, chunk_size=CHUNK_SIZE):
+    """ ユーザーの履歴をfmtの形式で少しずつ返します。履歴の件数によらず使うメモリは一定です。 """
+    writer = FORMATS[fmt][0]
+    return buffered(writer(iter_records(user, chunk_size)))
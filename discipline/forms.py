@@ -1,35 +1,88 @@
 from django import forms
-from .models import Discipline
+from .models import Discipline, DisciplineSet, SET_COUNT
+
+
+class DisciplineSetForm(forms.ModelForm):
+
+    class Meta:
+        model = DisciplineSet
+        fields = [
+            'weight',
+            'reps',
+        ]
+
+
+class BaseDisciplineSetFormSet(forms.BaseInlineFormSet):
+    def __init__(self, *args, **kwargs):
+        """ 既に保存されているセットと合わせて、少なくともSET_COUNT個のフォームを表示します。 """
+        super().__init__(*args, **kwargs)
+        self.extra = max(SET_COUNT - self.initial_form_count(), 0)
+
+    def save(self, commit=True):
+        """ 重量、回数のどちらかが入力されたセットを、入力された順にセット番号をつけて保存します。
+
+        既に保存されているセットの重量、回数を両方とも空にした場合はそのセットを削除します。
+        """
+        discipline_sets = []
+        for form in self.forms:
+            if form.cleaned_data.get('weight') is None and form.cleaned_data.get('reps') is None:
+                if form.instance.pk is not None:
+                    form.instance.delete()
+                continue
+            discipline_set = form.save(commit=False)
+            discipline_set.discipline = self.instance
+            discipline_set.index = len(discipline_sets) + 1
+            discipline_set.save()
+            discipline_sets.append(discipline_set)
+        return discipline_sets
+
+
+DisciplineSetFormSet = forms.inlineformset_factory(
+    Discipline, DisciplineSet, form=DisciplineSetForm, formset=BaseDisciplineSetFormSet, extra=0, can_delete=False,
+)
 
 
 class DisciplineForm(forms.ModelForm):
+    """ 種目のフォームです。セットごとの重量、回数は self.formset で入力します。 """
 
     class Meta:
         model = Discipline
         fields = [
             'discipline',
-            'weight_1',
-            'weight_2',
-            'weight_3',
-            'weight_4',
-            'weight_5',
-            'weight_6',
-            'weight_7',
-            'weight_8',
-            'weight_9',
-            'weight_10',
-            'times_1',
-            'times_2',
-            'times_3',
-            'times_4',
-            'times_5',
-            'times_6',
-            'times_7',
-            'times_8',
-            'times_9',
-            'times_10',
             'remarks',
         ]
         widgets = {
             'remarks': forms.Textarea(attrs={'rows': 3, 'cols': 30}),
         }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.formset = DisciplineSetFormSet(self.data if self.is_bound else None, instance=self.instance, prefix='sets')
+
+    def is_valid(self):
+        is_valid = super().is_valid()
+        return self.formset.is_valid() and is_valid
+
+    def _save_m2m(self):
+        """ 種目を保存した後にセットを保存します。 commit=False の場合は save_m2m() で保存します。 """
+        super()._save_m2m()
+        self.formset.instance = self.instance
+        self.formset.save()
+
+
+class HistoryImportForm(forms.Form):
+    """ 履歴の取り込みのフォームです。形式を選択しない場合はファイルの拡張子から判定します。 """
+    file = forms.FileField(label='ファイル')
+    format = forms.ChoiceField(
+        label='形式', required=False, choices=[('', 'ファイルの拡張子から判定'), ('csv', 'CSV'), ('jsonl', 'JSON Lines')],
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        file = cleaned_data.get('file')
+        if file is not None and not cleaned_data.get('format'):
+            extension = file.name.rsplit('.', 1)[-1].lower()
+            if extension not in ('csv', 'jsonl'):
+                raise forms.ValidationError('形式を選択してください')
+            cleaned_data['format'] = extension
+        return cleaned_data
@@ -0,0 +1,279 @@
+import csv
+import functools
+import json
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Max
+
+from routine.models import BodyPart, TermDecision
+from tr_calendar.cache import bump_generation
+from tr_calendar.forms import DayBodyPartForm, validate_day_part
+from tr_calendar.schedules import ScheduleResolver, refresh_day_schedules
+from .forms import DisciplineForm, DisciplineSetForm
+from .models import Discipline, DisciplineSet
+
+# 一回のトランザクションで保存する行数
+BATCH_SIZE = 1000
+# 一日に登録できる部位の数（day_schedule_create と同じです）
+MAX_DAY_PARTS = 5
+
+FORMATS = ['csv', 'jsonl']
+TYPES = ['schedule', 'discipline']
+
+BODY_PART_FIELDS = {name: DayBodyPartForm.base_fields[name] for name in ['date', 'part', 'detail_part']}
+DISCIPLINE_FIELDS = DisciplineForm.base_fields
+SET_FIELDS = DisciplineSetForm.base_fields
+
+# bulk_create_with_pks で作成した行を取得し直すためのフィールド（自然キー）
+BODY_PART_KEY = ['user', 'date', 'part', 'detail_part']
+DISCIPLINE_KEY = ['body_part', 'date', 'discipline', 'remarks']
+
+
+class ImportResult:
+    def __init__(self):
+        """ 取り込みの結果です。
+
+        rows : 読み込んだ行数
+        body_parts, disciplines, sets : 作成した日付指定オブジェクト、種目、セットの数
+        errors : 取り込めなかった行の [(行番号, [エラーメッセージ, ...]), ...]
+        """
+        self.rows = 0
+        self.body_parts = 0
+        self.disciplines = 0
+        self.sets = 0
+        self.errors = []
+
+    def add_error(self, line_no, messages):
+        self.errors.append((line_no, messages))
+
+
+def iter_csv(f):
+    """ CSVの行を (行番号, 行の辞書) で返します。列は discipline.export.FIELDS と同じです。 """
+    reader = csv.DictReader(f)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def iter_jsonl(f):
+    """ JSON Linesの行を (行番号, 行の辞書) で返します。JSONとして読み込めない行はNoneを返します。 """
+    for line_no, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_no, row if isinstance(row, dict) else None
+
+
+READERS = {'csv': iter_csv, 'jsonl': iter_jsonl}
+
+
+def parse_sets(value):
+    """ セットを [(重量, 回数), ...] にします。
+
+    CSVでは '60x10;70x8' の形の文字列、JSON Linesでは [[60, 10], [70, 8]] の形のリストです。
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = [item.split('x') for item in value.split(';')]
+    if not isinstance(value, list) or not all(isinstance(item, (list, tuple)) and len(item) == 2 for item in value):
+        raise ValidationError('セットは 60x10;70x8 の形式で入力してください')
+    return [(weight, reps) for weight, reps in value]
+
+
+@functools.lru_cache(maxsize=4096)
+def clean_value(field, value):
+    """ フィールドで値を検証します。日付、部位、重量などは同じ値が多いため、検証した結果を再利用します。 """
+    return field.clean(value)
+
+
+def clean_fields(fields, data):
+    """ フォームのフィールドで値を検証します。（フォームを作成せず、フィールドの検証のみ行います） """
+    cleaned_data = {}
+    messages = []
+    for name, field in fields.items():
+        value = data.get(name)
+        value = '' if value is None else value
+        try:
+            try:
+                cleaned_data[name] = clean_value(field, value)
+            except TypeError:
+                # JSONのリストなど、キャッシュのキーにできない値はそのまま検証します
+                cleaned_data[name] = field.clean(value)
+        except ValidationError as e:
+            messages.extend(f'{field.label}: {message}' for message in e.messages)
+    if messages:
+        raise ValidationError(messages)
+    return cleaned_data
+
+
+def clean_row(row):
+    """ 行を検証して (種類, 値の辞書) を返します。
+
+    部位は DayBodyPartForm、種目は DisciplineForm、セットは DisciplineSetForm のフィールドで検証します。
+    """
+    if row is None:
+        raise ValidationError('JSONの形式が正しくありません')
+    kind = row.get('type') or 'discipline'
+    if kind not in TYPES:
+        raise ValidationError(f'種類は {"、".join(TYPES)} のいずれかを指定してください')
+
+    cleaned_data = clean_fields(BODY_PART_FIELDS, row)
+    if cleaned_data['date'] is None:
+        raise ValidationError('日付を入力してください')
+    if not cleaned_data['part']:
+        raise ValidationError('部位を選択してください')
+    cleaned_data['detail_part'] = cleaned_data['detail_part'] or None
+
+    if kind == 'discipline':
+        cleaned_data.update(clean_fields(DISCIPLINE_FIELDS, row))
+        cleaned_data['sets'] = []
+        for weight, reps in parse_sets(row.get('sets')):
+            discipline_set = clean_fields(SET_FIELDS, {'weight': weight, 'reps': reps})
+            # 重量、回数のどちらも入力されていないセットは保存しません（BaseDisciplineSetFormSet.save と同じです）
+            if discipline_set['weight'] is not None or discipline_set['reps'] is not None:
+                cleaned_data['sets'].append(discipline_set)
+    return kind, cleaned_data
+
+
+def bulk_create_with_pks(model, objs, queryset, key):
+    """ objsをbulk_createしてpkを設定します。
+
+    DBが作成した行のpkを返さない場合（SQLite、MySQL）は、作成前の最後のpkより後の行をquerysetから
+    keyのフィールド（自然キー）の値とあわせて取得し、同じ値のオブジェクトにpkの順に設定します。
+    取り込み中にウェブの画面から同じユーザーの行が作成されても、値の異なる行のpkは設定しません。
+    （値まで同じ行が同時に作成された場合は、どちらの行のpkを設定しても同じ内容になります）
+    """
+    if not objs:
+        return objs
+    last_pk = queryset.aggregate(last_pk=Max('pk'))['last_pk'] or 0
+    model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+    if objs[0].pk is None:
+        attnames = [model._meta.get_field(name).attname for name in key]
+        key_pks = defaultdict(list)
+        for pk, *values in queryset.filter(pk__gt=last_pk).order_by('-pk').values_list('pk', *key).iterator():
+            key_pks[tuple(values)].append(pk)
+        for obj in objs:
+            pks = key_pks.get(tuple(getattr(obj, attname) for attname in attnames))
+            if not pks:
+                raise RuntimeError(f'{model.__name__} の作成した行を取得できませんでした')
+            # pkの降順に取得しているため、最後から取り出すとpkの順になります
+            obj.pk = pks.pop()
+    return objs
+
+
+class HistoryImporter:
+    def __init__(self, user, batch_size=BATCH_SIZE):
+        """ CSV、JSON Linesの履歴を読み込み、日付指定オブジェクト、種目、セットをまとめて作成します。
+
+        列は discipline.export の書き出しと同じです。種類（type）が schedule の行は部位のみ、
+        discipline の行は種目とセットを作成します。その日付に同じ部位がなければ日付指定オブジェクトを作成します。
+        batch_size行ごとにトランザクションを分けるため、エラーのある行があっても他の行は取り込みます。
+        """
+        self.user = user
+        self.batch_size = batch_size
+        self.result = ImportResult()
+
+    def run(self, f, fmt):
+        """ テキストのファイルfをfmtの形式で少しずつ読み込んで取り込みます。 """
+        batch = []
+        for line_no, row in READERS[fmt](f):
+            self.result.rows += 1
+            try:
+                batch.append((line_no, *clean_row(row)))
+            except ValidationError as e:
+                self.result.add_error(line_no, e.messages)
+                continue
+            if len(batch) >= self.batch_size:
+                self.save(batch)
+                batch = []
+        if batch:
+            self.save(batch)
+        return self.result
+
+    def get_day_parts(self, dates):
+        """ datesの日付ごとに設定されている部位の {日付: {(部位, 部位詳細): 部位オブジェクトのpk}} を返します。
+
+        DayScheduleが作り直されていない場合も同じ部位を重複して作成しないように、部位オブジェクトから解決します。
+        """
+        resolver = ScheduleResolver(self.user, TermDecision.objects.filter(user=self.user).index(), dates)
+        day_parts = defaultdict(dict)
+        for date in dates:
+            for bp_object in resolver.get_schedules(date):
+                day_parts[date][(bp_object.part, bp_object.detail_part)] = bp_object.pk
+        return day_parts
+
+    def validate_body_part(self, part, detail_part, parts):
+        """ 日付指定オブジェクトを day_schedule_create と同じルールで検証し、エラーメッセージを返します。
+
+        各フィールドは clean_row で検証済みのため、フォームは作成せずに DayBodyPartForm.clean と同じ検証のみ行います。
+        """
+        if len(parts) >= MAX_DAY_PARTS:
+            return ['これ以上の登録はできません']
+        try:
+            validate_day_part(part, detail_part, [BodyPart(part=p, detail_part=d) for p, d in parts] or [None])
+        except ValidationError as e:
+            return e.messages
+        return []
+
+    def save(self, batch):
+        """ 検証済みの行をまとめて保存します。 """
+        with transaction.atomic():
+            # 同じユーザーの取り込みを同時に行わないようにします
+            get_user_model().objects.select_for_update().filter(pk=self.user.pk).exists()
+            day_parts = self.get_day_parts({cleaned_data['date'] for _, _, cleaned_data in batch})
+
+            new_body_parts = {}
+            rows = []
+            for line_no, kind, cleaned_data in batch:
+                date = cleaned_data['date']
+                key = (cleaned_data['part'], cleaned_data['detail_part'])
+                if key not in day_parts[date]:
+                    messages = self.validate_body_part(*key, day_parts[date])
+                    if messages:
+                        self.result.add_error(line_no, messages)
+                        continue
+                    new_body_parts[(date, *key)] = BodyPart(date=date, part=key[0], detail_part=key[1], user=self.user)
+                    # 作成する部位オブジェクトは保存した後にpkを設定します
+                    day_parts[date][key] = None
+                if kind == 'discipline':
+                    rows.append((date, key, cleaned_data))
+
+            bulk_create_with_pks(
+                BodyPart, list(new_body_parts.values()), BodyPart.objects.filter(user=self.user), BODY_PART_KEY)
+            for body_part in new_body_parts.values():
+                day_parts[body_part.date][(body_part.part, body_part.detail_part)] = body_part.pk
+
+            disciplines = bulk_create_with_pks(Discipline, [
+                Discipline(
+                    discipline=cleaned_data['discipline'], date=date, remarks=cleaned_data['remarks'],
+                    body_part_id=day_parts[date][key],
+                )
+                for date, key, cleaned_data in rows
+            ], Discipline.objects.filter(body_part__user=self.user), DISCIPLINE_KEY)
+            discipline_sets = [
+                DisciplineSet(discipline=discipline, index=index, **discipline_set)
+                for discipline, (_, _, cleaned_data) in zip(disciplines, rows)
+                for index, discipline_set in enumerate(cleaned_data['sets'], 1)
+            ]
+            DisciplineSet.objects.bulk_create(discipline_sets, batch_size=BATCH_SIZE)
+
+            if new_body_parts:
+                refresh_day_schedules(self.user, {body_part.date for body_part in new_body_parts.values()})
+            elif disciplines:
+                # bulk_createではシグナルが送られないため、キャッシュを無効にします
+                bump_generation(self.user.pk)
+
+        self.result.body_parts += len(new_body_parts)
+        self.result.disciplines += len(disciplines)
+        self.result.sets += len(discipline_sets)
+
+
+def import_history(user, f, fmt, batch_size=BATCH_SIZE):
+    """ テキストのファイルfからユーザーの履歴を取り込み、ImportResultを返します。 """
+    return HistoryImporter(user, batch_size).run(f, fmt)
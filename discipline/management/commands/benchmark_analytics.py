@@ -0,0 +1,96 @@
+import datetime
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from discipline.analytics import get_training_stats
+from discipline.models import Discipline, DisciplineSet
+from routine.testing import factory_history
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        '複数年分の合成データをSQLiteのテスト用DBに作成し、トレーニング分析の集計時間を'
+        '種目ごとにループして集計する場合と比較します。'
+    )
+    # 目標とする集計時間(ms)
+    target = 50
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, default=5, help='履歴の年数')
+        parser.add_argument('--repeat', type=int, default=5, help='計測回数')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('このコマンドはSQLiteでのみ実行できます。')
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            user = self.seed(options['years'])
+            vectorized = self.measure(lambda: get_training_stats(user), options['repeat'])
+            naive = self.measure(lambda: self.naive_training_stats(user), options['repeat'])
+            self.report(vectorized, naive)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def seed(self, years):
+        started = time.perf_counter()
+        user = User.objects.create_user(email='benchmark@example.com')
+        days = 365 * years
+        factory_history(user, datetime.date.today() - datetime.timedelta(days=days), days)
+        self.stdout.write(
+            f'データ作成: {years}年分 種目{Discipline.objects.count()}件 '
+            f'セット{DisciplineSet.objects.count()}件 ({time.perf_counter() - started:.1f}秒)'
+        )
+        return user
+
+    def naive_training_stats(self, user):
+        """ 種目ごとにセットを取得して、週ごと、部位ごとの総挙上量と種目ごとの最高推定1RMを集計します。 """
+        weekly_volume = {}
+        best_1rms = {}
+        for discipline in Discipline.objects.filter(body_part__user=user, date__isnull=False).order_by('date'):
+            monday = discipline.date - datetime.timedelta(days=discipline.date.weekday())
+            key = (monday, discipline.body_part.part)
+            for discipline_set in discipline.sets.all():
+                if discipline_set.weight is None or discipline_set.reps is None:
+                    continue
+                weekly_volume[key] = weekly_volume.get(key, 0) + discipline_set.weight * discipline_set.reps
+                estimated_1rm = discipline_set.weight * (1 + discipline_set.reps / 30)
+                best_1rms[discipline.discipline] = max(best_1rms.get(discipline.discipline, 0), estimated_1rm)
+        return weekly_volume, best_1rms
+
+    def measure(self, func, repeat):
+        """ funcのクエリ数と実行時間（中央値、最大値）を計測します。 """
+        timings = []
+        queries = []
+
+        # ループで集計する場合はクエリ数が多いため、クエリのログではなく実行回数だけを数えます
+        def count_queries(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        for _ in range(repeat):
+            queries.clear()
+            with connection.execute_wrapper(count_queries):
+                started = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - started) * 1000)
+        return {'queries': len(queries), 'median': statistics.median(timings), 'max': max(timings)}
+
+    def report(self, vectorized, naive):
+        self.stdout.write('')
+        self.stdout.write(f"{'集計方法':<24}{'クエリ数':>8}{'中央値(ms)':>12}{'最大(ms)':>12}")
+        for name, result in [('numpy (get_training_stats)', vectorized), ('種目ごとのループ', naive)]:
+            self.stdout.write(f"{name:<24}{result['queries']:>8}{result['median']:>12.2f}{result['max']:>12.2f}")
+        if vectorized['median'] > self.target:
+            self.stdout.write(self.style.WARNING(f'目標の{self.target}msを超えています。'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'目標の{self.target}ms以内です。'))
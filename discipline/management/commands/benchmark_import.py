@@ -0,0 +1,79 @@
+import datetime
+import io
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from discipline.forms import DisciplineForm
+from discipline.importer import import_history
+from discipline.testing import get_sets_data
+from routine.models import BodyPart, PARTS
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'テスト用DBに履歴のCSVを取り込む時間を計測し、以前のように種目ごとにフォーム（DisciplineForm）で'
+        '保存する場合と比較します。'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000, help='取り込む種目の行数')
+        parser.add_argument('--form-rows', type=int, default=2000, help='フォームで保存する種目の行数')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            user = User.objects.create_user(email='benchmark@example.com')
+            content = self.make_csv(options['rows'])
+            started = time.perf_counter()
+            result = import_history(user, io.StringIO(content), 'csv')
+            imported = time.perf_counter() - started
+
+            form_user = User.objects.create_user(email='form@example.com')
+            started = time.perf_counter()
+            self.save_with_forms(form_user, options['form_rows'])
+            form = time.perf_counter() - started
+
+            self.report(result, imported, options['form_rows'], form)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def make_csv(self, rows):
+        """ 一日に2部位、5種目ずつ、3セットの履歴のCSVを作成します。 """
+        parts = [part for part, _ in PARTS]
+        start_date = datetime.date.today() - datetime.timedelta(days=rows // 5)
+        lines = ['type,date,part,detail_part,discipline,sets,remarks\r\n']
+        for i in range(rows):
+            date = start_date + datetime.timedelta(days=i // 5)
+            part = parts[(i // 5 * 2 + i % 2) % len(parts)]
+            lines.append(f'discipline,{date},{part},,種目{i % 5},60x10;65x8;70x6,\r\n')
+        return ''.join(lines)
+
+    def save_with_forms(self, user, rows):
+        """ discipline_create と同じく、種目ごとにフォームを検証して保存します。 """
+        body_part = BodyPart.objects.create(date=datetime.date.today(), part='胸', user=user)
+        data = get_sets_data([(60, 10), (65, 8), (70, 6)])
+        for i in range(rows):
+            form = DisciplineForm({'discipline': f'種目{i % 5}', 'remarks': '', **data})
+            form.is_valid()
+            discipline = form.save(commit=False)
+            discipline.date = body_part.date
+            discipline.body_part = body_part
+            discipline.save()
+            form.save_m2m()
+
+    def report(self, result, imported, form_rows, form):
+        self.stdout.write('')
+        self.stdout.write(f"{'方法':<12}{'行数':>8}{'時間(秒)':>10}{'行/秒':>10}")
+        self.stdout.write(f"{'importer':<12}{result.rows:>8}{imported:>10.2f}{result.rows / imported:>10.0f}")
+        self.stdout.write(f"{'form':<12}{form_rows:>8}{form:>10.2f}{form_rows / form:>10.0f}")
+        self.stdout.write(
+            f'部位{result.body_parts}件、種目{result.disciplines}件、セット{result.sets}件（エラー{len(result.errors)}行）'
+        )
@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from discipline.export import FORMATS, export_history
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'ユーザーのスケジュールと種目の履歴を、CSV、JSON Lines、iCalendarのいずれかの形式で書き出します。'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='書き出すユーザーのメールアドレス')
+        parser.add_argument('--format', choices=FORMATS.keys(), default='csv', help='書き出す形式')
+        parser.add_argument('--output', help='書き出すファイル（省略すると標準出力）')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError(f"ユーザーが見つかりません: {options['email']}")
+
+        chunks = export_history(user, options['format'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f"{options['output']} に書き出しました。"))
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,39 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from discipline.importer import BATCH_SIZE, FORMATS, import_history
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'CSV、JSON Linesの履歴ファイルからユーザーの部位、種目、セットを取り込みます。'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='取り込むユーザーのメールアドレス')
+        parser.add_argument('path', help='取り込むファイル')
+        parser.add_argument('--format', choices=FORMATS, help='ファイルの形式（省略すると拡張子から判定）')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='一回のトランザクションで保存する行数')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError(f"ユーザーが見つかりません: {options['email']}")
+        fmt = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if fmt not in FORMATS:
+            raise CommandError(f"--format で形式（{'、'.join(FORMATS)}）を指定してください")
+
+        started = time.perf_counter()
+        with open(options['path'], encoding='utf-8-sig', newline='') as f:
+            result = import_history(user, f, fmt, options['batch_size'])
+        elapsed = time.perf_counter() - started
+
+        for line_no, messages in result.errors:
+            self.stderr.write(f"{line_no}行目: {'、'.join(messages)}")
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.rows}行を{elapsed:.2f}秒で読み込み、部位{result.body_parts}件、種目{result.disciplines}件、'
+            f'セット{result.sets}件を登録しました。（エラー{len(result.errors)}行）'
+        ))
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discipline', '0004_discipline_remarks'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='discipline',
+            index=models.Index(fields=['body_part', 'date'], name='discipline_bp_date_idx'),
+        ),
+    ]
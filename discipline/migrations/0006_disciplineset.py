@@ -0,0 +1,66 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_sets(apps, schema_editor):
+    """ weight_1～weight_10、times_1～times_10 の値をセットごとの DisciplineSet に移します。
+
+    重量、回数のどちらかが入力されている番号のみ、その番号をセット番号として作成します。
+    """
+    Discipline = apps.get_model('discipline', 'Discipline')
+    DisciplineSet = apps.get_model('discipline', 'DisciplineSet')
+    fields = ['pk'] + [f'weight_{i}' for i in range(1, 11)] + [f'times_{i}' for i in range(1, 11)]
+    discipline_sets = []
+    for values in Discipline.objects.values(*fields).iterator():
+        for i in range(1, 11):
+            weight = values[f'weight_{i}']
+            reps = values[f'times_{i}']
+            if weight is not None or reps is not None:
+                discipline_sets.append(DisciplineSet(discipline_id=values['pk'], index=i, weight=weight, reps=reps))
+        if len(discipline_sets) >= 1000:
+            DisciplineSet.objects.bulk_create(discipline_sets)
+            discipline_sets = []
+    DisciplineSet.objects.bulk_create(discipline_sets)
+
+
+def restore_sets(apps, schema_editor):
+    """ DisciplineSet の値を weight_1～weight_10、times_1～times_10 に戻します。（11セット目以降は戻せません） """
+    Discipline = apps.get_model('discipline', 'Discipline')
+    DisciplineSet = apps.get_model('discipline', 'DisciplineSet')
+    disciplines = {}
+    for discipline_set in DisciplineSet.objects.filter(index__lte=10).iterator():
+        values = disciplines.setdefault(discipline_set.discipline_id, {})
+        values[f'weight_{discipline_set.index}'] = discipline_set.weight
+        values[f'times_{discipline_set.index}'] = discipline_set.reps
+    for pk, values in disciplines.items():
+        Discipline.objects.filter(pk=pk).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discipline', '0005_discipline_discipline_bp_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DisciplineSet',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField(verbose_name='セット')),
+                ('weight', models.FloatField(blank=True, null=True, verbose_name='重量')),
+                ('reps', models.IntegerField(blank=True, null=True, verbose_name='回数')),
+                ('discipline', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sets', to='discipline.discipline')),
+            ],
+            options={
+                'ordering': ['discipline', 'index'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='disciplineset',
+            constraint=models.UniqueConstraint(fields=('discipline', 'index'), name='unique_discipline_set'),
+        ),
+        migrations.RunPython(copy_sets, restore_sets),
+    ]
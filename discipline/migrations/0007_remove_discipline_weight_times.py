@@ -0,0 +1,93 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discipline', '0006_disciplineset'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='discipline',
+            name='weight_1',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='weight_2',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='weight_3',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='weight_4',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='weight_5',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='weight_6',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='weight_7',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='weight_8',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='weight_9',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='weight_10',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='times_1',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='times_2',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='times_3',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='times_4',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='times_5',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='times_6',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='times_7',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='times_8',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='times_9',
+        ),
+        migrations.RemoveField(
+            model_name='discipline',
+            name='times_10',
+        ),
+    ]
@@ -1,90 +1,33 @@
 from django.db import models
+from django.db.models import ExpressionWrapper, F, FloatField, Max, OuterRef, Subquery, Sum
 from routine.models import BodyPart
 
+# 種目の入力フォーム、表示で最低限表示するセット数
+SET_COUNT = 10
+
+
+class DisciplineQuerySet(models.QuerySet):
+    def with_stats(self):
+        """ 種目ごとの集計値をDBで計算して付け加えます。
+
+        total_volume : 総挙上量（重量×回数の合計）
+        top_weight, top_reps : 最も重量が大きいセット（同じ重量なら回数が多いセット）の重量と回数
+        estimated_1rm : 推定1RM（Epley式 重量×(1＋回数÷30) の最大値）
+        """
+        top_set = DisciplineSet.objects.filter(discipline=OuterRef('pk')).exclude(weight=None).order_by('-weight', '-reps')
+        return self.annotate(
+            total_volume=Sum(F('sets__weight') * F('sets__reps'), output_field=FloatField()),
+            top_weight=Subquery(top_set.values('weight')[:1]),
+            top_reps=Subquery(top_set.values('reps')[:1]),
+            estimated_1rm=Max(ExpressionWrapper(
+                F('sets__weight') * (1 + F('sets__reps') / 30.0), output_field=FloatField()
+            )),
+        )
+
 
 class Discipline(models.Model):
     discipline = models.CharField(max_length=30, null=True, blank=True)
     date = models.DateField('実行日', null=True, blank=True)
-    weight_1 = models.FloatField(
-        verbose_name='重量1',
-        blank=True,
-        null=True, )
-    weight_2 = models.FloatField(
-        verbose_name='重量2',
-        blank=True,
-        null=True, )
-    weight_3 = models.FloatField(
-        verbose_name='重量3',
-        blank=True,
-        null=True, )
-    weight_4 = models.FloatField(
-        verbose_name='重量4',
-        blank=True,
-        null=True, )
-    weight_5 = models.FloatField(
-        verbose_name='重量5',
-        blank=True,
-        null=True, )
-    weight_6 = models.FloatField(
-        verbose_name='重量6',
-        blank=True,
-        null=True, )
-    weight_7 = models.FloatField(
-        verbose_name='重量7',
-        blank=True,
-        null=True, )
-    weight_8 = models.FloatField(
-        verbose_name='重量8',
-        blank=True,
-        null=True, )
-    weight_9 = models.FloatField(
-        verbose_name='重量9',
-        blank=True,
-        null=True, )
-    weight_10 = models.FloatField(
-        verbose_name='重量10',
-        blank=True,
-        null=True, )
-    times_1 = models.IntegerField(
-        verbose_name='回数1',
-        blank=True,
-        null=True, )
-    times_2 = models.IntegerField(
-        verbose_name='回数2',
-        blank=True,
-        null=True, )
-    times_3 = models.IntegerField(
-        verbose_name='回数3',
-        blank=True,
-        null=True, )
-    times_4 = models.IntegerField(
-        verbose_name='回数4',
-        blank=True,
-        null=True, )
-    times_5 = models.IntegerField(
-        verbose_name='回数5',
-        blank=True,
-        null=True, )
-    times_6 = models.IntegerField(
-        verbose_name='回数6',
-        blank=True,
-        null=True, )
-    times_7 = models.IntegerField(
-        verbose_name='回数7',
-        blank=True,
-        null=True, )
-    times_8 = models.IntegerField(
-        verbose_name='回数8',
-        blank=True,
-        null=True, )
-    times_9 = models.IntegerField(
-        verbose_name='回数9',
-        blank=True,
-        null=True, )
-    times_10 = models.IntegerField(
-        verbose_name='回数10',
-        blank=True,
-        null=True, )
     body_part = models.ForeignKey(BodyPart, on_delete=models.CASCADE)
     remarks = models.TextField(
         verbose_name='備考',
@@ -93,5 +36,48 @@ class Discipline(models.Model):
         max_length=1000,
     )
 
+    objects = DisciplineQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # 部位ごと、日付ごとの種目の取得
+            models.Index(fields=['body_part', 'date'], name='discipline_bp_date_idx'),
+        ]
+
     def __str__(self):
         return self.discipline
+
+    @property
+    def set_list(self):
+        """ セット番号順に並べたセットのリストを返します。（テンプレートでの表示用）
+
+        セットのない番号はNoneとなり、SET_COUNT個に満たない場合もNoneで埋めます。
+        例： セット1とセット3のみの場合　[セット1, None, セット3, None, ... None]
+        """
+        sets = {discipline_set.index: discipline_set for discipline_set in self.sets.all()}
+        count = max([SET_COUNT, *sets.keys()])
+        return [sets.get(index) for index in range(1, count + 1)]
+
+
+class DisciplineSet(models.Model):
+    """ 種目のセットごとの重量と回数です。 """
+    discipline = models.ForeignKey(Discipline, on_delete=models.CASCADE, related_name='sets')
+    # 何セット目かを表します。（1から始まります）
+    index = models.PositiveSmallIntegerField('セット')
+    weight = models.FloatField(
+        verbose_name='重量',
+        blank=True,
+        null=True, )
+    reps = models.IntegerField(
+        verbose_name='回数',
+        blank=True,
+        null=True, )
+
+    class Meta:
+        ordering = ['discipline', 'index']
+        constraints = [
+            models.UniqueConstraint(fields=['discipline', 'index'], name='unique_discipline_set'),
+        ]
+
+    def __str__(self):
+        return f'{self.discipline} {self.index}'
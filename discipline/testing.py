@@ -0,0 +1,12 @@
+def get_sets_data(sets, initial=0):
+    """ 種目フォームのセットの入力値を作ります。 sets は [(重量, 回数), ...] です。 """
+    data = {
+        'sets-TOTAL_FORMS': len(sets),
+        'sets-INITIAL_FORMS': initial,
+        'sets-MIN_NUM_FORMS': 0,
+        'sets-MAX_NUM_FORMS': 1000,
+    }
+    for i, (weight, reps) in enumerate(sets):
+        data[f'sets-{i}-weight'] = '' if weight is None else weight
+        data[f'sets-{i}-reps'] = '' if reps is None else reps
+    return data
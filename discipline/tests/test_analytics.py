@@ -0,0 +1,141 @@
+import datetime
+
+from django.test import TestCase
+from django.urls import reverse
+
+from register.testing import factory_user
+from routine.testing import factory_body_part, factory_history
+from tr_calendar import cache as schedule_cache
+from ..analytics import TrainingHistory, get_training_stats
+from ..models import Discipline, DisciplineSet
+
+
+def create_discipline(body_part, date, name, sets):
+    discipline = Discipline.objects.create(discipline=name, date=date, body_part=body_part)
+    DisciplineSet.objects.bulk_create([
+        DisciplineSet(discipline=discipline, index=index, weight=weight, reps=reps)
+        for index, (weight, reps) in enumerate(sets, 1)
+    ])
+    return discipline
+
+
+class TestTrainingHistory(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        cls.chest = factory_body_part(week='月曜日', part='胸', user=cls.user)
+        cls.back = factory_body_part(week='水曜日', part='背中', user=cls.user)
+        # 2020-11-02、2020-11-09、2020-11-16はいずれも月曜日
+        create_discipline(cls.chest, datetime.date(2020, 11, 2), 'ベンチプレス', [(60, 10), (50, 10)])
+        create_discipline(cls.back, datetime.date(2020, 11, 4), 'デッドリフト', [(100, 5), (None, None)])
+        create_discipline(cls.chest, datetime.date(2020, 11, 9), 'ベンチプレス', [(65, 10), (0, 15)])
+        create_discipline(cls.chest, datetime.date(2020, 11, 23), 'ベンチプレス', [(60, 8)])
+        create_discipline(cls.chest, datetime.date(2020, 11, 30), 'ベンチプレス', [(62.5, 10)])
+        # 日付のない種目は集計しないこと
+        create_discipline(cls.chest, None, 'ベンチプレス', [(200, 10)])
+        # 他のユーザーの種目は集計しないこと
+        create_discipline(
+            factory_body_part(week='月曜日', part='胸', user=factory_user(email='other@example.com')),
+            datetime.date(2020, 11, 2), 'ベンチプレス', [(200, 10)],
+        )
+
+    def test_from_user(self):
+        with self.assertNumQueries(1):
+            history = TrainingHistory.from_user(self.user)
+        self.assertEqual(len(history.days), 8)
+
+    def test_weekly_volume(self):
+        self.assertEqual(TrainingHistory.from_user(self.user).weekly_volume(), {
+            'weeks': ['2020-11-02', '2020-11-09', '2020-11-16', '2020-11-23', '2020-11-30'],
+            'parts': ['背中', '胸'],
+            'volume': [[500.0, 1100.0], [0.0, 650.0], [0.0, 0.0], [0.0, 480.0], [0.0, 625.0]],
+        })
+
+    def test_weekly_volume_matches_naive(self):
+        """ 種目ごとにループして集計した値と一致すること """
+        user = factory_user(email='history@example.com')
+        factory_history(user, datetime.date(2020, 1, 1), 120)
+        expected = {}
+        for discipline in Discipline.objects.filter(body_part__user=user, date__isnull=False):
+            monday = discipline.date - datetime.timedelta(days=discipline.date.weekday())
+            key = (monday.isoformat(), discipline.body_part.part)
+            for discipline_set in discipline.sets.all():
+                expected[key] = expected.get(key, 0) + (discipline_set.weight or 0) * (discipline_set.reps or 0)
+
+        weekly_volume = TrainingHistory.from_user(user).weekly_volume()
+        actual = {}
+        for week, volume in zip(weekly_volume['weeks'], weekly_volume['volume']):
+            for part, part_volume in zip(weekly_volume['parts'], volume):
+                if part_volume:
+                    actual[(week, part)] = part_volume
+        self.assertEqual(actual.keys(), {key for key, volume in expected.items() if volume})
+        for key, volume in actual.items():
+            self.assertAlmostEqual(volume, expected[key])
+
+    def test_exercise_stats(self):
+        bench_press, deadlift = sorted(
+            TrainingHistory.from_user(self.user).exercise_stats(), key=lambda stats: stats['exercise'] != 'ベンチプレス')
+
+        self.assertEqual(bench_press['part'], '胸')
+        self.assertEqual([(trend['date'], trend['top_weight'], trend['top_reps']) for trend in bench_press['trend']], [
+            ('2020-11-02', 60.0, 10), ('2020-11-09', 65.0, 10), ('2020-11-23', 60.0, 8), ('2020-11-30', 62.5, 10),
+        ])
+        self.assertAlmostEqual(bench_press['trend'][0]['estimated_1rm'], 80.0)
+        self.assertAlmostEqual(bench_press['best_1rm'], 65 * (1 + 10 / 30))
+        self.assertEqual(bench_press['current_streak'], 1)
+        self.assertEqual(bench_press['longest_streak'], 1)
+
+        self.assertEqual(deadlift['part'], '背中')
+        self.assertEqual(deadlift['trend'][0]['volume'], 500.0)
+        self.assertEqual(deadlift['current_streak'], 0)
+
+    def test_streaks(self):
+        user = factory_user(email='streak@example.com')
+        chest = factory_body_part(week='月曜日', part='胸', user=user)
+        for i, weight in enumerate([60, 62.5, 65, 60, 62.5, 65, 67.5]):
+            create_discipline(chest, datetime.date(2020, 11, 2) + datetime.timedelta(weeks=i), 'ベンチプレス', [(weight, 10)])
+
+        stats, = TrainingHistory.from_user(user).exercise_stats()
+        self.assertEqual(stats['current_streak'], 3)
+        self.assertEqual(stats['longest_streak'], 3)
+
+    def test_empty(self):
+        history = TrainingHistory.from_user(factory_user(email='empty@example.com'))
+        self.assertEqual(history.weekly_volume(), {'weeks': [], 'parts': [], 'volume': []})
+        self.assertEqual(history.exercise_stats(), [])
+
+
+class TestTrainingStats(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        chest = factory_body_part(week='月曜日', part='胸', user=cls.user)
+        create_discipline(chest, datetime.date(2020, 11, 2), 'ベンチプレス', [(60, 10)])
+
+    def setUp(self):
+        schedule_cache.get_cache().clear()
+        self.client.force_login(self.user)
+
+    def test_get(self):
+        res = self.client.get(reverse('discipline:training_stats'))
+        self.assertTemplateUsed(res, 'training_stats.html')
+        self.assertEqual(res.context['recent_weeks'], [('2020-11-02', [600.0])])
+        self.assertContains(res, 'ベンチプレス')
+
+    def test_get_json(self):
+        res = self.client.get(reverse('discipline:training_stats_json'))
+        self.assertEqual(res.json(), get_training_stats(self.user))
+        self.assertEqual(res.json()['exercises'][0]['trend'][0]['top_weight'], 60.0)
+
+    def test_cache(self):
+        """ 種目を変更するまで集計結果をキャッシュすること """
+        self.client.get(reverse('discipline:training_stats'))
+        with self.assertNumQueries(2):  # セッション、ユーザー
+            self.client.get(reverse('discipline:training_stats'))
+
+        discipline = Discipline.objects.get()
+        discipline.sets.update(weight=70)
+        with self.captureOnCommitCallbacks(execute=True):
+            discipline.save()
+        res = self.client.get(reverse('discipline:training_stats'))
+        self.assertEqual(res.context['recent_weeks'], [('2020-11-02', [700.0])])
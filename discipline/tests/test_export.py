@@ -0,0 +1,165 @@
+import datetime
+import io
+import json
+import tracemalloc
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from register.testing import factory_user
+from routine.testing import factory_body_part, factory_term_decision
+from tr_calendar.schedules import rebuild_day_schedules
+from ..export import export_history, fold_ics, format_sets, iter_records
+from ..models import Discipline, DisciplineSet
+
+
+class TestExportHelpers(SimpleTestCase):
+    def test_format_sets(self):
+        self.assertEqual(format_sets([(60.0, 10), (62.5, 8), (None, 5), (70.0, None)]), '60x10;62.5x8;x5;70x')
+
+    def test_fold_ics(self):
+        self.assertEqual(fold_ics('SUMMARY:胸'), 'SUMMARY:胸\r\n')
+        folded = fold_ics('DESCRIPTION:' + '胸' * 40)
+        lines = folded.split('\r\n')
+        self.assertEqual(lines[-1], '')
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        self.assertTrue(all(line.startswith(' ') for line in lines[1:-1]))
+        self.assertEqual(''.join(line[1:] if i else line for i, line in enumerate(lines)), 'DESCRIPTION:' + '胸' * 40)
+
+
+class TestTrainingHistoryExport(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        factory_term_decision(
+            user=cls.user,
+            start_date=datetime.date(2020, 11, 2),
+            end_date=datetime.date(2020, 11, 3),
+        )
+        cls.monday_chest = factory_body_part(week='月曜日', part='胸', detail_part='大胸筋', user=cls.user)
+        cls.arm = factory_body_part(date=datetime.date(2020, 11, 2), part='腕', user=cls.user)
+        rebuild_day_schedules(cls.user)
+        cls.bench_press = Discipline.objects.create(
+            discipline='ベンチプレス', date=datetime.date(2020, 11, 2), body_part=cls.monday_chest, remarks='調子, 良い',
+        )
+        DisciplineSet.objects.create(discipline=cls.bench_press, index=1, weight=60, reps=10)
+        DisciplineSet.objects.create(discipline=cls.bench_press, index=2, weight=62.5, reps=8)
+        cls.curl = Discipline.objects.create(discipline='カール', date=datetime.date(2020, 11, 2), body_part=cls.arm)
+        # 他のユーザーの履歴は含めません
+        other = factory_user(email='other@test.com')
+        Discipline.objects.create(
+            discipline='スクワット', date=datetime.date(2020, 11, 2),
+            body_part=factory_body_part(date=datetime.date(2020, 11, 2), part='脚', user=other),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _getTarget(self, fmt):
+        return reverse('discipline:training_history_export', kwargs={'fmt': fmt})
+
+    def _get_content(self, fmt):
+        res = self.client.get(self._getTarget(fmt))
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.streaming)
+        return res, b''.join(res.streaming_content).decode()
+
+    def test_csv(self):
+        res, content = self._get_content('csv')
+
+        self.assertEqual(res['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(res['Content-Disposition'], 'attachment; filename="training_history.csv"')
+        self.assertEqual(content, (
+            '\ufefftype,date,part,detail_part,discipline,sets,remarks\r\n'
+            'schedule,2020-11-02,腕,,,,\r\n'
+            'schedule,2020-11-02,胸,大胸筋,,,\r\n'
+            'discipline,2020-11-02,胸,大胸筋,ベンチプレス,60x10;62.5x8,"調子, 良い"\r\n'
+            'discipline,2020-11-02,腕,,カール,,\r\n'
+        ))
+
+    def test_jsonl(self):
+        res, content = self._get_content('jsonl')
+
+        self.assertEqual(res['Content-Type'], 'application/jsonl; charset=utf-8')
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(records), 4)
+        self.assertEqual(records[2], {
+            'type': 'discipline', 'date': '2020-11-02', 'part': '胸', 'detail_part': '大胸筋',
+            'discipline': 'ベンチプレス', 'sets': [[60.0, 10], [62.5, 8]], 'remarks': '調子, 良い',
+        })
+
+    def test_ics(self):
+        res, content = self._get_content('ics')
+
+        self.assertEqual(res['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertTrue(content.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(content.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(content.count('BEGIN:VEVENT'), 4)
+        self.assertIn(f'UID:discipline-{self.bench_press.pk}@workout_plan\r\n', content)
+        self.assertIn('DTSTART;VALUE=DATE:20201102\r\nDTEND;VALUE=DATE:20201103\r\n', content)
+        self.assertIn('SUMMARY:胸（大胸筋） ベンチプレス\r\n', content)
+        self.assertIn('DESCRIPTION:60x10\\;62.5x8\\n調子\\, 良い\r\n', content)
+
+    def test_unknown_format(self):
+        res = self.client.get(self._getTarget('xml'))
+        self.assertEqual(res.status_code, 404)
+
+    def test_login_required(self):
+        self.client.logout()
+        res = self.client.get(self._getTarget('csv'))
+        self.assertEqual(res.status_code, 302)
+
+    def test_chunks(self):
+        """ チャンクの境目（同じ日付の部位番号、種目のpk）で履歴が抜けたり重複したりしません。 """
+        records = [(record['type'], record['uid']) for record in iter_records(self.user)]
+        self.assertEqual([(record['type'], record['uid']) for record in iter_records(self.user, chunk_size=1)], records)
+        self.assertEqual([(record['type'], record['uid']) for record in iter_records(self.user, chunk_size=2)], records)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('export_history', 'test@test.com', '--format', 'jsonl', stdout=out)
+        self.assertEqual(out.getvalue(), ''.join(export_history(self.user, 'jsonl')))
+
+
+class TestTrainingHistoryExportMemory(TestCase):
+    # 履歴の行数と、書き出す間に使ってよいメモリの上限
+    rows = 100000
+    memory_limit = 10 * 1024 * 1024
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        body_parts = [
+            factory_body_part(week=week, part='胸', user=cls.user) for week in ['月曜日', '水曜日', '金曜日']
+        ]
+        start_date = datetime.date(2000, 1, 1)
+        Discipline.objects.bulk_create([
+            Discipline(
+                discipline=f'種目{i % 5}',
+                date=start_date + datetime.timedelta(days=i // 10),
+                body_part=body_parts[i % len(body_parts)],
+                remarks='備考' * 30,
+            )
+            for i in range(cls.rows)
+        ], batch_size=5000)
+
+    def test_constant_memory(self):
+        self.client.force_login(self.user)
+        res = self.client.get(reverse('discipline:training_history_export', kwargs={'fmt': 'csv'}))
+
+        size = 0
+        lines = 0
+        tracemalloc.start()
+        try:
+            for chunk in res.streaming_content:
+                size += len(chunk)
+                lines += chunk.count(b'\r\n')
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(lines, self.rows + 1)
+        # 書き出した内容の大きさより十分小さいメモリで書き出せます
+        self.assertGreater(size, self.memory_limit)
+        self.assertLess(peak, self.memory_limit)
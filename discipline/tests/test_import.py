@@ -0,0 +1,255 @@
+import datetime
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from register.testing import factory_user
+from routine.models import BodyPart
+from routine.testing import factory_body_part, factory_term_decision
+from tr_calendar.models import DaySchedule
+from tr_calendar.schedules import rebuild_day_schedules
+from ..export import export_history
+from ..importer import clean_row, import_history, parse_sets
+from ..models import Discipline, DisciplineSet
+
+CSV_HEADER = 'type,date,part,detail_part,discipline,sets,remarks\r\n'
+
+
+class TestCleanRow(SimpleTestCase):
+    def test_parse_sets(self):
+        self.assertEqual(parse_sets(''), [])
+        self.assertEqual(parse_sets('60x10;62.5x'), [('60', '10'), ('62.5', '')])
+        self.assertEqual(parse_sets([[60, 10], [None, 5]]), [(60, 10), (None, 5)])
+        with self.assertRaisesMessage(Exception, 'セットは 60x10;70x8 の形式で入力してください'):
+            parse_sets('60-10')
+
+    def test_clean_row(self):
+        kind, cleaned_data = clean_row({
+            'date': '2020-11-02', 'part': '胸', 'detail_part': '', 'discipline': 'ベンチプレス',
+            'sets': '60x10;x;70x', 'remarks': '',
+        })
+        self.assertEqual(kind, 'discipline')
+        self.assertEqual(cleaned_data['date'], datetime.date(2020, 11, 2))
+        self.assertIsNone(cleaned_data['detail_part'])
+        # 重量、回数のどちらも入力されていないセットは除きます
+        self.assertEqual(cleaned_data['sets'], [{'weight': 60.0, 'reps': 10}, {'weight': 70.0, 'reps': None}])
+
+    def test_clean_row_errors(self):
+        with self.assertRaisesMessage(Exception, '部位を選択してください'):
+            clean_row({'date': '2020-11-02', 'part': ''})
+        with self.assertRaisesMessage(Exception, '日付を入力してください'):
+            clean_row({'date': '', 'part': '胸'})
+        with self.assertRaisesMessage(Exception, '部位: 正しく選択してください'):
+            clean_row({'date': '2020-11-02', 'part': '首'})
+        with self.assertRaisesMessage(Exception, '重量: 数値を入力してください'):
+            clean_row({'date': '2020-11-02', 'part': '胸', 'sets': 'abcx10'})
+        with self.assertRaisesMessage(Exception, '種類は schedule、discipline のいずれかを指定してください'):
+            clean_row({'type': 'set', 'date': '2020-11-02', 'part': '胸'})
+        with self.assertRaisesMessage(Exception, 'JSONの形式が正しくありません'):
+            clean_row(None)
+
+
+class TestImportHistory(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        factory_term_decision(
+            user=cls.user,
+            start_date=datetime.date(2020, 11, 2),
+            end_date=datetime.date(2020, 11, 8),
+        )
+        cls.monday_chest = factory_body_part(week='月曜日', part='胸', detail_part='大胸筋', user=cls.user)
+        rebuild_day_schedules(cls.user)
+
+    def _import(self, content, fmt='csv', batch_size=1000):
+        return import_history(self.user, io.StringIO(content), fmt, batch_size)
+
+    def test_import_csv(self):
+        result = self._import(
+            CSV_HEADER +
+            'discipline,2020-11-02,胸,大胸筋,ベンチプレス,60x10;62.5x8,調子が良い\r\n'
+            'discipline,2020-11-03,腕,,カール,20x12,\r\n'
+            'discipline,2020-11-03,腕,,ハンマーカール,,\r\n'
+            'schedule,2020-11-04,脚,,,,\r\n'
+        )
+
+        self.assertEqual(result.errors, [])
+        self.assertEqual((result.rows, result.body_parts, result.disciplines, result.sets), (4, 2, 3, 3))
+        # 設定されている部位（ルーティンオブジェクト）の種目として登録します
+        bench_press = Discipline.objects.get(discipline='ベンチプレス')
+        self.assertEqual(bench_press.body_part, self.monday_chest)
+        self.assertEqual(bench_press.remarks, '調子が良い')
+        self.assertEqual(
+            list(bench_press.sets.values_list('index', 'weight', 'reps')), [(1, 60.0, 10), (2, 62.5, 8)]
+        )
+        # 同じ日付の同じ部位は一つの日付指定オブジェクトにまとめます
+        arm = BodyPart.objects.get(date=datetime.date(2020, 11, 3))
+        self.assertEqual((arm.part, arm.detail_part, arm.user), ('腕', None, self.user))
+        self.assertEqual(arm.discipline_set.count(), 2)
+        self.assertEqual(
+            list(DaySchedule.objects.filter(date__range=['2020-11-03', '2020-11-04']).values_list('date', 'part')),
+            [(datetime.date(2020, 11, 3), '腕'), (datetime.date(2020, 11, 4), '脚')],
+        )
+
+    def test_import_jsonl(self):
+        result = self._import(
+            json.dumps({
+                'type': 'discipline', 'date': '2020-11-03', 'part': '背中', 'detail_part': None,
+                'discipline': 'デッドリフト', 'sets': [[100, 5], [110, 3]], 'remarks': None,
+            }, ensure_ascii=False) + '\n\n{"type":\n',
+            fmt='jsonl',
+        )
+
+        self.assertEqual(result.errors, [(3, ['JSONの形式が正しくありません'])])
+        self.assertEqual((result.rows, result.body_parts, result.disciplines, result.sets), (2, 1, 1, 2))
+        self.assertEqual(DisciplineSet.objects.filter(discipline__discipline='デッドリフト').count(), 2)
+
+    def test_row_errors(self):
+        """ エラーのある行は行番号とエラーを返し、他の行は取り込みます。 """
+        result = self._import(
+            CSV_HEADER +
+            'discipline,2020-11-31,胸,,ベンチプレス,,\r\n'
+            'discipline,2020-11-03,胸,部位の詳細,ベンチプレス,,\r\n'
+            'discipline,2020-11-03,胸,,ベンチプレス,60x,\r\n'
+            'discipline,2020-11-03,胸,,ベンチプレス,60x10x3,\r\n',
+            batch_size=2,
+        )
+
+        self.assertEqual(result.errors, [
+            (2, ['日付: 日付を正しく入力してください。']),
+            (3, ['同じ部位は登録できません']),
+            (5, ['セットは 60x10;70x8 の形式で入力してください']),
+        ])
+        self.assertEqual((result.rows, result.body_parts, result.disciplines, result.sets), (4, 1, 1, 1))
+
+    def test_max_day_parts(self):
+        result = self._import(CSV_HEADER + ''.join(
+            f'schedule,2020-11-02,{part},,,,\r\n' for part in ['腕', '肩', '背中', '脚', '腹']
+        ))
+
+        # 月曜日のルーティンオブジェクトとあわせて5部位まで登録できます
+        self.assertEqual(result.errors, [(6, ['これ以上の登録はできません'])])
+        self.assertEqual(result.body_parts, 4)
+
+    def test_stale_day_schedules(self):
+        """ DayScheduleが作り直されていなくても、設定されている部位の種目として登録します。 """
+        DaySchedule.objects.filter(user=self.user).delete()
+
+        result = self._import(CSV_HEADER + 'discipline,2020-11-02,胸,大胸筋,ベンチプレス,60x10,\r\n')
+
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.body_parts, 0)
+        self.assertEqual(Discipline.objects.get(discipline='ベンチプレス').body_part, self.monday_chest)
+
+    def test_concurrent_body_part(self):
+        """ 取り込み中に他の画面から作成された部位オブジェクトのpkを設定しません。 """
+        bulk_create = BodyPart.objects.bulk_create
+
+        def bulk_create_after_web(objs, *args, **kwargs):
+            factory_body_part(date=datetime.date(2020, 11, 6), part='脚', user=self.user)
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(BodyPart.objects, 'bulk_create', bulk_create_after_web):
+            result = self._import(CSV_HEADER + 'discipline,2020-11-03,腕,,カール,20x12,\r\n')
+
+        self.assertEqual(result.errors, [])
+        arm = BodyPart.objects.get(date=datetime.date(2020, 11, 3))
+        self.assertEqual(Discipline.objects.get(discipline='カール').body_part, arm)
+
+    def test_import_again(self):
+        """ 書き出した履歴を取り込み直しても部位は重複しません。 """
+        self._import(CSV_HEADER + 'discipline,2020-11-03,腕,,カール,20x12,\r\n')
+        content = ''.join(export_history(self.user, 'csv')).lstrip('\ufeff')
+
+        result = self._import(content)
+
+        self.assertEqual(result.errors, [])
+        self.assertEqual((result.body_parts, result.disciplines, result.sets), (0, 1, 1))
+        self.assertEqual(BodyPart.objects.filter(date=datetime.date(2020, 11, 3)).count(), 1)
+
+    def test_round_trip(self):
+        """ 書き出した履歴を他のユーザーに取り込むと、同じ履歴を書き出せます。 """
+        self._import(
+            CSV_HEADER +
+            'discipline,2020-11-02,胸,大胸筋,ベンチプレス,60x10;62.5x8,"調子, 良い"\r\n'
+            'discipline,2020-11-05,腕,,カール,20x12,\r\n'
+        )
+        other = factory_user(email='other@test.com')
+        content = ''.join(export_history(self.user, 'jsonl'))
+
+        result = import_history(other, io.StringIO(content), 'jsonl')
+
+        self.assertEqual(result.errors, [])
+        self.assertEqual(''.join(export_history(other, 'jsonl')), content)
+
+    def test_num_queries(self):
+        """ クエリの数は行数ではなくまとめて保存する回数に比例します。 """
+        rows = 5000
+        content = CSV_HEADER + ''.join(
+            f'discipline,{datetime.date(2021, 1, 1) + datetime.timedelta(days=i // 5)},胸,,種目{i % 5},60x10;70x8,\r\n'
+            for i in range(rows)
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            result = self._import(content)
+
+        self.assertEqual(result.errors, [])
+        self.assertEqual((result.body_parts, result.disciplines, result.sets), (rows // 5, rows, rows * 2))
+        # 1000行ごとに40クエリ未満（SQLiteではbulk_createが変数の数の上限で分かれます）
+        self.assertLess(len(queries), rows // 1000 * 40)
+
+
+class TestTrainingHistoryImport(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _getTarget(self):
+        return reverse('discipline:training_history_import')
+
+    def test_get(self):
+        res = self.client.get(self._getTarget())
+        self.assertTemplateUsed(res, 'training_history_import.html')
+        self.assertIsNone(res.context['result'])
+
+    def test_post(self):
+        content = '\ufeff' + CSV_HEADER + 'discipline,2020-11-03,腕,,カール,20x12,\r\ndiscipline,,腕,,カール,,\r\n'
+        res = self.client.post(self._getTarget(), {
+            'file': SimpleUploadedFile('history.csv', content.encode()),
+        })
+
+        self.assertEqual(res.status_code, 200)
+        result = res.context['result']
+        self.assertEqual((result.body_parts, result.disciplines, result.sets), (1, 1, 1))
+        self.assertEqual(result.errors, [(3, ['日付を入力してください'])])
+        self.assertContains(res, '日付を入力してください')
+
+    def test_post_unknown_format(self):
+        res = self.client.post(self._getTarget(), {'file': SimpleUploadedFile('history.txt', b'date,part')})
+        self.assertFormError(res, 'form', None, '形式を選択してください')
+        self.assertIsNone(res.context['result'])
+
+    def test_command(self):
+        out = io.StringIO()
+        err = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'history.jsonl')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('{"date": "2020-11-03", "part": "腕", "discipline": "カール", "sets": [[20, 12]]}\n[]\n')
+            call_command('import_history', 'test@test.com', path, stdout=out, stderr=err)
+
+        self.assertEqual(Discipline.objects.filter(body_part__user=self.user).count(), 1)
+        self.assertIn('2行目: JSONの形式が正しくありません', err.getvalue())
+        self.assertIn('種目1件', out.getvalue())
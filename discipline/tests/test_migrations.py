@@ -0,0 +1,39 @@
+import datetime
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+from register.testing import factory_user
+from routine.testing import factory_body_part
+
+
+class TestCopySetsMigration(TransactionTestCase):
+    """ weight_1～weight_10、times_1～times_10 の値が DisciplineSet に移されること """
+    migrate_from = [('discipline', '0005_discipline_discipline_bp_date_idx')]
+    migrate_to = [('discipline', '0007_remove_discipline_weight_times')]
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self._migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_migrate(self):
+        apps = self._migrate(self.migrate_from)
+        Discipline = apps.get_model('discipline', 'Discipline')
+        body_part = factory_body_part(date=datetime.date(2020, 11, 2), user=factory_user())
+        discipline = Discipline.objects.create(
+            discipline='ベンチプレス', body_part_id=body_part.pk,
+            weight_1=60, times_1=10, weight_3=0, times_10=5,
+        )
+
+        apps = self._migrate(self.migrate_to)
+        DisciplineSet = apps.get_model('discipline', 'DisciplineSet')
+        self.assertEqual(
+            list(DisciplineSet.objects.filter(discipline_id=discipline.pk).values_list('index', 'weight', 'reps')),
+            [(1, 60, 10), (3, 0, None), (10, None, 5)],
+        )
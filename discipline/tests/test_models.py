@@ -0,0 +1,48 @@
+import datetime
+
+from django.test import TestCase
+
+from register.testing import factory_user
+from routine.testing import factory_body_part
+from ..models import Discipline, DisciplineSet
+
+
+class TestDiscipline(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        body_part = factory_body_part(date=datetime.date(2020, 11, 2), user=factory_user())
+        cls.discipline = Discipline.objects.create(discipline='ベンチプレス', date=datetime.date(2020, 11, 2),
+                                                   body_part=body_part)
+        DisciplineSet.objects.bulk_create([
+            DisciplineSet(discipline=cls.discipline, index=1, weight=60, reps=10),
+            DisciplineSet(discipline=cls.discipline, index=2, weight=80, reps=5),
+            DisciplineSet(discipline=cls.discipline, index=3, weight=80, reps=3),
+            DisciplineSet(discipline=cls.discipline, index=5, weight=None, reps=20),
+        ])
+        cls.empty_discipline = Discipline.objects.create(discipline='ディップス', date=datetime.date(2020, 11, 2),
+                                                         body_part=body_part)
+
+    def test_with_stats(self):
+        discipline = Discipline.objects.with_stats().get(pk=self.discipline.pk)
+
+        self.assertEqual(discipline.total_volume, 60 * 10 + 80 * 5 + 80 * 3)
+        self.assertEqual((discipline.top_weight, discipline.top_reps), (80, 5))
+        self.assertAlmostEqual(discipline.estimated_1rm, 80 * (1 + 5 / 30))
+
+    def test_with_stats_empty(self):
+        discipline = Discipline.objects.with_stats().get(pk=self.empty_discipline.pk)
+
+        self.assertIsNone(discipline.total_volume)
+        self.assertIsNone(discipline.top_weight)
+        self.assertIsNone(discipline.estimated_1rm)
+
+    def test_set_list(self):
+        set_list = self.discipline.set_list
+
+        self.assertEqual(len(set_list), 10)
+        self.assertEqual([s.index if s else None for s in set_list[:6]], [1, 2, 3, None, 5, None])
+
+    def test_set_list_over_set_count(self):
+        DisciplineSet.objects.create(discipline=self.discipline, index=12, weight=40, reps=10)
+
+        self.assertEqual(len(self.discipline.set_list), 12)
@@ -0,0 +1,144 @@
+import datetime
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from register.testing import factory_user
+from routine.testing import factory_body_part
+from ..models import Discipline, DisciplineSet
+from ..testing import get_sets_data
+
+
+class TestDisciplineCreate(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        cls.body_part = factory_body_part(date=datetime.date(2020, 11, 2), user=cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _getTarget(self):
+        return reverse('discipline:discipline_create', kwargs={
+            'pk': self.body_part.pk, 'year': 2020, 'month': 11, 'day': 2, 'new': 1,
+        })
+
+    def test_get(self):
+        res = self.client.get(self._getTarget())
+        self.assertTemplateUsed(res, 'discipline_create.html')
+        self.assertEqual(len(res.context['form'].formset.forms), 10)
+
+    def test_post(self):
+        data = {'discipline': 'ベンチプレス'}
+        data.update(get_sets_data([(60, 10), (None, None), (0, 15)] + [(None, None)] * 9))
+        self.client.post(self._getTarget(), data)
+
+        discipline = Discipline.objects.get(body_part=self.body_part)
+        self.assertEqual(discipline.date, datetime.date(2020, 11, 2))
+        self.assertEqual(list(discipline.sets.values_list('index', 'weight', 'reps')), [(1, 60, 10), (2, 0, 15)])
+
+
+class TestDisciplineUpdate(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        cls.body_part = factory_body_part(date=datetime.date(2020, 11, 2), user=cls.user)
+        cls.discipline = Discipline.objects.create(discipline='ベンチプレス', date=datetime.date(2020, 11, 2),
+                                                   body_part=cls.body_part)
+        cls.first_set = DisciplineSet.objects.create(discipline=cls.discipline, index=1, weight=60, reps=10)
+        cls.second_set = DisciplineSet.objects.create(discipline=cls.discipline, index=2, weight=70, reps=8)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _getTarget(self):
+        return reverse('discipline:discipline_update', kwargs={
+            'pk': self.discipline.pk, 'year': 2020, 'month': 11, 'day': 2,
+        })
+
+    def test_get(self):
+        res = self.client.get(self._getTarget())
+        forms = res.context['form'].formset.forms
+        self.assertEqual(len(forms), 10)
+        self.assertEqual([form.instance for form in forms[:2]], [self.first_set, self.second_set])
+
+    def test_post(self):
+        """ 空にしたセットは削除し、残りのセットの番号を詰めること """
+        data = {'discipline': 'インクラインベンチプレス'}
+        data.update(get_sets_data([(None, None), (75, 6), (80, 3)] + [(None, None)] * 9, initial=2))
+        data['sets-0-id'] = self.first_set.pk
+        data['sets-1-id'] = self.second_set.pk
+        self.client.post(self._getTarget(), data)
+
+        self.discipline.refresh_from_db()
+        self.assertEqual(self.discipline.discipline, 'インクラインベンチプレス')
+        self.assertEqual(list(self.discipline.sets.values_list('index', 'weight', 'reps')), [(1, 75, 6), (2, 80, 3)])
+
+
+class TestDisciplineSaveGeneration(TransactionTestCase):
+    """ 種目のキャッシュはセットを保存した後（コミット後）に無効にすること """
+
+    def setUp(self):
+        self.user = factory_user()
+        self.body_part = factory_body_part(date=datetime.date(2020, 11, 2), user=self.user)
+        self.client.force_login(self.user)
+
+    def _post(self, url, sets, **data):
+        """ 世代番号を増やした時点で保存されているセットを返します。 """
+        saved_sets = []
+
+        def bump_generation(user_pk):
+            saved_sets.append(list(DisciplineSet.objects.order_by('index').values_list('weight', 'reps')))
+
+        data.update(get_sets_data(sets))
+        with mock.patch('tr_calendar.cache._bump_generation', side_effect=bump_generation):
+            self.client.post(url, data)
+        return saved_sets
+
+    def test_create(self):
+        url = reverse('discipline:discipline_create', kwargs={
+            'pk': self.body_part.pk, 'year': 2020, 'month': 11, 'day': 2, 'new': 1,
+        })
+        self.assertEqual(self._post(url, [(60, 10), (70, 8)], discipline='ベンチプレス'), [[(60, 10), (70, 8)]])
+
+    def test_update(self):
+        discipline = Discipline.objects.create(discipline='ベンチプレス', date=datetime.date(2020, 11, 2),
+                                               body_part=self.body_part)
+        url = reverse('discipline:discipline_update', kwargs={'pk': discipline.pk, 'year': 2020, 'month': 11, 'day': 2})
+        self.assertEqual(self._post(url, [(80, 3)], discipline='ベンチプレス'), [[(80, 3)]])
+
+
+class TestDayScheduleDiscipline(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        cls.body_part = factory_body_part(date=datetime.date(2020, 11, 2), user=cls.user)
+        for n in range(3):
+            discipline = Discipline.objects.create(discipline=f'種目{n + 1}', date=datetime.date(2020, 11, 2),
+                                                   body_part=cls.body_part)
+            DisciplineSet.objects.create(discipline=discipline, index=1, weight=60, reps=10)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _getTarget(self):
+        return reverse('discipline:day_schedule_discipline', kwargs={
+            'pk': self.body_part.pk, 'year': 2020, 'month': 11, 'day': 2,
+        })
+
+    def test_get(self):
+        res = self.client.get(self._getTarget())
+        self.assertEqual([d.total_volume for d in res.context['discipline_set']], [600, 600, 600])
+        self.assertContains(res, '60.0kg', count=3)
+
+    def test_num_queries(self):
+        """ 種目の数によらずクエリ数が一定であること """
+        self.client.get(self._getTarget())
+        with self.assertNumQueries(5):
+            self.client.get(self._getTarget())
+        discipline = Discipline.objects.create(discipline='種目4', date=datetime.date(2020, 11, 2),
+                                               body_part=self.body_part)
+        DisciplineSet.objects.create(discipline=discipline, index=1, weight=60, reps=10)
+        with self.assertNumQueries(5):
+            self.client.get(self._getTarget())
@@ -1,5 +1,8 @@
 from django.urls import path
-from .views import day_schedule_discipline, discipline_create, discipline_update, discipline_delete
+from .views import (
+    day_schedule_discipline, discipline_create, discipline_update, discipline_delete, training_stats, training_stats_json,
+    training_history_export, training_history_import
+)
 
 app_name = 'discipline'
 
@@ -19,5 +22,9 @@ urlpatterns = [
     path(
         'discipline_delete/<int:year>/<int:month>/<int:day>/',
         discipline_delete, name='discipline_delete'
-    )
-]
\ No newline at end of file
+    ),
+    path('training_stats/', training_stats, name='training_stats'),
+    path('training_stats/json/', training_stats_json, name='training_stats_json'),
+    path('training_history/import/', training_history_import, name='training_history_import'),
+    path('training_history/<str:fmt>/', training_history_export, name='training_history_export'),
+]
\ No newline at end of file
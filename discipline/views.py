@@ -1,11 +1,19 @@
+from django.db import transaction
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from routine.models import BodyPart
+from tr_calendar import cache as schedule_cache
+from tr_calendar.conditional import schedule_condition
+from .analytics import get_training_stats
+from .export import FORMATS, export_history
+from .importer import import_history
 from .models import Discipline
-from .forms import DisciplineForm
+from .forms import DisciplineForm, HistoryImportForm
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 
 import datetime
+import io
 
 
 @login_required
@@ -21,10 +29,13 @@ def discipline_create(request, pk, year, month, day, new):
     if request.method == 'POST':
         form = DisciplineForm(request.POST)
         if form.is_valid():
-            discipline = form.save(commit=False)
-            discipline.date = date
-            discipline.body_part = body_part
-            discipline.save()
+            # 種目とセットを一つのトランザクションで保存し、キャッシュはセットを保存した後（コミット後）に無効にします
+            with transaction.atomic():
+                discipline = form.save(commit=False)
+                discipline.date = date
+                discipline.body_part = body_part
+                discipline.save()
+                form.save_m2m()  # セットごとの重量、回数を保存します
             if not request.POST.get('continue'):  # 続けて種目登録する場合の処理
                 return redirect('discipline:day_schedule_discipline',
                                 pk=pk, year=year, month=month, day=day)
@@ -48,12 +59,18 @@ def discipline_create(request, pk, year, month, day, new):
 
 
 @login_required
+@schedule_condition
 def day_schedule_discipline(request, pk, year, month, day):
-    """ 指定部位の種目一覧を表示させます。 """
+    """ 指定部位の種目一覧を表示させます。
+
+    種目ごとの総挙上量、最も重いセット、推定1RMはDBで集計します。
+    前回表示した時から種目が変わっていなければ304を返します。
+    """
 
     date = datetime.date(year=year, month=month, day=day)
     body_part = get_object_or_404(BodyPart, pk=pk)  # 指定した部位のオブジェクト取得
-    discipline_set = body_part.discipline_set.filter(date=date)  # 指定した日付に設定してあるオブジェクトのセット取得
+    # 指定した日付に設定してあるオブジェクトのセット取得
+    discipline_set = body_part.discipline_set.filter(date=date).with_stats().prefetch_related('sets')
 
     # ページタイトルの作成
     page_title = body_part.page_title()
@@ -87,7 +104,8 @@ def discipline_update(request, pk, year, month, day):
     if request.method == 'POST':
         form = DisciplineForm(request.POST, instance=discipline)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():  # 種目とセットを一つのトランザクションで保存します
+                form.save()
             return redirect('discipline:discipline_create', pk=body_part_pk, year=year, month=month, day=day, new=new)
     else:
         form = DisciplineForm(instance=discipline)
@@ -116,6 +134,8 @@ def discipline_delete(request, year, month, day):
     # 選んだ種目を削除
     del_objects = Discipline.objects.filter(pk__in=del_pk_list)
     del_objects.delete()
+    # 種目の削除ではシグナルを送らないため、ここでキャッシュを無効にします
+    schedule_cache.bump_generation(discipline.body_part.user_id)
 
     new = 1  # 全て削除されれば設定されている種目がなくなるので１になります。
 
@@ -127,3 +147,69 @@ def discipline_delete(request, year, month, day):
         new = 0
 
     return redirect('discipline:discipline_create', pk=body_part_pk, year=year, month=month, day=day, new=new)
+
+
+@login_required
+def training_stats(request):
+    """ 週ごと、部位ごとの総挙上量と、種目ごとの推定1RMの推移を表示させます。
+
+    表示する総挙上量は直近の12週間分です。（全ての期間は training_stats_json で取得できます）
+    集計結果はスケジュールと同じく、種目を変更するまでキャッシュします。
+    """
+    stats = schedule_cache.get_or_set(request.user.pk, 'stats', 'all', lambda: get_training_stats(request.user))
+    weekly_volume = stats['weekly_volume']
+    recent_weeks = list(zip(weekly_volume['weeks'], weekly_volume['volume']))[-12:]
+
+    return render(request, 'training_stats.html', {
+        'parts': weekly_volume['parts'],
+        'recent_weeks': recent_weeks,
+        'exercises': stats['exercises'],
+        'page_title': 'トレーニング分析',
+        'breadcrumb_root': True,
+        'breadcrumb_name': 'stats',
+    })
+
+
+@login_required
+def training_stats_json(request):
+    """ 週ごと、部位ごとの総挙上量と、種目ごとの推定1RMの推移をJSONで返します。 """
+    stats = schedule_cache.get_or_set(request.user.pk, 'stats', 'all', lambda: get_training_stats(request.user))
+    return JsonResponse(stats, json_dumps_params={'ensure_ascii': False})
+
+
+@login_required
+def training_history_export(request, fmt):
+    """ ユーザーのスケジュールと種目の履歴を、CSV、JSON Lines、iCalendarのいずれかの形式で少しずつ返します。 """
+    if fmt not in FORMATS:
+        raise Http404
+    _, content_type, extension = FORMATS[fmt]
+    response = StreamingHttpResponse(export_history(request.user, fmt), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="training_history.{extension}"'
+    return response
+
+
+@login_required
+def training_history_import(request):
+    """ CSV、JSON Linesの履歴ファイルを取り込みます。エラーのある行は取り込まずに行番号とエラーを表示します。 """
+    result = None
+    if request.method == 'POST':
+        form = HistoryImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            # ファイル全体を読み込まずに一行ずつ取り込みます（ExcelのBOMは取り除きます）
+            f = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+            try:
+                result = import_history(request.user, f, form.cleaned_data['format'])
+            except UnicodeDecodeError:
+                form.add_error('file', 'UTF-8のファイルを選択してください')
+            else:
+                form = HistoryImportForm()
+    else:
+        form = HistoryImportForm()
+
+    return render(request, 'training_history_import.html', {
+        'form': form,
+        'result': result,
+        'page_title': '履歴の取り込み',
+        'breadcrumb_root': True,
+        'breadcrumb_name': '履歴の取り込み',
+    })
@@ -1,5 +1,7 @@
 import datetime
+from tr_calendar import cache as schedule_cache
 from tr_calendar.mixins import BaseCalendarMixin
+from tr_calendar.schedules import DayScheduleResolver
 
 
 class WeekCalendarMixin(BaseCalendarMixin):
@@ -40,40 +42,47 @@ class WeekCalendarMixin(BaseCalendarMixin):
 
 
 class WeekWithScheduleMixin(WeekCalendarMixin):
-    """スケジュール付きの、週間カレンダーを提供するMixin"""
+    """スケジュール付きの、週間カレンダーを提供するMixin
+
+    週間カレンダーと今日のスケジュールは、リクエストごとに一度だけ取得したスケジュール（get_schedule_resolver）から作成します。
+    """
+
+    def get_schedule_resolver(self):
+        """ 表示する週と今日のスケジュールをまとめて取得します。
+
+        スケジュールを一度だけDBから取得し、ビューに保持します。
+        同じユーザー、同じ週のスケジュールはスケジュールを変更するまでキャッシュしたものを使います。
+        """
+        if getattr(self, '_schedule_resolver', None) is None:
+            # ルーティン期間を取得します。（なければ作成します）
+            self.get_term_date()
+            self._schedule_resolver = self.load_schedule_resolver()
+        return self._schedule_resolver
+
+    def load_schedule_resolver(self):
+        """ 表示する週と今日のスケジュールを取得します。キャッシュがあればキャッシュを返します。
+
+        ルーティン期間とは関係なく取得できるため、非同期のビューではルーティン期間と同時に取得します。
+        """
+        self.setup_calendar()
+        week_days = self.get_week_days()
+        today = datetime.date.today()
+        user = self.request.user
+        return schedule_cache.get_or_set(
+            user.pk, 'week', f'{week_days[0]}:{today}',
+            lambda: DayScheduleResolver(user, week_days + [today]),
+        )
 
     def get_week_schedules(self, days):
         """それぞれの日とスケジュールを返す"""
-        user = self.request.user
-        # ルーティン期間を取得します。
-        term_date = self.get_term_date()
+        resolver = self.get_schedule_resolver()
 
         # コンテキストのvalueとなる辞書を作る
         # {1日のdatetime: 1日のスケジュール全て, 2日のdatetime: 2日の全て...}のような辞書を作る
+        #  例：　{2020/11/25 : [week='水曜日'の部位オブジェクト一つ目, week='水曜日'の部位オブジェクト二つ目, ....],{2020/....}
         day_schedules = {}
         for day in days:
-            week = self.week_names[day.weekday()]
-            dt_bp_objects = self.model.objects.filter(date=day, user=user)  # 日付指定のクエリセットを取得
-            wd_bp_objects = self.model.objects.filter(week__startswith=week, user=user)  # ルーティンのクエリセットを取得
-
-            #  一週間を一日ずつ取り出して、その日付のスケジュールリスト（またはクエリセット）をday_schedules[day]に格納する
-            #  例：　{2020/11/25 : [week='水曜日'の部位オブジェクト一つ目, week='水曜日'の部位オブジェクト二つ目, ....],{2020/....}
-            if wd_bp_objects:  # ルーティンのクエリセットが存在する場合
-                if term_date.judge_term_date(date=day):
-                    if not dt_bp_objects:  # ルーティンのクエリセットのみの場合
-                        day_schedules[day] = wd_bp_objects
-                    # ルーティンのクエリセットとpartがNoneではない日付指定のクエリセットが存在する場合
-                    elif None not in [dt_bp_object.part for dt_bp_object in dt_bp_objects]:
-                        bp_objects = [dt_bp_object for dt_bp_object in dt_bp_objects]
-                        for wd_bp_object in wd_bp_objects:
-                            bp_objects.append(wd_bp_object)
-                        day_schedules[day] = bp_objects
-                    else:  # ルーティンのクエリセットとpartがNoneの日付指定のクエリセットが存在する場合
-                        day_schedules[day] = dt_bp_objects.exclude(part=None)
-                else:
-                    day_schedules[day] = dt_bp_objects.exclude(part=None)
-            else:  # 日付指定のクエリセットのみの場合
-                day_schedules[day] = dt_bp_objects.exclude(part=None)
+            day_schedules[day] = resolver.get_schedules(day)
 
         return day_schedules
 
@@ -115,25 +124,18 @@ class WeekWithScheduleMixin(WeekCalendarMixin):
                     week_schedules[count].append(None)
 
         calendar_context['week_day_schedules'] = week_schedules
+        calendar_context.update(self.get_schedule_cache_context())
         return calendar_context
 
     def get_today_schedules(self):
         """ 今日のトレーニング部位スケジュールを取得 """
         date = datetime.date.today()
-        next_date = date + datetime.timedelta(days=1)
-        dates = [date, next_date]
-        dates_schedules = self.get_week_schedules(dates)
-        calendar_context = super().get_week_calendar()
-        calendar_context['today_schedules'] = dates_schedules[date]
-        return calendar_context
+        dates_schedules = self.get_week_schedules([date])
+        return {'today_schedules': dates_schedules[date]}
 
     def get_today_num(self):
         """ 曜日番号を作成してコンテキストに格納します """
         today = datetime.date.today()
-        today_num = today.isoweekday()
-        calendar_context = super().get_week_calendar()
-        calendar_context['today_num'] = today_num
-
-        return calendar_context
+        return {'today_num': today.isoweekday()}
 
 
@@ -0,0 +1,85 @@
+import datetime
+
+from django.conf import settings
+from django.test import TestCase
+from django.urls import reverse
+
+from character.models import Character
+from register.testing import factory_user
+from routine.testing import factory_term_decision, factory_body_part
+from tr_calendar.cache import get_cache
+from tr_calendar.schedules import rebuild_day_schedules
+
+
+class TestHome(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        cls.today = datetime.date.today()
+        factory_term_decision(
+            user=cls.user,
+            start_date=cls.today - datetime.timedelta(days=30),
+            end_date=cls.today + datetime.timedelta(days=30),
+        )
+        # 今日の曜日のルーティンオブジェクト
+        cls.today_chest = factory_body_part(week=settings.WEEK[cls.today.weekday()], part='胸', user=cls.user)
+        cls.today_back = factory_body_part(week=settings.WEEK[cls.today.weekday()], part='背中', user=cls.user)
+        # 明日は日付指定オブジェクトのみ
+        cls.tomorrow = cls.today + datetime.timedelta(days=1)
+        cls.tomorrow_leg = factory_body_part(date=cls.tomorrow, part='脚', user=cls.user)
+        rebuild_day_schedules(cls.user)
+
+    def setUp(self):
+        get_cache().clear()
+        self.client.force_login(self.user)
+
+    def _getTarget(self, date=None):
+        if date is None:
+            return reverse('home:home')
+        return reverse('home:home', kwargs={'year': date.year, 'month': date.month, 'day': date.day})
+
+    def test_get(self):
+        res = self.client.get(self._getTarget())
+        self.assertTemplateUsed(res, 'home.html')
+        self.assertEqual(res.context['today_num'], self.today.isoweekday())
+        self.assertEqual(list(res.context['today_schedules']), [self.today_chest, self.today_back])
+
+        week_day_schedules = res.context['week_day_schedules']
+        today_index = res.context['week_days'].index(self.today)
+        self.assertEqual(len(week_day_schedules), 2)
+        self.assertEqual(week_day_schedules[0][today_index], self.today_chest)
+        self.assertEqual(week_day_schedules[1][today_index], self.today_back)
+        if self.tomorrow in res.context['week_days']:
+            self.assertEqual(week_day_schedules[0][today_index + 1], self.tomorrow_leg)
+            self.assertEqual(week_day_schedules[1][today_index + 1], 'temporary')
+
+    def test_get_other_week(self):
+        """ 今日を含まない週を表示しても今日のスケジュールが取得されること """
+        res = self.client.get(self._getTarget(self.today + datetime.timedelta(days=70)))
+        self.assertEqual(list(res.context['today_schedules']), [self.today_chest, self.today_back])
+        self.assertEqual(res.context['week_day_schedules'], {})
+
+    def test_num_queries(self):
+        """ 表示する週や部位オブジェクトの数によらずクエリ数が一定であること """
+        self.client.get(self._getTarget())
+        for days in [0, 7, 70, -70]:
+            get_cache().clear()
+            with self.assertNumQueries(4):
+                self.client.get(self._getTarget(self.today + datetime.timedelta(days=days)))
+
+    def test_num_queries_cached(self):
+        """ キャッシュがあればスケジュールを取得しないこと """
+        self.client.get(self._getTarget())
+        with self.assertNumQueries(3):
+            self.client.get(self._getTarget())
+
+    def test_character(self):
+        """ キャラクターはログイン中のユーザーと一緒に取得し、なければ初期設定のキャラクターを作成すること """
+        res = self.client.get(self._getTarget())
+        self.assertEqual(res.context['character'].number, '1')
+        self.assertEqual(res.context['character_serif'], 'character_serif/character1.html')
+
+        Character.objects.filter(user=self.user).update(number='2')
+        res = self.client.get(self._getTarget())
+        self.assertEqual(res.context['character_serif'], 'character_serif/character2.html')
+        self.assertEqual(Character.objects.filter(user=self.user).count(), 1)
@@ -1,8 +1,11 @@
+from django.conf import settings
 from django.urls import path
-from .views import Home
+from .views import Home, AsyncHome
 
 app_name = 'home'
+# ASGIで起動した場合は非同期のビューを使います
+HomeView = AsyncHome if settings.ASYNC_VIEWS else Home
 urlpatterns = [
-    path('home/', Home.as_view(), name='home'),
-    path('home/<int:year>/<int:month>/<int:day>/', Home.as_view(), name='home'),
+    path('home/', HomeView.as_view(), name='home'),
+    path('home/<int:year>/<int:month>/<int:day>/', HomeView.as_view(), name='home'),
 ]
@@ -1,15 +1,19 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import get_object_or_404
 from django.views import generic
 from .mixins import WeekWithScheduleMixin
 from routine.models import BodyPart
 from character.models import Character
+from tr_calendar.async_utils import AsyncLoginRequiredMixin, gather_sync, render_response, run_sync
+from tr_calendar.conditional import ConditionalGetMixin, AsyncConditionalGetMixin
 
 # Create your views here.
 
 
-class Home(LoginRequiredMixin, WeekWithScheduleMixin, generic.TemplateView):
-    """週間カレンダーを表示するビュー"""
+class Home(ConditionalGetMixin, LoginRequiredMixin, WeekWithScheduleMixin, generic.TemplateView):
+    """週間カレンダーを表示するビュー
+
+    前回表示した時からスケジュールとキャラクターが変わっていなければ304を返します。
+    """
     template_name = 'home.html'
     model = BodyPart
     week_field = 'week'
@@ -25,17 +29,28 @@ class Home(LoginRequiredMixin, WeekWithScheduleMixin, generic.TemplateView):
         context.update(calendar_context)
         calendar_context = {'page_title': 'ホーム', 'breadcrumb_list': None}
         context.update(calendar_context)
-        user = self.request.user
-        if Character.objects.filter(user=user):  # 既にキャラクターの設定がされている場合
-            character = get_object_or_404(Character, user=user)
-            character_serif = 'character_serif/character' + character.number + '.html'
-        else:  # キャラクター初期設定
-            character = Character.objects.create(name='ボディビルダー', number='1', user=user)
-            character_serif = 'character_serif/character1.html'
+        # キャラクターはログイン中のユーザーと一緒に取得済みです
+        character = Character.objects.provision(self.request.user)
 
         calendar_context = {'character': character,
-                            'character_serif': character_serif,
+                            'character_serif': character.get_serif_template(),
                             }
         context.update(calendar_context)
         return context
 
+
+class AsyncHome(AsyncConditionalGetMixin, AsyncLoginRequiredMixin, Home):
+    """ Homeの非同期版です。（settings.ASYNC_VIEWS がTrueの場合に使います）
+
+    ルーティン期間、スケジュール、キャラクターを同時に取得してから、Homeと同じコンテキストを作成します。
+    """
+
+    async def get(self, request, *args, **kwargs):
+        user = request.user
+        self._term_date, self._schedule_resolver, _ = await gather_sync(
+            self.get_term_date,
+            self.load_schedule_resolver,
+            lambda: Character.objects.provision(user),
+        )
+        context = await run_sync(lambda: self.get_context_data(**kwargs))
+        return await render_response(self.render_to_response(context))
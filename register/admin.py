@@ -2,7 +2,8 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
 from django.utils.translation import ugettext_lazy as _
-from .models import User, Profile
+from django.utils import timezone
+from .models import User, Profile, OutboxMail
 
 
 class MyUserChangeForm(UserChangeForm):
@@ -39,5 +40,22 @@ class MyUserAdmin(UserAdmin):
     ordering = ('email',)
 
 
+class OutboxMailAdmin(admin.ModelAdmin):
+    list_display = ('to', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('to', 'subject')
+    ordering = ('-created_at',)
+    actions = ['requeue']
+
+    def requeue(self, request, queryset):
+        """送信に失敗したメールを送信待ちに戻します。"""
+        count = queryset.exclude(status=OutboxMail.SENT).update(
+            status=OutboxMail.PENDING, attempts=0, next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f'{count}件のメールを送信待ちに戻しました。')
+    requeue.short_description = '送信待ちに戻す'
+
+
 admin.site.register(User, MyUserAdmin)
 admin.site.register(Profile)
+admin.site.register(OutboxMail, OutboxMailAdmin)
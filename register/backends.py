@@ -0,0 +1,17 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+UserModel = get_user_model()
+
+
+class UserBackend(ModelBackend):
+    """ ログイン中のユーザーを取得する際に、キャラクターも一緒に取得する認証バックエンド
+
+    ホームなどでキャラクターを表示するために、リクエストごとにクエリを追加しなくて済むようにします。
+    """
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related('character').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
@@ -4,8 +4,10 @@ from django.contrib.auth.forms import (
     PasswordChangeForm,  PasswordResetForm, SetPasswordForm
 )
 from django.contrib.auth import get_user_model
+from django.template import loader
 from django.utils import timezone
 
+from .mail import enqueue_mail
 from .models import Profile
 
 User = get_user_model()
@@ -75,6 +77,18 @@ class MyPasswordResetForm(PasswordResetForm):
         for field in self.fields.values():
             field.widget.attrs['class'] = 'form-control'
 
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email, html_email_template_name=None):
+        """パスワード再設定用URLのメールを送信せずに送信待ちとして保存します。"""
+        subject = loader.render_to_string(subject_template_name, context)
+        # 件名に改行を含めることはできません
+        subject = ''.join(subject.splitlines())
+        body = loader.render_to_string(email_template_name, context)
+        html_email = None
+        if html_email_template_name is not None:
+            html_email = loader.render_to_string(html_email_template_name, context)
+        enqueue_mail(subject, body, [to_email], from_email, html_message=html_email)
+
 
 class MySetPasswordForm(SetPasswordForm):
     """パスワード再設定用フォーム(パスワード忘れて再設定)"""
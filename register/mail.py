@@ -0,0 +1,119 @@
+import datetime
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxMail
+
+# 一回の送信でまとめて送るメールの数
+BATCH_SIZE = getattr(settings, 'MAIL_QUEUE_BATCH_SIZE', 50)
+# 送信に失敗したメールを再送する回数の上限
+MAX_ATTEMPTS = getattr(settings, 'MAIL_QUEUE_MAX_ATTEMPTS', 5)
+# 再送までの待ち時間（秒）。失敗するたびに倍にして、MAX_BACKOFF_SECONDSを上限とします。
+BACKOFF_SECONDS = getattr(settings, 'MAIL_QUEUE_BACKOFF_SECONDS', 60)
+MAX_BACKOFF_SECONDS = getattr(settings, 'MAIL_QUEUE_MAX_BACKOFF_SECONDS', 60 * 60)
+# 送信中のメールを他のワーカーが取得しないように next_attempt_at を遅らせる時間（秒）
+LOCK_SECONDS = getattr(settings, 'MAIL_QUEUE_LOCK_SECONDS', 5 * 60)
+
+
+def enqueue_mail(subject, message, recipient_list, from_email=None, html_message=None):
+    """ メールを送信せずに送信待ちとして保存します。
+
+    send_mailと同じ引数で呼び出せます。宛先ごとに一件ずつ保存し、送信は send_queued_mail コマンドで行います。
+    """
+    return OutboxMail.objects.bulk_create([
+        OutboxMail(
+            to=to,
+            from_email=from_email or '',
+            subject=subject,
+            message=message,
+            html_message=html_message or '',
+        )
+        for to in recipient_list
+    ])
+
+
+def get_backoff(attempts):
+    """ attempts回失敗したメールを再送するまでの待ち時間を返します。 """
+    return datetime.timedelta(seconds=min(BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS))
+
+
+def claim_mails(batch_size=BATCH_SIZE):
+    """ 送信するメールを取得して、他のワーカーが同じメールを取得しないように next_attempt_at を遅らせます。
+
+    行ロックに対応したDBでは、他のワーカーがロックしているメールを飛ばして取得します。
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        mails = list(
+            OutboxMail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxMail.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk')[:batch_size]
+        )
+        OutboxMail.objects.filter(pk__in=[mail.pk for mail in mails]).update(
+            next_attempt_at=now + datetime.timedelta(seconds=LOCK_SECONDS),
+        )
+    return mails
+
+
+def make_message(mail, connection):
+    message = EmailMultiAlternatives(
+        mail.subject, mail.message, mail.from_email or None, [mail.to], connection=connection,
+    )
+    if mail.html_message:
+        message.attach_alternative(mail.html_message, 'text/html')
+    return message
+
+
+def send_queued_mails(batch_size=BATCH_SIZE):
+    """ 送信待ちのメールを最大batch_size件、一つの接続で送信して、送信できた件数と失敗した件数を返します。
+
+    送信に失敗したメールは待ち時間を倍にしながら再送し、MAX_ATTEMPTS回失敗したら送信失敗とします。
+    接続自体に失敗した場合は、取得した全てのメールを失敗として扱います。
+    """
+    mails = claim_mails(batch_size)
+    if not mails:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        for mail in mails:
+            mark_failed(mail, e)
+        return 0, len(mails)
+
+    try:
+        for mail in mails:
+            try:
+                make_message(mail, connection).send()
+            except Exception as e:
+                mark_failed(mail, e)
+                failed += 1
+            else:
+                mark_sent(mail)
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def mark_sent(mail):
+    mail.status = OutboxMail.SENT
+    mail.attempts += 1
+    mail.sent_at = timezone.now()
+    mail.last_error = ''
+    mail.save(update_fields=['status', 'attempts', 'sent_at', 'last_error'])
+
+
+def mark_failed(mail, error):
+    mail.attempts += 1
+    mail.last_error = f'{error.__class__.__name__}: {error}'
+    if mail.attempts >= MAX_ATTEMPTS:
+        mail.status = OutboxMail.FAILED
+    else:
+        mail.next_attempt_at = timezone.now() + get_backoff(mail.attempts)
+    mail.save(update_fields=['status', 'attempts', 'next_attempt_at', 'last_error'])
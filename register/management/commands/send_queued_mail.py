@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from register.mail import BATCH_SIZE, send_queued_mails
+
+
+class Command(BaseCommand):
+    help = (
+        '送信待ちのメール（OutboxMail）をまとめて送信します。'
+        '--loop を指定しない場合は、送信時期になっているメールがなくなるまで送信して終了します。'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='一つの接続で送信するメールの数')
+        parser.add_argument('--loop', action='store_true', help='終了せずに送信待ちのメールを送信し続けます。')
+        parser.add_argument('--interval', type=float, default=5, help='--loop で送信待ちのメールがない場合に待つ秒数')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        try:
+            while True:
+                sent, failed = send_queued_mails(options['batch_size'])
+                total_sent += sent
+                total_failed += failed
+                if failed:
+                    self.stderr.write(f'{failed}件のメールの送信に失敗しました。後で再送します。')
+                if sent + failed < options['batch_size']:
+                    if not options['loop']:
+                        break
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'{total_sent}件のメールを送信しました。（失敗 {total_failed}件）'))
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:29
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('register', '0005_auto_20200702_2252'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('to', models.EmailField(max_length=254, verbose_name='宛先')),
+                ('from_email', models.CharField(blank=True, max_length=255, verbose_name='送信元')),
+                ('subject', models.CharField(max_length=255, verbose_name='件名')),
+                ('message', models.TextField(verbose_name='本文')),
+                ('html_message', models.TextField(blank=True, verbose_name='HTML本文')),
+                ('status', models.CharField(choices=[('pending', '送信待ち'), ('sent', '送信済み'), ('failed', '送信失敗')], default='pending', max_length=10, verbose_name='状態')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='送信回数')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='次回送信日時')),
+                ('last_error', models.TextField(blank=True, verbose_name='最後のエラー')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='作成日時')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='送信日時')),
+            ],
+            options={
+                'verbose_name': '送信待ちメール',
+                'verbose_name_plural': '送信待ちメール',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='outboxmail',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='outboxmail_status_next_idx'),
+        ),
+    ]
@@ -131,3 +131,42 @@ class Profile(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class OutboxMail(models.Model):
+    """ 送信待ちのメール
+
+    ビューではメールを直接送信せずにこのモデルに保存し、send_queued_mail コマンドでまとめて送信します。
+    送信に失敗した場合は next_attempt_at を遅らせて再送し、MAIL_QUEUE_MAX_ATTEMPTS 回失敗したら送信失敗とします。
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, '送信待ち'),
+        (SENT, '送信済み'),
+        (FAILED, '送信失敗'),
+    )
+
+    to = models.EmailField('宛先')
+    from_email = models.CharField('送信元', max_length=255, blank=True)
+    subject = models.CharField('件名', max_length=255)
+    message = models.TextField('本文')
+    html_message = models.TextField('HTML本文', blank=True)
+    status = models.CharField('状態', max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField('送信回数', default=0)
+    next_attempt_at = models.DateTimeField('次回送信日時', default=timezone.now)
+    last_error = models.TextField('最後のエラー', blank=True)
+    created_at = models.DateTimeField('作成日時', auto_now_add=True)
+    sent_at = models.DateTimeField('送信日時', null=True, blank=True)
+
+    class Meta:
+        verbose_name = '送信待ちメール'
+        verbose_name_plural = '送信待ちメール'
+        indexes = [
+            # 送信するメールの取得
+            models.Index(fields=['status', 'next_attempt_at'], name='outboxmail_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.to} {self.subject}'
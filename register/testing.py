@@ -1,3 +1,6 @@
+import socketserver
+import threading
+
 from django.utils import timezone
 
 from . import models
@@ -10,7 +13,7 @@ def factory_user(**kwargs):
         'last_name': '姓',
         'is_staff': False,
         'is_active': True,
-        'date_joined': timezone.now
+        'date_joined': timezone.now()
     }
     password = kwargs.pop('password', None)
     d.update(kwargs)
@@ -19,3 +22,80 @@ def factory_user(**kwargs):
         user.set_password(password)
     user.save()
     return user
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """ テスト用のSMTPサーバーです。受信したメールを保存するだけで、どこにも送信しません。
+
+    with LocalSMTPServer() as server:
+        with self.settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                           EMAIL_HOST=server.host, EMAIL_PORT=server.port, EMAIL_USE_TLS=False):
+            ...
+        server.messages  # [(送信元, [宛先], 本文), ...]
+        server.connections  # 接続数
+
+    fail_recipients に含まれる宛先へのメールは受け付けません。
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, fail_recipients=()):
+        super().__init__(('127.0.0.1', 0), LocalSMTPHandler)
+        self.host, self.port = self.server_address
+        self.fail_recipients = set(fail_recipients)
+        self.messages = []
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class LocalSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        self.reply('220 localhost')
+        mail_from, recipients = None, []
+        while True:
+            line = self.rfile.readline().decode().rstrip('\r\n')
+            if not line:
+                return
+            command = line.split(' ', 1)[0].upper()
+            if command == 'EHLO':
+                self.reply('250 localhost')
+            elif command == 'MAIL':
+                mail_from, recipients = line.split(':', 1)[1].strip().strip('<>'), []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                recipient = line.split(':', 1)[1].strip().strip('<>')
+                if recipient in self.server.fail_recipients:
+                    self.reply('550 No such user')
+                else:
+                    recipients.append(recipient)
+                    self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while True:
+                    data_line = self.rfile.readline().decode()
+                    if data_line in ('.\r\n', ''):
+                        break
+                    data.append(data_line)
+                with self.server.lock:
+                    self.server.messages.append((mail_from, recipients, ''.join(data)))
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                # RSET、NOOPなど
+                self.reply('250 OK')
@@ -0,0 +1,131 @@
+import datetime
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..mail import MAX_ATTEMPTS, enqueue_mail, get_backoff, send_queued_mails
+from ..models import OutboxMail
+from ..testing import LocalSMTPServer
+
+
+class TestEnqueueMail(TestCase):
+    def test_enqueue_mail(self):
+        enqueue_mail('件名', '本文', ['a@example.com', 'b@example.com'])
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            list(OutboxMail.objects.order_by('to').values_list('to', 'subject', 'status')),
+            [('a@example.com', '件名', OutboxMail.PENDING), ('b@example.com', '件名', OutboxMail.PENDING)],
+        )
+
+
+class TestSendQueuedMails(TestCase):
+    def test_send(self):
+        enqueue_mail('件名', '本文', ['a@example.com'])
+        enqueue_mail('件名2', 'テキスト', ['b@example.com'], html_message='<p>HTML</p>')
+
+        self.assertEqual(send_queued_mails(), (2, 0))
+        self.assertEqual([message.to for message in mail.outbox], [['a@example.com'], ['b@example.com']])
+        self.assertEqual(mail.outbox[1].alternatives, [('<p>HTML</p>', 'text/html')])
+        self.assertFalse(OutboxMail.objects.exclude(status=OutboxMail.SENT).exists())
+        # 送信済みのメールは再送しないこと
+        self.assertEqual(send_queued_mails(), (0, 0))
+
+    def test_batch_size(self):
+        enqueue_mail('件名', '本文', [f'user{i}@example.com' for i in range(5)])
+
+        self.assertEqual(send_queued_mails(batch_size=2), (2, 0))
+        self.assertEqual(send_queued_mails(batch_size=2), (2, 0))
+        self.assertEqual(send_queued_mails(batch_size=2), (1, 0))
+
+    def test_not_yet(self):
+        """ 再送の時期になっていないメールは送信しないこと """
+        enqueue_mail('件名', '本文', ['a@example.com'])
+        OutboxMail.objects.update(next_attempt_at=timezone.now() + datetime.timedelta(minutes=1))
+
+        self.assertEqual(send_queued_mails(), (0, 0))
+
+    def test_retry(self):
+        enqueue_mail('件名', '本文', ['a@example.com'])
+
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError('timeout')):
+            self.assertEqual(send_queued_mails(), (0, 1))
+        outbox_mail = OutboxMail.objects.get()
+        self.assertEqual(outbox_mail.status, OutboxMail.PENDING)
+        self.assertEqual(outbox_mail.attempts, 1)
+        self.assertEqual(outbox_mail.last_error, 'OSError: timeout')
+        self.assertGreater(outbox_mail.next_attempt_at, timezone.now() + get_backoff(1) - datetime.timedelta(seconds=5))
+        # 待ち時間が過ぎるまでは再送しないこと
+        self.assertEqual(send_queued_mails(), (0, 0))
+
+        OutboxMail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_mails(), (1, 0))
+        self.assertEqual(OutboxMail.objects.get().status, OutboxMail.SENT)
+
+    def test_max_attempts(self):
+        enqueue_mail('件名', '本文', ['a@example.com'])
+
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError('timeout')):
+            for _ in range(MAX_ATTEMPTS):
+                OutboxMail.objects.update(next_attempt_at=timezone.now())
+                send_queued_mails()
+        outbox_mail = OutboxMail.objects.get()
+        self.assertEqual(outbox_mail.status, OutboxMail.FAILED)
+        self.assertEqual(outbox_mail.attempts, MAX_ATTEMPTS)
+
+    def test_get_backoff(self):
+        self.assertEqual(get_backoff(1), datetime.timedelta(minutes=1))
+        self.assertEqual(get_backoff(2), datetime.timedelta(minutes=2))
+        self.assertEqual(get_backoff(3), datetime.timedelta(minutes=4))
+        self.assertEqual(get_backoff(10), datetime.timedelta(hours=1))
+
+
+class TestSendQueuedMailsSMTP(TestCase):
+    def _settings(self, server, **kwargs):
+        return override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST=server.host, EMAIL_PORT=server.port,
+            EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='', EMAIL_USE_TLS=False, **kwargs,
+        )
+
+    def test_send(self):
+        """ 一つの接続でまとめて送信すること """
+        enqueue_mail('件名', '本文', [f'user{i}@example.com' for i in range(3)])
+
+        with LocalSMTPServer() as server, self._settings(server):
+            self.assertEqual(send_queued_mails(), (3, 0))
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(
+            [recipients for mail_from, recipients, data in server.messages],
+            [['user0@example.com'], ['user1@example.com'], ['user2@example.com']],
+        )
+
+    def test_refused(self):
+        """ 受け付けられなかったメールだけを再送すること """
+        enqueue_mail('件名', '本文', ['a@example.com', 'refused@example.com', 'b@example.com'])
+
+        with LocalSMTPServer(fail_recipients=['refused@example.com']) as server, self._settings(server):
+            self.assertEqual(send_queued_mails(), (2, 1))
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(OutboxMail.objects.get(status=OutboxMail.PENDING).to, 'refused@example.com')
+
+    def test_connection_error(self):
+        enqueue_mail('件名', '本文', ['a@example.com', 'b@example.com'])
+
+        with LocalSMTPServer() as server:
+            pass
+        with self._settings(server, EMAIL_TIMEOUT=1):
+            self.assertEqual(send_queued_mails(), (0, 2))
+        self.assertEqual(
+            list(OutboxMail.objects.values_list('status', 'attempts').distinct()), [(OutboxMail.PENDING, 1)])
+
+
+class TestSendQueuedMailCommand(TestCase):
+    def test_command(self):
+        enqueue_mail('件名', '本文', [f'user{i}@example.com' for i in range(5)])
+
+        call_command('send_queued_mail', batch_size=2, stdout=mock.Mock())
+        self.assertEqual(len(mail.outbox), 5)
@@ -0,0 +1,64 @@
+from django.core import mail
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import OutboxMail
+from ..testing import factory_user
+
+
+class TestUserCreate(TestCase):
+    def _getTarget(self):
+        return reverse('register:user_create')
+
+    def test_post(self):
+        """ 本登録用のメールを送信せずに送信待ちとして保存すること """
+        data = {
+            'email': 'new@example.com', 'password1': 'Xk2p9LmQw8', 'password2': 'Xk2p9LmQw8',
+            'name': 'テスト', 'gender': '1', 'birthday': '2000-01-01',
+        }
+        self.client.post(reverse('register:user_data_input'), data)
+        res = self.client.post(self._getTarget())
+
+        self.assertRedirects(res, reverse('register:user_create_done'))
+        self.assertEqual(len(mail.outbox), 0)
+        outbox_mail = OutboxMail.objects.get()
+        self.assertEqual(outbox_mail.to, 'new@example.com')
+        self.assertIn('/user_create/complete/', outbox_mail.message)
+
+
+class TestEmailChange(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _getTarget(self):
+        return reverse('register:email_change')
+
+    def test_post(self):
+        res = self.client.post(self._getTarget(), {'email': 'changed@example.com'})
+
+        self.assertRedirects(res, reverse('register:email_change_done'))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxMail.objects.get().to, 'changed@example.com')
+
+
+class TestPasswordReset(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user(password='Xk2p9LmQw8')
+
+    def _getTarget(self):
+        return reverse('register:password_reset')
+
+    def test_post(self):
+        res = self.client.post(self._getTarget(), {'email': self.user.email})
+
+        self.assertRedirects(res, reverse('register:password_reset_done'))
+        self.assertEqual(len(mail.outbox), 0)
+        outbox_mail = OutboxMail.objects.get()
+        self.assertEqual(outbox_mail.to, self.user.email)
+        self.assertNotIn('\n', outbox_mail.subject)
+        self.assertIn('/password_reset/confirm/', outbox_mail.message)
@@ -7,7 +7,6 @@ from django.contrib.auth.views import (
 )
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.signing import BadSignature, SignatureExpired, loads, dumps
-from django.core.mail import send_mail
 from django.http import HttpResponseBadRequest
 from django.shortcuts import render, redirect
 from django.template.loader import render_to_string
@@ -19,6 +18,7 @@ from .forms import (
     LoginForm, UserCreateForm, ProfileForm, MyPasswordChangeForm,
     MyPasswordResetForm, MySetPasswordForm, EmailChangeForm
 )
+from .mail import enqueue_mail
 from .models import Profile
 from character.models import Character
 
@@ -135,9 +135,9 @@ def user_create(request):
         subject = render_to_string('register/mail_template/create/subject.txt', context).strip()
         message = render_to_string('register/mail_template/create/message.txt', context)
 
-        # ユーザーモデルにはメールアドレスフィールドがあるため、send_mailではなく
-        # 宛先不要のuser.email_userを使う
-        user.email_user(subject, message,)
+        # リクエスト中にSMTPサーバーへ接続しないように、送信待ちとして保存するだけにします。
+        # 送信は send_queued_mail コマンドで行います。
+        enqueue_mail(subject, message, [user.email])
         return redirect('register:user_create_done')
 
     context = {
@@ -194,6 +194,8 @@ class UserCreateComplete(generic.TemplateView):
                     # 問題なければ本登録とする
                     user.is_active = True
                     user.save()
+                    # ホームで表示する初期設定のキャラクターを作成しておきます
+                    Character.objects.provision(user)
                     return super().get(request, **kwargs)
 
         return HttpResponseBadRequest()
@@ -226,7 +228,7 @@ class UserDetail(OnlyYouMixin, generic.DetailView):
         user = self.request.user
         if user.pk == self.kwargs['pk']:
             profile = Profile.objects.get(user_id__exact=user.pk)
-            character = Character.objects.get(user_id__exact=user.pk)
+            character = Character.objects.provision(user)
         context = super().get_context_data(**kwargs)  # 継承元のメソッドを呼び出す
         context["profile"] = profile
         context["character"] = character
@@ -324,7 +326,7 @@ class EmailChange(LoginRequiredMixin, generic.FormView):
 
         subject = render_to_string('register/mail_template/email_change/subject.txt', context).strip()
         message = render_to_string('register/mail_template/email_change/message.txt', context)
-        send_mail(subject, message, None, [new_email])
+        enqueue_mail(subject, message, [new_email])
 
         return redirect('register:email_change_done')
 
@@ -1,7 +1,33 @@
 from django.contrib import admin
-from .models import BodyPart, TermDecision
+from django.contrib.auth import get_user_model
+from tr_calendar.cache import bump_generation
+from tr_calendar.schedules import rebuild_day_schedules
+from .models import BodyPart, TermDecision, ROUTINE_QUERY
 
 # Register your models here.
 
-admin.site.register(BodyPart)
+
+@admin.register(BodyPart)
+class BodyPartAdmin(admin.ModelAdmin):
+    def delete_model(self, request, obj):
+        user = obj.user
+        super().delete_model(request, obj)
+        # 部位オブジェクトの削除ではシグナルを送らないため、ここでスケジュールを作り直すかキャッシュを無効にします
+        if obj.week is not None or obj.rrule is not None:
+            rebuild_day_schedules(user)
+        else:
+            bump_generation(user.pk)
+
+    def delete_queryset(self, request, queryset):
+        user_pks = set(queryset.values_list('user', flat=True))
+        routine_user_pks = set(queryset.filter(ROUTINE_QUERY).values_list('user', flat=True))
+        users = {user.pk: user for user in get_user_model().objects.filter(pk__in=routine_user_pks)}
+        super().delete_queryset(request, queryset)
+        for user_pk in user_pks:
+            if user_pk in users:
+                rebuild_day_schedules(users[user_pk])
+            else:
+                bump_generation(user_pk)
+
+
 admin.site.register(TermDecision)
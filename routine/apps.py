@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class RoutineConfig(AppConfig):
     name = 'routine'
+
+    def ready(self):
+        # 部位ごとの画像のURLは変わらないため、起動時にまとめて作成します
+        from . import images
+        images.load()
@@ -0,0 +1,6 @@
+from .images import get_image_urls
+
+
+def images(request):
+    """ 部位以外の画像（オフの日など）のURLをテンプレートで使えるようにします。 例： {{ image_urls.off }} """
+    return {'image_urls': get_image_urls()}
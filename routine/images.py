@@ -0,0 +1,84 @@
+import types
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.templatetags.static import static
+
+# 部位以外に表示する画像（オフの日、部位のない枠）
+FIXED_IMAGES = {'off': 'media/off.png', 'empty': 'media/empty.png'}
+
+_image_paths = None
+_image_urls = None
+
+
+def build_image_paths():
+    """ settings.IMAGES から {(部位, 部位詳細): 画像のパス} の対応表を作成します。部位詳細がない場合はNoneです。
+
+    例： {('胸', None): 'media/chest.png', ('胸', '上部'): 'media/upperchest.png', ...}
+    """
+    from .models import PARTS
+
+    # 長い部位から判定します。（'上半身' などが他の部位で始まっていても正しく分けられるように）
+    parts = sorted((part for part, _ in PARTS), key=len, reverse=True)
+    image_paths = {}
+    for key, file_name in settings.IMAGES.items():
+        part = next((part for part in parts if key.startswith(part)), None)
+        if part is None:
+            raise ImproperlyConfigured(f'settings.IMAGES の {key} は部位で始まっていません')
+        image_paths[(part, key[len(part):] or None)] = f'media/{file_name}.png'
+    return types.MappingProxyType(image_paths)
+
+
+def build_image_urls():
+    """ 画像のパスを static() でURL（本番ではS3のURL）にした対応表を作成します。FIXED_IMAGES のキーも含めます。 """
+    image_urls = {key: static(path) for key, path in get_image_paths().items()}
+    image_urls.update({name: static(path) for name, path in FIXED_IMAGES.items()})
+    return types.MappingProxyType(image_urls)
+
+
+def get_image_paths():
+    global _image_paths
+    if _image_paths is None:
+        _image_paths = build_image_paths()
+    return _image_paths
+
+
+def get_image_urls():
+    global _image_urls
+    if _image_urls is None:
+        _image_urls = build_image_urls()
+    return _image_urls
+
+
+def load():
+    """ 起動時（RoutineConfig.ready）に対応表を作成します。
+
+    collectstatic の前などで画像のURLをまだ作成できない場合は、最初に使う時に作成します。
+    """
+    get_image_paths()
+    try:
+        get_image_urls()
+    except ValueError:
+        pass
+
+
+def get_image_path(part, detail_part=None):
+    """ 部位、部位詳細から画像ファイルのパス（{% static %} に渡す値）を返します。 """
+    return get_image_paths()[(part, detail_part or None)]
+
+
+def get_image_static_url(part, detail_part=None):
+    """ 部位、部位詳細から画像ファイルのURLを返します。 """
+    return get_image_urls()[(part, detail_part or None)]
+
+
+@receiver(setting_changed)
+def clear_images(setting, **kwargs):
+    """ テストなどで画像、静的ファイルの設定を変更した場合は対応表を作り直します。 """
+    global _image_paths, _image_urls
+    if setting == 'IMAGES':
+        _image_paths = None
+    if setting in ('IMAGES', 'STATIC_URL', 'STATICFILES_STORAGE'):
+        _image_urls = None
@@ -0,0 +1,117 @@
+import datetime
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, RequestFactory
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from routine.testing import factory_history
+from workout_plan.db.backends import pool as connection_pool
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'テスト用DBに対してホーム画面へのリクエストを繰り返し、DB接続の使い回しの設定ごとに'
+        '1000リクエストあたりの接続の作成回数と応答時間を比較します。'
+        'SQLiteの場合は一時ファイルのDBを、MySQLの場合はテスト用のデータベースを作成します。'
+    )
+    # 比較する設定 (名前, CONN_MAX_AGE, POOLのSIZE)
+    modes = [
+        ('none', 0, 0),
+        ('persistent', 60, 0),
+        ('pool', 0, 4),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='設定ごとのリクエスト数')
+        parser.add_argument('--threads', type=int, default=4, help='同時にリクエストするスレッド数')
+
+    def handle(self, *args, **options):
+        if not hasattr(connection, 'connection_created_at'):
+            raise CommandError('DATABASES の ENGINE に workout_plan.db.backends のバックエンドを指定してください。')
+
+        setup_test_environment()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            if connection.vendor == 'sqlite':
+                # メモリ上のDBは接続を閉じないため、ファイルのDBを使います
+                connection.settings_dict['TEST'] = dict(
+                    connection.settings_dict.get('TEST') or {}, NAME=os.path.join(tmpdir, 'benchmark.sqlite3'))
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                user = User.objects.create_user(email='benchmark@example.com')
+                factory_history(user, datetime.date.today() - datetime.timedelta(days=60), 90)
+                results = {}
+                for name, max_age, pool_size in self.modes:
+                    results[name] = self.measure(user, max_age, pool_size, options['requests'], options['threads'])
+                self.report(results, options['requests'])
+            finally:
+                self.configure(max_age=0, pool_size=0)
+                connections.close_all()
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+    def configure(self, max_age, pool_size):
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        connection.settings_dict['POOL'] = dict(connection.settings_dict.get('POOL') or {}, SIZE=pool_size)
+
+    def measure(self, user, max_age, pool_size, request_count, thread_count):
+        """ thread_count個のスレッドからrequest_count回リクエストして、接続の作成回数と応答時間を返します。
+
+        テスト用のClientはリクエストの前後で接続を閉じないため、WSGIHandlerを直接呼び出します。
+        （gunicornのスレッドワーカーと同じく、決まった数のスレッドでリクエストを処理します）
+        """
+        connections.close_all()
+        self.configure(max_age, pool_size)
+        client = Client()
+        client.force_login(user)
+        factory = RequestFactory()
+        factory.cookies = client.cookies
+        url = reverse('home:home')
+        handler = WSGIHandler()
+
+        def start_response(status, headers):
+            if not status.startswith('200'):
+                raise CommandError(f'{url} が {status} を返しました。')
+
+        def run(count):
+            timings = []
+            for _ in range(count):
+                started = time.perf_counter()
+                response = handler(factory.get(url).environ, start_response)
+                b''.join(response)
+                response.close()
+                timings.append((time.perf_counter() - started) * 1000)
+            # スレッドの接続はプールに返すか閉じます
+            connections.close_all()
+            return timings
+
+        connection_pool.stats.clear()
+        counts = [request_count // thread_count + (i < request_count % thread_count) for i in range(thread_count)]
+        with ThreadPoolExecutor(thread_count) as executor:
+            timings = [timing for thread_timings in executor.map(run, counts) for timing in thread_timings]
+        return {
+            'created': connection_pool.stats['created'],
+            'reused': connection_pool.stats['reused'],
+            'median': statistics.median(timings),
+            'p99': sorted(timings)[int(len(timings) * 0.99) - 1],
+        }
+
+    def report(self, results, request_count):
+        self.stdout.write('')
+        self.stdout.write(
+            f"{'設定':<14}{'接続作成/1000req':>18}{'プール再利用':>14}{'中央値(ms)':>12}{'p99(ms)':>10}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<14}{result['created'] * 1000 / request_count:>18.1f}{result['reused']:>14}"
+                f"{result['median']:>12.2f}{result['p99']:>10.2f}"
+            )
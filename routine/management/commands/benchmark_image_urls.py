@@ -0,0 +1,87 @@
+import datetime
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.template import engines, loader
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from routine.testing import factory_history
+
+User = get_user_model()
+
+# 以前の home.html の画像の書き方（表示するたびに {% static %} でURLを作成します）
+LEGACY_TAGS = [
+    ('{% load static cache routine_images %}', '{% load static cache %}'),
+    ('{{ s|image_url }}', '{% static s.get_image_url %}'),
+    ('{{ today_schedule|image_url }}', '{% static today_schedule.get_image_url %}'),
+    ('{{ image_urls.off }}', "{% static 'media/off.png' %}"),
+    ('{{ image_urls.empty }}', "{% static 'media/empty.png' %}"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'テスト用DBのデータでホーム画面（home.html）の描画時間を、画像のURLを起動時に作成した対応表から取得する場合と、'
+        '以前のように {% static %} で表示するたびに作成する場合とで比較します。'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=500, help='描画する回数')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        # 週間カレンダーの部分をキャッシュせずに毎回描画します
+        caches = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'benchmark': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+        }
+        try:
+            with override_settings(CACHES=caches):
+                user = User.objects.create_user(email='benchmark@example.com')
+                factory_history(user, datetime.date.today() - datetime.timedelta(days=60), 90)
+                client = Client()
+                client.force_login(user)
+                response = client.get(reverse('home:home'))
+                context = response.context[0].flatten()
+                context['schedule_cache'] = 'benchmark'
+                request = response.wsgi_request
+
+                template = loader.get_template('home.html')
+                source = template.template.source
+                for new, old in LEGACY_TAGS:
+                    source = source.replace(new, old)
+                legacy_template = engines['django'].from_string(source)
+
+                results = {
+                    'precompiled': self.measure(template, context, request, options['repeat']),
+                    'static': self.measure(legacy_template, context, request, options['repeat']),
+                }
+                self.report(results, context)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def measure(self, template, context, request, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            template.render(context, request)
+            timings.append(time.perf_counter() - started)
+        return {
+            'median': statistics.median(timings) * 1000,
+            'p99': sorted(timings)[int(len(timings) * 0.99) - 1] * 1000,
+        }
+
+    def report(self, results, context):
+        cells = sum(len(schedules) for schedules in context['week_day_schedules'].values())
+        self.stdout.write('')
+        self.stdout.write(f'週間カレンダーの画像 {cells}枠 + 今日の部位 {len(context["today_schedules"])}件')
+        self.stdout.write(f"{'画像のURL':<14}{'中央値(ms)':>12}{'p99(ms)':>10}")
+        for name, result in results.items():
+            self.stdout.write(f"{name:<14}{result['median']:>12.3f}{result['p99']:>10.3f}")
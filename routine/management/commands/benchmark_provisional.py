@@ -0,0 +1,92 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from routine.models import PARTS
+from routine.provisional import Provisional
+
+
+def legacy_judge_have_id_data(provisional, pk):
+    """ 以前の judge_have_id_data（削除データ、各データを全て調べます） """
+    if 'all_delete_data' in provisional.delete_data or pk in provisional.delete_data.values():
+        return False
+    for form_data in [provisional.ex_form_data, provisional.update_form_data]:
+        if any(item['pid'] == pk for item in form_data.values()):
+            return False
+    return True
+
+
+def legacy_get_form_data(provisional, week):
+    """ 以前の get_form_data（呼び出すたびに全てのデータを一つの辞書にまとめて調べます） """
+    form_data_dict = {}
+    for form_data in [provisional.ex_form_data, provisional.create_form_data, provisional.update_form_data]:
+        form_data_dict.update(form_data)
+    return [item for item in form_data_dict.values() if week in item['week']]
+
+
+def legacy_delete_form_data(provisional, pk):
+    """ 以前の delete_form_data（選択削除のみ） """
+    delete_data = 'delete_data_' + str(pk)
+    for form_data in [provisional.ex_form_data, provisional.update_form_data]:
+        keys = [k for k, v in form_data.items() if v['pid'] == int(pk)]
+        if keys:
+            provisional.delete_data[delete_data] = form_data.pop(keys[0])['pid']
+            return
+    keys = [k for k, v in provisional.create_form_data.items() if v['pid'] == int(pk)]
+    if keys:
+        del provisional.create_form_data[keys[0]]
+
+
+class Command(BaseCommand):
+    help = (
+        'ルーティン設定の仮データ（Provisional）の件数を増やしながら、週間リスト（week_list）と同じ処理'
+        '（設定済みのデータの判定、曜日ごとの取得、選択削除）の時間を、以前の全て調べる処理と比較します。（DBは使いません）'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[70, 700, 7000], help='仮データの件数')
+
+    def handle(self, *args, **options):
+        results = []
+        for size in options['sizes']:
+            results.append((
+                size,
+                self.measure(size, Provisional.judge_have_id_data, Provisional.get_form_data,
+                             Provisional.delete_form_data),
+                self.measure(size, legacy_judge_have_id_data, legacy_get_form_data, legacy_delete_form_data),
+            ))
+        self.report(results)
+
+    def make_provisional(self, size):
+        """ size件の仮データ（設定済み：新規作成：変更 = 2:1:1）を作成します。 """
+        parts = [part for part, _ in PARTS]
+        provisional = Provisional()
+        for i in range(size):
+            num = i % len(settings.WEEK)
+            form_num = [0, 0, 1, 2][i % 4]
+            key = ['ex_form_data_', 'create_form_data_', 'update_form_data_'][form_num] + str(num) + str(i)
+            provisional.add_form_data({key: {
+                'week': settings.WEEK[num], 'part': parts[i % len(parts)], 'detail_part': None,
+                'pid': i, 'form_num': form_num,
+            }})
+        return provisional
+
+    def measure(self, size, judge_have_id_data, get_form_data, delete_form_data):
+        provisional = self.make_provisional(size)
+        started = time.perf_counter()
+        # 設定済みのルーティンオブジェクトごとの判定と、曜日ごとの取得（week_list）
+        for pk in range(0, size * 2, 2):
+            judge_have_id_data(provisional, pk)
+        for week in settings.WEEK:
+            get_form_data(provisional, week)
+        # 1割のデータの選択削除（routine_delete）
+        for pk in range(0, size, 10):
+            delete_form_data(provisional, pk)
+        return (time.perf_counter() - started) * 1000
+
+    def report(self, results):
+        self.stdout.write('')
+        self.stdout.write(f"{'件数':>8}{'索引(ms)':>12}{'以前(ms)':>12}{'索引(μs/件)':>14}")
+        for size, indexed, legacy in results:
+            self.stdout.write(f'{size:>8}{indexed:>12.2f}{legacy:>12.2f}{indexed * 1000 / size:>14.2f}')
@@ -0,0 +1,66 @@
+import datetime
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from routine.models import BodyPart
+from routine.recurrence import RecurrenceRule, expand_rules, parse_rule
+
+
+class Command(BaseCommand):
+    help = (
+        '繰り返しルールのあるルーティンオブジェクトを1年間の期間で展開する時間を、'
+        '一日ずつ判定した場合と比較します。（DBは使いません）'
+    )
+    # 比較する繰り返しルール（分割法のローテーションなど）
+    rrules = [
+        'FREQ=DAILY;INTERVAL=2',
+        'FREQ=DAILY;INTERVAL=4',
+        'FREQ=DAILY;INTERVAL=3;BYDAY=MO,TU,WE,TH,FR',
+        'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH',
+        'FREQ=WEEKLY;BYDAY=TU,SA',
+        'FREQ=WEEKLY;INTERVAL=3;COUNT=20',
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help='展開する期間の日数')
+        parser.add_argument('--repeat', type=int, default=200, help='計測する回数')
+
+    def handle(self, *args, **options):
+        dtstart = datetime.date.today() - datetime.timedelta(days=100)
+        start = datetime.date.today()
+        end = start + datetime.timedelta(days=options['days'] - 1)
+        days = [start + datetime.timedelta(days=i) for i in range(options['days'])]
+
+        results = {}
+        for rrule in self.rrules:
+            rule = RecurrenceRule.parse(rrule, dtstart)
+            results[rrule] = (
+                self.measure(lambda: list(rule.between(start, end)), options['repeat']),
+                self.measure(lambda: [day for day in days if day in rule], options['repeat']),
+                len(list(rule.between(start, end))),
+            )
+
+        # ScheduleResolverと同じく、全てのルーティンオブジェクトを日付ごとにまとめる時間
+        bp_objects = [
+            BodyPart(pk=i, part='胸', rrule=rrule, rrule_start=dtstart) for i, rrule in enumerate(self.rrules)
+        ]
+        parse_rule.cache_clear()
+        expand = self.measure(lambda: expand_rules(bp_objects, start, end), options['repeat'])
+        self.report(results, expand, options['days'])
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings) * 1000 * 1000
+
+    def report(self, results, expand, days):
+        self.stdout.write('')
+        self.stdout.write(f"{'繰り返しルール':<44}{'日数':>6}{'展開(μs)':>12}{'一日ずつ(μs)':>14}")
+        for rrule, (between, naive, count) in results.items():
+            self.stdout.write(f'{rrule:<44}{count:>6}{between:>12.1f}{naive:>14.1f}')
+        self.stdout.write(f'{len(results)}個のルーティンオブジェクトを{days}日間で日付ごとにまとめる時間: {expand:.1f}μs')
@@ -0,0 +1,146 @@
+import datetime
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from discipline.models import Discipline
+from routine.models import BodyPart
+from routine.testing import factory_history
+from tr_calendar.models import DaySchedule, RoutineOverride
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        '複数年分の合成データをSQLiteのテスト用DBに作成し、ビューごとのクエリ数と応答時間を'
+        'インデックスあり・なしで比較します。'
+    )
+    # インデックスの有無を比較するモデル
+    index_models = [BodyPart, Discipline]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='作成するユーザー数')
+        parser.add_argument('--years', type=int, default=3, help='ユーザーごとの履歴の年数')
+        parser.add_argument('--repeat', type=int, default=20, help='ビューごとのリクエスト回数')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('このコマンドはSQLiteでのみ実行できます。')
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            start_date = datetime.date.today() - datetime.timedelta(days=365 * options['years'])
+            days = 365 * options['years']
+            user = self.seed(options['users'], start_date, days)
+            targets = self.get_targets(user, start_date + datetime.timedelta(days=days // 2))
+
+            with_indexes = self.measure(user, targets, options['repeat'])
+            with self.without_indexes():
+                without_indexes = self.measure(user, targets, options['repeat'])
+            self.report(with_indexes, without_indexes)
+            self.explain(user, targets)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def seed(self, user_count, start_date, days):
+        """ user_count人分の履歴データを作成して、計測に使うユーザーを返します。 """
+        started = time.perf_counter()
+        users = []
+        for i in range(user_count):
+            user = User.objects.create_user(email=f'benchmark{i}@example.com')
+            factory_history(user, start_date, days)
+            users.append(user)
+        self.stdout.write(
+            f'データ作成: ユーザー{user_count}人 部位{BodyPart.objects.count()}件 '
+            f'種目{Discipline.objects.count()}件 ({time.perf_counter() - started:.1f}秒)'
+        )
+        return users[0]
+
+    def get_targets(self, user, date):
+        """ 計測するビューのURLを返します。 dateはスケジュールのある日付に調整します。 """
+        day_schedule = DaySchedule.objects.filter(user=user, date__gte=date).first()
+        date = day_schedule.date
+        ymd = {'year': date.year, 'month': date.month, 'day': date.day}
+        return {
+            'date': date,
+            'body_part': day_schedule.body_part,
+            'urls': [
+                ('home:home', reverse('home:home', kwargs=ymd)),
+                ('tr_calendar:month_with_schedule', reverse(
+                    'tr_calendar:month_with_schedule', kwargs={'year': date.year, 'month': date.month})),
+                ('tr_calendar:day_schedule_detail', reverse(
+                    'tr_calendar:day_schedule_detail', kwargs=dict(ymd, detail=1))),
+                ('discipline:day_schedule_discipline', reverse(
+                    'discipline:day_schedule_discipline', kwargs=dict(ymd, pk=day_schedule.body_part_id))),
+                ('routine:list', reverse('routine:list')),
+            ],
+        }
+
+    def measure(self, user, targets, repeat):
+        """ ビューごとのクエリ数と応答時間（中央値、最大値）を計測します。 """
+        client = Client()
+        client.force_login(user)
+        results = {}
+        for name, url in targets['urls']:
+            client.get(url)  # 初回のみ発生する処理を除くため一度リクエストします
+            timings = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f'{name} が {response.status_code} を返しました。')
+            results[name] = {
+                'queries': len(queries),
+                'median': statistics.median(timings),
+                'max': max(timings),
+            }
+        return results
+
+    @contextmanager
+    def without_indexes(self):
+        """ 計測の間だけ index_models のインデックスを削除します。 """
+        with connection.schema_editor() as editor:
+            for model in self.index_models:
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+        try:
+            yield
+        finally:
+            with connection.schema_editor() as editor:
+                for model in self.index_models:
+                    for index in model._meta.indexes:
+                        editor.add_index(model, index)
+
+    def report(self, with_indexes, without_indexes):
+        self.stdout.write('')
+        self.stdout.write(f"{'ビュー':<36}{'クエリ数':>8}{'なし(ms)':>12}{'あり(ms)':>12}{'最大(ms)':>12}")
+        for name, result in with_indexes.items():
+            self.stdout.write(
+                f"{name:<36}{result['queries']:>8}{without_indexes[name]['median']:>12.2f}"
+                f"{result['median']:>12.2f}{result['max']:>12.2f}"
+            )
+
+    def explain(self, user, targets):
+        """ よく使う条件のクエリプランを表示します。 """
+        date = targets['date']
+        querysets = {
+            'BodyPart(user, date)': BodyPart.objects.filter(user=user, date=date),
+            'BodyPart(user, week)': BodyPart.objects.filter(user=user, week='月曜日'),
+            'RoutineOverride(user, date)': RoutineOverride.objects.filter(user=user, date=date),
+            'Discipline(body_part, date)': Discipline.objects.filter(body_part=targets['body_part'], date=date),
+        }
+        self.stdout.write('')
+        for name, queryset in querysets.items():
+            self.stdout.write(f'{name}: {queryset.explain()}')
@@ -0,0 +1,233 @@
+import datetime
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from routine.testing import factory_perf_users
+from tr_calendar.models import DaySchedule
+
+User = get_user_model()
+
+# 結果に含める応答時間のパーセンタイル
+PERCENTILES = [50, 90, 95, 99]
+
+
+def percentile(timings, p):
+    """ 昇順に並べた応答時間のpパーセンタイル（nearest-rank）を返します。 """
+    return timings[max(math.ceil(len(timings) * p / 100) - 1, 0)]
+
+
+def summarize(timings, errors, elapsed):
+    """ 応答時間（ミリ秒）のリストからスループットと応答時間の統計を返します。 """
+    timings = sorted(timings)
+    summary = {
+        'requests': len(timings),
+        'errors': errors,
+        'throughput': len(timings) / elapsed if elapsed else 0,
+        'mean': sum(timings) / len(timings) if timings else 0,
+    }
+    for p in PERCENTILES:
+        summary[f'p{p}'] = percentile(timings, p) if timings else 0
+    summary['max'] = timings[-1] if timings else 0
+    return summary
+
+
+class Command(BaseCommand):
+    help = (
+        'seed_perf で作成したユーザーでログインし、ホーム、カレンダー、ルーティン、種目、キャラクターの各画面に'
+        '複数のスレッドから同時にリクエストして、URLごとのスループットと応答時間のパーセンタイルをJSONに出力します。'
+        '外部のサービスは使わず、このプロセスの中でWSGIHandlerを呼び出します。'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='ログインするユーザー数')
+        parser.add_argument('--prefix', default='perf', help='seed_perf で作成したユーザーのメールアドレスの先頭')
+        parser.add_argument('--password', default='password', help='seed_perf で作成したユーザーのパスワード')
+        parser.add_argument('--threads', type=int, default=4, help='同時にリクエストするスレッド数')
+        parser.add_argument('--requests', type=int, default=1000, help='全体のリクエスト数')
+        parser.add_argument('--seed', type=int, default=0, help='URLを選ぶ順番の乱数のシード')
+        parser.add_argument('--output', default='load_test.json', help='結果を出力するJSONファイル')
+        parser.add_argument('--label', default='', help='結果に記録する実行の名前')
+        parser.add_argument('--compare', help='比較する以前の結果のJSONファイル')
+        parser.add_argument(
+            '--test-db', action='store_true',
+            help='テスト用のDBを作成し、seed_perf と同じデータ（--users人、--years年分）を作成してから計測します',
+        )
+        parser.add_argument('--years', type=int, default=3, help='--test-db で作成する履歴の年数')
+
+    def handle(self, *args, **options):
+        # RequestFactory、Clientのリクエストのホスト名（testserver）を許可します
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            if options['test_db']:
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    result = self.run_with_test_db(tmpdir, options)
+            else:
+                result = self.run(options)
+
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        self.report(result)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                self.compare(result, json.load(f))
+        self.stdout.write(self.style.SUCCESS(f"{options['output']} に結果を出力しました。"))
+
+    def run_with_test_db(self, tmpdir, options):
+        if connection.vendor == 'sqlite':
+            # メモリ上のDBは他のスレッドの接続から見えないため、ファイルのDBを使います
+            connection.settings_dict['TEST'] = dict(
+                connection.settings_dict.get('TEST') or {}, NAME=os.path.join(tmpdir, 'load_test.sqlite3'))
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            factory_perf_users(
+                options['users'], options['years'], password=options['password'], prefix=options['prefix'],
+            )
+            return self.run(options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, options):
+        sessions = [self.login(i, options) for i in range(options['users'])]
+        rng = random.Random(options['seed'])
+        # ユーザーとURLの組を、URLごとの回数がほぼ同じになるように並べます
+        plan = []
+        while len(plan) < options['requests']:
+            for session in sessions:
+                routes = list(session['routes'])
+                rng.shuffle(routes)
+                plan.extend((session, route) for route in routes)
+        plan = plan[:options['requests']]
+        chunks = [plan[i::options['threads']] for i in range(options['threads'])]
+
+        handler = WSGIHandler()
+        started = time.perf_counter()
+        if options['threads'] == 1:
+            records = self.work(handler, chunks[0])
+        else:
+            with ThreadPoolExecutor(options['threads']) as executor:
+                records = [
+                    record for thread_records in executor.map(lambda chunk: self.work(handler, chunk, True), chunks)
+                    for record in thread_records
+                ]
+        elapsed = time.perf_counter() - started
+
+        timings = defaultdict(list)
+        errors = defaultdict(int)
+        for name, timing, status in records:
+            timings[name].append(timing)
+            if status >= 400:
+                errors[name] += 1
+        return {
+            'label': options['label'],
+            'started_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'users': options['users'],
+            'threads': options['threads'],
+            'elapsed': elapsed,
+            'total': summarize([timing for _, timing, _ in records], sum(errors.values()), elapsed),
+            'routes': {name: summarize(timings[name], errors[name], elapsed) for name in sorted(timings)},
+        }
+
+    def login(self, i, options):
+        """ ログイン画面からログインし、リクエストに使うCookieとURLを返します。 """
+        email = f"{options['prefix']}{i}@example.com"
+        client = Client()
+        response = client.post(reverse('register:login'), {'username': email, 'password': options['password']})
+        if response.status_code != 302:
+            raise CommandError(f'{email} でログインできませんでした。seed_perf でユーザーを作成してください。')
+        user = User.objects.get(email=email)
+        return {'cookies': client.cookies, 'routes': self.get_routes(user)}
+
+    def get_routes(self, user):
+        """ ユーザーのデータに合わせて、リクエストするURLの (名前, URL) のリストを返します。 """
+        today = datetime.date.today()
+        day_schedule = DaySchedule.objects.filter(user=user, date__lte=today).order_by('-date').first()
+        if day_schedule is None:
+            raise CommandError(f'{user.email} のスケジュールがありません。')
+        date = day_schedule.date
+        ymd = {'year': date.year, 'month': date.month, 'day': date.day}
+        month_start = date.replace(day=1)
+        return [
+            ('home:home', reverse('home:home')),
+            ('home:home(date)', reverse('home:home', kwargs=ymd)),
+            ('tr_calendar:month_with_schedule', reverse(
+                'tr_calendar:month_with_schedule', kwargs={'year': date.year, 'month': date.month})),
+            ('tr_calendar:day_schedule_detail', reverse('tr_calendar:day_schedule_detail', kwargs=dict(ymd, detail=1))),
+            ('tr_calendar:day_schedule_create', reverse('tr_calendar:day_schedule_create', kwargs=ymd)),
+            ('tr_calendar:schedules', (
+                f"{reverse('tr_calendar:schedules')}?from={month_start}"
+                f"&to={month_start + datetime.timedelta(days=41)}"
+            )),
+            ('routine:list', reverse('routine:list')),
+            ('routine:term_decision', reverse('routine:term_decision')),
+            ('discipline:day_schedule_discipline', reverse(
+                'discipline:day_schedule_discipline', kwargs=dict(ymd, pk=day_schedule.body_part_id))),
+            ('discipline:training_stats', reverse('discipline:training_stats')),
+            ('discipline:training_stats_json', reverse('discipline:training_stats_json')),
+            ('character:character_selection', reverse('character:character_selection')),
+        ]
+
+    def work(self, handler, plan, close_connections=False):
+        """ planの (セッション, (名前, URL)) の順にリクエストして、(名前, 応答時間(ms), ステータス) のリストを返します。
+
+        gunicornのワーカーと同じく、WSGIHandlerを呼び出してミドルウェアを含めて処理します。
+        """
+        factory = RequestFactory()
+        records = []
+        for session, (name, url) in plan:
+            factory.cookies = session['cookies']
+            status = []
+            started = time.perf_counter()
+            response = handler(factory.get(url).environ, lambda s, headers: status.append(int(s.split()[0])))
+            b''.join(response)
+            response.close()
+            records.append((name, (time.perf_counter() - started) * 1000, status[0]))
+        if close_connections:
+            # スレッドの接続はプールに返すか閉じます
+            connections.close_all()
+        return records
+
+    def report(self, result):
+        self.stdout.write('')
+        self.stdout.write(
+            f"{'URL':<38}{'件数':>6}{'エラー':>6}{'req/s':>9}"
+            + ''.join(f"{f'p{p}(ms)':>10}" for p in PERCENTILES) + f"{'最大(ms)':>10}"
+        )
+        for name, summary in [*result['routes'].items(), ('合計', result['total'])]:
+            self.stdout.write(
+                f"{name:<38}{summary['requests']:>6}{summary['errors']:>6}{summary['throughput']:>9.1f}"
+                + ''.join(f"{summary[f'p{p}']:>10.2f}" for p in PERCENTILES) + f"{summary['max']:>10.2f}"
+            )
+        self.stdout.write(
+            f"スレッド{result['threads']} ユーザー{result['users']}人 {result['elapsed']:.1f}秒 ({result['database']})"
+        )
+
+    def compare(self, result, baseline):
+        """ 以前の結果に対する、URLごとのスループットとp50、p95の比を表示します。 """
+        self.stdout.write('')
+        self.stdout.write(f"以前の結果（{baseline.get('label') or baseline['started_at']}）との比較")
+        self.stdout.write(f"{'URL':<38}{'req/s':>10}{'p50':>10}{'p95':>10}")
+        for name, summary in [*result['routes'].items(), ('合計', result['total'])]:
+            base = baseline['total'] if name == '合計' else baseline['routes'].get(name)
+            if not base:
+                continue
+            ratios = [
+                summary[key] / base[key] if base[key] else 0 for key in ['throughput', 'p50', 'p95']
+            ]
+            self.stdout.write(f'{name:<38}' + ''.join(f'{ratio:>9.2f}x' for ratio in ratios))
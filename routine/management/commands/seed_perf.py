@@ -0,0 +1,49 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from routine.testing import factory_perf_users
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        '負荷試験用に複数年分のルーティン、ルーティンの変更、種目の履歴を持つユーザーをまとめて作成します。'
+        'ユーザーのメールアドレスは {prefix}{番号}@example.com です。（load_test でログインに使います）'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='作成するユーザー数')
+        parser.add_argument('--years', type=int, default=3, help='ユーザーごとの履歴の年数')
+        parser.add_argument('--seed', type=int, default=0, help='乱数のシード（同じシードなら同じデータを作成します）')
+        parser.add_argument('--password', default='password', help='作成するユーザーのパスワード')
+        parser.add_argument('--prefix', default='perf', help='作成するユーザーのメールアドレスの先頭')
+        parser.add_argument('--clear', action='store_true', help='以前に作成した同じprefixのユーザーを削除してから作成します')
+
+    def handle(self, *args, **options):
+        existing = User.objects.filter(
+            email__regex=rf"^{options['prefix']}[0-9]+@example\.com$",
+        )
+        if existing.exists():
+            if not options['clear']:
+                raise CommandError(
+                    f"{options['prefix']}で始まるユーザーが既にあります。--clear で削除してから作成してください。"
+                )
+            self.stdout.write(f'{existing.count()}人のユーザーを削除します。')
+            existing.delete()
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            stats = factory_perf_users(
+                options['users'], options['years'], seed=options['seed'],
+                password=options['password'], prefix=options['prefix'],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"ユーザー{stats['users']}人 ルーティン期間{stats['terms']}件 部位{stats['body_parts']}件 "
+            f"ルーティンの変更{stats['overrides']}件 スケジュール{stats['day_schedules']}件 "
+            f"種目{stats['disciplines']}件 セット{stats['sets']}件を作成しました。"
+            f"（{time.perf_counter() - started:.1f}秒）"
+        ))
@@ -1,29 +1,41 @@
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject, empty
+
 from .provisional import Provisional
 
 
+def get_provisional(request):
+    """ セッションに'provisional'(ルーティンの設定値)があればそれを取り出し、なければ新規インスタンス化します。 """
+    provisional_items = request.session.get('provisional')
+    if provisional_items:
+        return Provisional.from_session(provisional_items)
+    return Provisional()
+
+
 class ProvisionalMiddleware:
     """
     リクエストとレスポンス前後の処理になります。
 
+    settings.PROVISIONAL_NAMESPACES の名前空間のビューのみ request.provisional を設定します。
+    request.provisional は最初にアクセスしたときにセッションから取り出すため、アクセスしなければセッションを読み込みません。
     編集がなされていれば（edited=True）セッションにルーティンの設定値を入れます。
     """
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        provisional_items = request.session.get('provisional')
-        if provisional_items:  # セッションに'provisional'(ルーティンの設定値)があればそれを取り出す
-            provisional = Provisional.from_json(provisional_items)
-        else:  # なければ新規インスタンス化
-            provisional = Provisional()
-        # viewで処理される前の処理
-        request.provisional = provisional
         # リクエストに対してレスポンスを返す処理（viewでの処理）
         response = self.get_response(request)
         # レスポンス後の処理
-        # provisional.pyがTrueであれば（ルーティン設定で何かしらの処理を行っていれば）
+        # request.provisionalを取り出していて、編集があれば（ルーティン設定で何かしらの処理を行っていれば）
         # セッション'provisional'にルーティンの設定値を格納
-        if request.provisional.edited:
-            request.session['provisional'] = request.provisional.as_json()
+        provisional = getattr(request, 'provisional', None)
+        if provisional is not None and provisional._wrapped is not empty and provisional.edited:
+            request.session['provisional'] = provisional.encode()
 
         return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # viewで処理される前の処理
+        if request.resolver_match.namespace in settings.PROVISIONAL_NAMESPACES:
+            request.provisional = SimpleLazyObject(lambda: get_provisional(request))
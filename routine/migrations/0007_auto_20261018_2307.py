@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routine', '0006_auto_20201118_1236'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bodypart',
+            index=models.Index(fields=['user', 'date'], name='bodypart_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bodypart',
+            index=models.Index(fields=['user', 'week'], name='bodypart_user_week_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bodypart',
+            index=models.Index(fields=['user', 'part', 'date'], name='bodypart_user_part_date_idx'),
+        ),
+    ]
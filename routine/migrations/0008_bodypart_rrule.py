@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routine', '0007_auto_20261018_2307'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bodypart',
+            name='rrule',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='繰り返しルール'),
+        ),
+        migrations.AddField(
+            model_name='bodypart',
+            name='rrule_start',
+            field=models.DateField(blank=True, null=True, verbose_name='繰り返しの起点'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('routine', '0008_bodypart_rrule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bodypart',
+            name='term',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='routine.termdecision', verbose_name='ルーティン期間'),
+        ),
+        migrations.AlterField(
+            model_name='termdecision',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
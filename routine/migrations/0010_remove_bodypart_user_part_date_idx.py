@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:09
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routine', '0009_multiple_terms'),
+        # partがNoneの日付指定オブジェクトをルーティンの変更にまとめた後に削除します
+        ('tr_calendar', '0003_compact_placeholders'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bodypart',
+            name='bodypart_user_part_date_idx',
+        ),
+    ]
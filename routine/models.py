@@ -1,6 +1,11 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.conf import settings
 
+from .images import get_image_path
+from .recurrence import parse_rule
+from .terms import TermIndex
+
 PARTS = (
     ('胸', '胸'), ('背中', '背中'), ('肩', '肩'),
     ('腕', '腕'), ('脚', '脚'), ('腹', '腹'),
@@ -12,10 +17,55 @@ def check_part(value):
     return value
 
 
+def get_image_url(part, detail_part=None):
+    """ 部位、部位詳細から画像ファイルのｕｒｌを取得します。（routine.images の対応表から取得します） """
+    return get_image_path(part, detail_part)
+
+
+# ルーティンオブジェクト（曜日、または繰り返しルールで設定される部位オブジェクト）を取得するための条件
+ROUTINE_QUERY = models.Q(week__isnull=False) | models.Q(rrule__isnull=False)
+
+
+class TermDecisionQuerySet(models.QuerySet):
+    def index(self):
+        """ ルーティン期間を一回のクエリで取得して、日付から検索するためのインデックス（routine.terms.TermIndex）を返します。
+
+        例： TermDecision.objects.filter(user=user).index().get_term(date)
+        """
+        return TermIndex(self)
+
+    def current(self, date=None):
+        """ dateの日付（省略すると今日）のルーティン期間を返します。（TermIndex.get_current）
+
+        ルーティン期間がなければ TermDecision.DoesNotExist を送出します。
+        """
+        term = self.index().get_current(date)
+        if term is None:
+            raise self.model.DoesNotExist('ルーティン期間がありません')
+        return term
+
+
 class TermDecision(models.Model):
+    """ ルーティン期間です。ユーザーごとに重ならない期間を複数設定できます。 """
     start_date = models.DateField('開始時期', null=True, blank=True)
     end_date = models.DateField('終了時期', null=True, blank=True)
-    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+
+    objects = TermDecisionQuerySet.as_manager()
+
+    def clean(self):
+        """ 開始時期が終了時期より後でないことと、同じユーザーの他のルーティン期間と重ならないことを検証します。 """
+        if self.start_date is None or self.end_date is None:
+            return
+        if self.start_date > self.end_date:
+            raise ValidationError('終了時期は開始時期以降を指定してください')
+        if self.user_id is None:
+            return
+        overlaps = TermDecision.objects.filter(
+            user=self.user_id, start_date__lte=self.end_date, end_date__gte=self.start_date,
+        ).exclude(pk=self.pk)
+        if overlaps.exists():
+            raise ValidationError('他のルーティン期間と重なっています')
 
     def judge_term_date(self, date):
         """ dateの日付の指定部位（self.part）に種目が設定されているかを判定します。 """
@@ -47,25 +97,54 @@ class BodyPart(models.Model):
         blank=True,
         null=True,
         default=0,)
+    # 曜日以外で繰り返すルーティンオブジェクトの繰り返しルール（RRULEの形式）と、繰り返しの起点となる日付
+    # 例： 'FREQ=DAILY;INTERVAL=4'（4日ごと）、'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH'（隔週の月曜日と木曜日）
+    rrule = models.CharField('繰り返しルール', max_length=200, null=True, blank=True)
+    rrule_start = models.DateField('繰り返しの起点', null=True, blank=True)
+    # ルーティンオブジェクトを設定するルーティン期間。Noneの場合は全てのルーティン期間に設定します。
+    term = models.ForeignKey(
+        TermDecision, verbose_name='ルーティン期間', on_delete=models.CASCADE, null=True, blank=True,
+    )
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # 日付指定オブジェクトの取得（カレンダー、日付ごとの部位一覧）
+            models.Index(fields=['user', 'date'], name='bodypart_user_date_idx'),
+            # ルーティンオブジェクトの取得
+            models.Index(fields=['user', 'week'], name='bodypart_user_week_idx'),
+        ]
+
     def __str__(self):
         if self.part:
             return self.part
         else:
             return 'None'
 
+    def clean(self):
+        """ 繰り返しルールがある場合は、起点の日付があり、曜日・日付を指定していないことと、ルールの形式を検証します。 """
+        if not self.rrule:
+            self.rrule = None
+            return
+        if self.week or self.date:
+            raise ValidationError('繰り返しルールを指定する場合は曜日、日付を指定できません')
+        if self.rrule_start is None:
+            raise ValidationError({'rrule_start': '繰り返しの起点を指定してください'})
+        try:
+            parse_rule(self.rrule, self.rrule_start)
+        except ValueError as e:
+            raise ValidationError({'rrule': str(e)})
+
+    def get_recurrence(self):
+        """ 繰り返しルール（routine.recurrence.RecurrenceRule）を返します。なければNoneを返します。 """
+        if self.rrule is None:
+            return None
+        return parse_rule(self.rrule, self.rrule_start)
+
     def get_image_url(self):
         """ 画像ファイルのｕｒｌを作成して取得します。 """
-        part = self.part
-        detail_part = self.detail_part
-        if detail_part:
-            file_name = settings.IMAGES[part + detail_part]
-        else:
-            file_name = settings.IMAGES[part]
-        image = f"media/{file_name}.png"
-        return image
+        return get_image_url(self.part, self.detail_part)
 
     def judge_discipline(self, date):
         """ dateの日付の指定部位（self.part）に種目が設定されているかを判定します。 """
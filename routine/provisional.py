@@ -1,12 +1,120 @@
+from collections import defaultdict
+
 from django.conf import settings
 
+# 各データのキーの左部分の文字部です。インデックス番号がform_numになります。
+FORM_KEYS = ['ex_form_data_', 'create_form_data_', 'update_form_data_']
+# セッションに保存する形式のバージョンです。形式を変更した場合は値を上げて、decodeで古い形式を変換します。
+VERSION = 2
+
+
+class ProvisionalData:
+    """ セッションの値のデコードを、データに初めてアクセスするまで遅らせるためのディスクリプタです。 """
+    def __set_name__(self, owner, name):
+        self.name = '_' + name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        instance.decode()
+        return instance.__dict__[self.name]
+
+    def __set__(self, instance, value):
+        instance.decode()
+        instance.__dict__[self.name] = value
+
+
+class FormData(dict):
+    """ 各データ（ex_form_data など）の辞書です。
+
+    通常の辞書と同じように使えますが、値を追加・削除するたびに曜日ごと、pidごとの索引を更新し、
+    曜日のデータの取得（get_week）とpidの検索（get_key、has_pid）を、全てのデータを調べずに行います。
+
+    self.weeks
+        {'月曜日': {キー: データ, ...}, ...}  曜日ごとのデータ（追加した順）
+    self.pids
+        {pid: {キー: None, ...}, ...}  pidごとのキー（追加した順）
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.weeks = defaultdict(dict)
+        self.pids = defaultdict(dict)
+        self.update(*args, **kwargs)
+
+    def __setitem__(self, key, item):
+        old = self.get(key)
+        if old is not None and (old['week'], old['pid']) != (item['week'], item['pid']):
+            self._unindex(key, old)
+            old = None
+        super().__setitem__(key, item)
+        # 曜日、pidが同じ場合は索引の順番を変えずに値だけを変更します
+        self.weeks[item['week']][key] = item
+        if old is None:
+            self.pids[item['pid']][key] = None
+
+    def __delitem__(self, key):
+        self._unindex(key, self[key])
+        super().__delitem__(key)
+
+    def _unindex(self, key, item):
+        for index, value in [(self.weeks, item['week']), (self.pids, item['pid'])]:
+            del index[value][key]
+            if not index[value]:
+                del index[value]
+
+    def pop(self, key, *default):
+        if key not in self:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        item = self[key]
+        del self[key]
+        return item
+
+    def popitem(self):
+        key = next(reversed(self))
+        return key, self.pop(key)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, item in dict(*args, **kwargs).items():
+            self[key] = item
+
+    def clear(self):
+        super().clear()
+        self.weeks.clear()
+        self.pids.clear()
+
+    def get_week(self, week):
+        """ 指定の曜日のデータをリストで返します。 """
+        return list(self.weeks.get(week, {}).values())
+
+    def has_pid(self, pid):
+        return pid in self.pids
+
+    def get_key(self, pid):
+        """ 指定のpidを持つデータのキーを返します。（複数ある場合は最初に追加したもの） なければNoneを返します。 """
+        keys = self.pids.get(pid)
+        return next(iter(keys)) if keys else None
+
 
 class Provisional:
+    ex_form_data = ProvisionalData()
+    create_form_data = ProvisionalData()
+    update_form_data = ProvisionalData()
+    delete_data = ProvisionalData()
+    term_form_data = ProvisionalData()
+
     def __init__(self, ex=None, create=None, update=None, delete=None, term=None):
         """ ルーティン設定において決定する前に仮としてセッションに値を保存するための処理になります。
 
 
-        各変数のキーについて　
+        各変数のキーについて
 
         ・左部分の文字部
 
@@ -15,7 +123,7 @@ class Provisional:
         self.create_form_data
             create_form_data_ :　新規作成したデータを表します。
         self.update_form_data
-            update_form_data_ :　変更したex_form_dataまたはupdate_form_dataのデータを表します。　
+            update_form_data_ :　変更したex_form_dataまたはupdate_form_dataのデータを表します。
         self.delete_data
             delete_data :　削除するデータを表します。
             all_delete_data :　削除する全てのデータを表します。
@@ -28,52 +136,114 @@ class Provisional:
 
         例：
     　　  ex_form_data_015　→　これはすでに設定済みでidが15、weekが'月曜日'のbody_partオブジェクトを抽出したもの
+
+        セッションにはこの形ではなく、encodeで曜日ごとにまとめた形で保存します。
         """
-        self.ex_form_data = ex or {}
-        self.create_form_data = create or {}
-        self.update_form_data = update or {}
+        self.encoded = None  # まだデコードしていないセッションの値
+        self.ex_form_data = FormData(ex or {})
+        self.create_form_data = FormData(create or {})
+        self.update_form_data = FormData(update or {})
         self.delete_data = delete or {}
         self.term_form_data = term or {}
         self.edited = False  # インスタンス化後に編集があったかのフラグ。セッションに保存するかどうかの判定に使う
 
-    def as_json(self):
-        ret = {}
-        if self.ex_form_data:
-            ret.update(self.ex_form_data)
-        if self.create_form_data:
-            ret.update(self.create_form_data)
-        if self.update_form_data:
-            ret.update(self.update_form_data)
-        if self.delete_data:
-            ret.update(self.delete_data)
-        if self.term_form_data:
-            ret.update(self.term_form_data)
-        return ret
-
     @classmethod
-    def from_json(cls, data):
-        """セッションからルーティン設定値を取り出してクラス変数に格納したものをインスタンス化
+    def from_session(cls, data):
+        """ セッションからルーティン設定値を取り出したものをインスタンス化
 
         dataはセッション'provisional'の値が入ります。
+        デコードはいずれかのデータに初めてアクセスしたときに行うため、ルーティン設定以外のリクエストでは行いません。
+        """
+        provisional = cls()
+        provisional.encoded = data
+        return provisional
+
+    def encode(self):
+        """ セッションに保存する値を返します。
+
+        曜日ごとのリストにデータを [form_num, pid, part, detail_part] の形で格納します。
+        weekやimageはそれぞれ曜日の位置、part、detail_partから求められるため保存しません。
+        detail_partがない場合は省略します。
+
+        例：
+          {'v': 2,
+           'w': [[[0, 15, '胸', '上部'], [1, 0, '背中']], [], [], [], [], [], []],  # 月曜日～日曜日
+           'd': [16],  # 削除するid
+           'a': 1,  # 全て削除する場合のみ
+           't': ['2020-09-01', '2020-12-01']}  # ルーティン期間
+        """
+        ret = {'v': VERSION}
+        weeks = [[] for _ in settings.WEEK]
+        for form_num, form_data in enumerate([self.ex_form_data, self.create_form_data, self.update_form_data]):
+            for item in form_data.values():
+                data = [form_num, item['pid'], item['part']]
+                if item['detail_part']:
+                    data.append(item['detail_part'])
+                weeks[settings.WEEK.index(item['week'])].append(data)
+        if any(weeks):
+            ret['w'] = weeks
+        delete_pks = [pk for key, pk in self.delete_data.items() if key != 'all_delete_data']
+        if delete_pks:
+            ret['d'] = delete_pks
+        if 'all_delete_data' in self.delete_data:
+            ret['a'] = 1
+        if self.term_form_data:
+            term = self.term_form_data['term_form_data']
+            ret['t'] = [term['start_date'], term['end_date']]
+        return ret
+
+    def decode(self):
+        """ まだデコードしていないセッションの値があれば各データに格納します。 """
+        if self.encoded is None:
+            return
+        data, self.encoded = self.encoded, None
+        if data.get('v') == VERSION:
+            self.decode_data(data)
+        else:
+            self.decode_legacy_data(data)
+
+    def decode_data(self, data):
+        """ encodeで保存した値を各データに格納します。 """
+        form_data_list = [self.ex_form_data, self.create_form_data, self.update_form_data]
+        for num, week_data in enumerate(data.get('w', [])):
+            for form_num, pid, part, *detail_part in week_data:
+                detail_part = detail_part[0] if detail_part else None
+                form_data_list[form_num][FORM_KEYS[form_num] + str(num) + str(pid)] = {
+                    'week': settings.WEEK[num],
+                    'part': part,
+                    'detail_part': detail_part,
+                    'pid': pid,
+                    'form_num': form_num,
+                }
+        for pk in data.get('d', []):
+            self.delete_data['delete_data_' + str(pk)] = pk
+        if data.get('a'):
+            self.delete_data['all_delete_data'] = 'all'
+        if 't' in data:
+            start_date, end_date = data['t']
+            self.term_form_data['term_form_data'] = {'start_date': start_date, 'end_date': end_date}
+
+    def decode_legacy_data(self, data):
+        """ 以前の形式（各データのキーをそのまま一つの辞書にまとめたもの）の値を各データに格納します。
+
+        次のレスポンスで新しい形式で保存し直すため、編集があったものとします。
         """
-        ex_items = None or {}
-        create_items = None or {}
-        update_items = None or {}
-        delete_items = None or {}
-        term_items = None or {}
+        from .forms import TermDecisionForm
 
+        form_data_list = [self.ex_form_data, self.create_form_data, self.update_form_data]
         for key, item in data.items():
-            if 'ex' in key:
-                ex_items[key] = item
-            if 'create' in key:
-                create_items[key] = item
-            if 'update' in key:
-                update_items[key] = item
-            if 'delete' in key:
-                delete_items[key] = item
-            if 'term' in key:
-                term_items[key] = item
-        return cls(ex_items, create_items, update_items, delete_items, term_items)
+            for form_num, form_key in enumerate(FORM_KEYS):
+                if key.startswith(form_key):
+                    form_data_list[form_num][key] = item
+            if key.startswith('delete_data_') or key == 'all_delete_data':
+                self.delete_data[key] = item
+            if key == 'term_form_data':
+                # QueryDictのまま保存されていた場合は値がリストになっています。
+                term = {k: v[-1] if isinstance(v, list) else v for k, v in item.items()}
+                form = TermDecisionForm(term)
+                if form.is_valid():
+                    self.term_form_data['term_form_data'] = self.arrange_term_form_data(form)
+        self.edited = True
 
     def add_form_data(self, form_data):
         """ 仮の部位情報、ルーティン期間を追加する
@@ -85,59 +255,58 @@ class Provisional:
          　'image2': ex_data.image.url,
          　'pid': 15}
          ※'pid'の値は　ex_form_dataとupdate_form_data（既に設定済みまたは変更データ）であればDBに登録されている部位オブジェクトのｉｄの値になります。
-         ※create_form_data（新規作成データ）であればその曜日の何個目のデータ（実際には-1した値）かを表す値になります。　
+         ※create_form_data（新規作成データ）であればその曜日の何個目のデータ（実際には-1した値）かを表す値になります。
          ※例　1個目ならpidの値は0
         """
         self.edited = True
 
-        if 'ex' in list(form_data.keys())[0]:
+        key = list(form_data.keys())[0]
+        if key.startswith('ex_form_data_'):
             self.ex_form_data.update(form_data)
-        if 'create' in list(form_data.keys())[0]:
+        if key.startswith('create_form_data_'):
             self.create_form_data.update(form_data)
-        if 'update' in list(form_data.keys())[0]:
+        if key.startswith('update_form_data_'):
             self.update_form_data.update(form_data)
-        if 'term' in list(form_data.keys())[0]:
+        if key == 'term_form_data':
             self.term_form_data.update(form_data)
 
     def judge_have_id_data(self, pk):
         """ 指定のID(pk)を持つデータがあるかどうかを判定
 
-        指定のIDを持つデータとは元が既にＤＢに設定済みの　ex_form_data、　
-        またはそれを変更した　update_form_data、　
-        またはそれを削除した　delete_data　
+        指定のIDを持つデータとは元が既にＤＢに設定済みの　ex_form_data、
+        またはそれを変更した　update_form_data、
+        またはそれを削除した　delete_data
         となります。
 
         これらが一つでもなければ　True　、　あればＦａｌｓｅ　を返します
+        削除データのキー、各データの索引から判定するため、データの数によらず一定の時間で判定します。
         """
+        if 'all_delete_data' in self.delete_data or 'delete_data_' + str(pk) in self.delete_data:
+            return False
+        return not (self.ex_form_data.has_pid(pk) or self.update_form_data.has_pid(pk))
 
-        judge_data = {}
-        judge_data.update(self.ex_form_data)
-        judge_data.update(self.update_form_data)
-        judge_data.update(self.delete_data)
-        for key in judge_data.keys():
-            if str(pk) in key or 'all_delete_data' in key:
-                return False
-        return True
-
-    def get_form_data_dict(self):
-        """ 各データを辞書に格納して返します """
-        form_data_dict = {}
-        form_data_dict.update(self.ex_form_data)
-        form_data_dict.update(self.create_form_data)
-        form_data_dict.update(self.update_form_data)
-
-        return form_data_dict
+    def get_form_data_item(self, key):
+        """ キー（例 'ex_form_data_015'）のデータを返します。なければ KeyError を送出します。 """
+        for form_key, form_data in zip(FORM_KEYS, [self.ex_form_data, self.create_form_data, self.update_form_data]):
+            if key.startswith(form_key):
+                return form_data[key]
+        raise KeyError(key)
 
     def get_form_data(self, week):
-        """ 指定の曜日の各データをリストに格納して返します """
+        """ 指定の曜日の各データをリストに格納して返します
 
-        form_data_dict = self.get_form_data_dict()
-        return [item for key, item in form_data_dict.items() if week in item['week']]
+        各データの曜日ごとの索引から取得するため、他の曜日のデータは調べません。
+        """
+        return (
+            self.ex_form_data.get_week(week)
+            + self.create_form_data.get_week(week)
+            + self.update_form_data.get_week(week)
+        )
 
     def delete_form_data(self, pk='all'):
         """ データを削除します
 
-        　すべて削除の場合：　
+        　すべて削除の場合：
 
          変更前のデータ,既に設定済みのデータはＤＢに存在するため、決定後にＤＢから削除します。
          そのために　self.delete_data　に　全削除を表す　'all'　を一時保存します。
@@ -157,37 +326,43 @@ class Provisional:
             self.update_form_data.clear()
             self.create_form_data.clear()
         else:
+            pk = int(pk)
             delete_data = 'delete_data_' + str(pk)
-            delete_ex_form_data = [k for k, v in self.ex_form_data.items() if v['pid'] == int(pk)]
-            delete_update_form_data = [k for k, v in self.update_form_data.items() if v['pid'] == int(pk)]
-            delete_create_form_data = [k for k, v in self.create_form_data.items() if v['pid'] == int(pk)]
+            delete_ex_form_data = self.ex_form_data.get_key(pk)
+            delete_update_form_data = self.update_form_data.get_key(pk)
+            delete_create_form_data = self.create_form_data.get_key(pk)
 
             if delete_ex_form_data:
-                data = self.ex_form_data.pop(delete_ex_form_data[0])
+                data = self.ex_form_data.pop(delete_ex_form_data)
                 self.delete_data[delete_data] = data['pid']
             elif delete_update_form_data:
-                data = self.update_form_data.pop(delete_update_form_data[0])
+                data = self.update_form_data.pop(delete_update_form_data)
                 self.delete_data[delete_data] = data['pid']
             elif delete_create_form_data:
-                del self.create_form_data[delete_create_form_data[0]]
+                del self.create_form_data[delete_create_form_data]
 
     def arrange_form_data(self, form, pk, form_num=1):
         """ ヴァリデーションした form_data を 整えます　"""
         week = form.cleaned_data['week']
         part = form.cleaned_data['part']
         detail_part = form.cleaned_data['detail_part']
-        if detail_part:
-            file_name = settings.IMAGES[part + detail_part]
-        else:
-            file_name = settings.IMAGES[part]
-        image = f"media/{file_name}.png"
 
         return {
             'week': week,
             'part': part,
             'detail_part': detail_part,
-            'image': image,
             'pid': pk,
             'form_num': form_num,
         }
 
+    def arrange_term_form_data(self, form):
+        """ ヴァリデーションしたルーティン期間の form_data を 整えます
+
+        TermDecisionFormにそのまま渡せるように、日付は'2020-09-01'の形の文字列にします。
+        """
+        start_date = form.cleaned_data['start_date']
+        end_date = form.cleaned_data['end_date']
+        return {
+            'start_date': start_date.isoformat() if start_date else None,
+            'end_date': end_date.isoformat() if end_date else None,
+        }
@@ -0,0 +1,179 @@
+import datetime
+import functools
+import itertools
+from collections import defaultdict
+
+# 対応しているRRULEの繰り返しの単位と曜日（月曜日から）
+FREQUENCIES = ('DAILY', 'WEEKLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+
+class RecurrenceRule:
+    def __init__(self, freq, dtstart, interval=1, byweekday=None, count=None, until=None):
+        """ RRULE（RFC 5545）の一部に対応した、日付の繰り返しルールです。
+
+        freq
+            'DAILY'（interval日ごと）または 'WEEKLY'（interval週ごと）
+        dtstart
+            繰り返しの起点となる日付。最初の日付になり、intervalの数え始めにもなります。
+        byweekday
+            繰り返す曜日（0が月曜日）のリスト。WEEKLYでは省略するとdtstartの曜日になり、DAILYでは曜日で絞り込みます。
+        count, until
+            繰り返す回数、または最後の日付。どちらも省略すると終わりなく繰り返します。
+
+        例： RecurrenceRule('DAILY', dtstart, interval=4)  4日ごと
+             RecurrenceRule('WEEKLY', dtstart, interval=2, byweekday=[0, 3])  隔週の月曜日と木曜日
+
+        日付は保存せず、between で指定した期間の日付だけを計算します。
+        """
+        if freq not in FREQUENCIES:
+            raise ValueError(f'FREQ は {", ".join(FREQUENCIES)} のいずれかを指定してください')
+        if interval < 1:
+            raise ValueError('INTERVAL は1以上を指定してください')
+        if count is not None and until is not None:
+            raise ValueError('COUNT と UNTIL は同時に指定できません')
+        if count is not None and count < 1:
+            raise ValueError('COUNT は1以上を指定してください')
+        if until is not None and until < dtstart:
+            raise ValueError('UNTIL は起点の日付以降を指定してください')
+        if byweekday is not None and not set(byweekday) <= set(range(7)):
+            raise ValueError('BYDAY が正しくありません')
+
+        self.freq = freq
+        self.dtstart = dtstart
+        self.interval = interval
+        self.count = count
+        if byweekday:
+            self.byweekday = tuple(sorted(set(byweekday)))
+        elif freq == 'WEEKLY':
+            self.byweekday = (dtstart.weekday(),)
+        else:
+            self.byweekday = None
+        # 週の始め（月曜日）から繰り返す曜日までの日数
+        self._weekday_offsets = [datetime.timedelta(days=weekday) for weekday in self.byweekday or ()]
+        self._week_start = dtstart - datetime.timedelta(days=dtstart.weekday())
+
+        self.until = until
+        if count is not None:
+            # 回数の指定は最後の日付に置き換えて、期間の途中から計算する場合に数え直さないようにします。
+            occurrences = itertools.islice(self._between(dtstart, datetime.date.max), count - 1, None)
+            self.until = next(occurrences, None)
+            if self.until is None:
+                raise ValueError('繰り返しの日付がありません')
+
+    @classmethod
+    def parse(cls, rrule, dtstart):
+        """ 'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH' のようなRRULEの文字列から作成します。
+
+        FREQ、INTERVAL、BYDAY、COUNT、UNTIL（'20201130'の形）に対応しています。正しくない場合は ValueError を送出します。
+        """
+        params = {}
+        rrule = rrule.strip().upper()
+        if rrule.startswith('RRULE:'):
+            rrule = rrule[len('RRULE:'):]
+        for item in filter(None, rrule.split(';')):
+            key, sep, value = item.partition('=')
+            if not sep or not value or key in params:
+                raise ValueError(f'RRULEの形式が正しくありません: {item}')
+            params[key] = value
+        unknown = set(params) - {'FREQ', 'INTERVAL', 'BYDAY', 'COUNT', 'UNTIL'}
+        if unknown:
+            raise ValueError(f'対応していない項目です: {", ".join(sorted(unknown))}')
+        if 'FREQ' not in params:
+            raise ValueError('FREQ を指定してください')
+
+        byweekday = None
+        if 'BYDAY' in params:
+            days = params['BYDAY'].split(',')
+            if not set(days) <= set(WEEKDAYS):
+                raise ValueError(f'BYDAY が正しくありません: {params["BYDAY"]}')
+            byweekday = [WEEKDAYS.index(day) for day in days]
+        try:
+            interval = int(params.get('INTERVAL', 1))
+            count = int(params['COUNT']) if 'COUNT' in params else None
+            until = datetime.datetime.strptime(params['UNTIL'][:8], '%Y%m%d').date() if 'UNTIL' in params else None
+        except ValueError:
+            raise ValueError(f'RRULEの形式が正しくありません: {rrule}')
+        return cls(params['FREQ'], dtstart, interval=interval, byweekday=byweekday, count=count, until=until)
+
+    def __str__(self):
+        """ RRULEの文字列を返します。（parse の逆です） """
+        items = [f'FREQ={self.freq}']
+        if self.interval != 1:
+            items.append(f'INTERVAL={self.interval}')
+        if self.byweekday is not None and (self.freq != 'WEEKLY' or self.byweekday != (self.dtstart.weekday(),)):
+            items.append('BYDAY=' + ','.join(WEEKDAYS[weekday] for weekday in self.byweekday))
+        if self.count is not None:
+            items.append(f'COUNT={self.count}')
+        elif self.until is not None:
+            items.append(f'UNTIL={self.until:%Y%m%d}')
+        return ';'.join(items)
+
+    def __contains__(self, day):
+        """ dayの日付が繰り返しの日付かを判定します。 """
+        if day < self.dtstart or (self.until is not None and day > self.until):
+            return False
+        if self.byweekday is not None and day.weekday() not in self.byweekday:
+            return False
+        if self.freq == 'DAILY':
+            return (day - self.dtstart).days % self.interval == 0
+        return (day - self._week_start).days // 7 % self.interval == 0
+
+    def between(self, start, end):
+        """ start～end の繰り返しの日付を順番に返すジェネレータです。
+
+        期間の最初の日付は起点からの日数で計算するため、期間の長さと繰り返しの回数にのみ比例して計算します。
+        """
+        start = max(start, self.dtstart)
+        if self.until is not None:
+            end = min(end, self.until)
+        if start > end:
+            return iter(())
+        return self._between(start, end)
+
+    def _between(self, start, end):
+        if self.freq == 'DAILY':
+            # 起点からinterval日ごとの日付のうち、start以降の最初の日付から始めます
+            intervals = -(-(start - self.dtstart).days // self.interval)
+            day = self.dtstart + datetime.timedelta(days=intervals * self.interval)
+            step = datetime.timedelta(days=self.interval)
+            while day <= end:
+                if self.byweekday is None or day.weekday() in self.byweekday:
+                    yield day
+                if end - day < step:
+                    return
+                day += step
+        else:
+            # startを含む週（繰り返さない週の場合はその前の繰り返す週）の月曜日から始めます
+            weeks = (start - self._week_start).days // 7
+            monday = self._week_start + datetime.timedelta(weeks=weeks - weeks % self.interval)
+            step = datetime.timedelta(weeks=self.interval)
+            while monday <= end:
+                for offset in self._weekday_offsets:
+                    day = monday + offset
+                    if day > end:
+                        return
+                    if day >= start:
+                        yield day
+                if end - monday < step:
+                    return
+                monday += step
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_rule(rrule, dtstart):
+    """ RecurrenceRule.parse の結果をキャッシュして返します。（同じルールを何度も解析しないように） """
+    return RecurrenceRule.parse(rrule, dtstart)
+
+
+def expand_rules(bp_objects, start, end):
+    """ 繰り返しルールのある部位オブジェクトを start～end の日付ごとにまとめて返します。
+
+    例： {2020/11/02: [部位オブジェクト, ...], 2020/11/06: [...], ...}
+    日付ごとの部位オブジェクトは bp_objects と同じ順番になります。
+    """
+    day_objects = defaultdict(list)
+    for bp_object in bp_objects:
+        for day in parse_rule(bp_object.rrule, bp_object.rrule_start).between(start, end):
+            day_objects[day].append(bp_object)
+    return day_objects
@@ -0,0 +1,17 @@
+from django import template
+
+from ..images import get_image_static_url
+
+register = template.Library()
+
+
+@register.filter
+def image_url(body_part):
+    """ 部位オブジェクト（または part、detail_part を持つ辞書）の画像のURLを返します。
+
+    起動時に作成した対応表から取得するため、{% static body_part.get_image_url %} と違い、表示するたびにURLを作成しません。
+    例： <img src="{{ body_part|image_url }}">
+    """
+    if isinstance(body_part, dict):
+        return get_image_static_url(body_part['part'], body_part.get('detail_part'))
+    return get_image_static_url(body_part.part, body_part.detail_part)
@@ -0,0 +1,51 @@
+import bisect
+import datetime
+
+
+class TermIndex:
+    def __init__(self, terms):
+        """ ユーザーのルーティン期間を開始日の順に並べ、日付を含むルーティン期間を二分探索で取得します。
+
+        ルーティン期間は重ならないものとします。（TermDecision.clean で検証します）
+        開始時期、終了時期のどちらかがないルーティン期間は含めません。
+        一度作成すればDBを使わないため、リクエストごとに一度だけ作成して、日付ごとに get_term を呼び出します。
+        """
+        self.terms = sorted(
+            (term for term in terms if term.start_date is not None and term.end_date is not None),
+            key=lambda term: (term.start_date, term.pk or 0),
+        )
+        self.starts = [term.start_date for term in self.terms]
+
+    def __iter__(self):
+        return iter(self.terms)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def get_term(self, day):
+        """ dayの日付を含むルーティン期間を返します。なければNoneを返します。 """
+        i = bisect.bisect_right(self.starts, day) - 1
+        if i >= 0 and day <= self.terms[i].end_date:
+            return self.terms[i]
+        return None
+
+    def get_current(self, day=None):
+        """ dayの日付（省略すると今日）のルーティン期間を返します。
+
+        dayを含むルーティン期間がなければ、次に始まるルーティン期間、それもなければ最後のルーティン期間を返します。
+        ルーティン期間がなければNoneを返します。
+        """
+        day = day or datetime.date.today()
+        if not self.terms:
+            return None
+        i = bisect.bisect_right(self.starts, day) - 1
+        if i >= 0 and day <= self.terms[i].end_date:
+            return self.terms[i]
+        return self.terms[min(i + 1, len(self.terms) - 1)]
+
+    def get_days(self):
+        """ 全てのルーティン期間の日付を返します。 """
+        return [
+            term.start_date + datetime.timedelta(days=i)
+            for term in self.terms for i in range((term.end_date - term.start_date).days + 1)
+        ]
@@ -1,6 +1,9 @@
-from .models import TermDecision
-from ..register.testing import factory_user
+from collections import defaultdict
+from django.conf import settings
+from .models import BodyPart, TermDecision, PARTS
+from register.testing import factory_user
 import datetime
+import random
 
 
 def factory_term_decision(**kwargs):
@@ -9,7 +12,259 @@ def factory_term_decision(**kwargs):
     d = {
         'start_date': datetime.datetime(2020, 9, 1),
         'end_date': datetime.datetime(2020, 12, 1),
-        'user': factory_user()
     }
+    d.update(kwargs)
+    if 'user' not in d:
+        d['user'] = factory_user()
 
     return TermDecision.objects.create(**d)
+
+
+def factory_body_part(**kwargs):
+    """ テスト用のbody_partのデータを作る
+
+    weekを指定すればルーティンオブジェクト、dateを指定すれば日付指定オブジェクトになります。
+    rrule、rrule_startを指定すれば繰り返しルールのあるルーティンオブジェクトになります。
+    """
+    d = {
+        'part': '胸',
+    }
+    d.update(kwargs)
+
+    return BodyPart.objects.create(**d)
+
+
+def factory_history(user, start_date, days):
+    """ テスト、ベンチマーク用に start_date から days 日分の部位・種目の履歴データをまとめて作る
+
+    ・ルーティン期間は start_date から days 日間
+    ・月～土曜日に2部位ずつのルーティンオブジェクト
+    ・5日ごとにルーティンを個別に変更した日付（ルーティンを全て設定しないルーティンの変更 + 日付指定オブジェクト）
+    ・7日ごとにルーティンに追加した日付指定オブジェクト
+    ・スケジュールのある全ての日付の部位に3種目ずつ
+    """
+    from discipline.models import Discipline, DisciplineSet
+    from tr_calendar.models import DaySchedule, RoutineOverride
+    from tr_calendar.schedules import rebuild_day_schedules
+
+    parts = [part for part, _ in PARTS]
+    TermDecision.objects.update_or_create(user=user, defaults={
+        'start_date': start_date,
+        'end_date': start_date + datetime.timedelta(days=days - 1),
+    })
+
+    bp_objects = []
+    overrides = []
+    for i, wd in enumerate(settings.WEEK[:6]):
+        bp_objects.append(BodyPart(week=wd, part=parts[i % len(parts)], user=user))
+        bp_objects.append(BodyPart(week=wd, part=parts[(i + 3) % len(parts)], user=user))
+    for i in range(days):
+        date = start_date + datetime.timedelta(days=i)
+        if i % 5 == 0:
+            overrides.append(RoutineOverride(date=date, user=user))
+            bp_objects.append(BodyPart(date=date, part=parts[i % len(parts)], user=user))
+        elif i % 7 == 0:
+            bp_objects.append(BodyPart(date=date, part=parts[i % len(parts)], user=user))
+    BodyPart.objects.bulk_create(bp_objects, batch_size=500)
+    RoutineOverride.objects.bulk_create(overrides, batch_size=500)
+    rebuild_day_schedules(user)
+
+    disciplines = []
+    for day_schedule in DaySchedule.objects.filter(user=user).iterator():
+        for n in range(3):
+            disciplines.append(Discipline(
+                discipline=f'種目{n + 1}',
+                date=day_schedule.date,
+                body_part_id=day_schedule.body_part_id,
+            ))
+    Discipline.objects.bulk_create(disciplines, batch_size=500)
+
+    # bulk_createではpkが取得できないDBもあるため、作成した種目を取得し直してセットを作成します
+    discipline_sets = []
+    for pk, name in Discipline.objects.filter(body_part__user=user).values_list('pk', 'discipline').iterator():
+        n = int(name[len('種目'):]) - 1
+        discipline_sets.append(DisciplineSet(discipline_id=pk, index=1, weight=40.0 + n * 10, reps=10))
+        discipline_sets.append(DisciplineSet(discipline_id=pk, index=2, weight=45.0 + n * 10, reps=8))
+        discipline_sets.append(DisciplineSet(discipline_id=pk, index=3, weight=50.0 + n * 10, reps=6))
+    DisciplineSet.objects.bulk_create(discipline_sets, batch_size=500)
+
+
+# 負荷試験用の履歴で部位ごとに使う種目名
+PERF_EXERCISES = {
+    '胸': ['ベンチプレス', 'インクラインベンチプレス', 'ダンベルフライ', 'ディップス', 'ケーブルクロスオーバー'],
+    '背中': ['デッドリフト', 'ラットプルダウン', 'ベントオーバーロウ', 'チンニング', 'シーテッドロウ'],
+    '肩': ['ショルダープレス', 'サイドレイズ', 'リアレイズ', 'アップライトロウ', 'シュラッグ'],
+    '腕': ['バーベルカール', 'ハンマーカール', 'ライイングエクステンション', 'プレスダウン', 'リストカール'],
+    '脚': ['スクワット', 'レッグプレス', 'ルーマニアンデッドリフト', 'レッグカール', 'カーフレイズ'],
+    '腹': ['クランチ', 'レッグレイズ', 'アブローラー', 'プランク'],
+    '全身': ['クリーン', 'スナッチ', 'バーピー', 'ケトルベルスイング'],
+    '上半身': ['ベンチプレス', 'ラットプルダウン', 'ショルダープレス', 'バーベルカール'],
+}
+# 負荷試験用の繰り返しルール
+PERF_RRULES = ['FREQ=DAILY;INTERVAL=4', 'FREQ=WEEKLY;INTERVAL=2;BYDAY=SA', 'FREQ=DAILY;INTERVAL=9;BYDAY=MO,TU,WE,TH,FR']
+
+
+def factory_perf_users(count, years, end_date=None, seed=0, password='password', prefix='perf'):
+    """ 負荷試験用に count 人のユーザーと years 年分の履歴データを bulk_create でまとめて作る
+
+    ・ユーザーのメールアドレスは '{prefix}{番号}@example.com'、パスワードは全員 password
+    ・1年ごとのルーティン期間（最後の期間は end_date の60日後まで）
+    ・ルーティン期間ごとに週3～6日、1日1～3部位のルーティンオブジェクト（部位詳細は画像のある組み合わせ）
+    ・3割のユーザーはルーティン期間ごとに繰り返しルールのあるルーティンオブジェクト
+    ・約1割の日付にルーティンに追加した日付指定オブジェクト
+    ・end_date までの約1割の日付にルーティンの変更（全て設定しない、一部位を設定しない、一部位を日付指定オブジェクトに変更）
+      （以前の partがNoneの日付指定オブジェクト、ルーティンの複製は compact_placeholders で変更に置き換えているため作りません）
+    ・end_date までのスケジュールの85%の部位に2～4種目、3～5セット（重量は4週ごとに少しずつ増やします）
+    同じ seed なら同じデータを作ります。作成した件数の辞書を返します。
+    """
+    from character.models import Character, DEFAULT_NAME
+    from discipline.importer import BODY_PART_KEY, DISCIPLINE_KEY, bulk_create_with_pks
+    from discipline.models import Discipline, DisciplineSet
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from .images import get_image_paths
+    from tr_calendar.models import DaySchedule, RoutineOverride
+    from tr_calendar.schedules import rebuild_day_schedules
+
+    User = get_user_model()
+    end_date = end_date or datetime.date.today()
+    start_date = end_date - datetime.timedelta(days=365 * years)
+    combinations = sorted(get_image_paths().keys(), key=lambda key: (key[0], key[1] or ''))
+    stats = {'users': count}
+
+    # パスワードのハッシュは時間がかかるため一度だけ作成します
+    password = make_password(password)
+    User.objects.bulk_create([
+        User(email=f'{prefix}{i}@example.com', password=password, first_name='負荷', last_name=f'試験{i}')
+        for i in range(count)
+    ], batch_size=500)
+    users = list(User.objects.filter(email__in=[f'{prefix}{i}@example.com' for i in range(count)]).order_by('pk'))
+    Character.objects.bulk_create([
+        Character(user=user, name=DEFAULT_NAME, number=str(i % 4 + 1)) for i, user in enumerate(users)
+    ], batch_size=500)
+    rngs = {user.pk: random.Random(f'{seed}-{i}') for i, user in enumerate(users)}
+
+    # ルーティン期間
+    term_decisions = []
+    for user in users:
+        for year in range(years):
+            term_start = start_date + datetime.timedelta(days=365 * year + (rngs[user.pk].randint(0, 14) if year else 0))
+            term_end = start_date + datetime.timedelta(days=365 * (year + 1) - 1)
+            if year == years - 1:
+                term_end = end_date + datetime.timedelta(days=60)
+            term_decisions.append(TermDecision(user=user, start_date=term_start, end_date=term_end))
+    TermDecision.objects.bulk_create(term_decisions, batch_size=500)
+    terms = defaultdict(list)
+    for term in TermDecision.objects.filter(user__in=users).order_by('start_date'):
+        terms[term.user_id].append(term)
+    stats['terms'] = len(term_decisions)
+
+    # ルーティンオブジェクト、繰り返しルールのあるルーティンオブジェクト、日付指定オブジェクト
+    bp_objects = []
+    routines = {}
+    for user in users:
+        rng = rngs[user.pk]
+        routines[user.pk] = {}
+        for term in terms[user.pk]:
+            for wd in sorted(rng.sample(range(7), rng.randint(3, 6))):
+                day_parts = rng.sample(combinations, rng.randint(1, 3))
+                routines[user.pk][(term.pk, wd)] = day_parts
+                for part, detail_part in day_parts:
+                    bp_objects.append(BodyPart(
+                        week=settings.WEEK[wd], part=part, detail_part=detail_part, user=user, term=term,
+                    ))
+            if rng.random() < 0.3:
+                part, detail_part = rng.choice(combinations)
+                bp_objects.append(BodyPart(
+                    rrule=rng.choice(PERF_RRULES), rrule_start=term.start_date, part=part, detail_part=detail_part,
+                    user=user, term=term,
+                ))
+        for i in range((end_date - start_date).days + 60):
+            if rng.random() < 0.1:
+                part, detail_part = rng.choice(combinations)
+                bp_objects.append(BodyPart(
+                    date=start_date + datetime.timedelta(days=i), part=part, detail_part=detail_part, user=user,
+                ))
+    BodyPart.objects.bulk_create(bp_objects, batch_size=500)
+    routine_pks = {}
+    dated_keys = set()
+    for pk, user_id, term_id, week, date, part, detail_part in BodyPart.objects.filter(user__in=users).values_list(
+        'pk', 'user', 'term', 'week', 'date', 'part', 'detail_part',
+    ):
+        if week:
+            routine_pks[(user_id, term_id, settings.WEEK.index(week), part, detail_part)] = pk
+        elif date:
+            dated_keys.add((user_id, date, part, detail_part))
+
+    # ルーティンの変更
+    overrides = []
+    replacements = []
+    for user in users:
+        rng = rngs[user.pk]
+        for term in terms[user.pk]:
+            for i in range((min(term.end_date, end_date) - term.start_date).days + 1):
+                date = term.start_date + datetime.timedelta(days=i)
+                day_parts = routines[user.pk].get((term.pk, date.weekday()))
+                if not day_parts:
+                    continue
+                action = rng.random()
+                if action < 0.04:
+                    overrides.append(RoutineOverride(date=date, user=user))
+                elif action < 0.1:
+                    part, detail_part = rng.choice(day_parts)
+                    body_part_id = routine_pks[(user.pk, term.pk, date.weekday(), part, detail_part)]
+                    if action < 0.07:
+                        overrides.append(RoutineOverride(date=date, body_part_id=body_part_id, user=user))
+                    else:
+                        key = (user.pk, date, *rng.choice(combinations))
+                        if key not in dated_keys:
+                            dated_keys.add(key)
+                            replacements.append((key, RoutineOverride(date=date, body_part_id=body_part_id, user=user)))
+    bulk_create_with_pks(BodyPart, [
+        BodyPart(date=date, part=part, detail_part=detail_part, user_id=user_id)
+        for (user_id, date, part, detail_part), _ in replacements
+    ], BodyPart.objects.filter(user__in=users), BODY_PART_KEY)
+    replacement_pks = {
+        (user_id, date, part, detail_part): pk
+        for pk, user_id, date, part, detail_part in BodyPart.objects.filter(
+            user__in=users, date__isnull=False,
+        ).values_list('pk', 'user', 'date', 'part', 'detail_part')
+    }
+    for key, override in replacements:
+        override.replacement_id = replacement_pks[key]
+        overrides.append(override)
+    RoutineOverride.objects.bulk_create(overrides, batch_size=500)
+    stats['body_parts'] = len(bp_objects) + len(replacements)
+    stats['overrides'] = len(overrides)
+
+    for user in users:
+        rebuild_day_schedules(user)
+    stats['day_schedules'] = DaySchedule.objects.filter(user__in=users).count()
+
+    # 種目とセット
+    disciplines = []
+    sets = []
+    for user in users:
+        rng = rngs[user.pk]
+        for date, part, body_part_id in DaySchedule.objects.filter(
+            user=user, date__lte=end_date,
+        ).order_by('date', 'slot').values_list('date', 'part', 'body_part').iterator():
+            if rng.random() >= 0.85:
+                continue
+            progress = (date - start_date).days // 28 * 2.5
+            for name in rng.sample(PERF_EXERCISES[part], rng.randint(2, min(4, len(PERF_EXERCISES[part])))):
+                disciplines.append(Discipline(
+                    discipline=name, date=date, body_part_id=body_part_id,
+                    remarks='フォームを意識した' if rng.random() < 0.05 else None,
+                ))
+                weight = 20 + len(name) * 5 + progress
+                sets.append([(weight + n * 2.5, rng.randint(5, 12)) for n in range(rng.randint(3, 5))])
+    bulk_create_with_pks(Discipline, disciplines, Discipline.objects.filter(body_part__user__in=users), DISCIPLINE_KEY)
+    DisciplineSet.objects.bulk_create([
+        DisciplineSet(discipline=discipline, index=index, weight=weight, reps=reps)
+        for discipline, discipline_sets in zip(disciplines, sets)
+        for index, (weight, reps) in enumerate(discipline_sets, 1)
+    ], batch_size=500)
+    stats['disciplines'] = len(disciplines)
+    stats['sets'] = sum(len(discipline_sets) for discipline_sets in sets)
+    return stats
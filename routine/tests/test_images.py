@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.template import Context, Template
+from django.templatetags.static import static
+from django.test import TestCase, override_settings
+
+from ..images import get_image_path, get_image_static_url, get_image_urls
+from ..models import BodyPart, PARTS
+
+
+class TestImages(TestCase):
+    def test_image_paths(self):
+        """ 全ての画像のパスが、部位と部位詳細をつなげた settings.IMAGES のキーから作成したパスと一致すること """
+        parts = [part for part, _ in PARTS]
+        for key, file_name in settings.IMAGES.items():
+            part = max((part for part in parts if key.startswith(part)), key=len)
+            detail_part = key[len(part):] or None
+            with self.subTest(key=key):
+                self.assertEqual(get_image_path(part, detail_part), f'media/{file_name}.png')
+                self.assertEqual(get_image_static_url(part, detail_part), static(f'media/{file_name}.png'))
+        self.assertEqual(get_image_path('胸', ''), 'media/chest.png')
+        with self.assertRaises(KeyError):
+            get_image_path('胸', '存在しない部位')
+
+    def test_filter(self):
+        template = Template('{% load routine_images %}{{ body_part|image_url }} {{ form_data|image_url }}')
+        html = template.render(Context({
+            'body_part': BodyPart(part='肩', detail_part='僧帽筋上部'),
+            'form_data': {'part': '上半身', 'detail_part': None},
+        }))
+        self.assertEqual(html, f"{static('media/trapezius.png')} {static('media/upperbody.png')}")
+
+    def test_setting_changed(self):
+        """ 静的ファイルのURLを変更した場合は対応表を作り直すこと """
+        with override_settings(STATIC_URL='https://static.example.com/static/'):
+            self.assertEqual(get_image_static_url('胸'), 'https://static.example.com/static/media/chest.png')
+            self.assertEqual(get_image_urls()['off'], 'https://static.example.com/static/media/off.png')
+        self.assertEqual(get_image_static_url('胸'), static('media/chest.png'))
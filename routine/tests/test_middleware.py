@@ -0,0 +1,64 @@
+import datetime
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from register.testing import factory_user
+from ..middleware import get_provisional
+from ..provisional import Provisional, VERSION
+from ..testing import factory_term_decision, factory_body_part
+
+
+class TestProvisionalMiddleware(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        factory_term_decision(user=cls.user)
+        cls.monday_chest = factory_body_part(week='月曜日', part='胸', user=cls.user)
+        cls.draft = {'v': VERSION, 'w': [[[1, 0, '脚']], [], [], [], [], [], []]}
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['provisional'] = self.draft
+        session.save()
+
+    def _get(self, url):
+        with mock.patch('routine.middleware.get_provisional', wraps=get_provisional) as mocked:
+            res = self.client.get(url)
+        return res, mocked
+
+    def test_not_routine_namespace(self):
+        """ ルーティン設定以外のビューではセッションの仮データを読み込み、保存しないこと """
+        date = datetime.date(2020, 11, 2)
+        ymd = {'year': date.year, 'month': date.month, 'day': date.day}
+        urls = [
+            reverse('home:home'),
+            reverse('home:home', kwargs=ymd),
+            reverse('tr_calendar:month_with_schedule', kwargs={'year': date.year, 'month': date.month}),
+            reverse('tr_calendar:day_schedule_create', kwargs=ymd),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                res, mocked = self._get(url)
+                self.assertEqual(res.status_code, 200)
+                self.assertFalse(hasattr(res.wsgi_request, 'provisional'))
+                mocked.assert_not_called()
+                self.assertEqual(self.client.session['provisional'], self.draft)
+
+    def test_routine_namespace(self):
+        res, mocked = self._get(reverse('routine:list'))
+
+        mocked.assert_called_once()
+        self.assertIsInstance(res.wsgi_request.provisional, Provisional)
+        # 設定済みのルーティンを仮保存したため保存し直されること
+        self.assertEqual(self.client.session['provisional']['w'][0], [[0, self.monday_chest.pk, '胸'], [1, 0, '脚']])
+
+    def test_not_accessed(self):
+        """ ルーティン設定のビューでもrequest.provisionalにアクセスしなければセッションを読み込まないこと """
+        with mock.patch('routine.middleware.get_provisional', wraps=get_provisional) as mocked:
+            self.client.post(reverse('routine:delete'), {'delete': []})
+        # routine_deleteは選択がなければrequest.provisionalにアクセスしません
+        mocked.assert_not_called()
+        self.assertEqual(self.client.session['provisional'], self.draft)
@@ -0,0 +1,97 @@
+import datetime
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+
+from discipline.models import Discipline, DisciplineSet
+from tr_calendar.models import DaySchedule, RoutineOverride
+from ..models import BodyPart, TermDecision
+from ..testing import factory_perf_users
+
+User = get_user_model()
+
+
+class TestFactoryPerfUsers(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.end_date = datetime.date(2020, 11, 30)
+        cls.stats = factory_perf_users(2, 2, end_date=cls.end_date, seed=1)
+
+    def test_stats(self):
+        self.assertEqual(self.stats, {
+            'users': 2,
+            'terms': TermDecision.objects.count(),
+            'body_parts': BodyPart.objects.count(),
+            'overrides': RoutineOverride.objects.count(),
+            'day_schedules': DaySchedule.objects.count(),
+            'disciplines': Discipline.objects.count(),
+            'sets': DisciplineSet.objects.count(),
+        })
+        self.assertEqual(self.stats['terms'], 4)
+
+    def test_history(self):
+        user = User.objects.get(email='perf0@example.com')
+        self.assertTrue(user.check_password('password'))
+        self.assertEqual(user.character.name, 'ボディビルダー')
+        # ルーティン期間ごとのルーティンオブジェクト、日付指定オブジェクト
+        terms = list(TermDecision.objects.filter(user=user).order_by('start_date'))
+        for term in terms:
+            self.assertTrue(BodyPart.objects.filter(user=user, term=term, week__isnull=False).exists())
+        self.assertEqual(terms[-1].end_date, self.end_date + datetime.timedelta(days=60))
+        self.assertTrue(BodyPart.objects.filter(user=user, date__isnull=False).exists())
+        # 全て設定しない、一部位を設定しない、一部位を変更するルーティンの変更
+        overrides = RoutineOverride.objects.filter(user=user)
+        self.assertTrue(overrides.filter(body_part=None).exists())
+        self.assertTrue(overrides.filter(body_part__isnull=False, replacement=None).exists())
+        self.assertTrue(overrides.filter(replacement__isnull=False).exists())
+        # 種目はend_dateまでのスケジュールの部位に作成します
+        disciplines = Discipline.objects.filter(body_part__user=user)
+        self.assertFalse(disciplines.filter(date__gt=self.end_date).exists())
+        self.assertFalse(disciplines.filter(sets=None).exists())
+
+    def test_same_seed(self):
+        """ 同じシードなら同じデータを作成します。 """
+        def get_history(prefix):
+            return list(Discipline.objects.filter(body_part__user__email__startswith=prefix).order_by('pk').values_list(
+                'discipline', 'date', 'body_part__part', 'body_part__detail_part'))
+
+        factory_perf_users(2, 2, end_date=self.end_date, seed=1, prefix='again')
+        self.assertEqual(get_history('again'), get_history('perf'))
+
+
+class TestLoadTest(TransactionTestCase):
+    def test_load_test(self):
+        call_command('seed_perf', '--users', '2', '--years', '1', stdout=io.StringIO())
+        out = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'load_test.json')
+            call_command(
+                'load_test', '--users', '2', '--threads', '2', '--requests', '48', '--output', output, '--label', 'test',
+                stdout=out,
+            )
+            with open(output, encoding='utf-8') as f:
+                result = json.load(f)
+
+        self.assertEqual(result['label'], 'test')
+        self.assertEqual(result['total']['requests'], 48)
+        self.assertEqual(result['total']['errors'], 0)
+        # 全ての名前空間のURLにリクエストします
+        self.assertEqual({name.split(':')[0] for name in result['routes']}, {
+            'home', 'tr_calendar', 'routine', 'discipline', 'character',
+        })
+        for summary in result['routes'].values():
+            self.assertEqual(summary['requests'], 4)
+            self.assertLessEqual(summary['p50'], summary['p99'])
+        self.assertIn('load_test.json に結果を出力しました。', out.getvalue())
+
+    def test_seed_perf_existing_users(self):
+        call_command('seed_perf', '--users', '1', '--years', '1', stdout=io.StringIO())
+        with self.assertRaisesMessage(Exception, '--clear'):
+            call_command('seed_perf', '--users', '1', '--years', '1', stdout=io.StringIO())
+        call_command('seed_perf', '--users', '1', '--years', '1', '--clear', stdout=io.StringIO())
+        self.assertEqual(User.objects.count(), 1)
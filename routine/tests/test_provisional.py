@@ -0,0 +1,176 @@
+import json
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from register.testing import factory_user
+from ..provisional import FormData, Provisional, VERSION
+from ..testing import factory_term_decision, factory_body_part
+
+
+class TestProvisional(TestCase):
+    def _get_provisional(self):
+        provisional = Provisional()
+        provisional.add_form_data({'ex_form_data_015': {
+            'week': '月曜日', 'part': '胸', 'detail_part': '上部', 'pid': 15, 'form_num': 0,
+        }})
+        provisional.add_form_data({'create_form_data_20': {
+            'week': '水曜日', 'part': '脚', 'detail_part': None, 'pid': 0, 'form_num': 1,
+        }})
+        provisional.add_form_data({'update_form_data_016': {
+            'week': '月曜日', 'part': '背中', 'detail_part': None, 'pid': 16, 'form_num': 2,
+        }})
+        provisional.delete_data['delete_data_17'] = 17
+        provisional.add_form_data({'term_form_data': {'start_date': '2020-09-01', 'end_date': '2020-12-01'}})
+        return provisional
+
+    def test_encode(self):
+        self.assertEqual(self._get_provisional().encode(), {
+            'v': VERSION,
+            'w': [[[0, 15, '胸', '上部'], [2, 16, '背中']], [], [[1, 0, '脚']], [], [], [], []],
+            'd': [17],
+            't': ['2020-09-01', '2020-12-01'],
+        })
+
+    def test_decode(self):
+        provisional = self._get_provisional()
+        decoded = Provisional.from_session(json.loads(json.dumps(provisional.encode())))
+
+        self.assertEqual(decoded.ex_form_data, provisional.ex_form_data)
+        self.assertEqual(decoded.create_form_data, provisional.create_form_data)
+        self.assertEqual(decoded.update_form_data, provisional.update_form_data)
+        self.assertEqual(decoded.delete_data, provisional.delete_data)
+        self.assertEqual(decoded.term_form_data, provisional.term_form_data)
+        self.assertFalse(decoded.edited)
+
+    def test_decode_lazily(self):
+        """ データにアクセスするまでデコードしないこと """
+        provisional = Provisional.from_session({'v': VERSION, 'w': 'invalid'})
+        self.assertFalse(provisional.edited)
+        with self.assertRaises(ValueError):
+            provisional.get_form_data('月曜日')
+
+    def test_decode_legacy_data(self):
+        """ 以前の形式のセッションの値も読み込めること """
+        provisional = self._get_provisional()
+        legacy_data = {}
+        for data in [provisional.ex_form_data, provisional.create_form_data,
+                     provisional.update_form_data, provisional.delete_data]:
+            legacy_data.update(data)
+        legacy_data['all_delete_data'] = 'all'
+        legacy_data['term_form_data'] = {
+            'start_date_year': ['2020'], 'start_date_month': ['9'], 'start_date_day': ['1'],
+            'end_date_year': ['2020'], 'end_date_month': ['12'], 'end_date_day': ['1'],
+        }
+        decoded = Provisional.from_session(legacy_data)
+
+        self.assertEqual(decoded.ex_form_data, provisional.ex_form_data)
+        self.assertEqual(decoded.create_form_data, provisional.create_form_data)
+        self.assertEqual(decoded.update_form_data, provisional.update_form_data)
+        self.assertEqual(decoded.delete_data, dict(provisional.delete_data, all_delete_data='all'))
+        self.assertEqual(decoded.term_form_data, provisional.term_form_data)
+        # 新しい形式で保存し直すこと
+        self.assertTrue(decoded.edited)
+        self.assertLess(len(json.dumps(decoded.encode())), len(json.dumps(legacy_data)))
+
+    def test_judge_have_id_data(self):
+        provisional = self._get_provisional()
+
+        self.assertFalse(provisional.judge_have_id_data(15))
+        self.assertFalse(provisional.judge_have_id_data(16))
+        self.assertFalse(provisional.judge_have_id_data(17))
+        # idの一部が一致するだけのデータは含まないこと
+        self.assertTrue(provisional.judge_have_id_data(1))
+        self.assertTrue(provisional.judge_have_id_data(5))
+
+    def test_get_form_data(self):
+        provisional = self._get_provisional()
+        self.assertEqual(
+            [(item['form_num'], item['part']) for item in provisional.get_form_data('月曜日')], [(0, '胸'), (2, '背中')])
+        self.assertEqual([item['part'] for item in provisional.get_form_data('水曜日')], ['脚'])
+        self.assertEqual(provisional.get_form_data('日曜日'), [])
+
+    def test_delete_form_data(self):
+        provisional = self._get_provisional()
+        provisional.delete_form_data('15')
+        provisional.delete_form_data(0)
+        self.assertEqual([item['part'] for item in provisional.get_form_data('月曜日')], ['背中'])
+        self.assertEqual(provisional.get_form_data('水曜日'), [])
+        self.assertEqual(provisional.delete_data, {'delete_data_17': 17, 'delete_data_15': 15})
+        self.assertFalse(provisional.judge_have_id_data(15))
+
+        provisional.delete_form_data()
+        self.assertEqual(provisional.get_form_data('月曜日'), [])
+        self.assertEqual(provisional.delete_data['all_delete_data'], 'all')
+
+    def test_form_data_index(self):
+        """ 辞書として変更しても曜日、pidの索引が一致すること """
+        form_data = FormData({
+            'a': {'week': '月曜日', 'pid': 1}, 'b': {'week': '月曜日', 'pid': 2}, 'c': {'week': '火曜日', 'pid': 1},
+        })
+        form_data['a'] = {'week': '月曜日', 'pid': 1, 'part': '胸'}
+        self.assertEqual([item['pid'] for item in form_data.get_week('月曜日')], [1, 2])
+        self.assertEqual(form_data.get_week('月曜日')[0]['part'], '胸')
+        form_data['b'] = {'week': '水曜日', 'pid': 3}
+        self.assertEqual(form_data.get_week('水曜日'), [{'week': '水曜日', 'pid': 3}])
+        self.assertFalse(form_data.has_pid(2))
+
+        del form_data['a']
+        self.assertEqual(form_data.get_key(1), 'c')
+        self.assertEqual(form_data.pop('c')['pid'], 1)
+        self.assertIsNone(form_data.get_key(1))
+        self.assertEqual(form_data.pop('c', None), None)
+        self.assertEqual(dict(form_data.weeks), {'水曜日': {'b': {'week': '水曜日', 'pid': 3}}})
+        form_data.clear()
+        self.assertEqual((dict(form_data.weeks), dict(form_data.pids)), ({}, {}))
+
+
+class TestProvisionalSession(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        factory_term_decision(user=cls.user)
+        cls.monday_chest = factory_body_part(week='月曜日', part='胸', user=cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_session(self):
+        self.client.get(reverse('routine:list'))
+        self.assertEqual(self.client.session['provisional'], {
+            'v': VERSION,
+            'w': [[[0, self.monday_chest.pk, '胸']], [], [], [], [], [], []],
+        })
+
+        self.client.post(reverse('routine:create', kwargs={'num': 2}), {'week': '水曜日', 'part': '脚'})
+        res = self.client.get(reverse('routine:list'))
+        self.assertEqual(
+            [[body_part and body_part['part'] for body_part in body_part_set]
+             for body_part_set in res.context['body_part_i_set']],
+            [['胸', [], '脚', [], [], [], []]],
+        )
+
+    def test_week_list_num_queries(self):
+        """ 曜日の数によらず、ルーティンオブジェクトを一回のクエリで取得すること """
+        factory_body_part(week='水曜日', part='脚', user=self.user)
+        factory_body_part(week='日曜日', part='腕', user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(reverse('routine:list'))
+        self.assertEqual(len([query for query in queries.captured_queries if 'routine_bodypart' in query['sql']]), 1)
+        self.assertEqual(
+            [[body_part and body_part['part'] for body_part in body_part_set]
+             for body_part_set in res.context['body_part_i_set']],
+            [['胸', [], '脚', [], [], [], '腕']],
+        )
+
+    def test_session_term(self):
+        self.client.post(reverse('routine:term_decision'), {
+            'start_date_year': '2020', 'start_date_month': '10', 'start_date_day': '1',
+            'end_date_year': '2021', 'end_date_month': '3', 'end_date_day': '31',
+        })
+        self.assertEqual(self.client.session['provisional']['t'], ['2020-10-01', '2021-03-31'])
+
+        res = self.client.get(reverse('routine:list'))
+        self.assertEqual(str(res.context['term_object']['start_date']), '2020-10-01')
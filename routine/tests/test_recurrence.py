@@ -0,0 +1,102 @@
+import datetime
+
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase
+
+from ..models import BodyPart
+from ..recurrence import RecurrenceRule, expand_rules
+
+
+class TestRecurrenceRule(SimpleTestCase):
+    def _get_days(self, rrule, dtstart, start, end):
+        return list(RecurrenceRule.parse(rrule, dtstart).between(start, end))
+
+    def _get_naive_days(self, rule, start, end):
+        """ 一日ずつ判定した場合の日付（betweenの結果と比べるため） """
+        days = (start + datetime.timedelta(days=i) for i in range((end - start).days + 1))
+        return [day for day in days if day in rule]
+
+    def test_daily(self):
+        """ 4日ごとのローテーション """
+        self.assertEqual(
+            self._get_days(
+                'FREQ=DAILY;INTERVAL=4', datetime.date(2020, 11, 1), datetime.date(2020, 11, 6), datetime.date(2020, 11, 20),
+            ),
+            [datetime.date(2020, 11, 9), datetime.date(2020, 11, 13), datetime.date(2020, 11, 17)],
+        )
+
+    def test_weekly(self):
+        """ 隔週の月曜日と木曜日 """
+        self.assertEqual(
+            self._get_days(
+                'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH',
+                datetime.date(2020, 11, 5), datetime.date(2020, 11, 1), datetime.date(2020, 11, 30),
+            ),
+            [datetime.date(2020, 11, 5), datetime.date(2020, 11, 16), datetime.date(2020, 11, 19),
+             datetime.date(2020, 11, 30)],
+        )
+        # BYDAYを省略した場合は起点の曜日になること
+        self.assertEqual(
+            self._get_days('FREQ=WEEKLY', datetime.date(2020, 11, 4), datetime.date(2020, 11, 1), datetime.date(2020, 11, 20)),
+            [datetime.date(2020, 11, 4), datetime.date(2020, 11, 11), datetime.date(2020, 11, 18)],
+        )
+
+    def test_count_until(self):
+        self.assertEqual(
+            self._get_days('FREQ=DAILY;INTERVAL=2;COUNT=3', datetime.date(2020, 11, 1),
+                           datetime.date(2020, 11, 4), datetime.date(2020, 12, 1)),
+            [datetime.date(2020, 11, 5)],
+        )
+        self.assertEqual(
+            self._get_days('FREQ=WEEKLY;UNTIL=20201115', datetime.date(2020, 11, 1),
+                           datetime.date(2020, 10, 1), datetime.date(2020, 12, 1)),
+            [datetime.date(2020, 11, 1), datetime.date(2020, 11, 8), datetime.date(2020, 11, 15)],
+        )
+
+    def test_between_matches_contains(self):
+        """ 期間の途中から計算しても、一日ずつ判定した場合と同じ日付になること """
+        rrules = [
+            'FREQ=DAILY', 'FREQ=DAILY;INTERVAL=3', 'FREQ=DAILY;INTERVAL=2;BYDAY=MO,WE,FR',
+            'FREQ=WEEKLY;INTERVAL=3;BYDAY=SU,TU', 'FREQ=WEEKLY;COUNT=10;BYDAY=SA', 'FREQ=DAILY;INTERVAL=5;UNTIL=20210301',
+        ]
+        dtstart = datetime.date(2020, 11, 4)
+        for rrule in rrules:
+            rule = RecurrenceRule.parse(rrule, dtstart)
+            for offset in range(0, 60, 7):
+                start = datetime.date(2020, 10, 20) + datetime.timedelta(days=offset)
+                end = start + datetime.timedelta(days=200)
+                with self.subTest(rrule=rrule, start=start):
+                    self.assertEqual(list(rule.between(start, end)), self._get_naive_days(rule, start, end))
+
+    def test_str(self):
+        for rrule in ['FREQ=DAILY;INTERVAL=4', 'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH', 'FREQ=DAILY;COUNT=5']:
+            self.assertEqual(str(RecurrenceRule.parse(rrule, datetime.date(2020, 11, 2))), rrule)
+
+    def test_invalid(self):
+        for rrule in ['', 'FREQ=MONTHLY', 'FREQ=DAILY;INTERVAL=0', 'FREQ=DAILY;BYDAY=XX', 'FREQ=DAILY;COUNT=2;UNTIL=20201201',
+                      'FREQ=DAILY;BYSETPOS=1', 'FREQ=DAILY;INTERVAL=a', 'FREQ']:
+            with self.subTest(rrule=rrule), self.assertRaises(ValueError):
+                RecurrenceRule.parse(rrule, datetime.date(2020, 11, 2))
+
+    def test_expand_rules(self):
+        chest = BodyPart(pk=1, part='胸', rrule='FREQ=DAILY;INTERVAL=2', rrule_start=datetime.date(2020, 11, 1))
+        back = BodyPart(pk=2, part='背中', rrule='FREQ=DAILY;INTERVAL=3', rrule_start=datetime.date(2020, 11, 1))
+        day_objects = expand_rules([chest, back], datetime.date(2020, 11, 1), datetime.date(2020, 11, 7))
+        self.assertEqual(day_objects, {
+            datetime.date(2020, 11, 1): [chest, back],
+            datetime.date(2020, 11, 3): [chest],
+            datetime.date(2020, 11, 4): [back],
+            datetime.date(2020, 11, 5): [chest],
+            datetime.date(2020, 11, 7): [chest, back],
+        })
+
+    def test_body_part_clean(self):
+        body_part = BodyPart(part='胸', rrule='FREQ=DAILY;INTERVAL=4')
+        with self.assertRaises(ValidationError):
+            body_part.clean()
+        body_part.rrule_start = datetime.date(2020, 11, 1)
+        body_part.clean()
+        self.assertEqual(body_part.get_recurrence().interval, 4)
+        body_part.rrule = 'FREQ=YEARLY'
+        with self.assertRaises(ValidationError):
+            body_part.clean()
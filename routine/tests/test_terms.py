@@ -0,0 +1,64 @@
+import datetime
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+
+from register.testing import factory_user
+from ..models import TermDecision
+from ..terms import TermIndex
+from ..testing import factory_term_decision
+
+
+class TestTermIndex(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        cls.autumn = factory_term_decision(
+            user=cls.user, start_date=datetime.date(2020, 9, 1), end_date=datetime.date(2020, 11, 30))
+        cls.spring = factory_term_decision(
+            user=cls.user, start_date=datetime.date(2021, 3, 1), end_date=datetime.date(2021, 5, 31))
+        cls.winter = factory_term_decision(
+            user=cls.user, start_date=datetime.date(2020, 12, 1), end_date=datetime.date(2021, 1, 31))
+        factory_term_decision(user=factory_user(email='other@example.com'),
+                              start_date=datetime.date(2020, 1, 1), end_date=datetime.date(2022, 1, 1))
+
+    def test_get_term(self):
+        with self.assertNumQueries(1):
+            index = TermDecision.objects.filter(user=self.user).index()
+        with self.assertNumQueries(0):
+            self.assertEqual(list(index), [self.autumn, self.winter, self.spring])
+            self.assertIsNone(index.get_term(datetime.date(2020, 8, 31)))
+            self.assertEqual(index.get_term(datetime.date(2020, 9, 1)), self.autumn)
+            self.assertEqual(index.get_term(datetime.date(2020, 11, 30)), self.autumn)
+            self.assertEqual(index.get_term(datetime.date(2020, 12, 1)), self.winter)
+            self.assertIsNone(index.get_term(datetime.date(2021, 2, 14)))
+            self.assertEqual(index.get_term(datetime.date(2021, 5, 31)), self.spring)
+            self.assertIsNone(index.get_term(datetime.date(2021, 6, 1)))
+
+    def test_get_current(self):
+        index = TermDecision.objects.filter(user=self.user).index()
+        self.assertEqual(index.get_current(datetime.date(2020, 10, 1)), self.autumn)
+        # 期間の間の日付は次に始まるルーティン期間、最後の期間の後は最後のルーティン期間
+        self.assertEqual(index.get_current(datetime.date(2021, 2, 14)), self.spring)
+        self.assertEqual(index.get_current(datetime.date(2020, 1, 1)), self.autumn)
+        self.assertEqual(index.get_current(datetime.date(2022, 1, 1)), self.spring)
+        self.assertIsNone(TermIndex([]).get_current())
+        with self.assertRaises(TermDecision.DoesNotExist):
+            TermDecision.objects.filter(user=factory_user(email='new@example.com')).current()
+
+    def test_get_days(self):
+        index = TermIndex([self.winter])
+        self.assertEqual(len(index.get_days()), 62)
+        self.assertEqual(index.get_days()[0], datetime.date(2020, 12, 1))
+
+    def test_clean(self):
+        term = TermDecision(user=self.user, start_date=datetime.date(2021, 1, 15), end_date=datetime.date(2021, 2, 10))
+        with self.assertRaises(ValidationError):
+            term.clean()
+        term.start_date = datetime.date(2021, 2, 1)
+        term.clean()
+        term.end_date = datetime.date(2021, 1, 31)
+        with self.assertRaises(ValidationError):
+            term.clean()
+        # 自分自身とは重ならないこと
+        self.autumn.clean()
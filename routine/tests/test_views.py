@@ -1,7 +1,14 @@
+import datetime
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..testing import factory_term_decision
+from register.testing import factory_user
+from tr_calendar.models import RoutineOverride
+from ..models import BodyPart, TermDecision
+from ..testing import factory_term_decision, factory_body_part, factory_history
 
 
 class TestTermDecision(TestCase):
@@ -21,3 +28,111 @@ class TestTermDecision(TestCase):
         self.assertTemplateUsed(res, 'term_decision.html')
         self.assertEqual(res.context['page_title'], 'ルーティン設定')
         self.assertEqual(res.context['form'].inctance, self.term)
+
+
+class TestRoutineDecision(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        factory_term_decision(
+            user=cls.user,
+            start_date=datetime.date(2020, 9, 1),
+            end_date=datetime.date(2020, 12, 1),
+        )
+        cls.monday_chest = factory_body_part(week='月曜日', part='胸', user=cls.user)
+        cls.monday_back = factory_body_part(week='月曜日', part='背中', user=cls.user)
+        # ルーティン期間内の月曜日の日付指定オブジェクト
+        factory_body_part(date=datetime.date(2020, 11, 2), part='腕', user=cls.user)
+        factory_body_part(date=datetime.date(2020, 11, 2), part='脚', user=cls.user)
+        # ルーティン期間外の月曜日の日付指定オブジェクト
+        factory_body_part(date=datetime.date(2021, 1, 4), part='腕', user=cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _getTarget(self):
+        return reverse('routine:routine_decision')
+
+    def _set_provisional(self, provisional):
+        session = self.client.session
+        session['provisional'] = provisional
+        session.save()
+
+    def _create_form_data(self, week, part, pid):
+        return {'week': week, 'part': part, 'detail_part': None, 'pid': pid, 'form_num': 1}
+
+    def test_post(self):
+        self._set_provisional({
+            'create_form_data_00': self._create_form_data('月曜日', '肩', 0),
+            'create_form_data_21': self._create_form_data('水曜日', '脚', 1),
+            'update_form_data_0' + str(self.monday_chest.pk): dict(
+                self._create_form_data('月曜日', '腹', self.monday_chest.pk), form_num=2),
+            'delete_data_' + str(self.monday_back.pk): self.monday_back.pk,
+        })
+        res = self.client.post(self._getTarget())
+
+        self.assertRedirects(res, reverse('home:home'), fetch_redirect_response=False)
+        self.assertEqual(
+            sorted(BodyPart.objects.filter(user=self.user, week__isnull=False).values_list('week', 'part')),
+            sorted([('月曜日', '肩'), ('月曜日', '腹'), ('水曜日', '脚')]),
+        )
+        # ルーティン期間内の日付のみ、ルーティンを全て設定しないルーティンの変更が一つだけ作成されます
+        self.assertEqual(
+            RoutineOverride.objects.filter(user=self.user, body_part=None, date=datetime.date(2020, 11, 2)).count(), 1)
+        self.assertFalse(RoutineOverride.objects.filter(user=self.user, date=datetime.date(2021, 1, 4)).exists())
+        self.assertNotIn('provisional', self.client.session)
+
+    def test_post_overwrite(self):
+        self._set_provisional({'create_form_data_00': self._create_form_data('月曜日', '肩', 0)})
+        self.client.post(self._getTarget(), {'overwrite': 'on'})
+
+        self.assertFalse(BodyPart.objects.filter(user=self.user, date=datetime.date(2020, 11, 2)).exists())
+        self.assertTrue(BodyPart.objects.filter(user=self.user, date=datetime.date(2021, 1, 4)).exists())
+
+    def test_post_other_term(self):
+        """ 今日のルーティン期間のルーティンだけを変更し、他のルーティン期間のルーティンは変更しないこと """
+        term = TermDecision.objects.get(user=self.user)
+        old_term = factory_term_decision(
+            user=self.user, start_date=datetime.date(2020, 3, 1), end_date=datetime.date(2020, 8, 31))
+        old_routine = factory_body_part(week='火曜日', part='脚', term=old_term, user=self.user)
+        self._set_provisional({
+            'create_form_data_00': self._create_form_data('月曜日', '肩', 0),
+            'all_delete_data': 'all_delete_data',
+        })
+        self.client.post(self._getTarget())
+
+        self.assertTrue(BodyPart.objects.filter(pk=old_routine.pk).exists())
+        self.assertFalse(BodyPart.objects.filter(pk=self.monday_chest.pk).exists())
+        self.assertEqual(BodyPart.objects.get(user=self.user, part='肩').term, term)
+
+    def test_post_rollback(self):
+        """ 途中で失敗した場合にルーティンが一部だけ反映されないこと """
+        self._set_provisional({
+            'create_form_data_00': self._create_form_data('月曜日', '肩', 0),
+            'update_form_data_099999': dict(self._create_form_data('月曜日', '腹', 99999), form_num=2),
+        })
+        with self.assertRaises(BodyPart.DoesNotExist):
+            self.client.post(self._getTarget())
+        self.assertFalse(BodyPart.objects.filter(user=self.user, part='肩').exists())
+
+    def _get_body_part_queries(self, queries):
+        return [query for query in queries.captured_queries if 'routine_bodypart' in query['sql']]
+
+    def test_num_queries(self):
+        """ 日付指定オブジェクトの数によらず部位オブジェクトへのクエリ数が一定であること """
+        provisional = {
+            'create_form_data_00': self._create_form_data('月曜日', '肩', 0),
+            'create_form_data_21': self._create_form_data('水曜日', '脚', 1),
+        }
+        self._set_provisional(provisional)
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self._getTarget())
+
+        BodyPart.objects.filter(user=self.user, part__in=['肩', '脚'], week__isnull=False).delete()
+        factory_history(self.user, datetime.date(2020, 9, 1), 365)
+        RoutineOverride.objects.filter(user=self.user).delete()
+        self._set_provisional(provisional)
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(self._getTarget())
+
+        self.assertEqual(len(self._get_body_part_queries(small)), len(self._get_body_part_queries(large)))
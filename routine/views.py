@@ -1,9 +1,15 @@
+from collections import defaultdict
+
 from django.shortcuts import render, redirect
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
-from .models import BodyPart, TermDecision
+from django.db import transaction
+from django.db.models import Q
+from .models import BodyPart, TermDecision, ROUTINE_QUERY
 from .forms import BodyPartForm, TermDecisionForm
+from tr_calendar.models import RoutineOverride
+from tr_calendar.schedules import get_term_days, refresh_day_schedules
 
 FORM_TYPE = ['ex_form_data_', 'create_form_data_', 'update_form_data_']
 
@@ -12,12 +18,12 @@ FORM_TYPE = ['ex_form_data_', 'create_form_data_', 'update_form_data_']
 def term_decision(request):
     """ ルーティン期間を設定します """
     user = request.user
-    term_object = TermDecision.objects.get(user__pk=user.pk)
+    term_object = TermDecision.objects.filter(user=user).current()
     if request.method == 'POST':
         form = TermDecisionForm(request.POST)
         if form.is_valid():
             # request.provisionalにルーティン期間を仮保存
-            request.provisional.add_form_data({'term_form_data': request.POST})
+            request.provisional.add_form_data({'term_form_data': request.provisional.arrange_term_form_data(form)})
             return redirect('routine:list')
     else:
         if request.provisional.term_form_data:
@@ -49,32 +55,39 @@ def week_list(request):
     term_object　ではルーティン期間のオブジェクトまたは辞書データが格納されます
     """
     user = request.user
+    # 編集するルーティン期間（今日のルーティン期間）です。
+    current_term = TermDecision.objects.filter(user=user).current()
 
     body_parts = []  # 各曜日のデータのリストが入ります。　例　[月曜日のリスト, 火曜日のリスト, 水曜日のリスト,　.....]
     body_part_i_set = []
     count_list = []  # 各曜日のの個数が入ります。　例　[月曜日のデータ個数, 火曜日のデータ個数, 水曜日のデータ個数,　...]
 
+    # すでに設定済みのbody_partオブジェクト（ルーティンオブジェクト）を全ての曜日分まとめて一回のクエリで取得し、曜日ごとに分けます。
+    # 他のルーティン期間のルーティンオブジェクトは取得しません。
+    week_ex_data = defaultdict(list)
+    ex_many_data = BodyPart.objects.filter(
+        Q(term=current_term) | Q(term=None), week__in=settings.WEEK, user=user,
+    ).order_by('pk')
+    for ex_data in ex_many_data:
+        week_ex_data[ex_data.week].append(ex_data)
+
     # 月~日の各曜日ごとに既に設定済みbody_partオブジェクトがあればその各フィールドの値を辞書に置き換えてprovisionalに格納します。
     # それをデータのリストにまとめたものを「body_parts」リストに入れます。
     # 例　for文の一巡目：　i = 0 , day = '月曜日'
 
     for i, wd in enumerate(settings.WEEK):
 
-        # 該当する曜日のフィールドを持つすでに設定済みのbody_partオブジェクト（ルーティンオブジェクト）があれば取得する。
-        ex_many_data = BodyPart.objects.filter(week=wd, user=user)
-
-        # ex_many_dataからルーティンオブジェクトを一つずつ取得
-        for ex_data in ex_many_data:
+        # 該当する曜日のルーティンオブジェクトを一つずつ取得
+        for ex_data in week_ex_data[wd]:
             ex_form_data = 'ex_form_data_' + str(i) + str(ex_data.pk)  # 例  ex_form_data_015
             # ex_data.pkを持つデータがなければprovisionalにex_form_dataを追加します。
             if request.provisional.judge_have_id_data(ex_data.pk):
-                image = ex_data.get_image_url()
                 # request.provisionalに設定済みのルーティンを仮保存
+                # （画像のURLはテンプレートで part、detail_part から取得するため保存しません）
                 request.provisional.add_form_data({ex_form_data: {
                     'week': ex_data.week,
                     'part': ex_data.part,
                     'detail_part': ex_data.detail_part,
-                    'image': image,
                     'pid': ex_data.pk,
                     'form_num': 0,  # これはex_form_dataであることを示します。　※定数FORM_TYPEのインデックス番号0
                 }})
@@ -110,9 +123,9 @@ def week_list(request):
                 'end_date': form.cleaned_data['end_date'],
             }
         else:
-            term_object = TermDecision.objects.get(user__pk=user.pk)
+            term_object = current_term
     else:
-        term_object = TermDecision.objects.get(user__pk=user.pk)
+        term_object = current_term
 
     return render(request, 'week_list.html', {
         'body_parts_count': body_parts_count,
@@ -205,7 +218,7 @@ def routine_update(request, num, pid, form_num):
 
             return redirect('routine:list')
     else:
-        form = BodyPartForm(initial=request.provisional.get_form_data_dict()[form_data], bp_objects=form_data2)
+        form = BodyPartForm(initial=request.provisional.get_form_data_item(form_data), bp_objects=form_data2)
 
     return render(request, 'routine_update.html', {
         'wd': wd,
@@ -238,66 +251,98 @@ def routine_decision(request):
     新規で作成したセッション（provisional）データがある場合（新規作成セッションデータを更新したデータも含まれます）、それをDBに保存します。
     変更したセッションデータがある場合、それをDBに更新します。
     ルーティン期間を設定（変更）した場合、それをDBに更新します。
+    これらは曜日ごと、データごとではなく種類ごとにまとめてDBに反映し、全体を一つのトランザクションで行います。
+    ルーティンは今日のルーティン期間に設定し、新規で作成したルーティンオブジェクトはそのルーティン期間のものになります。
 
     セッションデータを取り出すときは空にしたいのでpopメソッドを使います。
     """
     user = request.user
-    term_date = TermDecision.objects.get(user__pk=user.pk)
-    form_week = []
-
-    if request.provisional.delete_data:  # 削除データがある場合
-        if 'all_delete_data' in request.provisional.delete_data.keys():  # 全て削除する場合
-            BodyPart.objects.filter(week__contains='曜日', user=user).delete()
-        else:  # 選択削除の場合
-            for v in request.provisional.delete_data.values():
-                BodyPart.objects.get(pk=v).delete()
-    if request.provisional.create_form_data:  # 新規作成データがある場合、バリデーションしてＤＢに保存します。
-        for create_form_data in request.provisional.create_form_data.values():
-            form = BodyPartForm(create_form_data)
+    term_date = TermDecision.objects.filter(user=user).current()
+    # 変更前のルーティン期間（スケジュールの作り直しに使います）
+    old_term_days = get_term_days(term_date.start_date, term_date.end_date)
+    form_week = set()
+
+    # 期間を指定していないルーティンオブジェクトは全てのルーティン期間に設定されるため、
+    # それを削除・変更する場合は全てのルーティン期間のスケジュールを作り直します。
+    delete_data = request.provisional.delete_data
+    changed_pks = [pk for key, pk in delete_data.items() if key != 'all_delete_data']
+    changed_pks += [update_form_data['pid'] for update_form_data in request.provisional.update_form_data.values()]
+    common_query = BodyPart.objects.filter(ROUTINE_QUERY, term=None, user=user)
+    if 'all_delete_data' not in delete_data:
+        common_query = common_query.filter(pk__in=changed_pks)
+    refresh_all_terms = (bool(changed_pks) or 'all_delete_data' in delete_data) and common_query.exists()
+
+    # 途中で失敗した場合に一部だけ反映されたルーティンが残らないように、全ての処理を一つのトランザクションで行います。
+    with transaction.atomic():
+        if request.provisional.delete_data:  # 削除データがある場合
+            if 'all_delete_data' in request.provisional.delete_data.keys():  # 全て削除する場合
+                BodyPart.objects.filter(Q(term=term_date) | Q(term=None), week__contains='曜日', user=user).delete()
+            else:  # 選択削除の場合
+                BodyPart.objects.filter(pk__in=list(request.provisional.delete_data.values()), user=user).delete()
+        if request.provisional.create_form_data:  # 新規作成データがある場合、バリデーションしてまとめてＤＢに保存します。
+            create_bp_objects = []
+            for create_form_data in request.provisional.create_form_data.values():
+                form = BodyPartForm(create_form_data)
+                if form.is_valid():
+                    body_part = form.save(commit=False)
+                    body_part.user = user
+                    body_part.term = term_date
+                    create_bp_objects.append(body_part)
+                    form_week.add(body_part.week)
+            BodyPart.objects.bulk_create(create_bp_objects)
+        if request.provisional.update_form_data:  # 変更データがある場合、バリデーションしてまとめてＤＢを更新します。
+            update_pks = [update_form_data['pid'] for update_form_data in request.provisional.update_form_data.values()]
+            bp_objects = BodyPart.objects.in_bulk(update_pks)
+            update_bp_objects = []
+            for update_form_data in request.provisional.update_form_data.values():
+                bp_object = bp_objects.get(update_form_data['pid'])
+                if bp_object is None or bp_object.user_id != user.pk:
+                    raise BodyPart.DoesNotExist
+                form = BodyPartForm(update_form_data, instance=bp_object)
+                if form.is_valid():
+                    body_part = form.save(commit=False)
+                    update_bp_objects.append(body_part)
+                    form_week.add(body_part.week)
+            BodyPart.objects.bulk_update(update_bp_objects, ['week', 'part', 'detail_part'])
+        if request.provisional.ex_form_data:  # 既に設定済みのデータがある場合
+            for ex_form_data in request.provisional.ex_form_data.values():
+                form_week.add(ex_form_data['week'])
+        if request.provisional.term_form_data:  # ルーティン期間データがある場合、バリデーションしてＤＢを更新します。
+            form = TermDecisionForm(request.provisional.term_form_data['term_form_data'], instance=term_date)
             if form.is_valid():
-                body_part = form.save(commit=False)
-                body_part.user = user
-                body_part.save()
-                form_week.append(body_part.week)
-    if request.provisional.update_form_data:  # 変更データがある場合、バリデーションしてＤＢを更新します。
-        for update_form_data in request.provisional.update_form_data.values():
-            bp_object = BodyPart.objects.get(pk=update_form_data['pid'], user=user)
-            form = BodyPartForm(update_form_data, instance=bp_object)
-            if form.is_valid():
-                body_part = form.save(commit=False)
-                form.save()
-                form_week.append(body_part.week)
-    if request.provisional.ex_form_data:  # 既に設定済みのデータがある場合
-        for ex_form_data in request.provisional.ex_form_data.values():
-            body_part = BodyPart.objects.get(pk=ex_form_data['pid'], user=user)
-            form_week.append(body_part.week)
-    if request.provisional.term_form_data:  # ルーティン期間データがある場合、バリデーションしてＤＢを更新します。
-        form = TermDecisionForm(request.provisional.term_form_data['term_form_data'], instance=term_date)
-        if form.is_valid():
-            term = form.save(commit=False)
-            term.user = request.user
-            term.save()
-
-    # partがNoneでない日付指定クエリセットの中で、
-    # ルーティン期間でかつ、作成したオブジェクトと同じ曜日となる日付指定オブジェクトでかつ、
-    # その日付にpartがNoneの日付指定オブジェクトがなければ、部位が空の日付指定オブジェクトをDBに作成します。
-    dt_bp_objects = BodyPart.objects.filter(date__isnull=False, user=user).exclude(part=None)
-    if dt_bp_objects:
-        for dt_bp_object in dt_bp_objects:
-            none_bp_objects = BodyPart.objects.filter(part=None, date=dt_bp_object.date, user=user)
-            judge_term_date = term_date.judge_term_date(date=dt_bp_object.date)
-            week = settings.WEEK[dt_bp_object.date.weekday()]
-            if judge_term_date and week in form_week:
-                # ルーティンで上書きする場合
-                if request.POST.get('overwrite'):
-                    dt_bp_object.delete()
-                    none_bp_objects.delete()
-                # session_create_form_data があれば（ルーチンオブジェクトを新規作成してれば）
-                elif request.provisional.create_form_data and not none_bp_objects:
-                    BodyPart.objects.create(date=dt_bp_object.date, user=user)
+                term = form.save(commit=False)
+                term.user = request.user
+                term.save()
+
+        # ルーティン期間でかつ、作成したオブジェクトと同じ曜日となる日付指定オブジェクトの日付を取得します。
+        # ルーティンで上書きする場合はその日付の日付指定オブジェクトとルーティンの変更を削除し、
+        # そうでなければその日付にルーティンを全て設定しないルーティンの変更がなければ、DBに作成します。
+        if form_week:
+            dt_dates = BodyPart.objects.filter(
+                date__range=(term_date.start_date, term_date.end_date), user=user
+            ).values_list('date', flat=True).distinct()
+            dt_dates = {date for date in dt_dates if settings.WEEK[date.weekday()] in form_week}
+            # ルーティンで上書きする場合
+            if request.POST.get('overwrite'):
+                BodyPart.objects.filter(date__in=dt_dates, user=user).delete()
+                RoutineOverride.objects.filter(date__in=dt_dates, user=user).delete()
+            # session_create_form_data があれば（ルーチンオブジェクトを新規作成してれば）
+            elif request.provisional.create_form_data:
+                skip_dates = set(RoutineOverride.objects.filter(
+                    body_part=None, date__in=dt_dates, user=user).values_list('date', flat=True))
+                RoutineOverride.objects.bulk_create([
+                    RoutineOverride(date=date, user=user) for date in sorted(dt_dates - skip_dates)
+                ])
+
+        # ルーティン、ルーティン期間の変更は変更前後のルーティン期間全体に影響するため、その期間のスケジュールを作り直します。
+        days = old_term_days + get_term_days(term_date.start_date, term_date.end_date)
+        if refresh_all_terms:
+            days += TermDecision.objects.filter(user=user).index().get_days()
+        refresh_day_schedules(user, days)
 
     if 'provisional' in request.session.keys():  # 最後にセッションから'provisional'を削除
         del request.session['provisional']
+    request.provisional.edited = False  # レスポンス後にセッションに保存し直さないようにします
 
     return redirect('home:home')
 
@@ -1,5 +1,6 @@
 from django.contrib import admin
-
+from .models import DaySchedule
 
 # Register your models here.
 
+admin.site.register(DaySchedule)
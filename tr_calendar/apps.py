@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class TrCalendarConfig(AppConfig):
     name = 'tr_calendar'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,89 @@
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections
+
+
+async def get_user(request):
+    """ request.user をDBから取得して返します。（非同期のコードでは遅延評価のまま使えないため） """
+    def load():
+        request.user.is_authenticated
+        return request.user
+    return await sync_to_async(load)()
+
+
+def close_connections_after(func):
+    """ 別スレッドで使ったDB接続を、リクエストの終了時と同じく CONN_MAX_AGE やプールの設定に従って閉じるようにします。 """
+    @functools.wraps(func)
+    def wrapper():
+        close_old_connections()
+        try:
+            return func()
+        finally:
+            close_old_connections()
+    return wrapper
+
+
+async def gather_sync(*funcs):
+    """ 互いに依存しない同期の関数（DBの読み込みなど）を実行して、結果をリストで返します。
+
+    settings.ASYNC_CONCURRENT_LOADS がTrueの場合は、関数ごとに別のスレッド（別のDB接続）で同時に実行します。
+    Falseの場合はリクエストのスレッドで順番に実行します。（トランザクションの中で実行するテストなど）
+    """
+    if not settings.ASYNC_CONCURRENT_LOADS:
+        return [await sync_to_async(func)() for func in funcs]
+    return await asyncio.gather(*(
+        sync_to_async(close_connections_after(func), thread_sensitive=False)() for func in funcs
+    ))
+
+
+async def run_sync(func):
+    """ 同期の関数（コンテキストの作成、テンプレートの描画など）を実行して、結果を返します。
+
+    settings.ASYNC_CONCURRENT_LOADS がTrueの場合は gather_sync と同じく別のスレッドで実行します。
+    Django 3.2 には ThreadSensitiveContext がないため、sync_to_async の既定（thread_sensitive=True）では
+    同時に処理している全てのリクエストのコンテキストの作成、描画が一つのスレッドで順番に実行されてしまいます。
+    """
+    result, = await gather_sync(func)
+    return result
+
+
+async def render_response(response):
+    """ TemplateResponseを run_sync で描画して返します。（ハンドラでは一つのスレッドで描画されるため） """
+    await run_sync(response.render)
+    return response
+
+
+def async_login_required(view_func):
+    """ 非同期の関数ビューで使う login_required です。 """
+    @functools.wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        user = await get_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+    return wrapper
+
+
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    """ 非同期のクラスビューで使う LoginRequiredMixin です。ハンドラ（get など）は async def で定義します。 """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+
+        # 非同期のビューとして呼び出されるように、コルーチン関数で包みます
+        async def async_view(request, *args, **kwargs):
+            return await view(request, *args, **kwargs)
+        functools.update_wrapper(async_view, view)
+        return async_view
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await get_user(request)
+        if not user.is_authenticated:
+            return self.handle_no_permission()
+        return await super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
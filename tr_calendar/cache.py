@@ -0,0 +1,101 @@
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+# 世代番号のキャッシュがない場合に使う値（まだ取得していないことを表します）
+_missing = object()
+# キャッシュの名前ごとのヒット数、ミス数です。プロセスごとに数えます。 例 {'month_hits': 3, 'month_misses': 1}
+stats = Counter()
+
+
+def get_cache():
+    """ スケジュールのキャッシュに使うキャッシュを返します。
+
+    settings.CACHES の settings.SCHEDULE_CACHE のキャッシュを使います。
+    ローカルではローカルメモリやファイル、本番ではRedisやMemcachedなど、CACHE_URL で切り替えます。
+    """
+    return caches[settings.SCHEDULE_CACHE]
+
+
+def get_generation_key(user_pk):
+    return f'schedule:generation:{user_pk}'
+
+
+def get_generation(user_pk):
+    """ ユーザーのスケジュールの世代番号を返します。
+
+    部位オブジェクト、種目、ルーティン期間を変更するたびに bump_generation で番号を変えるため、
+    キャッシュのキーに世代番号を含めておけば、変更前のキャッシュは使われなくなります。
+    """
+    cache = get_cache()
+    generation = cache.get(get_generation_key(user_pk))
+    if generation is None:
+        generation = time.time_ns()
+        # 他のリクエストが先に作成していればそちらを使います
+        if not cache.add(get_generation_key(user_pk), generation, timeout=None):
+            generation = cache.get(get_generation_key(user_pk), generation)
+    return generation
+
+
+def get_last_modified_key(user_pk):
+    return f'schedule:modified:{user_pk}'
+
+
+def get_last_modified(user_pk):
+    """ ユーザーのスケジュールを最後に変更した日時を返します。
+
+    キャッシュから消えていた場合は現在時刻を変更日時とします。（変更されていないのに新しくなるだけで、古くはなりません）
+    """
+    cache = get_cache()
+    last_modified = cache.get(get_last_modified_key(user_pk))
+    if last_modified is None:
+        last_modified = timezone.now()
+        if not cache.add(get_last_modified_key(user_pk), last_modified, timeout=None):
+            last_modified = cache.get(get_last_modified_key(user_pk), last_modified)
+    return last_modified
+
+
+def bump_generation(user_pk):
+    """ ユーザーのスケジュールの世代番号を変えて、そのユーザーのキャッシュを全て無効にします。
+
+    トランザクションの中で呼んだ場合は、コミットした後に変えます。（ロールバックした場合は変えません）
+    コミット前に変えると、他のリクエストがコミット前の行を読んで新しい世代番号でキャッシュしてしまい、
+    次に変更するまで古いスケジュールを表示し、ETagも304を返し続けるためです。
+    """
+    transaction.on_commit(lambda: _bump_generation(user_pk))
+
+
+def _bump_generation(user_pk):
+    """ 世代番号を変えます。
+
+    世代番号がキャッシュから消えていた場合は現在時刻から作り直すため、以前の番号に戻ることはありません。
+    あわせてスケジュールの変更日時（get_last_modified）を現在時刻にします。
+    """
+    cache = get_cache()
+    try:
+        cache.incr(get_generation_key(user_pk))
+    except ValueError:
+        cache.set(get_generation_key(user_pk), time.time_ns(), timeout=None)
+    cache.set(get_last_modified_key(user_pk), timezone.now(), timeout=None)
+
+
+def get_or_set(user_pk, name, key, default):
+    """ ユーザーの現在の世代のキャッシュを返します。なければ default() の値をキャッシュして返します。
+
+    name はキャッシュの種類（'month'、'week' など）で、ヒット数、ミス数はこの名前ごとに数えます。
+    key はキャッシュを区別する値（表示する月の最初の日付など）です。
+    """
+    cache = get_cache()
+    cache_key = f'schedule:{user_pk}:{get_generation(user_pk)}:{name}:{key}'
+    value = cache.get(cache_key, _missing)
+    if value is _missing:
+        stats[f'{name}_misses'] += 1
+        value = default()
+        cache.set(cache_key, value, timeout=settings.SCHEDULE_CACHE_TIMEOUT)
+    else:
+        stats[f'{name}_hits'] += 1
+    return value
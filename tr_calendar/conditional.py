@@ -0,0 +1,86 @@
+import datetime
+import functools
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from . import cache as schedule_cache
+
+
+def get_validators(request):
+    """ スケジュールを表示するページのETagと最終更新日時を返します。ログインしていない場合は (None, None) を返します。
+
+    ページはスケジュール、種目、ルーティン期間、キャラクターと今日の日付から作られるため、
+    ユーザーの世代番号と今日の日付からETagを作ります。フォームのCSRFトークンはログインし直すと変わるため、CSRFのCookieも含めます。
+    最終更新日時は今日の日付が変わった時点より前にはしません。
+    """
+    if not request.user.is_authenticated:
+        return None, None
+    user_pk = request.user.pk
+    today = datetime.date.today()
+    value = f"{user_pk}:{schedule_cache.get_generation(user_pk)}:{request.META.get('CSRF_COOKIE')}:{today}"
+    etag = quote_etag(hashlib.md5(value.encode()).hexdigest())
+    last_modified = max(
+        schedule_cache.get_last_modified(user_pk),
+        datetime.datetime.combine(today, datetime.time()).astimezone(),
+    )
+    return etag, last_modified
+
+
+def get_not_modified_response(request, etag, last_modified):
+    """ 前回表示した時から変更がなければ304のレスポンスを返します。変更があればNoneを返します。 """
+    if request.method not in ('GET', 'HEAD') or etag is None:
+        return None
+    return get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+
+
+def set_validators(request, response, etag, last_modified):
+    """ レスポンスにETagと最終更新日時を設定します。
+
+    ブラウザがキャッシュしたページをそのまま表示しないように、毎回ETagで変更がないかを確認させます。
+    """
+    if request.method in ('GET', 'HEAD') and response.status_code == 200 and etag is not None:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def schedule_condition(view_func):
+    """ スケジュールを変更していなければ、ビューを実行せずに304を返すデコレータです。 """
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        etag, last_modified = get_validators(request)
+        response = get_not_modified_response(request, etag, last_modified)
+        if response is None:
+            response = set_validators(request, view_func(request, *args, **kwargs), etag, last_modified)
+        return response
+    return wrapper
+
+
+def async_schedule_condition(view_func):
+    """ 非同期の関数ビューで使う schedule_condition です。 """
+    @functools.wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        etag, last_modified = await sync_to_async(get_validators)(request)
+        response = get_not_modified_response(request, etag, last_modified)
+        if response is None:
+            response = set_validators(request, await view_func(request, *args, **kwargs), etag, last_modified)
+        return response
+    return wrapper
+
+
+class ConditionalGetMixin:
+    """ schedule_condition をクラスビューで使うMixinです。LoginRequiredMixin より前に指定します。 """
+
+    def dispatch(self, request, *args, **kwargs):
+        return schedule_condition(super().dispatch)(request, *args, **kwargs)
+
+
+class AsyncConditionalGetMixin:
+    """ async_schedule_condition を非同期のクラスビューで使うMixinです。AsyncLoginRequiredMixin より前に指定します。 """
+
+    async def dispatch(self, request, *args, **kwargs):
+        return await async_schedule_condition(super().dispatch)(request, *args, **kwargs)
@@ -2,6 +2,19 @@ from django import forms
 from routine.models import BodyPart
 
 
+def validate_day_part(part, detail_part, bp_objects):
+    """ その日付に設定されている部位（bp_objects）と同じ部位が選択されたかどうかのバリデーションになります。
+
+    bp_objects は部位オブジェクト（part、detail_partを持つもの）のリストで、部位がない場合は [None] です。
+    """
+    if detail_part == '部位の詳細':
+        raise forms.ValidationError("同じ部位は登録できません")
+    if bp_objects[0] is not None:
+        for bp_object in bp_objects:
+            if part == bp_object.part and detail_part == bp_object.detail_part:
+                raise forms.ValidationError("同じ部位は登録できません")
+
+
 class DayBodyPartForm(forms.ModelForm):
 
     class Meta:
@@ -23,14 +36,8 @@ class DayBodyPartForm(forms.ModelForm):
         """ 同じ部位が選択されたかどうかのバリデーションになります。 """
 
         cleaned_data = super().clean()
-        part = cleaned_data.get('part')
-        detail_part = cleaned_data.get('detail_part')
-        if detail_part == '部位の詳細':
-            raise forms.ValidationError("同じ部位は登録できません")
+        validate_day_part(cleaned_data.get('part'), cleaned_data.get('detail_part'), self.bp_objects)
         if self.bp_objects[0] is not None:
-            for bp_object in self.bp_objects:
-                if part == bp_object.part and detail_part == bp_object.detail_part:
-                    raise forms.ValidationError("同じ部位は登録できません")
             return cleaned_data
 
     def clean_part(self):
@@ -0,0 +1,148 @@
+import asyncio
+import datetime
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, RequestFactory
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from routine.testing import factory_history
+from tr_calendar.testing import reload_urlconfs, use_async_views
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'テスト用DBに対してホーム画面と月間カレンダーへ同時にリクエストし、'
+        'WSGI（同期のビュー）とASGI（非同期のビュー）の1秒あたりのリクエスト数とp99の応答時間を比較します。'
+        'SQLiteの場合は一時ファイルのDBを、MySQLの場合はテスト用のデータベースを作成します。'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='ビューごとのリクエスト数')
+        parser.add_argument('--concurrency', type=int, default=8, help='同時にリクエストする数')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            if connection.vendor == 'sqlite':
+                # 別スレッドの接続から同じデータを読むため、ファイルのDBを使います
+                connection.settings_dict['TEST'] = dict(
+                    connection.settings_dict.get('TEST') or {}, NAME=os.path.join(tmpdir, 'benchmark.sqlite3'))
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                user = User.objects.create_user(email='benchmark@example.com')
+                factory_history(user, datetime.date.today() - datetime.timedelta(days=60), 90)
+                client = Client()
+                client.force_login(user)
+                today = datetime.date.today()
+                urls = [
+                    reverse('home:home'),
+                    reverse('tr_calendar:month_with_schedule', kwargs={'year': today.year, 'month': today.month}),
+                ]
+                results = {}
+                for url in urls:
+                    reload_urlconfs()
+                    results[('wsgi', url)] = self.measure_wsgi(
+                        client, url, options['requests'], options['concurrency'])
+                    with use_async_views(concurrent_loads=True):
+                        results[('asgi', url)] = asyncio.run(self.measure_asgi(
+                            client, url, options['requests'], options['concurrency']))
+                self.report(results)
+            finally:
+                connections.close_all()
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+    def measure_wsgi(self, client, url, request_count, concurrency):
+        """ concurrency個のスレッドからWSGIHandlerを呼び出します。（gunicornのスレッドワーカーと同じです） """
+        factory = RequestFactory()
+        factory.cookies = client.cookies
+        handler = WSGIHandler()
+
+        def start_response(status, headers):
+            if not status.startswith('200'):
+                raise CommandError(f'{url} が {status} を返しました。')
+
+        def run(count):
+            timings = []
+            for _ in range(count):
+                started = time.perf_counter()
+                response = handler(factory.get(url).environ, start_response)
+                b''.join(response)
+                response.close()
+                timings.append(time.perf_counter() - started)
+            connections.close_all()
+            return timings
+
+        counts = [request_count // concurrency + (i < request_count % concurrency) for i in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            timings = [timing for thread_timings in executor.map(run, counts) for timing in thread_timings]
+        return self.summarize(timings, time.perf_counter() - started)
+
+    async def measure_asgi(self, client, url, request_count, concurrency):
+        """ 一つのイベントループからconcurrency個のリクエストを同時にASGIHandlerへ送ります。（uvicornと同じです） """
+        handler = ASGIHandler()
+        cookie = '; '.join(f'{key}={morsel.value}' for key, morsel in client.cookies.items())
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': url,
+            'raw_path': url.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+        }
+
+        async def request():
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.start' and message['status'] != 200:
+                    raise CommandError(f"{url} が {message['status']} を返しました。")
+
+            started = time.perf_counter()
+            await handler(dict(scope), receive, send)
+            return time.perf_counter() - started
+
+        async def run(count):
+            return [await request() for _ in range(count)]
+
+        counts = [request_count // concurrency + (i < request_count % concurrency) for i in range(concurrency)]
+        started = time.perf_counter()
+        results = await asyncio.gather(*(run(count) for count in counts))
+        elapsed = time.perf_counter() - started
+        connections.close_all()
+        return self.summarize([timing for timings in results for timing in timings], elapsed)
+
+    def summarize(self, timings, elapsed):
+        return {
+            'rps': len(timings) / elapsed,
+            'median': statistics.median(timings) * 1000,
+            'p99': sorted(timings)[int(len(timings) * 0.99) - 1] * 1000,
+        }
+
+    def report(self, results):
+        self.stdout.write('')
+        self.stdout.write(f"{'ハンドラ':<8}{'URL':<36}{'req/s':>10}{'中央値(ms)':>12}{'p99(ms)':>10}")
+        for (name, url), result in results.items():
+            self.stdout.write(
+                f"{name:<8}{url:<36}{result['rps']:>10.1f}{result['median']:>12.2f}{result['p99']:>10.2f}"
+            )
@@ -0,0 +1,134 @@
+import datetime
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from discipline.models import Discipline
+from routine.models import BodyPart, TermDecision, PARTS
+from tr_calendar.models import RoutineOverride
+from tr_calendar.overrides import compact_placeholders
+from tr_calendar.schedules import ScheduleResolver, get_term_days
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'テスト用DBに以前のカレンダーの編集（ルーティンの複製 + partがNoneのオブジェクト）で作成したデータを作り、'
+        'ルーティンの変更（RoutineOverride）にまとめた前後の行数と、スケジュールが変わらないことを確認します。'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help='ルーティン期間の日数')
+        parser.add_argument('--parts', type=int, default=3, help='曜日ごとのルーティンオブジェクトの数')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            user = User.objects.create_user(email='benchmark@example.com')
+            start_date = datetime.date.today()
+            days = get_term_days(start_date, start_date + datetime.timedelta(days=options['days'] - 1))
+            self.seed(user, days, options['parts'])
+
+            before = self.count_rows(user)
+            expected = {day: self.get_legacy_parts(user, day) for day in days}
+            started = time.perf_counter()
+            stats = compact_placeholders(apps.get_model, user_pks=[user.pk])
+            elapsed = (time.perf_counter() - started) * 1000
+            after = self.count_rows(user)
+
+            resolver = ScheduleResolver(user, TermDecision.objects.filter(user=user).index(), days)
+            mismatches = [
+                day for day in days
+                if Counter((bp.part, bp.detail_part) for bp in resolver.get_schedules(day)) != expected[day]
+            ]
+            self.report(before, after, stats, elapsed, mismatches)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def seed(self, user, days, part_count):
+        """ 以前の day_schedule_update2、routine_day_delete と同じ行を作成します。
+
+        ・月～土曜日に part_count 部位ずつのルーティンオブジェクト
+        ・ルーティンのある日付の3日に1日は1部位を変更（他の部位の複製 + 複製ごとのpartがNoneのオブジェクト + 変更後の部位）
+        ・それ以外の4日に1日は1部位を削除（他の部位の複製 + partがNoneのオブジェクト）
+        ・スケジュールのある全ての部位に1種目ずつ
+        """
+        parts = [part for part, _ in PARTS]
+        TermDecision.objects.create(user=user, start_date=days[0], end_date=days[-1])
+        routine_objects = {}
+        for i, wd in enumerate(settings.WEEK[:6]):
+            routine_objects[wd] = [
+                BodyPart.objects.create(week=wd, part=parts[(i + n) % len(parts)], user=user)
+                for n in range(part_count)
+            ]
+
+        bp_objects = []
+        for i, day in enumerate(day for day in days if day.weekday() < 6):
+            wd_bp_objects = routine_objects[settings.WEEK[day.weekday()]]
+            if i % 3 == 0:
+                if len(wd_bp_objects) == 1:
+                    bp_objects.append(BodyPart(date=day, user=user))
+                for wd_bp_object in wd_bp_objects[1:]:
+                    bp_objects.append(BodyPart(
+                        date=day, part=wd_bp_object.part, detail_part=wd_bp_object.detail_part, user=user))
+                    bp_objects.append(BodyPart(date=day, user=user))
+                bp_objects.append(BodyPart(date=day, part=parts[-1], user=user))
+            elif i % 4 == 0:
+                for wd_bp_object in wd_bp_objects[1:]:
+                    bp_objects.append(BodyPart(
+                        date=day, part=wd_bp_object.part, detail_part=wd_bp_object.detail_part, user=user))
+                bp_objects.append(BodyPart(date=day, user=user))
+        BodyPart.objects.bulk_create(bp_objects, batch_size=500)
+
+        disciplines = []
+        for day in days:
+            for bp_object in self.get_legacy_schedules(user, day):
+                disciplines.append(Discipline(discipline='種目1', date=day, body_part=bp_object))
+        Discipline.objects.bulk_create(disciplines, batch_size=500)
+
+    def get_legacy_schedules(self, user, day):
+        """ 以前のスケジュールの判定（partがNoneのオブジェクトがあればルーティンを設定しない）で、dayのスケジュールを返します。 """
+        dt_bp_objects = list(BodyPart.objects.filter(user=user, date=day).order_by('pk'))
+        schedules = [dt_bp_object for dt_bp_object in dt_bp_objects if dt_bp_object.part is not None]
+        if len(schedules) == len(dt_bp_objects):
+            schedules += list(BodyPart.objects.filter(user=user, week=settings.WEEK[day.weekday()]).order_by('pk'))
+        return schedules
+
+    def get_legacy_parts(self, user, day):
+        return Counter((bp.part, bp.detail_part) for bp in self.get_legacy_schedules(user, day))
+
+    def count_rows(self, user):
+        return {
+            'BodyPart': BodyPart.objects.filter(user=user).count(),
+            'partがNone': BodyPart.objects.filter(user=user, part=None).count(),
+            'RoutineOverride': RoutineOverride.objects.filter(user=user).count(),
+        }
+
+    def report(self, before, after, stats, elapsed, mismatches):
+        self.stdout.write('')
+        self.stdout.write(f"{'テーブル':<20}{'変更前':>10}{'変更後':>10}")
+        for name in before:
+            self.stdout.write(f'{name:<20}{before[name]:>10}{after[name]:>10}')
+        total_before = before['BodyPart'] + before['RoutineOverride']
+        total_after = after['BodyPart'] + after['RoutineOverride']
+        self.stdout.write(
+            f'{"合計":<20}{total_before:>10}{total_after:>10}'
+            f'  （{(1 - total_after / total_before) * 100:.1f}%削減）'
+        )
+        self.stdout.write(
+            f"削除した複製 {stats.get('clones', 0)}、partがNoneのオブジェクト {stats.get('placeholders', 0)}、"
+            f"作成したルーティンの変更 {stats.get('overrides', 0)}（{elapsed:.0f}ms）"
+        )
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f'スケジュールが変わった日付があります: {mismatches[:10]}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('全ての日付でスケジュールが変わらないことを確認しました。'))
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from tr_calendar.schedules import rebuild_all_day_schedules
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = '部位オブジェクトとルーティン期間から日付ごとのスケジュール（DaySchedule）を作り直します。'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help='指定したユーザーのスケジュールのみ作り直します。')
+
+    def handle(self, *args, **options):
+        user_pks = None
+        if options['email']:
+            try:
+                user_pks = [User.objects.get(email=options['email']).pk]
+            except User.DoesNotExist:
+                raise CommandError(f"ユーザーが見つかりません: {options['email']}")
+
+        # 部位オブジェクトまたはルーティン期間を持つユーザーのみ対象にします。
+        count = rebuild_all_day_schedules(user_pks)
+
+        self.stdout.write(self.style.SUCCESS(f'{count}人のスケジュールを作り直しました。'))
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('routine', '0006_auto_20201118_1236'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DaySchedule',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日付')),
+                ('slot', models.PositiveSmallIntegerField(verbose_name='部位番号')),
+                ('part', models.CharField(choices=[('胸', '胸'), ('背中', '背中'), ('肩', '肩'), ('腕', '腕'), ('脚', '脚'), ('腹', '腹'), ('全身', '全身'), ('上半身', '上半身')], max_length=50, verbose_name='部位')),
+                ('detail_part', models.CharField(blank=True, max_length=50, null=True, verbose_name='部位詳細')),
+                ('body_part', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='routine.bodypart')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date', 'slot'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dayschedule',
+            constraint=models.UniqueConstraint(fields=('user', 'date', 'slot'), name='unique_day_schedule'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('routine', '0007_auto_20261018_2307'),
+        ('tr_calendar', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoutineOverride',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日付')),
+                ('body_part', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='overrides', to='routine.bodypart')),
+                ('replacement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='replaced_overrides', to='routine.bodypart')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='routineoverride',
+            constraint=models.UniqueConstraint(fields=('user', 'date', 'body_part'), name='unique_routine_override'),
+        ),
+    ]
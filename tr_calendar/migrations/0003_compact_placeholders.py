@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from tr_calendar.overrides import compact_placeholders, expand_overrides
+
+
+def compact(apps, schema_editor):
+    compact_placeholders(apps.get_model)
+
+
+def expand(apps, schema_editor):
+    expand_overrides(apps.get_model)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discipline', '0007_remove_discipline_weight_times'),
+        ('routine', '0007_auto_20261018_2307'),
+        ('tr_calendar', '0002_routineoverride'),
+    ]
+
+    operations = [
+        migrations.RunPython(compact, expand),
+    ]
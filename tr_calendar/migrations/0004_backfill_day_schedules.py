@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from tr_calendar.schedules import rebuild_all_day_schedules
+
+
+def backfill(apps, schema_editor):
+    """ 既存のユーザーのDayScheduleを作成します。（manage.py rebuild_schedules と同じです）
+
+    後のマイグレーションでモデルに列を追加しても実行できるように、このマイグレーションの時点のモデルで作成します。
+    """
+    rebuild_all_day_schedules(get_model=apps.get_model)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discipline', '0007_remove_discipline_weight_times'),
+        ('routine', '0009_multiple_terms'),
+        ('tr_calendar', '0003_compact_placeholders'),
+    ]
+
+    operations = [
+        # 戻す場合はDayScheduleをそのまま残します（再度実行すると作り直します）
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
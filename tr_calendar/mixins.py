@@ -5,7 +5,11 @@ from django.utils import timezone
 import itertools
 from collections import deque
 
+from django.conf import settings
+
 from routine.models import TermDecision
+from . import cache as schedule_cache
+from .schedules import DayScheduleResolver
 
 
 class BaseCalendarMixin:
@@ -29,15 +33,44 @@ class BaseCalendarMixin:
         week_names.rotate(-self.first_weekday)  # リスト内の要素を右に1つずつ移動...なんてときは、dequeを使うと中々面白いです
         return week_names
 
+    def get_term_index(self):
+        """ ユーザーの全てのルーティン期間を、日付から二分探索で取得するためのインデックスを返します。
+
+        一度作成したインデックスはビューに保持し、同じリクエスト内ではDBから再取得しません。
+        """
+        if getattr(self, '_term_index', None) is None:
+            self._term_index = TermDecision.objects.filter(user=self.request.user).index()
+        return self._term_index
+
     def get_term_date(self):
-        """ ルーティン期間を取得します。　なければ現在から3か月後までで作成します。 """
-        # ルーティン期間オブジェクトがあれば取り出します。
-        if TermDecision.objects.filter(user=self.request.user).exists():
-            return TermDecision.objects.get(user=self.request.user)
+        """ 今日のルーティン期間（なければ次に始まる、それもなければ最後のルーティン期間）を取得します。
+        ルーティン期間がなければ現在から3か月後までで作成します。
+
+        一度取得したルーティン期間はビューに保持し、同じリクエスト内では再取得しません。
+        """
+        if getattr(self, '_term_date', None) is not None:
+            return self._term_date
 
-        today = timezone.now()
-        after_3_month = today + relativedelta.relativedelta(months=3)
-        return TermDecision.objects.create(start_date=today, end_date=after_3_month, user=self.request.user)
+        # ルーティン期間オブジェクトがあれば取り出します。
+        term_date = self.get_term_index().get_current()
+        if term_date is None:
+            today = timezone.now()
+            after_3_month = today + relativedelta.relativedelta(months=3)
+            term_date = TermDecision.objects.create(start_date=today, end_date=after_3_month, user=self.request.user)
+            self._term_index = None
+        self._term_date = term_date
+        return term_date
+
+    def get_schedule_cache_context(self):
+        """ テンプレートでスケジュールの表示部分をキャッシュするための値を返します。
+
+        schedule_generation をキャッシュのキーに含めるため、スケジュールを変更すると作り直されます。
+        """
+        return {
+            'schedule_cache': settings.SCHEDULE_CACHE,
+            'schedule_cache_timeout': settings.SCHEDULE_CACHE_TIMEOUT,
+            'schedule_generation': schedule_cache.get_generation(self.request.user.pk),
+        }
 
 
 class MonthCalendarMixin(BaseCalendarMixin):
@@ -92,42 +125,37 @@ class MonthWithScheduleMixin(MonthCalendarMixin):
     """スケジュール付きの、月間カレンダーを提供するMixin"""
 
     def get_month_schedules(self, days):
-        """それぞれの日とスケジュールを返す"""
+        """それぞれの日とスケジュールを返す
+
+        同じユーザー、同じ月のスケジュールはスケジュールを変更するまでキャッシュしたものを返します。
+        非同期のビューで取得済みの場合はそれを返します。
+        """
+        # ルーティン期間を取得します。（なければ作成します）
+        self.get_term_date()
+
+        if getattr(self, '_month_schedules', None) is None:
+            self._month_schedules = self.load_month_schedules(days)
+        return self._month_schedules
+
+    def load_month_schedules(self, days):
+        """ それぞれの日とスケジュールを、キャッシュがあればキャッシュから、なければDBから作成して返します。 """
         user = self.request.user
+        return schedule_cache.get_or_set(user.pk, 'month', days[0][0], lambda: self.make_month_schedules(days))
 
-        # ルーティン期間を取得します。
-        term_date = self.get_term_date()
+    def make_month_schedules(self, days):
+        """それぞれの日とスケジュールをDBから作成する"""
+        # 表示する期間のスケジュールをまとめて取得します。
+        resolver = DayScheduleResolver(self.request.user, itertools.chain.from_iterable(days))
 
         # コンテキストのvalueとなる辞書を作る
         day_schedules = {}
 
         # 月の週ごとの日付リストを取り出してさらにそこから一日ずつ取り出して処理
         # {1日のdatetime: 1日のスケジュール全て, 2日のdatetime: 2日の全て...}のような辞書を作る
+        #  例：　{2020/11/25 : [week='水曜日'の部位オブジェクト一つ目, week='水曜日'の部位オブジェクト二つ目,....],{2020/....}
         for one_week in days:
             for day in one_week:
-                week = self.week_names[day.weekday()] + '曜日'  # day が何曜日が取得する
-                # objects.filter　を使っているのでクエリセットがない場合、空のクエリセットを返します
-                dt_bp_objects = self.model.objects.filter(date=day, user=user)  # 日付がdayの日付指定のクエリセットを取得
-                wd_bp_objects = self.model.objects.filter(week=week, user=user)  # 曜日がweekの日付指定のクエリセットを取得
-
-                #  一週間を一日ずつ取り出して、その日付のスケジュールリスト（またはクエリセット）をday_schedules[day]に格納する
-                #  例：　{2020/11/25 : [week='水曜日'の部位オブジェクト一つ目, week='水曜日'の部位オブジェクト二つ目,....],{2020/....}
-                if wd_bp_objects:  # ルーティンのクエリセットが存在する場合
-                    if term_date.judge_term_date(date=day):
-                        if not dt_bp_objects:  # ルーティンのクエリセットのみの場合
-                            day_schedules[day] = wd_bp_objects
-                        # ルーティンのクエリセットとpartがNoneではない日付指定のクエリセットが存在する場合
-                        elif None not in [dt_bp_object.part for dt_bp_object in dt_bp_objects]:
-                            bp_objects = [dt_bp_object for dt_bp_object in dt_bp_objects]
-                            for wd_bp_object in wd_bp_objects:
-                                bp_objects.append(wd_bp_object)
-                            day_schedules[day] = bp_objects
-                        else:  # ルーティンのクエリセットとpartがNoneの日付指定のクエリセットが存在する場合
-                            day_schedules[day] = dt_bp_objects.exclude(part=None)
-                    else:
-                        day_schedules[day] = dt_bp_objects.exclude(part=None)
-                else:  # 日付指定のクエリセットのみの場合
-                    day_schedules[day] = dt_bp_objects.exclude(part=None)
+                day_schedules[day] = resolver.get_schedules(day)
 
         # day_schedules辞書を、周毎に分割する。[{1日: 1日のスケジュール...}, {8日: 8日のスケジュール...}, ...]
         # 7個ずつ取り出して分割しています。
@@ -141,5 +169,6 @@ class MonthWithScheduleMixin(MonthCalendarMixin):
         calendar_context['month_day_schedules'] = self.get_month_schedules(
             month_days,
         )
+        calendar_context.update(self.get_schedule_cache_context())
 
         return calendar_context
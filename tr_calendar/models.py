@@ -1 +1,70 @@
+from django.db import models
+from django.conf import settings
+from routine.models import BodyPart, PARTS
 
+
+class DaySchedule(models.Model):
+    """ 日付ごとのスケジュールを保持します。
+
+    ルーティンオブジェクト、日付指定オブジェクト、partがNoneのオブジェクト、ルーティン期間から
+    導かれる「その日付に何の部位が設定されているか」をあらかじめ展開したものになります。
+    カレンダーはこのテーブルを日付の範囲で取得するだけで表示できます。
+
+    BodyPartを作成・変更・削除する処理では tr_calendar.schedules の refresh_day_schedules、
+    rebuild_day_schedules で更新します。
+    """
+    date = models.DateField('日付')
+    # その日付の何部位目かを表します。（0から始まります）
+    slot = models.PositiveSmallIntegerField('部位番号')
+    part = models.CharField(
+        verbose_name='部位',
+        max_length=50,
+        choices=PARTS,
+    )
+    detail_part = models.CharField(
+        verbose_name='部位詳細',
+        max_length=50,
+        null=True,
+        blank=True,
+    )
+    body_part = models.ForeignKey(BodyPart, on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+
+    class Meta:
+        ordering = ['date', 'slot']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date', 'slot'], name='unique_day_schedule'),
+        ]
+
+    def __str__(self):
+        return f'{self.date} {self.slot} {self.part}'
+
+
+class RoutineOverride(models.Model):
+    """ ルーティンを特定の日付だけ変更・削除したことを表します。
+
+    body_part がNoneの場合              その日付はルーティンを全て設定しません
+    replacement がNoneの場合            その日付は body_part（ルーティンオブジェクト）を設定しません
+    replacement がある場合              その日付は body_part の代わりに replacement（日付指定オブジェクト）を設定します
+
+    ルーティンの他の部位を日付指定オブジェクトとして複製せずに済むため、変更した部位の分だけ作成します。
+    スケジュールへの反映は tr_calendar.schedules の ScheduleResolver で行います。
+    """
+    date = models.DateField('日付')
+    body_part = models.ForeignKey(
+        BodyPart, on_delete=models.CASCADE, null=True, blank=True, related_name='overrides',
+    )
+    # 変更後の部位を削除した場合は、ルーティンを削除した日付として残します
+    replacement = models.ForeignKey(
+        BodyPart, on_delete=models.SET_NULL, null=True, blank=True, related_name='replaced_overrides',
+    )
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            # ユーザー、日付での取得にもこのインデックスを使います
+            models.UniqueConstraint(fields=['user', 'date', 'body_part'], name='unique_routine_override'),
+        ]
+
+    def __str__(self):
+        return f'{self.date} {self.body_part} → {self.replacement}'
@@ -0,0 +1,106 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+
+def compact_placeholders(get_model, user_pks=None):
+    """ 以前のカレンダーの編集で作成した、partがNoneの日付指定オブジェクトとルーティンの複製をルーティンの変更にまとめます。
+
+    以前はルーティンを特定の日付だけ変更・削除すると、その曜日の他のルーティンオブジェクトを日付指定オブジェクトとして複製し、
+    partがNoneの日付指定オブジェクト（複製した部位ごとに重複して）を作成して、その日付のルーティンを設定しないようにしていました。
+
+    partがNoneの日付指定オブジェクトがある日付ごとに
+        ルーティン期間内でその曜日のルーティンオブジェクトがある場合
+            ルーティンオブジェクトと同じ部位、部位詳細の日付指定オブジェクトを複製とみなして削除し、
+            複製の種目とスケジュールはルーティンオブジェクトに付け替えます。
+            複製のないルーティンオブジェクトは、その日付だけ設定しないルーティンの変更を作成します。
+        それ以外の場合
+            その日付のルーティンを全て設定しないルーティンの変更を作成します。
+    最後にpartがNoneの日付指定オブジェクトを全て削除します。
+
+    マイグレーションとベンチマークで使うため、モデルは get_model（apps.get_model）から取得します。
+    user_pks を指定した場合はそのユーザーのみまとめます。
+    削除した部位オブジェクトの数と作成したルーティンの変更の数を返します。 例 {'placeholders': 10, 'clones': 8, 'overrides': 2}
+    """
+    BodyPart = get_model('routine', 'BodyPart')
+    TermDecision = get_model('routine', 'TermDecision')
+    Discipline = get_model('discipline', 'Discipline')
+    DaySchedule = get_model('tr_calendar', 'DaySchedule')
+    RoutineOverride = get_model('tr_calendar', 'RoutineOverride')
+
+    placeholders = BodyPart.objects.filter(part=None, date__isnull=False)
+    if user_pks is not None:
+        placeholders = placeholders.filter(user__in=user_pks)
+    placeholder_dates = defaultdict(set)
+    for user_pk, date in placeholders.values_list('user', 'date').distinct():
+        placeholder_dates[user_pk].add(date)
+
+    stats = Counter()
+    for user_pk, dates in sorted(placeholder_dates.items()):
+        term_date = TermDecision.objects.filter(user=user_pk).first()
+        routine_objects = defaultdict(list)
+        for bp_object in BodyPart.objects.filter(user=user_pk, week__isnull=False).order_by('pk'):
+            routine_objects[bp_object.week].append(bp_object)
+        date_objects = defaultdict(list)
+        for bp_object in BodyPart.objects.filter(user=user_pk, date__in=dates, part__isnull=False).order_by('pk'):
+            date_objects[bp_object.date].append(bp_object)
+
+        overrides = []
+        clones = {}  # {複製のpk: ルーティンオブジェクトのpk}
+        for date in sorted(dates):
+            wd_bp_objects = routine_objects.get(settings.WEEK[date.weekday()], [])
+            in_term = (
+                term_date is not None and term_date.start_date is not None and term_date.end_date is not None
+                and term_date.start_date <= date <= term_date.end_date
+            )
+            if not in_term or not wd_bp_objects:
+                overrides.append(RoutineOverride(date=date, user_id=user_pk))
+                continue
+            dt_bp_objects = list(date_objects.get(date, []))
+            for wd_bp_object in wd_bp_objects:
+                clone = next((
+                    dt_bp_object for dt_bp_object in dt_bp_objects
+                    if (dt_bp_object.part, dt_bp_object.detail_part) == (wd_bp_object.part, wd_bp_object.detail_part)
+                ), None)
+                if clone is None:
+                    overrides.append(RoutineOverride(date=date, body_part_id=wd_bp_object.pk, user_id=user_pk))
+                else:
+                    dt_bp_objects.remove(clone)
+                    clones[clone.pk] = wd_bp_object.pk
+
+        for clone_pk, wd_bp_object_pk in clones.items():
+            Discipline.objects.filter(body_part=clone_pk).update(body_part=wd_bp_object_pk)
+            DaySchedule.objects.filter(body_part=clone_pk).update(body_part=wd_bp_object_pk)
+        BodyPart.objects.filter(pk__in=list(clones)).delete()
+        RoutineOverride.objects.bulk_create(overrides, batch_size=500)
+        user_placeholders = BodyPart.objects.filter(user=user_pk, part=None, date__isnull=False)
+        stats['placeholders'] += user_placeholders.count()
+        user_placeholders.delete()
+        stats['clones'] += len(clones)
+        stats['overrides'] += len(overrides)
+    return dict(stats)
+
+
+def expand_overrides(get_model):
+    """ compact_placeholders の逆で、ルーティンの変更をpartがNoneの日付指定オブジェクトとルーティンの複製に戻します。 """
+    BodyPart = get_model('routine', 'BodyPart')
+    RoutineOverride = get_model('tr_calendar', 'RoutineOverride')
+
+    day_overrides = defaultdict(set)
+    for user_pk, date, body_part_pk in RoutineOverride.objects.values_list('user', 'date', 'body_part'):
+        day_overrides[(user_pk, date)].add(body_part_pk)
+    routine_objects = defaultdict(list)
+    for bp_object in BodyPart.objects.filter(week__isnull=False).order_by('pk'):
+        routine_objects[(bp_object.user_id, bp_object.week)].append(bp_object)
+
+    bp_objects = []
+    for (user_pk, date), overrides in sorted(day_overrides.items()):
+        if None not in overrides:
+            for wd_bp_object in routine_objects.get((user_pk, settings.WEEK[date.weekday()]), []):
+                if wd_bp_object.pk not in overrides:
+                    bp_objects.append(BodyPart(
+                        date=date, part=wd_bp_object.part, detail_part=wd_bp_object.detail_part, user_id=user_pk,
+                    ))
+        bp_objects.append(BodyPart(date=date, user_id=user_pk))
+    BodyPart.objects.bulk_create(bp_objects, batch_size=500)
+    RoutineOverride.objects.all().delete()
@@ -0,0 +1,247 @@
+import datetime
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from routine.models import TermDecision, ROUTINE_QUERY
+from routine.recurrence import expand_rules
+from routine.terms import TermIndex
+from .cache import bump_generation
+from .models import DaySchedule
+
+
+def get_date_query(days):
+    """ daysの日付を取得するための条件を返します。
+
+    連続した日付ごとに範囲で取得します。
+    例： [11/1, 11/2, 11/3, 11/10] → 11/1～11/3 または 11/10～11/10
+    """
+    date_query = Q()
+    days = sorted(days)
+    first = previous = days[0]
+    for day in days[1:]:
+        if (day - previous).days != 1:
+            date_query |= Q(date__range=(first, previous))
+            first = day
+        previous = day
+    return date_query | Q(date__range=(first, previous))
+
+
+def get_term_days(start_date, end_date):
+    """ start_date～end_date の全ての日付を返します。どちらかがNoneの場合は空のリストを返します。 """
+    if start_date is None or end_date is None:
+        return []
+    return [start_date + datetime.timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+
+class ScheduleResolver:
+    def __init__(self, user, term_index, days, get_model=apps.get_model):
+        """ 指定した日付のスケジュールを部位オブジェクトから解決します。
+
+        ルーティンオブジェクト、日付指定オブジェクト、ルーティンの変更（RoutineOverride）、ルーティン期間から
+        日付ごとのスケジュールを作ります。DayScheduleを作成する際に使います。
+        繰り返しルールのあるルーティンオブジェクトは、daysの最初から最後の日付までの繰り返しの日付だけを計算します。
+
+        days の日付指定オブジェクトとすべてのルーティンオブジェクトを一回のクエリで、
+        days のルーティンの変更をもう一回のクエリで取得し、日付ごとのスケジュールの判定はメモリ上で行います。
+        日付ごとのルーティン期間は term_index（routine.terms.TermIndex）から二分探索で取得し、
+        その期間のルーティンオブジェクトと、期間を指定していないルーティンオブジェクトを設定します。
+        term_index が None の場合、ルーティンオブジェクトはどの日付にも設定されません。
+        マイグレーションでも使うため、モデルは get_model（apps.get_model）から取得します。
+
+        self.routine_objects
+            {'月曜日': [week='月曜日'の部位オブジェクト, ...], '火曜日': [...], ...}
+        self.rule_objects
+            {日付: [その日付に繰り返す、繰り返しルールのある部位オブジェクト, ...], ...}
+        self.date_objects
+            {日付: [date=日付の部位オブジェクト, ...], ...}
+        self.overrides
+            {日付: {ルーティンオブジェクトのpk（ルーティンを全て設定しない場合はNone）: 変更後の部位オブジェクトのpk または None}, ...}
+        """
+        self.term_index = term_index
+        self.days = set(days)
+        self.routine_objects = defaultdict(list)
+        self.date_objects = defaultdict(list)
+        self.overrides = defaultdict(dict)
+        BodyPart = get_model('routine', 'BodyPart')
+        RoutineOverride = get_model('tr_calendar', 'RoutineOverride')
+
+        date_query = get_date_query(self.days)
+        bp_objects = BodyPart.objects.filter(date_query | ROUTINE_QUERY, user=user).order_by('pk')
+        rule_objects = []
+        for bp_object in bp_objects:
+            if bp_object.date is not None:
+                self.date_objects[bp_object.date].append(bp_object)
+            if bp_object.week is not None:
+                self.routine_objects[bp_object.week].append(bp_object)
+            if bp_object.rrule is not None:
+                rule_objects.append(bp_object)
+        self.rule_objects = expand_rules(rule_objects, min(self.days), max(self.days))
+
+        overrides = RoutineOverride.objects.filter(date_query, user=user).values_list(
+            'date', 'body_part_id', 'replacement_id')
+        for date, body_part_pk, replacement_pk in overrides:
+            self.overrides[date][body_part_pk] = replacement_pk
+
+    def get_day_objects(self, day):
+        """ dayの日付に設定されているルーティンオブジェクトと日付指定オブジェクトを返します。
+
+        ルーティン期間内で、ルーティンを全て設定しない日付でなければ、曜日のルーティンオブジェクトと
+        その日付に繰り返す繰り返しルールのあるルーティンオブジェクトのうち、
+        その日付のルーティン期間のもの（期間を指定していないものを含む）を設定します。
+            ルーティンの変更で削除したルーティンオブジェクトは設定しません
+            ルーティンの変更で変更したルーティンオブジェクトは、同じ位置に変更後の日付指定オブジェクトを設定します
+        日付指定オブジェクトは、変更後の日付指定オブジェクトとして設定したもの以外を全て設定します。
+
+        例： ([ルーティンオブジェクト, 変更後の日付指定オブジェクト, ...], [日付指定オブジェクト, ...])
+        """
+        if day not in self.days:
+            raise ValueError(f'{day} のスケジュールは取得されていません')
+
+        overrides = self.overrides.get(day, {})
+        dt_bp_objects = {dt_bp_object.pk: dt_bp_object for dt_bp_object in self.date_objects.get(day, [])}
+        wd_bp_objects = []
+        term = self.term_index.get_term(day) if self.term_index is not None else None
+        if None not in overrides and term is not None:
+            wd = settings.WEEK[day.weekday()]
+            for wd_bp_object in self.routine_objects.get(wd, []) + self.rule_objects.get(day, []):
+                if wd_bp_object.term_id not in (None, term.pk):
+                    continue
+                if wd_bp_object.pk not in overrides:
+                    wd_bp_objects.append(wd_bp_object)
+                elif overrides[wd_bp_object.pk] in dt_bp_objects:
+                    wd_bp_objects.append(dt_bp_objects.pop(overrides[wd_bp_object.pk]))
+        return wd_bp_objects, list(dt_bp_objects.values())
+
+    def get_schedules(self, day):
+        """ dayの日付のスケジュールリストを返します。
+
+        日付指定オブジェクトの後に、ルーティンオブジェクト（ルーティンの変更を反映したもの）を並べます。
+        """
+        wd_bp_objects, dt_bp_objects = self.get_day_objects(day)
+        return dt_bp_objects + wd_bp_objects
+
+
+class DayScheduleResolver:
+    def __init__(self, user, days):
+        """ 指定した日付のスケジュールをDayScheduleから取得します。
+
+        daysの範囲のDayScheduleを部位オブジェクトとあわせて一回のクエリで取得します。
+        get_schedules は ScheduleResolver と同じ値を返します。
+        """
+        self.days = set(days)
+        self.schedules = defaultdict(list)
+
+        day_schedules = DaySchedule.objects.filter(
+            get_date_query(self.days), user=user
+        ).select_related('body_part').order_by('date', 'slot')
+        for day_schedule in day_schedules:
+            self.schedules[day_schedule.date].append(day_schedule.body_part)
+
+    def get_schedules(self, day):
+        """ dayの日付のスケジュールリストを返します。 """
+        if day not in self.days:
+            raise ValueError(f'{day} のスケジュールは取得されていません')
+        return list(self.schedules.get(day, []))
+
+
+def build_day_schedules(user, resolver, days, get_model=apps.get_model):
+    """ daysの日付のDayScheduleオブジェクトを作成します。（DBには保存しません） """
+    DaySchedule = get_model('tr_calendar', 'DaySchedule')
+    day_schedules = []
+    for day in sorted(days):
+        for slot, bp_object in enumerate(resolver.get_schedules(day)):
+            day_schedules.append(DaySchedule(
+                date=day,
+                slot=slot,
+                part=bp_object.part,
+                detail_part=bp_object.detail_part,
+                body_part=bp_object,
+                user=user,
+            ))
+    return day_schedules
+
+
+def refresh_day_schedules(user, days):
+    """ daysの日付のDayScheduleを作り直します。
+
+    日付指定オブジェクトを作成・変更・削除した場合など、影響する日付が分かっている場合に使います。
+    """
+    days = set(days)
+    if not days:
+        return
+    resolver = ScheduleResolver(user, TermDecision.objects.filter(user=user).index(), days)
+    with transaction.atomic():
+        DaySchedule.objects.filter(get_date_query(days), user=user).delete()
+        DaySchedule.objects.bulk_create(build_day_schedules(user, resolver, days), batch_size=500)
+    # bulk_create、bulk_updateではシグナルが送られないため、ここでもキャッシュを無効にします
+    bump_generation(user.pk)
+
+
+def rebuild_day_schedules(user, get_model=apps.get_model):
+    """ ユーザーのDayScheduleをすべて作り直します。
+
+    ルーティンオブジェクトやルーティン期間を変更した場合など、影響する日付がルーティン期間全体に及ぶ場合に使います。
+    作り直す日付は日付指定オブジェクトのある日付と全てのルーティン期間の全ての日付です。
+    マイグレーションでも使うため、モデルは get_model（apps.get_model）から取得します。
+    """
+    BodyPart = get_model('routine', 'BodyPart')
+    DaySchedule = get_model('tr_calendar', 'DaySchedule')
+    term_index = TermIndex(get_model('routine', 'TermDecision').objects.filter(user=user))
+    days = set(BodyPart.objects.filter(user=user, date__isnull=False).values_list('date', flat=True))
+    days.update(term_index.get_days())
+
+    with transaction.atomic():
+        DaySchedule.objects.filter(user=user).delete()
+        if days:
+            # 最初から最後の日付までを範囲で取得するため、連続した日付で部位オブジェクトを取得します。
+            resolver = ScheduleResolver(user, term_index, get_term_days(min(days), max(days)), get_model)
+            DaySchedule.objects.bulk_create(build_day_schedules(user, resolver, days, get_model), batch_size=500)
+    bump_generation(user.pk)
+
+
+def rebuild_all_day_schedules(user_pks=None, get_model=apps.get_model):
+    """ 部位オブジェクトまたはルーティン期間を持つ全てのユーザー（user_pks を指定した場合はそのユーザーのみ）の
+    DayScheduleを作り直し、作り直したユーザー数を返します。
+
+    マイグレーションでも使うため、モデルは get_model（apps.get_model）から取得します。
+    """
+    pks = set(get_model('routine', 'BodyPart').objects.values_list('user', flat=True).distinct())
+    pks.update(get_model('routine', 'TermDecision').objects.values_list('user', flat=True))
+    if user_pks is not None:
+        pks &= set(user_pks)
+    count = 0
+    for user in get_model(settings.AUTH_USER_MODEL).objects.filter(pk__in=pks).order_by('pk').iterator():
+        rebuild_day_schedules(user, get_model)
+        count += 1
+    return count
+
+
+def get_range_schedules(user, start_date, end_date):
+    """ start_date～end_date の日付ごとのスケジュールを、JSONで返すための辞書で返します。
+
+    DayScheduleを部位オブジェクトの曜日とあわせて一回のクエリで取得します。
+    同じ部位オブジェクトは何日にも設定されるため、部位オブジェクトは parts にまとめ、days には pk のみを入れます。
+    スケジュールのない日付は days に含めません。
+
+    例： {'from': '2020-11-01', 'to': '2020-11-30',
+          'parts': {'12': ['胸', 'ベンチプレス', '月曜日'], '15': ['腕', None, None]},
+          'days': {'2020-11-02': [12, 15], '2020-11-09': [12]}}
+    """
+    parts = {}
+    days = defaultdict(list)
+    day_schedules = DaySchedule.objects.filter(
+        user=user, date__range=(start_date, end_date)
+    ).order_by('date', 'slot').values_list('date', 'body_part_id', 'part', 'detail_part', 'body_part__week')
+    for date, body_part_pk, part, detail_part, week in day_schedules:
+        parts[str(body_part_pk)] = [part, detail_part, week]
+        days[date.isoformat()].append(body_part_pk)
+    return {
+        'from': start_date.isoformat(),
+        'to': end_date.isoformat(),
+        'parts': parts,
+        'days': days,
+    }
@@ -0,0 +1,112 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from character.models import Character
+from discipline.models import Discipline
+from routine.models import BodyPart, TermDecision
+from .cache import bump_generation
+from .schedules import get_term_days, rebuild_day_schedules, refresh_day_schedules
+
+
+@receiver(post_save, sender=BodyPart)
+@receiver([post_save, post_delete], sender=TermDecision)
+@receiver(post_delete, sender=Character)
+def bump_user_generation(sender, instance, **kwargs):
+    """ 部位オブジェクト、ルーティン期間、キャラクターを変更したユーザーのスケジュールのキャッシュを無効にします。
+
+    ホーム画面などのETag（tr_calendar.conditional）も世代番号から作るため、変更後は304を返さなくなります。
+    部位オブジェクト、種目の削除にはレシーバーを設定しません。（レシーバーがあると削除する行を一行ずつ取得するため）
+    削除するビューや管理画面で bump_generation を呼びます。
+    """
+    bump_generation(instance.user_id)
+
+
+@receiver(post_save, sender=BodyPart)
+def rebuild_routine_day_schedules(sender, instance, raw, **kwargs):
+    """ ルーティンオブジェクト（曜日または繰り返しルールのある部位オブジェクト）を保存した場合、DayScheduleを作り直します。
+
+    ルーティン設定画面は bulk_create、bulk_update で保存して作り直すため、管理画面などで保存した場合のためのものです。
+    ルーティンオブジェクトはルーティン期間全体に影響するため、すべての日付を作り直します。
+    """
+    if raw or (instance.week is None and instance.rrule is None):
+        return
+    rebuild_day_schedules(instance.user)
+
+
+@receiver(post_save, sender=Character)
+def bump_character_user_generation(sender, instance, created, **kwargs):
+    """ キャラクターを変更したユーザーのスケジュールのキャッシュを無効にします。
+
+    キャラクターはホーム画面の表示中（Character.objects.provision）に作成されるため、作成した時は無効にしません。
+    （作成したキャラクターは表示中のページに含まれます）
+    """
+    if not created:
+        bump_generation(instance.user_id)
+
+
+@receiver(post_save, sender=Discipline)
+def bump_discipline_user_generation(sender, instance, **kwargs):
+    """ 種目を変更したユーザーのスケジュールのキャッシュを無効にします。
+
+    ビューでは部位オブジェクトを設定してから保存するため、取得済みの部位オブジェクトのユーザーを使います。
+    """
+    if Discipline.body_part.is_cached(instance):
+        user_pk = instance.body_part.user_id
+    else:
+        user_pk = BodyPart.objects.filter(pk=instance.body_part_id).values_list('user', flat=True).first()
+    bump_generation(user_pk)
+
+
+def get_instance_term_days(start_date, end_date):
+    """ ルーティン期間の日付を返します。
+
+    作成直後のインスタンスには datetime が入っている場合があるため、DateField と同じように日付に変換します。
+    """
+    start_field = TermDecision._meta.get_field('start_date')
+    return get_term_days(start_field.to_python(start_date), start_field.to_python(end_date))
+
+
+@receiver(pre_save, sender=TermDecision)
+def keep_old_term_days(sender, instance, raw, **kwargs):
+    """ 変更前のルーティン期間の日付を保持します。（保存後にスケジュールを作り直す日付に含めます） """
+    instance._old_term_days = None
+    if raw or instance.pk is None:
+        return
+    old_term = TermDecision.objects.filter(pk=instance.pk).values_list('start_date', 'end_date').first()
+    if old_term is not None:
+        instance._old_term_days = get_instance_term_days(*old_term)
+
+
+@receiver(post_save, sender=TermDecision)
+def refresh_term_day_schedules(sender, instance, raw, **kwargs):
+    """ ルーティン期間を作成・変更した場合、変更前後のルーティン期間のDayScheduleを作り直します。
+
+    ルーティン設定画面以外（管理画面、カレンダー表示時のルーティン期間の自動作成など）で保存した場合も
+    スケジュールに反映するためのものです。期間の日付が変わらない場合は作り直しません。
+    """
+    if raw:
+        return
+    old_days = getattr(instance, '_old_term_days', None) or []
+    new_days = get_instance_term_days(instance.start_date, instance.end_date)
+    if old_days != new_days:
+        refresh_day_schedules(instance.user, old_days + new_days)
+
+
+@receiver(post_delete, sender=TermDecision)
+def refresh_deleted_term_day_schedules(sender, instance, **kwargs):
+    """ ルーティン期間を削除した場合、その期間のDayScheduleを作り直します。
+
+    ユーザーの削除でルーティン期間が削除される場合もあるため、コミット後にユーザーが残っていれば作り直します。
+    """
+    days = get_instance_term_days(instance.start_date, instance.end_date)
+    user_pk = instance.user_id
+
+    def refresh():
+        user = get_user_model().objects.filter(pk=user_pk).first()
+        if user is not None:
+            refresh_day_schedules(user, days)
+
+    if days:
+        transaction.on_commit(refresh)
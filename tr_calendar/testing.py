@@ -0,0 +1,42 @@
+import importlib
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test import override_settings
+from django.urls import clear_url_caches
+
+from .models import RoutineOverride
+
+# settings.ASYNC_VIEWS で同期・非同期のビューを切り替えるURLconf
+ASYNC_VIEW_URLCONFS = ['home.urls', 'tr_calendar.urls']
+
+
+def factory_routine_override(**kwargs):
+    """ テスト用のルーティンの変更のデータを作る
+
+    body_partを指定しなければ、その日付はルーティンを全て設定しません。
+    """
+    return RoutineOverride.objects.create(**kwargs)
+
+
+@contextmanager
+def use_async_views(concurrent_loads=False):
+    """ ホーム、カレンダー、日付ごとの部位設定を非同期のビューにします。
+
+    concurrent_loads がFalseの場合、DBの読み込みをリクエストのスレッドで行います。（TestCaseのトランザクション内のデータを読むため）
+    """
+    try:
+        with override_settings(ASYNC_VIEWS=True, ASYNC_CONCURRENT_LOADS=concurrent_loads):
+            reload_urlconfs()
+            yield
+    finally:
+        # settings.ASYNC_VIEWS を戻した後に、同期のビューのURLconfに戻します
+        reload_urlconfs()
+
+
+def reload_urlconfs():
+    for urlconf in ASYNC_VIEW_URLCONFS:
+        importlib.reload(importlib.import_module(urlconf))
+    # include() したURLconfを読み直すため、ROOT_URLCONF も読み直します
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
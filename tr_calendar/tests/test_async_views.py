@@ -0,0 +1,110 @@
+import asyncio
+import datetime
+
+from django.test import TestCase, TransactionTestCase
+from django.urls import resolve, reverse
+
+from character.models import Character
+from discipline.models import Discipline
+from register.testing import factory_user
+from routine.models import BodyPart
+from routine.testing import factory_term_decision, factory_body_part
+from tr_calendar.cache import get_cache
+from tr_calendar.schedules import rebuild_day_schedules
+from tr_calendar.testing import factory_routine_override, use_async_views
+
+
+def create_schedules(user):
+    factory_term_decision(user=user, start_date=datetime.date(2020, 9, 1), end_date=datetime.date(2020, 12, 1))
+    monday_chest = factory_body_part(week='月曜日', part='胸', user=user)
+    factory_body_part(week='月曜日', part='背中', user=user)
+    factory_body_part(date=datetime.date(2020, 11, 2), part='腕', user=user)
+    factory_routine_override(date=datetime.date(2020, 11, 11), user=user)
+    factory_body_part(date=datetime.date(2020, 11, 11), part='肩', user=user)
+    Discipline.objects.create(discipline='ベンチプレス', date=datetime.date(2020, 11, 2), body_part=monday_chest)
+    Character.objects.provision(user)
+    rebuild_day_schedules(user)
+
+
+class AsyncViewsTestMixin:
+    """ 非同期のビューが同期のビューと同じコンテキストを返すことを確認します。 """
+    concurrent_loads = False
+
+    def _get(self, url, keys):
+        get_cache().clear()
+        res = self.client.get(url)
+        return {key: res.context[key] for key in keys}
+
+    def _assert_same(self, url, keys):
+        expected = self._get(url, keys)
+        with use_async_views(self.concurrent_loads):
+            self.assertTrue(asyncio.iscoroutinefunction(resolve(url).func))
+            actual = self._get(url, keys)
+        self.assertEqual(actual, expected)
+
+    def test_home(self):
+        self._assert_same(
+            reverse('home:home', kwargs={'year': 2020, 'month': 11, 'day': 2}),
+            ['week_day_schedules', 'today_schedules', 'character', 'character_serif'],
+        )
+
+    def test_month_with_schedule(self):
+        self._assert_same(
+            reverse('tr_calendar:month_with_schedule', kwargs={'year': 2020, 'month': 11}),
+            ['month_day_schedules', 'month_current'],
+        )
+
+    def test_day_schedule_detail(self):
+        for day in [2, 9, 11, 12]:
+            self._assert_same(
+                reverse('tr_calendar:day_schedule_detail', kwargs={'year': 2020, 'month': 11, 'day': day, 'detail': 1}),
+                ['bp_objects_judge_discipline_list'],
+            )
+
+    def test_day_schedule_create(self):
+        self._assert_same(
+            reverse('tr_calendar:day_schedule_create', kwargs={'year': 2020, 'month': 11, 'day': 2}),
+            ['wd_dt_bp_objects', 'error'],
+        )
+
+
+class TestAsyncViews(AsyncViewsTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        create_schedules(cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_day_schedule_create_post(self):
+        url = reverse('tr_calendar:day_schedule_create', kwargs={'year': 2020, 'month': 11, 'day': 10})
+        with use_async_views():
+            res = self.client.post(url, {'part': '脚'})
+
+        self.assertRedirects(
+            res, reverse('tr_calendar:month_with_schedule', kwargs={'year': 2020, 'month': 11}),
+            fetch_redirect_response=False,
+        )
+        self.assertTrue(BodyPart.objects.filter(user=self.user, date=datetime.date(2020, 11, 10), part='脚').exists())
+
+    def test_login_required(self):
+        self.client.logout()
+        with use_async_views():
+            for url in [
+                reverse('home:home'),
+                reverse('tr_calendar:month_with_schedule'),
+                reverse('tr_calendar:day_schedule_create', kwargs={'year': 2020, 'month': 11, 'day': 2}),
+            ]:
+                res = self.client.get(url)
+                self.assertRedirects(res, f"{reverse('register:login')}?next={url}", fetch_redirect_response=False)
+
+
+class TestAsyncViewsConcurrentLoads(AsyncViewsTestMixin, TransactionTestCase):
+    """ DBの読み込みを別スレッドで同時に行っても同じコンテキストになること """
+    concurrent_loads = True
+
+    def setUp(self):
+        self.user = factory_user()
+        create_schedules(self.user)
+        self.client.force_login(self.user)
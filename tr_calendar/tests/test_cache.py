@@ -0,0 +1,193 @@
+import datetime
+
+from django.db import connection
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from discipline.models import Discipline
+from discipline.testing import get_sets_data
+from register.testing import factory_user
+from routine.testing import factory_term_decision, factory_body_part
+from tr_calendar import cache as schedule_cache
+from tr_calendar.schedules import rebuild_day_schedules
+
+
+class TestScheduleCache(TestCase):
+    def setUp(self):
+        schedule_cache.get_cache().clear()
+
+    def test_get_or_set(self):
+        schedule_cache.stats.clear()
+        self.assertEqual(schedule_cache.get_or_set(1, 'test', 'a', lambda: 'first'), 'first')
+        self.assertEqual(schedule_cache.get_or_set(1, 'test', 'a', lambda: 'second'), 'first')
+        # ユーザーやキーが違えば別のキャッシュになること
+        self.assertEqual(schedule_cache.get_or_set(2, 'test', 'a', lambda: 'other'), 'other')
+        self.assertEqual(schedule_cache.get_or_set(1, 'test', 'b', lambda: 'other'), 'other')
+        self.assertEqual(schedule_cache.stats, {'test_hits': 1, 'test_misses': 3})
+
+    def test_bump_generation(self):
+        generation = schedule_cache.get_generation(1)
+        schedule_cache.get_or_set(1, 'test', 'a', lambda: 'first')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_cache.bump_generation(1)
+        self.assertNotEqual(schedule_cache.get_generation(1), generation)
+        self.assertEqual(schedule_cache.get_or_set(1, 'test', 'a', lambda: 'second'), 'second')
+
+    def test_bump_generation_on_commit(self):
+        """ トランザクションの中では、コミットするまで世代番号を変えないこと """
+        generation = schedule_cache.get_generation(1)
+        with self.captureOnCommitCallbacks() as callbacks:
+            schedule_cache.bump_generation(1)
+            self.assertEqual(schedule_cache.get_generation(1), generation)
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(schedule_cache.get_generation(1), generation)
+
+    def test_bump_generation_evicted(self):
+        """ 世代番号がキャッシュから消えていても以前の番号に戻らないこと """
+        generation = schedule_cache.get_generation(1)
+        schedule_cache.get_cache().delete(schedule_cache.get_generation_key(1))
+
+        schedule_cache.bump_generation(1)
+        self.assertGreater(schedule_cache.get_generation(1), generation)
+
+
+class TestScheduleCacheInvalidation(TestCase):
+    """ スケジュールを変更する全てのビューの後にキャッシュが使われないこと """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        factory_term_decision(
+            user=cls.user,
+            start_date=datetime.date(2020, 9, 1),
+            end_date=datetime.date(2020, 12, 1),
+        )
+        cls.monday_chest = factory_body_part(week='月曜日', part='胸', user=cls.user)
+        cls.arm = factory_body_part(date=datetime.date(2020, 11, 4), part='腕', user=cls.user)
+        cls.discipline = Discipline.objects.create(
+            discipline='ベンチプレス', date=datetime.date(2020, 11, 2), body_part=cls.monday_chest)
+        rebuild_day_schedules(cls.user)
+
+    def setUp(self):
+        schedule_cache.get_cache().clear()
+        self.client.force_login(self.user)
+
+    def _get_parts(self, date):
+        """ 月間カレンダーと週間カレンダーを表示して、dateのスケジュールの部位を返します。 """
+        res = self.client.get(reverse('tr_calendar:month_with_schedule', kwargs={'year': 2020, 'month': 11}))
+        self.client.get(reverse('home:home', kwargs={'year': date.year, 'month': date.month, 'day': date.day}))
+        day_schedules = {}
+        for week_day_schedules in res.context['month_day_schedules']:
+            day_schedules.update(week_day_schedules)
+        return [bp_object.part for bp_object in day_schedules[date]]
+
+    def _assert_invalidated(self, date, expected, write):
+        self._get_parts(date)
+        stats = schedule_cache.stats.copy()
+        self._get_parts(date)
+        self.assertEqual(schedule_cache.stats['month_hits'], stats['month_hits'] + 1)
+        self.assertEqual(schedule_cache.stats['week_hits'], stats['week_hits'] + 1)
+
+        # キャッシュはコミットした後に無効にします
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        stats = schedule_cache.stats.copy()
+        self.assertEqual(self._get_parts(date), expected)
+        self.assertEqual(schedule_cache.stats['month_misses'], stats['month_misses'] + 1)
+        self.assertEqual(schedule_cache.stats['week_misses'], stats['week_misses'] + 1)
+
+    def test_day_schedule_create(self):
+        self._assert_invalidated(datetime.date(2020, 11, 9), ['脚', '胸'], lambda: self.client.post(
+            reverse('tr_calendar:day_schedule_create', kwargs={'year': 2020, 'month': 11, 'day': 9}),
+            {'part': '脚'},
+        ))
+
+    def test_day_schedule_update(self):
+        self._assert_invalidated(datetime.date(2020, 11, 4), ['肩'], lambda: self.client.post(
+            reverse('tr_calendar:day_schedule_update', kwargs={'pk': self.arm.pk}), {'part': '肩'},
+        ))
+
+    def test_day_schedule_update2(self):
+        self._assert_invalidated(datetime.date(2020, 11, 16), ['脚'], lambda: self.client.post(
+            reverse('tr_calendar:day_schedule_update2', kwargs={
+                'pk': self.monday_chest.pk, 'year': 2020, 'month': 11, 'day': 16,
+            }),
+            {'part': '脚'},
+        ))
+
+    def test_routine_day_delete(self):
+        self._assert_invalidated(datetime.date(2020, 11, 4), [], lambda: self.client.post(
+            reverse('tr_calendar:routine_day_delete', kwargs={'year': 2020, 'month': 11, 'day': 4}),
+            {'delete_dt_obj': [self.arm.pk]},
+        ))
+
+    def test_routine_day_delete_all(self):
+        self._assert_invalidated(datetime.date(2020, 11, 2), [], lambda: self.client.post(
+            reverse('tr_calendar:routine_day_delete'), {'delete_all': '1'},
+        ))
+
+    def test_routine_decision(self):
+        def write():
+            session = self.client.session
+            session['provisional'] = {'v': 2, 'w': [[], [], [[1, 0, '脚']], [], [], [], []]}
+            session.save()
+            self.client.post(reverse('routine:routine_decision'))
+
+        self._assert_invalidated(datetime.date(2020, 11, 11), ['脚'], write)
+
+    def test_discipline_create(self):
+        self._assert_invalidated(datetime.date(2020, 11, 2), ['胸'], lambda: self.client.post(
+            reverse('discipline:discipline_create', kwargs={
+                'pk': self.monday_chest.pk, 'year': 2020, 'month': 11, 'day': 2, 'new': 0,
+            }),
+            dict(get_sets_data([(12, 10)]), discipline='ダンベルフライ'),
+        ))
+
+    def test_discipline_update(self):
+        self._assert_invalidated(datetime.date(2020, 11, 2), ['胸'], lambda: self.client.post(
+            reverse('discipline:discipline_update', kwargs={
+                'pk': self.discipline.pk, 'year': 2020, 'month': 11, 'day': 2,
+            }),
+            dict(get_sets_data([(60, 10)]), discipline='インクラインベンチプレス'),
+        ))
+
+    def test_discipline_delete(self):
+        self._assert_invalidated(datetime.date(2020, 11, 2), ['胸'], lambda: self.client.post(
+            reverse('discipline:discipline_delete', kwargs={'year': 2020, 'month': 11, 'day': 2}),
+            {'delete': [self.discipline.pk]},
+        ))
+
+    def test_fragment(self):
+        """ 表示部分のキャッシュもスケジュールの変更後に作り直されること """
+        url = reverse('tr_calendar:month_with_schedule', kwargs={'year': 2020, 'month': 11})
+        count = self.client.get(url).content.decode().count('Workout Day')
+        self.assertEqual(self.client.get(url).content.decode().count('Workout Day'), count)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('tr_calendar:day_schedule_create', kwargs={'year': 2020, 'month': 11, 'day': 10}),
+                {'part': '脚'},
+            )
+        self.assertEqual(self.client.get(url).content.decode().count('Workout Day'), count + 1)
+
+    def test_delete_queries(self):
+        """ 部位オブジェクトを削除する時に、種目を一行ずつ取得しないこと """
+        def delete(count):
+            arm = factory_body_part(date=datetime.date(2020, 11, 5), part='腕', user=self.user)
+            Discipline.objects.bulk_create([
+                Discipline(discipline='アームカール', date=arm.date, body_part=arm) for _ in range(count)
+            ])
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(
+                    reverse('tr_calendar:routine_day_delete', kwargs={'year': 2020, 'month': 11, 'day': 5}),
+                    {'delete_dt_obj': [arm.pk]},
+                )
+            self.assertFalse(Discipline.objects.filter(body_part=arm).exists())
+            return len(queries)
+
+        # 削除する種目のpkをGET_ITERATOR_CHUNK_SIZE件ごとに分けて削除する分だけ増えます
+        self.assertLessEqual(delete(200), delete(1) + 200 // GET_ITERATOR_CHUNK_SIZE)
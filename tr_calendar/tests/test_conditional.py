@@ -0,0 +1,125 @@
+import datetime
+
+from django.conf import settings
+from django.middleware.csrf import get_token
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from character.models import Character
+from discipline.models import Discipline
+from discipline.testing import get_sets_data
+from register.testing import factory_user
+from routine.models import TermDecision
+from routine.testing import factory_term_decision, factory_body_part
+from tr_calendar.cache import get_cache
+from tr_calendar.schedules import rebuild_day_schedules
+from tr_calendar.testing import use_async_views
+
+
+class TestConditionalGet(TestCase):
+    """ スケジュールを表示するページが、変更がなければ304を、変更があれば200を返すこと """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        factory_term_decision(
+            user=cls.user,
+            start_date=datetime.date(2020, 9, 1),
+            end_date=datetime.date(2020, 12, 1),
+        )
+        cls.monday_chest = factory_body_part(week='月曜日', part='胸', user=cls.user)
+        cls.discipline = Discipline.objects.create(
+            discipline='ベンチプレス', date=datetime.date(2020, 11, 2), body_part=cls.monday_chest)
+        Character.objects.provision(cls.user)
+        rebuild_day_schedules(cls.user)
+
+    def setUp(self):
+        get_cache().clear()
+        self.client.force_login(self.user)
+        # ブラウザと同じく、CSRFのCookieを設定済みにします
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = get_token(RequestFactory().get('/'))
+
+    def _get_urls(self):
+        return [
+            reverse('home:home', kwargs={'year': 2020, 'month': 11, 'day': 2}),
+            reverse('tr_calendar:month_with_schedule', kwargs={'year': 2020, 'month': 11}),
+            reverse('tr_calendar:day_schedule_detail', kwargs={'year': 2020, 'month': 11, 'day': 2, 'detail': 1}),
+            reverse('discipline:day_schedule_discipline', kwargs={
+                'pk': self.monday_chest.pk, 'year': 2020, 'month': 11, 'day': 2,
+            }),
+        ]
+
+    def _get_etags(self):
+        etags = {}
+        for url in self._get_urls():
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res['Cache-Control'], 'private, no-cache')
+            etags[url] = (res['ETag'], res['Last-Modified'])
+        return etags
+
+    def _get_status_codes(self, etags):
+        return [
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag, HTTP_IF_MODIFIED_SINCE=last_modified).status_code
+            for url, (etag, last_modified) in etags.items()
+        ]
+
+    def _assert_modified(self, write):
+        etags = self._get_etags()
+        self.assertEqual(self._get_status_codes(etags), [304, 304, 304, 304])
+        # キャッシュはコミットした後に無効にします
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        self.assertEqual(self._get_status_codes(etags), [200, 200, 200, 200])
+
+    def test_not_modified(self):
+        """ 304を返す場合はスケジュールを取得しないこと """
+        etags = self._get_etags()
+        for url, (etag, last_modified) in etags.items():
+            with self.assertNumQueries(2):  # セッション、ユーザー
+                res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(res.status_code, 304)
+
+    def test_if_modified_since(self):
+        etags = self._get_etags()
+        for url, (etag, last_modified) in etags.items():
+            res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(res.status_code, 304)
+
+    def test_body_part(self):
+        self._assert_modified(lambda: self.client.post(
+            reverse('tr_calendar:day_schedule_create', kwargs={'year': 2020, 'month': 11, 'day': 10}),
+            {'part': '脚'},
+        ))
+
+    def test_discipline(self):
+        self._assert_modified(lambda: self.client.post(
+            reverse('discipline:discipline_update', kwargs={
+                'pk': self.discipline.pk, 'year': 2020, 'month': 11, 'day': 2,
+            }),
+            dict(get_sets_data([(60, 10)]), discipline='インクラインベンチプレス'),
+        ))
+
+    def test_term_decision(self):
+        def write():
+            term_date = TermDecision.objects.get(user=self.user)
+            term_date.end_date = datetime.date(2021, 1, 1)
+            term_date.save()
+
+        self._assert_modified(write)
+
+    def test_character(self):
+        self._assert_modified(lambda: Character.objects.select(self.user, 'マッチョ', '2'))
+
+    def test_csrf_cookie(self):
+        """ ログインし直すなどしてCSRFトークンが変わった場合は200を返すこと """
+        def write():
+            self.client.cookies[settings.CSRF_COOKIE_NAME] = get_token(RequestFactory().get('/'))
+
+        self._assert_modified(write)
+
+    def test_async_views(self):
+        with use_async_views():
+            self._assert_modified(lambda: self.client.post(
+                reverse('tr_calendar:day_schedule_create', kwargs={'year': 2020, 'month': 11, 'day': 10}),
+                {'part': '脚'},
+            ))
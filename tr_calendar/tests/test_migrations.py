@@ -0,0 +1,96 @@
+import datetime
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+from register.testing import factory_user
+
+
+class TestCompactPlaceholdersMigration(TransactionTestCase):
+    """ partがNoneの日付指定オブジェクトとルーティンの複製がルーティンの変更にまとめられること """
+    migrate_from = [
+        ('tr_calendar', '0002_routineoverride'),
+        ('discipline', '0007_remove_discipline_weight_times'),
+    ]
+    migrate_to = [('tr_calendar', '0003_compact_placeholders')]
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self._migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_migrate(self):
+        apps = self._migrate(self.migrate_from)
+        BodyPart = apps.get_model('routine', 'BodyPart')
+        TermDecision = apps.get_model('routine', 'TermDecision')
+        Discipline = apps.get_model('discipline', 'Discipline')
+        user = factory_user()
+        TermDecision.objects.create(
+            user_id=user.pk, start_date=datetime.date(2020, 9, 1), end_date=datetime.date(2020, 12, 1))
+        chest = BodyPart.objects.create(week='月曜日', part='胸', user_id=user.pk)
+        back = BodyPart.objects.create(week='月曜日', part='背中', user_id=user.pk)
+        # 11/16 胸を脚に変更（背中の複製 + 重複したpartがNoneのオブジェクト）
+        back_clone = BodyPart.objects.create(date=datetime.date(2020, 11, 16), part='背中', user_id=user.pk)
+        BodyPart.objects.create(date=datetime.date(2020, 11, 16), user_id=user.pk)
+        BodyPart.objects.create(date=datetime.date(2020, 11, 16), user_id=user.pk)
+        leg = BodyPart.objects.create(date=datetime.date(2020, 11, 16), part='脚', user_id=user.pk)
+        Discipline.objects.create(discipline='デッドリフト', date=datetime.date(2020, 11, 16), body_part=back_clone)
+        # 11/23 背中を削除（胸の複製 + partがNoneのオブジェクト）
+        BodyPart.objects.create(date=datetime.date(2020, 11, 23), part='胸', user_id=user.pk)
+        BodyPart.objects.create(date=datetime.date(2020, 11, 23), user_id=user.pk)
+        # ルーティン期間外
+        BodyPart.objects.create(date=datetime.date(2021, 1, 4), user_id=user.pk)
+
+        apps = self._migrate(self.migrate_to)
+        BodyPart = apps.get_model('routine', 'BodyPart')
+        Discipline = apps.get_model('discipline', 'Discipline')
+        RoutineOverride = apps.get_model('tr_calendar', 'RoutineOverride')
+        self.assertEqual(
+            sorted(BodyPart.objects.values_list('pk', flat=True)), sorted([chest.pk, back.pk, leg.pk]))
+        self.assertEqual(
+            list(RoutineOverride.objects.order_by('date').values_list('date', 'body_part')),
+            [(datetime.date(2020, 11, 16), chest.pk), (datetime.date(2020, 11, 23), back.pk),
+             (datetime.date(2021, 1, 4), None)],
+        )
+        # 複製に登録した種目はルーティンオブジェクトに付け替えられること
+        self.assertEqual(Discipline.objects.get().body_part_id, back.pk)
+
+
+class TestBackfillDaySchedulesMigration(TransactionTestCase):
+    """ 既存のユーザーのDayScheduleが作成されること """
+    migrate_from = [('tr_calendar', '0003_compact_placeholders')]
+    migrate_to = [('tr_calendar', '0004_backfill_day_schedules')]
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self._migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_migrate(self):
+        apps = self._migrate(self.migrate_from)
+        BodyPart = apps.get_model('routine', 'BodyPart')
+        TermDecision = apps.get_model('routine', 'TermDecision')
+        DaySchedule = apps.get_model('tr_calendar', 'DaySchedule')
+        user = factory_user()
+        TermDecision.objects.create(
+            user_id=user.pk, start_date=datetime.date(2020, 11, 1), end_date=datetime.date(2020, 11, 30))
+        chest = BodyPart.objects.create(week='月曜日', part='胸', user_id=user.pk)
+        arm = BodyPart.objects.create(date=datetime.date(2020, 12, 5), part='腕', user_id=user.pk)
+        DaySchedule.objects.all().delete()
+
+        apps = self._migrate(self.migrate_to)
+        DaySchedule = apps.get_model('tr_calendar', 'DaySchedule')
+        self.assertEqual(
+            list(DaySchedule.objects.order_by('date').values_list('date', 'body_part')),
+            [(datetime.date(2020, 11, day), chest.pk) for day in [2, 9, 16, 23, 30]]
+            + [(datetime.date(2020, 12, 5), arm.pk)],
+        )
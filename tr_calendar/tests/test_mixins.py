@@ -0,0 +1,80 @@
+import datetime
+
+from django.test import TestCase
+from django.urls import reverse
+
+from register.testing import factory_user
+from routine.testing import factory_term_decision, factory_body_part
+from tr_calendar.cache import get_cache
+from tr_calendar.schedules import rebuild_day_schedules
+from tr_calendar.testing import factory_routine_override
+
+
+class TestMonthWithScheduleMixin(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        factory_term_decision(
+            user=cls.user,
+            start_date=datetime.date(2020, 9, 1),
+            end_date=datetime.date(2020, 12, 1),
+        )
+        # ルーティンオブジェクト
+        cls.monday_chest = factory_body_part(week='月曜日', part='胸', user=cls.user)
+        cls.monday_back = factory_body_part(week='月曜日', part='背中', user=cls.user)
+        cls.wednesday_leg = factory_body_part(week='水曜日', part='脚', user=cls.user)
+        # ルーティンに追加された日付指定オブジェクト
+        cls.arm = factory_body_part(date=datetime.date(2020, 11, 4), part='腕', user=cls.user)
+        # ルーティンが個別に変更された日付
+        factory_routine_override(date=datetime.date(2020, 11, 11), user=cls.user)
+        cls.shoulder = factory_body_part(date=datetime.date(2020, 11, 11), part='肩', user=cls.user)
+        # ルーティンが個別に削除された日付
+        factory_routine_override(date=datetime.date(2020, 11, 18), user=cls.user)
+        # ルーティン期間外の日付指定オブジェクト
+        cls.abs = factory_body_part(date=datetime.date(2020, 12, 8), part='腹', user=cls.user)
+        rebuild_day_schedules(cls.user)
+
+    def setUp(self):
+        get_cache().clear()
+        self.client.force_login(self.user)
+
+    def _getTarget(self, year, month):
+        return reverse('tr_calendar:month_with_schedule', kwargs={'year': year, 'month': month})
+
+    def _get_day_schedules(self, year, month):
+        res = self.client.get(self._getTarget(year, month))
+        day_schedules = {}
+        for week_day_schedules in res.context['month_day_schedules']:
+            day_schedules.update(week_day_schedules)
+        return day_schedules
+
+    def test_month_day_schedules(self):
+        day_schedules = self._get_day_schedules(2020, 11)
+
+        self.assertEqual(len(day_schedules), 42)
+        self.assertEqual(list(day_schedules[datetime.date(2020, 11, 2)]), [self.monday_chest, self.monday_back])
+        self.assertEqual(list(day_schedules[datetime.date(2020, 11, 4)]), [self.arm, self.wednesday_leg])
+        self.assertEqual(list(day_schedules[datetime.date(2020, 11, 11)]), [self.shoulder])
+        self.assertEqual(list(day_schedules[datetime.date(2020, 11, 18)]), [])
+        self.assertEqual(list(day_schedules[datetime.date(2020, 11, 3)]), [])
+
+    def test_month_day_schedules_out_of_term(self):
+        day_schedules = self._get_day_schedules(2020, 12)
+
+        self.assertEqual(list(day_schedules[datetime.date(2020, 11, 30)]), [self.monday_chest, self.monday_back])
+        self.assertEqual(list(day_schedules[datetime.date(2020, 12, 7)]), [])
+        self.assertEqual(list(day_schedules[datetime.date(2020, 12, 8)]), [self.abs])
+
+    def test_num_queries(self):
+        """ 表示する月や部位オブジェクトの数によらずクエリ数が一定であること """
+        self.client.get(self._getTarget(2020, 11))
+        for year, month in [(2020, 11), (2020, 12), (2021, 2), (2019, 1)]:
+            get_cache().clear()
+            with self.assertNumQueries(5):
+                self.client.get(self._getTarget(year, month))
+
+    def test_num_queries_cached(self):
+        """ キャッシュがあればスケジュールを取得しないこと """
+        self.client.get(self._getTarget(2020, 11))
+        with self.assertNumQueries(4):
+            self.client.get(self._getTarget(2020, 11))
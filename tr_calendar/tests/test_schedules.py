@@ -0,0 +1,290 @@
+import datetime
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from register.testing import factory_user
+from routine.models import BodyPart, TermDecision
+from routine.terms import TermIndex
+from routine.testing import factory_term_decision, factory_body_part
+from discipline.models import Discipline
+from tr_calendar.cache import get_cache
+from tr_calendar.models import DaySchedule, RoutineOverride
+from tr_calendar.schedules import ScheduleResolver, rebuild_day_schedules
+from tr_calendar.testing import factory_routine_override
+
+
+class TestDaySchedule(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        cls.term = factory_term_decision(
+            user=cls.user,
+            start_date=datetime.date(2020, 9, 1),
+            end_date=datetime.date(2020, 12, 1),
+        )
+        cls.monday_chest = factory_body_part(week='月曜日', part='胸', user=cls.user)
+        cls.monday_back = factory_body_part(week='月曜日', part='背中', user=cls.user)
+        cls.arm = factory_body_part(date=datetime.date(2020, 11, 2), part='腕', user=cls.user)
+        cls.abs = factory_body_part(date=datetime.date(2021, 1, 5), part='腹', user=cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        get_cache().clear()
+        rebuild_day_schedules(self.user)
+
+    def _get_parts(self, date):
+        return list(DaySchedule.objects.filter(user=self.user, date=date).values_list('part', flat=True))
+
+    def test_rebuild(self):
+        """ 作り直したスケジュールが部位オブジェクトから解決したスケジュールと一致すること """
+        days = [datetime.date(2020, 8, 31) + datetime.timedelta(days=i) for i in range(140)]
+        resolver = ScheduleResolver(self.user, TermIndex([self.term]), days)
+        for day in days:
+            day_schedules = DaySchedule.objects.filter(user=self.user, date=day)
+            self.assertEqual([s.body_part for s in day_schedules], resolver.get_schedules(day))
+            self.assertEqual([s.slot for s in day_schedules], list(range(len(day_schedules))))
+
+        # ルーティン期間の月曜日13日 + 日付指定オブジェクト2つ
+        self.assertEqual(DaySchedule.objects.filter(user=self.user).count(), 13 * 2 + 2)
+
+    def test_command(self):
+        DaySchedule.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_schedules', stdout=out)
+        self.assertIn('1人', out.getvalue())
+        self.assertEqual(self._get_parts(datetime.date(2020, 11, 2)), ['腕', '胸', '背中'])
+        self.assertEqual(self._get_parts(datetime.date(2021, 1, 5)), ['腹'])
+
+    def test_day_schedule_create(self):
+        self.client.post(
+            reverse('tr_calendar:day_schedule_create', kwargs={'year': 2020, 'month': 11, 'day': 9}),
+            {'part': '脚'},
+        )
+        self.assertEqual(self._get_parts(datetime.date(2020, 11, 9)), ['脚', '胸', '背中'])
+
+    def test_day_schedule_update(self):
+        self.client.post(reverse('tr_calendar:day_schedule_update', kwargs={'pk': self.arm.pk}), {'part': '肩'})
+        self.assertEqual(self._get_parts(datetime.date(2020, 11, 2)), ['肩', '胸', '背中'])
+
+    def test_day_schedule_update2(self):
+        self.client.post(
+            reverse('tr_calendar:day_schedule_update2', kwargs={
+                'pk': self.monday_chest.pk, 'year': 2020, 'month': 11, 'day': 16,
+            }),
+            {'part': '脚'},
+        )
+        # 変更した部位は変更前のルーティンオブジェクトと同じ位置に設定されること
+        self.assertEqual(self._get_parts(datetime.date(2020, 11, 16)), ['脚', '背中'])
+        self.assertEqual(self._get_parts(datetime.date(2020, 11, 23)), ['胸', '背中'])
+        # 他のルーティンオブジェクトを複製せずに、変更後の部位とルーティンの変更だけを作成すること
+        self.assertEqual(BodyPart.objects.filter(user=self.user, date=datetime.date(2020, 11, 16)).count(), 1)
+        self.assertEqual(
+            list(RoutineOverride.objects.filter(user=self.user).values_list('date', 'body_part', 'replacement__part')),
+            [(datetime.date(2020, 11, 16), self.monday_chest.pk, '脚')],
+        )
+
+    def test_day_schedule_update2_delete_replacement(self):
+        """ 変更後の部位を削除しても、変更前のルーティンオブジェクトが設定されないこと """
+        self.client.post(
+            reverse('tr_calendar:day_schedule_update2', kwargs={
+                'pk': self.monday_chest.pk, 'year': 2020, 'month': 11, 'day': 16,
+            }),
+            {'part': '脚'},
+        )
+        replacement = BodyPart.objects.get(user=self.user, date=datetime.date(2020, 11, 16))
+        self.client.post(
+            reverse('tr_calendar:routine_day_delete', kwargs={'year': 2020, 'month': 11, 'day': 16}),
+            {'delete_dt_obj': [replacement.pk]},
+        )
+        self.assertEqual(self._get_parts(datetime.date(2020, 11, 16)), ['背中'])
+
+    def test_routine_day_delete(self):
+        self.client.post(
+            reverse('tr_calendar:routine_day_delete', kwargs={'year': 2020, 'month': 11, 'day': 16}),
+            {'delete_wd_obj': [self.monday_chest.pk]},
+        )
+        self.assertEqual(self._get_parts(datetime.date(2020, 11, 16)), ['背中'])
+        self.assertFalse(BodyPart.objects.filter(user=self.user, date=datetime.date(2020, 11, 16)).exists())
+        self.assertEqual(RoutineOverride.objects.filter(user=self.user).count(), 1)
+
+        self.client.post(
+            reverse('tr_calendar:routine_day_delete', kwargs={'year': 2020, 'month': 11, 'day': 2}),
+            {'delete_dt_obj': [self.arm.pk]},
+        )
+        self.assertEqual(self._get_parts(datetime.date(2020, 11, 2)), ['胸', '背中'])
+
+    def test_routine_day_delete_all(self):
+        factory_routine_override(date=datetime.date(2020, 11, 9), user=self.user)
+        self.client.post(reverse('tr_calendar:routine_day_delete'), {'delete_all': '1'})
+        self.assertFalse(DaySchedule.objects.filter(user=self.user).exists())
+        self.assertFalse(RoutineOverride.objects.filter(user=self.user).exists())
+
+    def test_routine_day_delete_keeps_disciplines(self):
+        """ 他のルーティンオブジェクトを削除しても、ルーティンオブジェクトに登録した種目が表示されること """
+        Discipline.objects.create(discipline='デッドリフト', date=datetime.date(2020, 11, 16), body_part=self.monday_back)
+        self.client.post(
+            reverse('tr_calendar:routine_day_delete', kwargs={'year': 2020, 'month': 11, 'day': 16}),
+            {'delete_wd_obj': [self.monday_chest.pk]},
+        )
+        res = self.client.get(reverse('tr_calendar:day_schedule_detail', kwargs={
+            'year': 2020, 'month': 11, 'day': 16, 'detail': 1,
+        }))
+        self.assertEqual(res.context['bp_objects_judge_discipline_list'], [[self.monday_back, True]])
+
+    def test_resolver_overrides(self):
+        """ ルーティンの変更を反映してスケジュールを解決すること """
+        replacement = factory_body_part(date=datetime.date(2020, 11, 16), part='脚', user=self.user)
+        factory_routine_override(
+            date=datetime.date(2020, 11, 16), body_part=self.monday_chest, replacement=replacement, user=self.user)
+        factory_routine_override(date=datetime.date(2020, 11, 23), body_part=self.monday_back, user=self.user)
+        factory_routine_override(date=datetime.date(2020, 11, 2), user=self.user)
+        days = [datetime.date(2020, 11, 2), datetime.date(2020, 11, 16), datetime.date(2020, 11, 23)]
+        resolver = ScheduleResolver(self.user, TermIndex([self.term]), days)
+
+        self.assertEqual(resolver.get_schedules(datetime.date(2020, 11, 2)), [self.arm])
+        self.assertEqual(resolver.get_schedules(datetime.date(2020, 11, 16)), [replacement, self.monday_back])
+        self.assertEqual(resolver.get_schedules(datetime.date(2020, 11, 23)), [self.monday_chest])
+
+        # ルーティン期間外は変更後の部位を日付指定オブジェクトとして設定すること
+        self.term.end_date = datetime.date(2020, 11, 1)
+        resolver = ScheduleResolver(self.user, TermIndex([self.term]), days)
+        self.assertEqual(resolver.get_schedules(datetime.date(2020, 11, 16)), [replacement])
+
+    def test_resolver_rules(self):
+        """ 繰り返しルールのあるルーティンオブジェクトを、ルーティン期間内の繰り返しの日付に設定すること """
+        legs = factory_body_part(
+            part='脚', rrule='FREQ=DAILY;INTERVAL=4', rrule_start=datetime.date(2020, 11, 1), user=self.user)
+        factory_routine_override(date=datetime.date(2020, 11, 13), body_part=legs, user=self.user)
+        days = [datetime.date(2020, 11, 1) + datetime.timedelta(days=i) for i in range(35)]
+        resolver = ScheduleResolver(self.user, TermIndex([self.term]), days)
+
+        self.assertEqual(
+            [day for day in days if legs in resolver.get_schedules(day)],
+            [datetime.date(2020, 11, 1), datetime.date(2020, 11, 5), datetime.date(2020, 11, 9),
+             datetime.date(2020, 11, 17), datetime.date(2020, 11, 21), datetime.date(2020, 11, 25),
+             datetime.date(2020, 11, 29)],
+        )
+        self.assertEqual(resolver.get_schedules(datetime.date(2020, 11, 9)), [self.monday_chest, self.monday_back, legs])
+
+    def test_month_calendar_rules(self):
+        """ 繰り返しルールのあるルーティンオブジェクトが月間カレンダーに表示されること """
+        legs = factory_body_part(
+            part='脚', rrule='FREQ=WEEKLY;INTERVAL=2;BYDAY=TU', rrule_start=datetime.date(2020, 11, 3), user=self.user)
+        # 保存したルーティンオブジェクトはスケジュールに反映されます
+        self.assertEqual(DaySchedule.objects.filter(user=self.user, body_part=legs).count(), 3)
+        res = self.client.get(reverse('tr_calendar:month_with_schedule', kwargs={'year': 2020, 'month': 11}))
+        days = [
+            day for week in res.context['month_day_schedules'] for day, schedules in week.items() if legs in schedules
+        ]
+        self.assertEqual(days, [datetime.date(2020, 11, 3), datetime.date(2020, 11, 17), datetime.date(2020, 12, 1)])
+
+        # カレンダーからその日付だけ削除できること
+        self.client.post(
+            reverse('tr_calendar:routine_day_delete', kwargs={'year': 2020, 'month': 11, 'day': 17}),
+            {'delete_wd_obj': [legs.pk]},
+        )
+        self.assertEqual(self._get_parts(datetime.date(2020, 11, 17)), [])
+        self.assertEqual(self._get_parts(datetime.date(2020, 11, 3)), ['脚'])
+
+    def test_admin_delete_routine(self):
+        """ 管理画面でルーティンオブジェクトを削除した場合、スケジュールを作り直すこと """
+        admin_user = factory_user(email='admin@test.com', is_staff=True, is_superuser=True)
+        self.client.force_login(admin_user)
+        self.client.post(
+            reverse('admin:routine_bodypart_delete', args=[self.monday_chest.pk]), {'post': 'yes'})
+
+        self.assertEqual(self._get_parts(datetime.date(2020, 11, 2)), ['腕', '背中'])
+        self.assertEqual(
+            list(DaySchedule.objects.filter(user=self.user, date=datetime.date(2020, 11, 2)).values_list('slot', flat=True)),
+            [0, 1],
+        )
+
+    def test_resolver_terms(self):
+        """ ルーティン期間ごとのルーティンオブジェクトを、その期間の日付にだけ設定すること """
+        next_term = factory_term_decision(
+            user=self.user, start_date=datetime.date(2020, 12, 2), end_date=datetime.date(2021, 1, 31))
+        legs = factory_body_part(week='月曜日', part='脚', term=next_term, user=self.user)
+        arms = factory_body_part(week='月曜日', part='腕', term=self.term, user=self.user)
+        rebuild_day_schedules(self.user)
+
+        self.assertEqual(self._get_parts(datetime.date(2020, 11, 30)), ['胸', '背中', '腕'])
+        self.assertEqual(self._get_parts(datetime.date(2020, 12, 7)), ['胸', '背中', '脚'])
+        self.assertEqual(self._get_parts(datetime.date(2021, 2, 1)), [])
+
+        resolver = ScheduleResolver(self.user, TermDecision.objects.filter(user=self.user).index(), [
+            datetime.date(2020, 11, 30), datetime.date(2020, 12, 7),
+        ])
+        self.assertIn(arms, resolver.get_schedules(datetime.date(2020, 11, 30)))
+        self.assertNotIn(legs, resolver.get_schedules(datetime.date(2020, 11, 30)))
+        self.assertIn(legs, resolver.get_schedules(datetime.date(2020, 12, 7)))
+
+    def test_routine_decision(self):
+        session = self.client.session
+        session['provisional'] = {
+            'create_form_data_20': {
+                'week': '水曜日', 'part': '脚', 'detail_part': None, 'pid': 0, 'form_num': 1,
+            },
+            'delete_data_' + str(self.monday_back.pk): self.monday_back.pk,
+        }
+        session.save()
+
+        self.client.post(reverse('routine:routine_decision'))
+        self.assertFalse(BodyPart.objects.filter(pk=self.monday_back.pk).exists())
+        self.assertEqual(self._get_parts(datetime.date(2020, 11, 4)), ['脚'])
+        self.assertEqual(self._get_parts(datetime.date(2020, 11, 9)), ['胸'])
+
+    def test_routine_decision_common_routine(self):
+        """ 期間を指定していないルーティンオブジェクトを変更した場合、全てのルーティン期間のスケジュールを作り直すこと """
+        factory_term_decision(
+            user=self.user, start_date=datetime.date(2021, 2, 1), end_date=datetime.date(2021, 3, 31))
+        rebuild_day_schedules(self.user)
+        self.assertEqual(self._get_parts(datetime.date(2021, 2, 1)), ['胸', '背中'])
+
+        session = self.client.session
+        session['provisional'] = {
+            'update_form_data_0' + str(self.monday_chest.pk): {
+                'week': '月曜日', 'part': '腹', 'detail_part': None, 'pid': self.monday_chest.pk, 'form_num': 2,
+            },
+        }
+        session.save()
+
+        self.client.post(reverse('routine:routine_decision'))
+        self.assertEqual(self._get_parts(datetime.date(2020, 11, 9)), ['腹', '背中'])
+        self.assertEqual(self._get_parts(datetime.date(2021, 2, 1)), ['腹', '背中'])
+
+    def test_term_decision_save(self):
+        """ ルーティン期間を作成・変更した場合、その期間のスケジュールを作り直すこと """
+        term = TermDecision.objects.create(
+            user=self.user, start_date=datetime.date(2021, 2, 1), end_date=datetime.date(2021, 3, 31))
+        self.assertEqual(self._get_parts(datetime.date(2021, 2, 1)), ['胸', '背中'])
+
+        term.end_date = datetime.date(2021, 2, 28)
+        term.save()
+        self.assertEqual(self._get_parts(datetime.date(2021, 2, 22)), ['胸', '背中'])
+        self.assertEqual(self._get_parts(datetime.date(2021, 3, 1)), [])
+
+        # 期間が変わらない場合は作り直さないこと（変更前の期間の取得と更新のみ）
+        with self.assertNumQueries(2):
+            term.save()
+
+    def test_term_decision_delete(self):
+        """ ルーティン期間を削除した場合、コミット後にその期間のスケジュールを作り直すこと """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.term.delete()
+        self.assertEqual(self._get_parts(datetime.date(2020, 11, 2)), ['腕'])
+        self.assertEqual(self._get_parts(datetime.date(2020, 11, 9)), [])
+
+    def test_term_decision_auto_create(self):
+        """ カレンダーの表示中に作成したルーティン期間にもスケジュールを設定すること """
+        user = factory_user(email='auto@test.com')
+        factory_body_part(week=settings.WEEK[datetime.date.today().weekday()], part='脚', user=user)
+        self.client.force_login(user)
+        self.client.get(reverse('tr_calendar:month_with_schedule'))
+        self.assertEqual(
+            list(DaySchedule.objects.filter(user=user, date=datetime.date.today()).values_list('part', flat=True)),
+            ['脚'],
+        )
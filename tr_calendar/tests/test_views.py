@@ -0,0 +1,160 @@
+import datetime
+
+from django.test import TestCase
+from django.urls import reverse
+
+from register.testing import factory_user
+from routine.testing import factory_term_decision, factory_body_part
+from routine.models import BodyPart
+from tr_calendar.cache import get_cache
+from tr_calendar.models import DaySchedule
+from tr_calendar.schedules import rebuild_day_schedules
+from tr_calendar.testing import factory_routine_override
+
+
+class TestSchedules(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        factory_term_decision(
+            user=cls.user,
+            start_date=datetime.date(2020, 9, 1),
+            end_date=datetime.date(2020, 12, 1),
+        )
+        cls.monday_chest = factory_body_part(week='月曜日', part='胸', detail_part='大胸筋', user=cls.user)
+        cls.arm = factory_body_part(date=datetime.date(2020, 11, 2), part='腕', user=cls.user)
+        # ルーティンが個別に削除された日付
+        factory_routine_override(date=datetime.date(2020, 11, 9), user=cls.user)
+        rebuild_day_schedules(cls.user)
+
+    def setUp(self):
+        get_cache().clear()
+        self.client.force_login(self.user)
+
+    def _getTarget(self, start_date, end_date):
+        return f"{reverse('tr_calendar:schedules')}?from={start_date}&to={end_date}"
+
+    def test_get(self):
+        res = self.client.get(self._getTarget('2020-11-01', '2020-11-30'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {
+            'from': '2020-11-01',
+            'to': '2020-11-30',
+            'parts': {
+                str(self.monday_chest.pk): ['胸', '大胸筋', '月曜日'],
+                str(self.arm.pk): ['腕', None, None],
+            },
+            'days': {
+                '2020-11-02': [self.arm.pk, self.monday_chest.pk],
+                '2020-11-16': [self.monday_chest.pk],
+                '2020-11-23': [self.monday_chest.pk],
+                '2020-11-30': [self.monday_chest.pk],
+            },
+        })
+
+    def test_etag(self):
+        res = self.client.get(self._getTarget('2020-11-01', '2020-11-30'))
+        etag = res['ETag']
+
+        # 変更がなければ304を返し、スケジュールを取得しないこと
+        with self.assertNumQueries(2):  # セッション、ユーザー
+            res = self.client.get(self._getTarget('2020-11-01', '2020-11-30'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+
+        # 期間が違えば別のETagになること
+        res = self.client.get(self._getTarget('2020-11-01', '2020-11-29'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+
+        # スケジュールを変更すると（コミットした後に）200を返すこと
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('tr_calendar:day_schedule_create', kwargs={'year': 2020, 'month': 11, 'day': 10}),
+                {'part': '脚'},
+            )
+        res = self.client.get(self._getTarget('2020-11-01', '2020-11-30'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(len(res.json()['days']['2020-11-10']), 1)
+
+    def test_cached(self):
+        self.client.get(self._getTarget('2020-11-01', '2020-11-30'))
+        with self.assertNumQueries(2):  # セッション、ユーザー
+            res = self.client.get(self._getTarget('2020-11-01', '2020-11-30'))
+        self.assertEqual(res.status_code, 200)
+
+    def test_bad_request(self):
+        for start_date, end_date in [
+            ('2020-11-30', '2020-11-01'),
+            ('2020-11-01', '2021-12-01'),
+            ('2020-11-01', 'x'),
+        ]:
+            res = self.client.get(self._getTarget(start_date, end_date))
+            self.assertEqual(res.status_code, 400)
+        self.assertEqual(self.client.get(reverse('tr_calendar:schedules')).status_code, 400)
+
+    def test_login_required(self):
+        self.client.logout()
+        res = self.client.get(self._getTarget('2020-11-01', '2020-11-30'))
+        self.assertEqual(res.status_code, 302)
+
+
+class TestRoutineDayDelete(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        cls.other = factory_user(email='other@test.com')
+        cls.arm = factory_body_part(date=datetime.date(2020, 11, 2), part='腕', user=cls.user)
+        cls.other_arm = factory_body_part(date=datetime.date(2020, 11, 2), part='腕', user=cls.other)
+        rebuild_day_schedules(cls.user)
+        rebuild_day_schedules(cls.other)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _getTarget(self):
+        return reverse('tr_calendar:routine_day_delete', kwargs={'year': 2020, 'month': 11, 'day': 2})
+
+    def test_delete_dt_obj(self):
+        res = self.client.post(self._getTarget(), {'delete_dt_obj': [self.arm.pk]})
+
+        self.assertRedirects(res, reverse('tr_calendar:month_with_schedule', kwargs={'year': 2020, 'month': 11}))
+        self.assertFalse(BodyPart.objects.filter(pk=self.arm.pk).exists())
+        self.assertFalse(DaySchedule.objects.filter(user=self.user).exists())
+
+    def test_delete_dt_obj_other_user(self):
+        """ 他のユーザーの部位オブジェクト、存在しない部位オブジェクトは削除せずに404を返すこと """
+        for pk in [self.other_arm.pk, 0]:
+            res = self.client.post(self._getTarget(), {'delete_dt_obj': [pk]})
+            self.assertEqual(res.status_code, 404)
+        self.assertTrue(BodyPart.objects.filter(pk=self.other_arm.pk).exists())
+        self.assertTrue(DaySchedule.objects.filter(user=self.other).exists())
+
+
+class TestDayScheduleUpdate(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = factory_user()
+        cls.other = factory_user(email='other@test.com')
+        cls.arm = factory_body_part(date=datetime.date(2020, 11, 2), part='腕', user=cls.user)
+        cls.other_arm = factory_body_part(date=datetime.date(2020, 11, 2), part='腕', user=cls.other)
+        cls.monday_chest = factory_body_part(week='月曜日', part='胸', user=cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _getTarget(self, pk):
+        return reverse('tr_calendar:day_schedule_update', kwargs={'pk': pk})
+
+    def test_post(self):
+        res = self.client.post(self._getTarget(self.arm.pk), {'part': '肩'})
+
+        self.assertRedirects(res, reverse('tr_calendar:month_with_schedule', kwargs={'year': 2020, 'month': 11}))
+        self.assertEqual(BodyPart.objects.get(pk=self.arm.pk).part, '肩')
+
+    def test_other_user(self):
+        """ 他のユーザーの部位オブジェクト、ルーティンオブジェクト、存在しない部位オブジェクトは変更せずに404を返すこと """
+        for pk in [self.other_arm.pk, self.monday_chest.pk, 0]:
+            self.assertEqual(self.client.get(self._getTarget(pk)).status_code, 404)
+            self.assertEqual(self.client.post(self._getTarget(pk), {'part': '肩'}).status_code, 404)
+        self.assertEqual(BodyPart.objects.get(pk=self.other_arm.pk).part, '腕')
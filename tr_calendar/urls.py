@@ -1,25 +1,33 @@
+from django.conf import settings
 from django.urls import path
 from .views import MonthWithScheduleCalendar, day_schedule_create_or_detail, routine_day_delete, day_schedule_update, \
-    day_schedule_update2
+    day_schedule_update2, AsyncMonthWithScheduleCalendar, day_schedule_create_or_detail_async, schedules
 
 app_name = 'tr_calendar'
+# ASGIで起動した場合は非同期のビューを使います
+if settings.ASYNC_VIEWS:
+    month_with_schedule = AsyncMonthWithScheduleCalendar.as_view()
+    day_schedule_view = day_schedule_create_or_detail_async
+else:
+    month_with_schedule = MonthWithScheduleCalendar.as_view()
+    day_schedule_view = day_schedule_create_or_detail
 
 urlpatterns = [
     path(
         'month_with_schedule/',
-        MonthWithScheduleCalendar.as_view(), name='month_with_schedule'
+        month_with_schedule, name='month_with_schedule'
     ),
     path(
         'month_with_schedule/<int:year>/<int:month>/',
-        MonthWithScheduleCalendar.as_view(), name='month_with_schedule'
+        month_with_schedule, name='month_with_schedule'
     ),
     path(
         'day_schedule_create/<int:year>/<int:month>/<int:day>/',
-        day_schedule_create_or_detail, name='day_schedule_create'
+        day_schedule_view, name='day_schedule_create'
     ),
     path(
         'day_schedule_detail/<int:year>/<int:month>/<int:day>/<int:detail>/',
-        day_schedule_create_or_detail, name='day_schedule_detail'
+        day_schedule_view, name='day_schedule_detail'
     ),
     path(
         'routine_day_delete/<int:year>/<int:month>/<int:day>/',
@@ -37,4 +45,5 @@ urlpatterns = [
         'day_schedule_update2/<int:pk>/<int:year>/<int:month>/<int:day>/',
         day_schedule_update2, name='day_schedule_update2'
     ),
+    path('schedules/', schedules, name='schedules'),
 ]
@@ -1,18 +1,34 @@
-from django.shortcuts import render, redirect
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Q
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404
 from django.views import generic
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
 from . import mixins
-from routine.models import BodyPart, TermDecision
+from . import cache as schedule_cache
+from discipline.models import Discipline
+from routine.models import BodyPart, TermDecision, ROUTINE_QUERY
+from .async_utils import AsyncLoginRequiredMixin, async_login_required, gather_sync, render_response, run_sync
+from .conditional import ConditionalGetMixin, AsyncConditionalGetMixin, schedule_condition, async_schedule_condition
 from .forms import DayBodyPartForm
-from django.views.decorators.http import require_POST
+from .models import RoutineOverride
+from .schedules import ScheduleResolver, refresh_day_schedules, get_range_schedules
+from django.views.decorators.http import require_POST, require_GET, etag
 import datetime
 from django.utils import timezone
 
 
-class MonthWithScheduleCalendar(LoginRequiredMixin, mixins.MonthWithScheduleMixin, generic.TemplateView):
-    """月間カレンダーを表示するビュー"""
+class MonthWithScheduleCalendar(ConditionalGetMixin, LoginRequiredMixin, mixins.MonthWithScheduleMixin,
+                                generic.TemplateView):
+    """月間カレンダーを表示するビュー
+
+    前回表示した時からスケジュールが変わっていなければ304を返します。
+    """
     template_name = 'calendar.html'
     model = BodyPart
     week_field = 'week'
@@ -23,15 +39,34 @@ class MonthWithScheduleCalendar(LoginRequiredMixin, mixins.MonthWithScheduleMixi
         context = super().get_context_data(**kwargs)
         calendar_context = self.get_month_calendar()
         context.update(calendar_context)
-        all_objects = self.model.objects.filter(user=user)
-        calendar_context = {'page_title': 'カレンダー', 'all_objects': all_objects,
+        # 「すべて削除する」を表示するかの判定のみに使うため、部位オブジェクトは取得しません
+        has_objects = self.model.objects.filter(user=user).exists()
+        calendar_context = {'page_title': 'カレンダー', 'has_objects': has_objects,
                             'breadcrumb_root': True, 'breadcrumb_name': 'calendar',
                             }
         context.update(calendar_context)
         return context
 
 
+class AsyncMonthWithScheduleCalendar(AsyncConditionalGetMixin, AsyncLoginRequiredMixin, MonthWithScheduleCalendar):
+    """ MonthWithScheduleCalendarの非同期版です。（settings.ASYNC_VIEWS がTrueの場合に使います）
+
+    ルーティン期間と月のスケジュールを同時に取得してから、MonthWithScheduleCalendarと同じコンテキストを作成します。
+    """
+
+    async def get(self, request, *args, **kwargs):
+        self.setup_calendar()
+        days = self.get_month_days(self.get_current_month())
+        self._term_date, self._month_schedules = await gather_sync(
+            self.get_term_date,
+            lambda: self.load_month_schedules(days),
+        )
+        context = await run_sync(lambda: self.get_context_data(**kwargs))
+        return await render_response(self.render_to_response(context))
+
+
 @login_required
+@schedule_condition
 def day_schedule_create_or_detail(request, year, month, day, detail=None):
     """指定された日付のトレーニング部位を設定。（5部位まで設定可能）,または設定部位詳細ページへ遷移
 
@@ -47,48 +82,19 @@ def day_schedule_create_or_detail(request, year, month, day, detail=None):
     """
     user = request.user
     select_day = datetime.date(year=year, month=month, day=day)
-    wd = settings.WEEK[select_day.weekday()]
     error = None
-    bp_objects = BodyPart.objects.filter(user=user)
 
-    # Noneのdateオブジェクトがあればその最新のレコードのpkを取り出す
-    if bp_objects.filter(part=None, date=select_day):
-        none_bp_object_pk = bp_objects.filter(part=None, date=select_day).order_by('-pk').first().pk
-    else:
-        none_bp_object_pk = 0
-    # ルーチンオブジェクトがあればその最新のレコードのpkを取り出す
-    if bp_objects.filter(week=wd):
-        wd_bp_object_pk = bp_objects.filter(week=wd).order_by('-pk').first().pk
-    else:
-        wd_bp_object_pk = 0
-
-    # ルーチンオブジェクトのほうが古ければwdを Noneにする
-    if none_bp_object_pk > wd_bp_object_pk:
-        wd = None
-
-    wd_dt_bp_objects = create_wd_bp_objects(user, wd, select_day)
+    wd_dt_bp_objects = create_wd_bp_objects(user, select_day)
 
     # データの数をかぞえます。
     data_count = len(wd_dt_bp_objects)
 
-    #  指定日の設定部位（wd_dt_bp_objects）のそれぞれに種目登録がされていれば judge_discipline はTrueになります。※なければFalse
-    #  bp_objects_judge_discipline　のリストに [wd_dt_bp_object, judge_discipline]という形で格納した後にそれを
-    #  bp_objects_judge_discipline_list に格納していきます。
-    bp_objects_judge_discipline_list = []
-    if None not in wd_dt_bp_objects:
-        for wd_dt_bp_object in wd_dt_bp_objects:
-            bp_objects_judge_discipline = []
-            bp_objects_judge_discipline.append(wd_dt_bp_object)
-            judge_discipline = wd_dt_bp_object.judge_discipline(date=select_day)
-            bp_objects_judge_discipline.append(judge_discipline)
-            bp_objects_judge_discipline_list.append(bp_objects_judge_discipline)
-
     if detail:
         return render(request, 'day_schedule_detail.html', {
             'select_day': select_day,
             'page_title': 'カレンダー',
             'breadcrumb_name': '部位詳細',
-            'bp_objects_judge_discipline_list': bp_objects_judge_discipline_list
+            'bp_objects_judge_discipline_list': judge_disciplines(wd_dt_bp_objects, select_day),
         })
 
     # POSTで送られてきた部位データをバリデーションしてDBに保存します。
@@ -100,6 +106,7 @@ def day_schedule_create_or_detail(request, year, month, day, detail=None):
                 schedule.date = select_day
                 schedule.user = user
                 schedule.save()
+                refresh_day_schedules(user, [select_day])
 
                 if not request.POST.get('continue'):  # 登録を続けて行う場合
                     return redirect('tr_calendar:month_with_schedule', year=year, month=month)
@@ -121,20 +128,82 @@ def day_schedule_create_or_detail(request, year, month, day, detail=None):
     })
 
 
+@async_login_required
+@async_schedule_condition
+async def day_schedule_create_or_detail_async(request, year, month, day, detail=None):
+    """ day_schedule_create_or_detail の非同期版です。（settings.ASYNC_VIEWS がTrueの場合に使います）
+
+    部位オブジェクトとルーティンの変更、ルーティン期間を同時に取得します。
+    """
+    user = request.user
+    select_day = datetime.date(year=year, month=month, day=day)
+
+    term_index, resolver = await gather_sync(
+        lambda: TermDecision.objects.filter(user=user).index(),
+        lambda: ScheduleResolver(user, None, [select_day]),
+    )
+    # ルーティン期間は部位オブジェクトと同時に取得したため、後から設定します（create_wd_bp_objects と同じ結果になります）
+    resolver.term_index = term_index
+    wd_dt_bp_objects = arrange_wd_dt_bp_objects(*resolver.get_day_objects(select_day))
+
+    if detail:
+        bp_objects_judge_discipline_list, = await gather_sync(lambda: judge_disciplines(wd_dt_bp_objects, select_day))
+        return await run_sync(lambda: render(request, 'day_schedule_detail.html', {
+            'select_day': select_day,
+            'page_title': 'カレンダー',
+            'breadcrumb_name': '部位詳細',
+            'bp_objects_judge_discipline_list': bp_objects_judge_discipline_list
+        }))
+
+    def save(form):
+        schedule = form.save(commit=False)
+        schedule.date = select_day
+        schedule.user = user
+        schedule.save()
+        refresh_day_schedules(user, [select_day])
+
+    # POSTで送られてきた部位データをバリデーションしてDBに保存します。
+    error = None
+    if request.method == 'POST':
+        if len(wd_dt_bp_objects) != 5:  # データ数が5以下の場合
+            form = DayBodyPartForm(data=request.POST, bp_objects=wd_dt_bp_objects)
+            if await sync_to_async(form.is_valid)():
+                await sync_to_async(save)(form)
+
+                if not request.POST.get('continue'):  # 登録を続けて行う場合
+                    return redirect('tr_calendar:month_with_schedule', year=year, month=month)
+                else:
+                    return redirect('tr_calendar:day_schedule_create', year=year, month=month, day=day)
+        else:  # データ数が5個既にある場合
+            error = '※これ以上の登録はできません'
+            form = DayBodyPartForm(bp_objects=wd_dt_bp_objects)
+    else:
+        form = DayBodyPartForm(bp_objects=wd_dt_bp_objects)
+
+    return await run_sync(lambda: render(request, 'day_schedule_create.html', {
+        'select_day': select_day,
+        'form': form,
+        'wd_dt_bp_objects': wd_dt_bp_objects,
+        'page_title': 'カレンダー',
+        'breadcrumb_name': '部位作成',
+        'error': error,
+    }))
+
+
 @login_required
 def day_schedule_update(request, pk):
     """  日付指定オブジェクトの変更を行います。
 
     これはpkから変更先のオブジェクトを取り出して、フォームデータをバリデーションします。
     そしてそれを更新するだけです。
+    ログインしているユーザーの日付指定オブジェクトでなければ404を返します。
     """
-    bp_object = BodyPart.objects.get(pk=pk)
+    bp_object = get_object_or_404(BodyPart, pk=pk, user=request.user, date__isnull=False)
     year = int(bp_object.date.year)
     month = int(bp_object.date.month)
     select_day = bp_object.date
-    wd = settings.WEEK[select_day.weekday()]
 
-    wd_dt_bp_objects = create_wd_bp_objects(request.user, wd, select_day)
+    wd_dt_bp_objects = create_wd_bp_objects(request.user, select_day)
 
     if request.method == 'POST':
         form = DayBodyPartForm(request.POST, instance=bp_object, bp_objects=wd_dt_bp_objects)
@@ -142,6 +211,7 @@ def day_schedule_update(request, pk):
             schedule = form.save(commit=False)
             schedule.date = select_day
             schedule.save()
+            refresh_day_schedules(request.user, [select_day])
             return redirect('tr_calendar:month_with_schedule', year=year, month=month)
     else:  # getの場合
         form = DayBodyPartForm(instance=bp_object, bp_objects=wd_dt_bp_objects)
@@ -161,40 +231,31 @@ def day_schedule_update2(request, pk,  year, month, day):
     この場合処理は少し複雑になります。
 
     ルーティンオブジェクトをそのまま更新してしまうと、同じ曜日の他の日も更新されることになってしまいます。
-    また、日付指定オブジェクトとして更新するとルーティンオブジェクトではなくなるため、同じ曜日の他の日のオブジェクトがなくなってしまいます。
-    そのため、更新ではなく新規で日付指定オブジェクトを作成します。
-    指定日に変更部位オブジェクトの他にルーティンオブジェクトが存在する場合、
-    そのオブジェクトも新規に日付指定オブジェクトとして同じ部位で作成します。
+    そのため、更新ではなく新規で日付指定オブジェクトを作成し、
+    その日付だけルーティンオブジェクトの代わりに設定するルーティンの変更（RoutineOverride）を作成します。
+    同じ曜日の他のルーティンオブジェクトはそのまま設定されます。
 
     """
     user = request.user
     date = datetime.date(year=year, month=month, day=day)
-    upd_bp_object = BodyPart.objects.get(pk=pk)  # 変更するオブジェクトをとります。
-    wd_bp_objects = BodyPart.objects.filter(week=upd_bp_object.week, user=user)  # upd_object と同じ曜日の他のオブジェクトをとります
+    upd_bp_object = get_object_or_404(BodyPart, ROUTINE_QUERY, pk=pk, user=user)  # 変更するオブジェクトをとります。
 
-    wd_dt_bp_objects = create_wd_bp_objects(user, upd_bp_object.week, date)
+    wd_dt_bp_objects = create_wd_bp_objects(user, date)
 
     if request.method == 'POST':
 
         # ルーティンオブジェクトを変更する場合、変更するオブジェクトを更新せずに新規で日付指定オブジェクトを作成します。
         form = DayBodyPartForm(request.POST, bp_objects=wd_dt_bp_objects)
         if form.is_valid():
-            # upd_object と同じ曜日のオブジェクト(同じ曜日の設定部位)が他にない（upd_objectの1部位）のみの場合、
-            # 部位が空白の日付指定オブジェクトをDBに作成します
-            if wd_bp_objects.count() == 1:
-                BodyPart.objects.create(date=date, user=user)
-            for wd_bp_object in wd_bp_objects:
-                # wd_bp_object が 変更するオブジェクトではない場合、新しく　wd_object　と同じ部位の日付指定オブジェクトを作ります。
-                if wd_bp_object != upd_bp_object:
-                    part = wd_bp_object.part
-                    detail_part = wd_bp_object.detail_part
-                    BodyPart.objects.create(part=part, detail_part=detail_part, date=date, user=user)
-                    BodyPart.objects.create(date=date, user=user)
-            # DBに保存します
-            schedule = form.save(commit=False)
-            schedule.date = date
-            schedule.user = user
-            schedule.save()
+            with transaction.atomic():
+                schedule = form.save(commit=False)
+                schedule.date = date
+                schedule.user = user
+                schedule.save()
+                RoutineOverride.objects.update_or_create(
+                    user=user, date=date, body_part=upd_bp_object, defaults={'replacement': schedule},
+                )
+            refresh_day_schedules(user, [date])
             return redirect('tr_calendar:month_with_schedule', year=year, month=month)
     else:  # getの場合
         form = DayBodyPartForm(instance=upd_bp_object, bp_objects=wd_dt_bp_objects)
@@ -207,6 +268,7 @@ def day_schedule_update2(request, pk,  year, month, day):
     })
 
 
+@login_required
 @require_POST
 def routine_day_delete(request, year=timezone.now().year, month=timezone.now().month, day=timezone.now().day):
     """カレンダーから設定部位を削除する処理"""
@@ -218,54 +280,126 @@ def routine_day_delete(request, year=timezone.now().year, month=timezone.now().m
     if request.POST.get('delete_all'):
         del_objects = BodyPart.objects.filter(user=user)
         del_objects.delete()
+        # ルーティンを全て設定しない日付も削除します（他のルーティンの変更は部位オブジェクトと一緒に削除されます）
+        RoutineOverride.objects.filter(user=user).delete()
+        # 部位オブジェクトの削除ではシグナルを送らないため、ここでキャッシュを無効にします
+        schedule_cache.bump_generation(user.pk)
 
     # day_schedule_create.html で日付指定オブジェクトを削除する場合
     if request.POST.getlist('delete_dt_obj'):
         del_pk_list = request.POST.getlist('delete_dt_obj')
-        del_objects = BodyPart.objects.filter(pk__in=del_pk_list)
+        # 他のユーザーの部位オブジェクトは削除しません
+        del_objects = BodyPart.objects.filter(pk__in=del_pk_list, date__isnull=False, user=user)
+        del_object = del_objects.first()
+        if del_object is None:
+            raise Http404('削除する部位が見つかりません')
 
         # redirect時に　yearとmonthを返す必要があるのでここで取得します。
-        del_object = del_objects[0]
         year = int(del_object.date.year)
         month = int(del_object.date.month)
+        del_dates = {del_object.date for del_object in del_objects}
 
         del_objects.delete()
+        refresh_day_schedules(user, del_dates)
 
     if request.POST.getlist('delete_wd_obj'):  # ルーチンオブジェクトを削除する場合
         del_pk_list = request.POST.getlist('delete_wd_obj')
-        del_objects = BodyPart.objects.filter(pk__in=del_pk_list)
-        wd_objects = BodyPart.objects.filter(week=wd, user=user)
-
-        # 削除する曜日のルーティンオブジェクトにおいて、削除する部位以外の日付オブジェクトをDBに作成します。
-        for wd_object in wd_objects:
-            if wd_object not in del_objects:
-                part = wd_object.part
-                detail_part = wd_object.detail_part
-                BodyPart.objects.create(part=part, detail_part=detail_part, date=date, user=user)
-        # 部位が空の日付指定オブジェクトをDBに作成します。
-        BodyPart.objects.create(date=date, user=user)
+        del_objects = BodyPart.objects.filter(Q(week=wd) | Q(rrule__isnull=False), pk__in=del_pk_list, user=user)
+
+        # その日付だけ削除するルーティンオブジェクトを設定しないように、ルーティンの変更をまとめて作成します。
+        # （既に削除済みのルーティンオブジェクトは無視します）
+        RoutineOverride.objects.bulk_create([
+            RoutineOverride(date=date, body_part=del_object, user=user) for del_object in del_objects
+        ], ignore_conflicts=True)
+        refresh_day_schedules(user, [date])
 
     return redirect('tr_calendar:month_with_schedule', year=year, month=month)
 
 
-def create_wd_bp_objects(user, wd, date):
+def get_schedule_range(request):
+    """ GETパラメータ from、to（'2020-11-01'の形）の日付を返します。正しくない場合は ValueError を送出します。 """
+    start_date = datetime.date.fromisoformat(request.GET['from'])
+    end_date = datetime.date.fromisoformat(request.GET['to'])
+    if end_date < start_date:
+        raise ValueError('to は from 以降の日付を指定してください')
+    if (end_date - start_date).days >= settings.SCHEDULE_API_MAX_DAYS:
+        raise ValueError(f'一度に取得できるのは{settings.SCHEDULE_API_MAX_DAYS}日までです')
+    return start_date, end_date
+
+
+def get_schedules_etag(request):
+    """ スケジュールのJSONのETagを返します。
+
+    スケジュールを変更するたびにユーザーの世代番号が変わるため、世代番号と期間からETagを作ります。
+    （レスポンスを作成しなくても、変更がなければ304を返せます）
+    """
+    if not request.user.is_authenticated:
+        return None
+    try:
+        start_date, end_date = get_schedule_range(request)
+    except (KeyError, ValueError):
+        return None
+    generation = schedule_cache.get_generation(request.user.pk)
+    return f'schedules-{request.user.pk}-{generation}-{start_date:%Y%m%d}-{end_date:%Y%m%d}'
+
+
+@login_required
+@require_GET
+@etag(get_schedules_etag)
+def schedules(request):
+    """ from～to の日付ごとのスケジュールをJSONで返します。
+
+    ルーティン、日付指定、partがNoneのオブジェクトを反映したスケジュール（DaySchedule）を返すため、
+    フロントエンドで前後の月を先に取得しておき、カレンダーを表示し直すことができます。
+    形式は tr_calendar.schedules の get_range_schedules を参照してください。
+    同じ期間のJSONはスケジュールを変更するまでキャッシュし、If-None-Match が一致すれば304を返します。
+    """
+    try:
+        start_date, end_date = get_schedule_range(request)
+    except (KeyError, ValueError) as e:
+        return JsonResponse({'error': f'from、to を正しく指定してください。（{e}）'}, status=400)
+
+    content = schedule_cache.get_or_set(
+        request.user.pk, 'range', f'{start_date}:{end_date}',
+        lambda: json.dumps(
+            get_range_schedules(request.user, start_date, end_date), ensure_ascii=False, separators=(',', ':'),
+        ),
+    )
+    response = HttpResponse(content, content_type='application/json')
+    # ブラウザのキャッシュを使う前に、毎回ETagで変更がないかを確認させます
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def create_wd_bp_objects(user, date):
     """ テンプレートに表示する部位オブジェクトをリストに格納します。
 
     wd_bp_objects, dt_bp_objects　にオブジェクトがあればそれをwd_dt_bp_objectsに格納します。
     なければNoneを入れます。
-    これはバリデーションの時に同じ部位がすでに登録してないかを判定するために使います。※formの引数に渡します"""
-
-    dt_bp_objects = BodyPart.objects.filter(date=date, user=user).exclude(part=None)
-    if wd == None:  #　曜日がNoneとなっている場合
-        wd_bp_objects = None
-    elif TermDecision.objects.filter(user=user).exists():  # ルーチン期間外の場合
-        if not TermDecision.objects.get(user=user).judge_term_date(date=date):
-            wd_bp_objects = None
-        else:  # ルーチン期間内の場合
-            wd_bp_objects = BodyPart.objects.filter(week=wd, user=user)
-    else:
-        wd_bp_objects = BodyPart.objects.filter(week=wd, user=user)
+    これはバリデーションの時に同じ部位がすでに登録してないかを判定するために使います。※formの引数に渡します
+
+    ルーティン期間とルーティンの変更を反映した部位オブジェクトを ScheduleResolver で取得します。"""
+
+    resolver = ScheduleResolver(user, TermDecision.objects.filter(user=user).index(), [date])
+    return arrange_wd_dt_bp_objects(*resolver.get_day_objects(date))
+
+
+def judge_disciplines(wd_dt_bp_objects, date):
+    """ 部位オブジェクトごとにdateの日付の種目が登録されているかを判定します。
+
+    [[部位オブジェクト, 種目があればTrue], ...] を返します。部位がない場合（[None]）は空のリストを返します。
+    種目の有無は部位オブジェクトごとではなく、一度のクエリでまとめて取得します。
+    """
+    if None in wd_dt_bp_objects:
+        return []
+    disciplined_pks = set(Discipline.objects.filter(
+        date=date, body_part__in=wd_dt_bp_objects,
+    ).values_list('body_part', flat=True))
+    return [[wd_dt_bp_object, wd_dt_bp_object.pk in disciplined_pks] for wd_dt_bp_object in wd_dt_bp_objects]
+
 
+def arrange_wd_dt_bp_objects(wd_bp_objects, dt_bp_objects):
+    """ ルーティンオブジェクトと日付指定オブジェクトをリストに格納します。どちらもなければNoneを入れます。 """
     wd_dt_bp_objects = []
 
     if wd_bp_objects:
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'workout_plan.settings')
+# ASGIで起動しても、非同期のビューは環境変数 ASYNC_VIEWS=True を指定した場合のみ使います
+# （benchmark_async では同期のビュー（WSGI）の方が1秒あたりのリクエスト数が多いため）
 
 application = get_asgi_application()
@@ -0,0 +1,13 @@
+from django.db.backends.mysql import base
+
+from ..pool import ConnectionReuseMixin
+
+
+class DatabaseWrapper(ConnectionReuseMixin, base.DatabaseWrapper):
+    """ 接続のヘルスチェックと接続プールに対応したMySQLのバックエンドです。 """
+    def ping(self, connection):
+        try:
+            connection.ping()
+        except base.Database.Error:
+            return False
+        return True
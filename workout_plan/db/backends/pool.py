@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import Counter, deque
+
+# DBへの接続を新しく作成した回数と、プールの接続を使い回した回数です。プロセスごとに数えます。
+# 例 {'created': 3, 'reused': 997}
+stats = Counter()
+# DBのエイリアスごとの接続プール
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    def __init__(self, size, recycle):
+        """ 使い終わった接続を保持して、他のリクエスト（スレッド）で使い回すための接続プールです。
+
+        size : 保持する接続の数の上限。これを超えて返された接続は閉じます。
+        recycle : 接続を作成してから使い回す秒数。これを過ぎた接続は閉じて作り直します。
+        """
+        self.size = size
+        self.recycle = recycle
+        self.idle = deque()  # (接続, 作成した時刻)
+        self.lock = threading.Lock()
+
+    def get(self):
+        """ 保持している接続を (接続, 作成した時刻) の形で返します。なければNoneを返します。 """
+        while True:
+            with self.lock:
+                if not self.idle:
+                    return None
+                connection, created_at = self.idle.pop()
+            if time.monotonic() - created_at < self.recycle:
+                return connection, created_at
+            close_quietly(connection)
+
+    def put(self, connection, created_at):
+        """ 接続をプールに返します。プールが一杯の場合は返さずにFalseを返します。 """
+        with self.lock:
+            if len(self.idle) >= self.size:
+                return False
+            self.idle.append((connection, created_at))
+            return True
+
+    def clear(self):
+        with self.lock:
+            idle, self.idle = self.idle, deque()
+        for connection, created_at in idle:
+            close_quietly(connection)
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def get_pool(alias, pool_settings):
+    """ DATABASES の 'POOL' の設定からエイリアスの接続プールを返します。SIZEが0の場合はNoneを返します。
+
+    例 'POOL': {'SIZE': 10, 'RECYCLE': 600}
+    """
+    size = (pool_settings or {}).get('SIZE', 0)
+    if not size:
+        return None
+    recycle = pool_settings.get('RECYCLE', 60 * 10)
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None or (pool.size, pool.recycle) != (size, recycle):
+            if pool is not None:
+                pool.clear()
+            pool = _pools[alias] = ConnectionPool(size, recycle)
+        return pool
+
+
+class ConnectionReuseMixin:
+    """ DB接続の使い回しに、ヘルスチェックと接続プールを追加するDatabaseWrapperのミックスインです。
+
+    DATABASES に次の設定を追加できます。
+
+    CONN_HEALTH_CHECKS : Trueの場合、CONN_MAX_AGE で使い回す接続を、リクエストで初めて使う前に確認します。
+                         切断されていれば作り直すため、DBの再起動やタイムアウトの後もエラーになりません。
+    POOL : {'SIZE': 保持する接続の数, 'RECYCLE': 使い回す秒数}
+           SIZEが1以上の場合、リクエストの終了時に接続を閉じずにプールに返し、他のスレッドで使い回します。
+           （この場合 CONN_MAX_AGE は使いません）
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+        self.connection_created_at = None
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict.get('POOL'))
+
+    def ping(self, connection):
+        """ 接続が使えるかどうかを返します。 """
+        raise NotImplementedError
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is not None:
+            while True:
+                item = pool.get()
+                if item is None:
+                    break
+                connection, created_at = item
+                if self.ping(connection):
+                    stats['reused'] += 1
+                    self.connection_created_at = created_at
+                    return connection
+                close_quietly(connection)
+        stats['created'] += 1
+        self.connection_created_at = time.monotonic()
+        return super().get_new_connection(conn_params)
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+        if self.pool is not None:
+            # リクエストの終了時（close_if_unusable_or_obsolete）に閉じて、プールに返します
+            self.close_at = time.monotonic()
+
+    def _close(self):
+        pool = self.pool
+        if pool is not None and not self.in_atomic_block:
+            try:
+                # 途中のトランザクションを残さないようにします。切断されている場合はここでエラーになります
+                self.connection.rollback()
+            except Exception:
+                pass
+            else:
+                if pool.put(self.connection, self.connection_created_at):
+                    return
+        super()._close()
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        # 次のリクエストで初めて使う前に、もう一度確認します
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if (self.connection is not None and self.settings_dict.get('CONN_HEALTH_CHECKS')
+                and not self.health_check_done and not self.in_atomic_block):
+            if not self.is_usable():
+                self.close()
+            self.health_check_done = True
+        super().ensure_connection()
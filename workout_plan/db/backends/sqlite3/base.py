@@ -0,0 +1,13 @@
+from django.db.backends.sqlite3 import base
+
+from ..pool import ConnectionReuseMixin
+
+
+class DatabaseWrapper(ConnectionReuseMixin, base.DatabaseWrapper):
+    """ 接続のヘルスチェックと接続プールに対応したSQLiteのバックエンドです。（ローカルでの確認用） """
+    def ping(self, connection):
+        try:
+            connection.execute('SELECT 1')
+        except base.Database.Error:
+            return False
+        return True
@@ -73,6 +73,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'routine.context_processors.images',
             ],
         },
     },
@@ -84,10 +85,24 @@ WSGI_APPLICATION = 'workout_plan.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
+# DB接続の使い回しの設定（workout_plan.db.backends のバックエンドで使います）
+# CONN_MAX_AGE : 接続を使い回す秒数。0ならリクエストごとに接続します。
+# CONN_HEALTH_CHECKS : 使い回す接続をリクエストで初めて使う前に確認します。
+# POOL : SIZEが1以上ならリクエストの終了時に接続をプールに返し、スレッド間で使い回します。RECYCLE秒で作り直します。
+DATABASE_CONNECTION = {
+    'CONN_MAX_AGE': env.int('DB_CONN_MAX_AGE', default=60),
+    'CONN_HEALTH_CHECKS': env.bool('DB_CONN_HEALTH_CHECKS', default=True),
+    'POOL': {
+        'SIZE': env.int('DB_POOL_SIZE', default=0),
+        'RECYCLE': env.int('DB_POOL_RECYCLE', default=60 * 10),
+    },
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'workout_plan.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        **DATABASE_CONNECTION,
     }
 }
 
@@ -130,6 +145,13 @@ USE_TZ = True
 # カスタマイズしたUserモデルをデフォルトで使用するため宣言
 AUTH_USER_MODEL = 'register.User'
 
+# ログイン中のユーザーをキャラクターと一緒に取得します。
+# ModelBackendは、変更前にログインしたユーザーのセッションを引き続き使えるように残しています。
+AUTHENTICATION_BACKENDS = [
+    'register.backends.UserBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 STATIC_URL = env('STATIC_URL')
 
 STATICFILES_DIRS = [
@@ -150,6 +172,11 @@ EMAIL_PORT = 587
 EMAIL_HOST_USER = 'shintamafitness@gmail.com'
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD')  # gmailの2段階認証のアプリパス
 EMAIL_USE_TLS = True
+EMAIL_TIMEOUT = 10
+
+# 送信待ちメール（register.OutboxMail）を send_queued_mail コマンドで送信する際の、一つの接続で送る件数と再送回数の上限
+MAIL_QUEUE_BATCH_SIZE = env.int('MAIL_QUEUE_BATCH_SIZE', default=50)
+MAIL_QUEUE_MAX_ATTEMPTS = env.int('MAIL_QUEUE_MAX_ATTEMPTS', default=5)
 
 IMAGES = {
     "胸": "chest", "胸上部": "upperchest", "胸下部": "underchest", "胸中部": "middlechest", "腹": "abs",
@@ -161,18 +188,38 @@ IMAGES = {
 
 WEEK = ['月曜日', '火曜日', '水曜日', '木曜日', '金曜日', '土曜日', '日曜日']
 
+# キャッシュ（ローカルでは locmemcache:// や filecache:///tmp/workout_plan 、本番では rediscache:// や memcache:// を指定）
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+# カレンダーのスケジュールのキャッシュに使う CACHES のキーと、キャッシュの有効期限（秒）
+SCHEDULE_CACHE = 'default'
+SCHEDULE_CACHE_TIMEOUT = env.int('SCHEDULE_CACHE_TIMEOUT', default=60 * 60 * 24)
+# スケジュールのJSON（tr_calendar:schedules）で一度に取得できる日数
+SCHEDULE_API_MAX_DAYS = 366
+
+# request.provisional（ルーティン設定の仮データ）を使うURLの名前空間
+PROVISIONAL_NAMESPACES = ['routine']
+
+# ホーム、カレンダー、日付ごとの部位設定に非同期のビューを使います
+# ASGIで起動する場合のみ有効にしてください。benchmark_async ではWSGIの同期のビューより遅いため、既定では使いません。
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=False)
+# 非同期のビューで、互いに依存しないDBの読み込みをスレッドごとに別の接続で同時に行います
+ASYNC_CONCURRENT_LOADS = env.bool('ASYNC_CONCURRENT_LOADS', default=True)
+
 if not DEBUG:
     INSTALLED_APPS.append('storages')
 
     # 環境変数にて、DBの簡略記法にRDSのエンドポイントを指定できないため、env.db()を使用せずに表記
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.mysql',
+            'ENGINE': 'workout_plan.db.backends.mysql',
             'NAME': 'workout_plan',
             'USER': 'root',
             'PASSWORD': env('DATABASE_PASS'),
             'HOST': 'workout-planning-web.cahz2hijsbun.ap-northeast-1.rds.amazonaws.com',
             'PORT': '3306',
+            **DATABASE_CONNECTION,
         }
     }
 
@@ -0,0 +1,85 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase
+
+from ..db.backends import pool as connection_pool
+from ..db.backends.pool import ConnectionPool
+from ..db.backends.sqlite3.base import DatabaseWrapper
+
+
+class TestConnectionPool(SimpleTestCase):
+    def test_put_get(self):
+        pool = ConnectionPool(size=1, recycle=60)
+        first, second = mock.Mock(), mock.Mock()
+
+        self.assertTrue(pool.put(first, connection_pool.time.monotonic()))
+        # 上限を超えた接続は返せないこと
+        self.assertFalse(pool.put(second, connection_pool.time.monotonic()))
+        self.assertEqual(pool.get()[0], first)
+        self.assertIsNone(pool.get())
+
+    def test_recycle(self):
+        """ RECYCLE秒を過ぎた接続は閉じて使わないこと """
+        pool = ConnectionPool(size=1, recycle=60)
+        expired = mock.Mock()
+        pool.put(expired, connection_pool.time.monotonic() - 61)
+
+        self.assertIsNone(pool.get())
+        expired.close.assert_called_once_with()
+
+
+class TestConnectionReuse(SimpleTestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.settings_dict = dict(connection.settings_dict, NAME=os.path.join(tmpdir.name, 'test.sqlite3'))
+        connection_pool.stats.clear()
+
+    def _get_wrapper(self, **kwargs):
+        wrapper = DatabaseWrapper(dict(self.settings_dict, **kwargs), alias='test_pool')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_pool(self):
+        """ リクエストの終了時に接続をプールに返し、他の接続で使い回すこと """
+        pool_settings = {'SIZE': 1, 'RECYCLE': 60}
+        self.addCleanup(lambda: connection_pool.get_pool('test_pool', pool_settings).clear())
+        first = self._get_wrapper(POOL=pool_settings, CONN_MAX_AGE=60)
+        second = self._get_wrapper(POOL=pool_settings, CONN_MAX_AGE=60)
+
+        first.ensure_connection()
+        raw_connection = first.connection
+        first.close_if_unusable_or_obsolete()
+        self.assertIsNone(first.connection)
+
+        second.ensure_connection()
+        self.assertIs(second.connection, raw_connection)
+        self.assertEqual(connection_pool.stats, {'created': 1, 'reused': 1})
+
+    def test_persistent(self):
+        wrapper = self._get_wrapper(CONN_MAX_AGE=60)
+        wrapper.ensure_connection()
+        raw_connection = wrapper.connection
+
+        wrapper.close_if_unusable_or_obsolete()
+        wrapper.ensure_connection()
+        self.assertIs(wrapper.connection, raw_connection)
+        self.assertEqual(connection_pool.stats, {'created': 1})
+
+    def test_health_checks(self):
+        """ 使い回す接続が切断されていれば作り直すこと """
+        wrapper = self._get_wrapper(CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=True)
+        wrapper.ensure_connection()
+        raw_connection = wrapper.connection
+        wrapper.close_if_unusable_or_obsolete()
+
+        with mock.patch.object(wrapper, 'is_usable', return_value=False) as is_usable:
+            wrapper.ensure_connection()
+            # 同じリクエストの中では一度だけ確認すること
+            wrapper.ensure_connection()
+        self.assertEqual(is_usable.call_count, 1)
+        self.assertIsNot(wrapper.connection, raw_connection)
+        self.assertEqual(connection_pool.stats, {'created': 2})
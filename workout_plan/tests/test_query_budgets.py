@@ -0,0 +1,284 @@
+import datetime
+
+from django.core.signing import dumps
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+
+from character.models import Character, DEFAULT_NAME
+from discipline.export import CHUNK_SIZE, FORMATS
+from discipline.models import Discipline
+from register.models import Profile
+from register.testing import factory_user
+from routine.models import BodyPart, TermDecision, PARTS
+from routine.testing import factory_history
+from tr_calendar.cache import get_cache
+from tr_calendar.models import DaySchedule
+from tr_calendar.schedules import rebuild_day_schedules
+
+# 比較する2つのデータ量（履歴の日数）です。
+# factory_history は5日ごと、7日ごとに日付指定オブジェクトを作るため、差を35日の倍数にして
+# どちらのデータでも今日の前後の日付のスケジュールが同じになるようにします。
+DATASET_DAYS = {'small': 70, 'large': 700}
+# 今日のルーティン期間の日数です。どちらのデータでも同じ期間にし、履歴の量だけを変えます。
+TERM_DAYS = 70
+# 今日からルーティン期間の最後の日までの日数です。
+FUTURE_DAYS = 34
+
+# 画面ごとのクエリ数の上限です。
+# セッション、ユーザーの取得を含みます。クエリを減らした場合は上限も下げてください。
+BUDGETS = {
+    'home:home': 4,
+    'home:home(date)': 4,
+    'tr_calendar:month_with_schedule': 5,
+    'tr_calendar:day_schedule_create': 5,
+    'tr_calendar:day_schedule_create(post)': 13,
+    # 種目の有無は部位の数によらず一回のクエリで取得します
+    'tr_calendar:day_schedule_detail': 6,
+    'tr_calendar:day_schedule_update': 6,
+    'tr_calendar:day_schedule_update2': 6,
+    'tr_calendar:routine_day_delete': 11,
+    'tr_calendar:schedules': 3,
+    'routine:term_decision': 3,
+    'routine:list': 7,
+    'routine:create': 2,
+    'routine:update': 2,
+    'routine:delete': 4,
+    # ルーティン期間全体のスケジュールを作り直します
+    'routine:routine_decision': 16,
+    'discipline:day_schedule_discipline': 5,
+    'discipline:discipline_create': 4,
+    'discipline:discipline_update': 5,
+    'discipline:discipline_delete': 8,
+    'discipline:training_stats': 3,
+    'discipline:training_stats_json': 3,
+    'discipline:training_history_import': 2,
+    'character:character_selection': 2,
+    'register:user_detail': 4,
+    'register:password_change': 2,
+    'register:password_change_done': 2,
+    'register:email_change': 2,
+    'register:email_change_done': 2,
+    'register:email_change_complete': 4,
+    'register:phone_change': 3,
+    'register:phone_change_done': 2,
+    'register:name_change': 3,
+    'register:name_change_done': 2,
+    'register:user_delete': 2,
+}
+# 履歴の書き出しのクエリ数です。CHUNK_SIZE件ごとにクエリを分けるため、件数に応じて増えます。
+# （セッション、ユーザー + スケジュールのチャンクごとに1 + 種目のチャンクごとに種目、セットの2）
+EXPORT_BUDGET = 2
+EXPORT_SCHEDULE_CHUNK_QUERIES = 1
+EXPORT_DISCIPLINE_CHUNK_QUERIES = 2
+
+# 計測するURLの名前空間です。
+NAMESPACES = ['home', 'tr_calendar', 'routine', 'discipline', 'character', 'register']
+# 計測しないURLの名前と理由です。
+EXCLUDED = {
+    **{f'register:{name}': 'ログインせずに使う画面です' for name in [
+        'top', 'login', 'logout', 'user_create', 'user_create_done', 'user_create_complete', 'user_data_input',
+        'user_data_confirm', 'password_reset', 'password_reset_done', 'password_reset_confirm',
+        'password_reset_complete',
+    ]},
+    'register:user_delete_done': 'ユーザーと全ての履歴を削除するため、削除する件数に応じてクエリが増えます',
+    'discipline:training_history_export': 'test_export で件数に応じたクエリ数を確認します',
+}
+
+
+def seed_dataset(email, days):
+    """ days日分の履歴を持つユーザーを作成し、計測に使う値の辞書を返します。
+
+    ルーティン期間は今日を含むTERM_DAYS日間にします。（それより前の日付は日付指定オブジェクトと種目の履歴のみです）
+    """
+    today = datetime.date.today()
+    end_date = today + datetime.timedelta(days=FUTURE_DAYS)
+    user = factory_user(email=email)
+    profile = Profile.objects.create(user=user, name='テスト', gender='2')
+    Character.objects.create(user=user, name=DEFAULT_NAME, number='1')
+    factory_history(user, end_date - datetime.timedelta(days=days - 1), days)
+    TermDecision.objects.filter(user=user).update(start_date=end_date - datetime.timedelta(days=TERM_DAYS - 1))
+    rebuild_day_schedules(user)
+
+    # ルーティンオブジェクトと日付指定オブジェクトの両方が設定された、今日以前の最後の日付です。
+    date = DaySchedule.objects.filter(
+        user=user, date__lte=today, body_part__week__isnull=False,
+        date__in=BodyPart.objects.filter(user=user, date__isnull=False).values('date'),
+    ).latest('date').date
+    day_schedules = list(DaySchedule.objects.filter(user=user, date=date).select_related('body_part'))
+    routine = next(day_schedule.body_part for day_schedule in day_schedules if day_schedule.body_part.week)
+    dated = next(day_schedule.body_part for day_schedule in day_schedules if day_schedule.body_part.date)
+    return {
+        'user': user,
+        'profile': profile,
+        'date': date,
+        'routine': routine,
+        'dated': dated,
+        'parts': {day_schedule.part for day_schedule in day_schedules},
+        'discipline': Discipline.objects.filter(body_part=dated, date=date).order_by('pk').first(),
+    }
+
+
+def get_routes(data):
+    """ 計測する画面の (名前, メソッド, URL, POSTするデータ, 事前にGETするURLのリスト) のリストを返します。
+
+    名前はURLの名前です。同じURLの名前を複数回計測する場合は括弧で区別します。
+    """
+    user, date = data['user'], data['date']
+    ymd = {'year': date.year, 'month': date.month, 'day': date.day}
+    month_start = date.replace(day=1)
+    week_list = reverse('routine:list')
+    # その日付にまだ設定されていない部位です（day_schedule_createで登録します）
+    new_part = next(part for part, _ in PARTS if part not in data['parts'])
+    return [
+        ('home:home', 'get', reverse('home:home'), None, []),
+        ('home:home(date)', 'get', reverse('home:home', kwargs=ymd), None, []),
+        ('tr_calendar:month_with_schedule', 'get', reverse(
+            'tr_calendar:month_with_schedule', kwargs={'year': date.year, 'month': date.month}), None, []),
+        ('tr_calendar:day_schedule_create', 'get', reverse('tr_calendar:day_schedule_create', kwargs=ymd), None, []),
+        ('tr_calendar:day_schedule_create(post)', 'post', reverse('tr_calendar:day_schedule_create', kwargs=ymd), {
+            'part': new_part, 'detail_part': '',
+        }, []),
+        ('tr_calendar:day_schedule_detail', 'get', reverse(
+            'tr_calendar:day_schedule_detail', kwargs=dict(ymd, detail=1)), None, []),
+        ('tr_calendar:day_schedule_update', 'get', reverse(
+            'tr_calendar:day_schedule_update', kwargs={'pk': data['dated'].pk}), None, []),
+        ('tr_calendar:day_schedule_update2', 'get', reverse(
+            'tr_calendar:day_schedule_update2', kwargs=dict(ymd, pk=data['routine'].pk)), None, []),
+        ('tr_calendar:routine_day_delete', 'post', reverse('tr_calendar:routine_day_delete', kwargs=ymd), {
+            'delete_wd_obj': data['routine'].pk,
+        }, []),
+        ('tr_calendar:schedules', 'get', (
+            f"{reverse('tr_calendar:schedules')}?from={month_start}&to={month_start + datetime.timedelta(days=41)}"
+        ), None, []),
+        ('routine:term_decision', 'get', reverse('routine:term_decision'), None, []),
+        ('routine:list', 'get', week_list, None, []),
+        ('routine:create', 'get', reverse('routine:create', kwargs={'num': date.weekday()}), None, []),
+        ('routine:update', 'get', reverse('routine:update', kwargs={
+            'num': date.weekday(), 'pid': data['routine'].pk, 'form_num': 0,
+        }), None, [week_list]),
+        ('routine:delete', 'post', reverse('routine:delete'), {'delete': data['routine'].pk}, [week_list]),
+        ('routine:routine_decision', 'post', reverse('routine:routine_decision'), {}, [week_list]),
+        ('discipline:day_schedule_discipline', 'get', reverse(
+            'discipline:day_schedule_discipline', kwargs=dict(ymd, pk=data['dated'].pk)), None, []),
+        ('discipline:discipline_create', 'get', reverse(
+            'discipline:discipline_create', kwargs=dict(ymd, pk=data['dated'].pk, new=0)), None, []),
+        ('discipline:discipline_update', 'get', reverse(
+            'discipline:discipline_update', kwargs=dict(ymd, pk=data['discipline'].pk)), None, []),
+        ('discipline:discipline_delete', 'post', reverse('discipline:discipline_delete', kwargs=ymd), {
+            'delete': data['discipline'].pk,
+        }, []),
+        ('discipline:training_stats', 'get', reverse('discipline:training_stats'), None, []),
+        ('discipline:training_stats_json', 'get', reverse('discipline:training_stats_json'), None, []),
+        ('discipline:training_history_import', 'get', reverse('discipline:training_history_import'), None, []),
+        ('character:character_selection', 'get', reverse('character:character_selection'), None, []),
+        ('register:user_detail', 'get', reverse('register:user_detail', kwargs={'pk': user.pk}), None, []),
+        ('register:password_change', 'get', reverse('register:password_change'), None, []),
+        ('register:password_change_done', 'get', reverse('register:password_change_done'), None, []),
+        ('register:email_change', 'get', reverse('register:email_change'), None, []),
+        ('register:email_change_done', 'get', reverse('register:email_change_done'), None, []),
+        ('register:email_change_complete', 'get', reverse('register:email_change_complete', kwargs={
+            'token': dumps(f'new-{user.email}'),
+        }), None, []),
+        ('register:phone_change', 'get', reverse('register:phone_change', kwargs={'pk': data['profile'].pk}), None, []),
+        ('register:phone_change_done', 'get', reverse('register:phone_change_done'), None, []),
+        ('register:name_change', 'get', reverse('register:name_change', kwargs={'pk': data['profile'].pk}), None, []),
+        ('register:name_change_done', 'get', reverse('register:name_change_done'), None, []),
+        ('register:user_delete', 'get', reverse('register:user_delete', kwargs={'pk': user.pk}), None, []),
+    ]
+
+
+def format_queries(queries):
+    """ 実行したSQLを番号を付けて一行ずつの文字列にします。 """
+    return '\n'.join(f'{i}. {sql}' for i, sql in enumerate(queries, 1))
+
+
+def get_url_names(namespaces):
+    """ 名前空間のURLの名前（'名前空間:名前'）の集合を返します。 """
+    resolver = get_resolver()
+    return {
+        f'{namespace}:{pattern.name}'
+        for namespace in namespaces
+        for pattern in resolver.namespace_dict[namespace][1].url_patterns
+        if pattern.name
+    }
+
+
+class TestQueryBudgets(TestCase):
+    """ 画面ごとのクエリ数が上限（BUDGETS）以下で、履歴の量によって増えないことを確認します。
+
+    履歴の日数だけが異なる2つのデータ（DATASET_DAYS）で同じ画面を表示し、クエリ数を比較します。
+    上限を超えた場合、データ量でクエリ数が変わった場合は実行したSQLを表示します。
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datasets = {size: seed_dataset(f'{size}@example.com', days) for size, days in DATASET_DAYS.items()}
+
+    def setUp(self):
+        self.routes = {size: get_routes(data) for size, data in self.datasets.items()}
+
+    def measure(self, data, method, url, post_data, setup_urls):
+        """ データのユーザーでリクエストし、(レスポンス, 実行したSQLのリスト) を返します。
+
+        キャッシュは計測の前に空にし、キャッシュがない場合のクエリ数を計測します。
+        リクエストで変更したデータは計測した後に元に戻します。
+        """
+        self.client.force_login(data['user'])
+        with transaction.atomic():
+            for setup_url in setup_urls:
+                self.client.get(setup_url)
+            get_cache().clear()
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.post(url, post_data) if method == 'post' else self.client.get(url)
+                if res.streaming:
+                    b''.join(res.streaming_content)
+            transaction.set_rollback(True)
+        return res, [query['sql'] for query in queries.captured_queries]
+
+    def assertQueryBudget(self, name, budget, queries):
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{name} のクエリ数 {len(queries)} が上限 {budget} を超えました。\n{format_queries(queries)}',
+        )
+
+    def test_query_budgets(self):
+        """ 画面ごとのクエリ数が上限以下で、履歴の量で変わらないこと """
+        for i, (name, *_) in enumerate(self.routes['small']):
+            with self.subTest(name):
+                results = {}
+                for size, data in self.datasets.items():
+                    _, method, url, post_data, setup_urls = self.routes[size][i]
+                    res, results[size] = self.measure(data, method, url, post_data, setup_urls)
+                    # POSTは処理が成功してリダイレクトすること
+                    self.assertEqual(res.status_code, 302 if method == 'post' else 200, f'{name}（{size}）: {url}')
+                    self.assertQueryBudget(name, BUDGETS[name], results[size])
+                self.assertEqual(
+                    len(results['large']), len(results['small']),
+                    f'{name} のクエリ数が履歴の量で変わりました。\n'
+                    f'small:\n{format_queries(results["small"])}\nlarge:\n{format_queries(results["large"])}',
+                )
+
+    def test_export(self):
+        """ 履歴の書き出しのクエリ数がチャンクの数に比例すること（行ごとにクエリが増えないこと） """
+        for size, data in self.datasets.items():
+            schedules = DaySchedule.objects.filter(user=data['user']).count()
+            disciplines = Discipline.objects.filter(body_part__user=data['user']).count()
+            budget = (
+                EXPORT_BUDGET
+                + (schedules // CHUNK_SIZE + 1) * EXPORT_SCHEDULE_CHUNK_QUERIES
+                + (disciplines // CHUNK_SIZE + 1) * EXPORT_DISCIPLINE_CHUNK_QUERIES
+            )
+            for fmt in FORMATS:
+                with self.subTest(size=size, fmt=fmt):
+                    url = reverse('discipline:training_history_export', kwargs={'fmt': fmt})
+                    res, queries = self.measure(data, 'get', url, None, [])
+                    self.assertEqual(res.status_code, 200)
+                    self.assertQueryBudget(f'{url}（{size}）', budget, queries)
+
+    def test_routes(self):
+        """ 計測しないURL以外の全てのURLを計測すること """
+        names = {name.split('(')[0] for name, *_ in self.routes['small']}
+        self.assertEqual(names | set(EXCLUDED), get_url_names(NAMESPACES))
+        self.assertEqual({name for name, *_ in self.routes['small']}, set(BUDGETS))